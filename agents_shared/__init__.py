@@ -63,42 +63,82 @@ retry_config = types.HttpRetryOptions(
 )
 
 def check_for_approval(events):
-    """Check if events contain an approval request.
+    """Check if events contain approval requests.
+
+    Collects every pending `adk_request_confirmation` of the first invocation
+    that has one, so they can all be answered with a single resume.
 
     Returns:
-        dict with approval details or None
+        dict with approval details or None. "approval_id" and "invocation_id"
+        describe the first request; "approvals" lists all pending requests of
+        that invocation, each with its "approval_id", "tool", "hint" and "payload"
     """
+    answered = {
+        response.id
+        for event in events
+        for response in event.get_function_responses()
+        if response.name == "adk_request_confirmation"
+    }
+    pending = {}
     for event in events:
-        if event.content and event.content.parts:
-            for part in event.content.parts:
-                if (
-                    part.function_call
-                    and part.function_call.name == "adk_request_confirmation"
-                ):
-                    return {
-                        "approval_id": part.function_call.id,
-                        "invocation_id": event.invocation_id,
-                    }
-    return None
+        if event.partial:
+            continue
+        for call in event.get_function_calls():
+            if call.name != "adk_request_confirmation" or call.id in answered:
+                continue
+            args = call.args or {}
+            confirmation = args.get("toolConfirmation") or {}
+            pending.setdefault(event.invocation_id, []).append({
+                "approval_id": call.id,
+                "tool": (args.get("originalFunctionCall") or {}).get("name"),
+                "hint": confirmation.get("hint"),
+                "payload": confirmation.get("payload"),
+            })
+    if not pending:
+        return None
+    invocation_id, approvals = next(iter(pending.items()))
+    return {
+        "approval_id": approvals[0]["approval_id"],
+        "invocation_id": invocation_id,
+        "approvals": approvals,
+    }
 
 def print_agent_response(events):
     """Print agent's text responses from events."""
     for event in events:
+        # A streamed response's final event repeats the text of its partial events
+        if event.partial:
+            continue
         if event.content and event.content.parts:
             for part in event.content.parts:
                 if part.text:
                     print(f"Agent > {part.text}")
 
 def create_approval_response(approval_info, approved):
-    """Create approval response message."""
-    confirmation_response = types.FunctionResponse(
-        id=approval_info["approval_id"],
-        name="adk_request_confirmation",
-        response={"confirmed": approved},
-    )
-    return types.Content(
-        role="user", parts=[types.Part(function_response=confirmation_response)]
-    )
+    """Create approval response message.
+
+    Args:
+        approval_info: Result of check_for_approval
+        approved: One decision for every pending approval, or a dict of
+            approval_id -> decision (approvals missing from it are rejected)
+
+    Returns:
+        One user message answering all approvals, to resume them in one run_async
+    """
+    approvals = approval_info.get("approvals") or [{"approval_id": approval_info["approval_id"]}]
+    parts = []
+    for approval in approvals:
+        if isinstance(approved, dict):
+            confirmed = bool(approved.get(approval["approval_id"], False))
+        else:
+            confirmed = bool(approved)
+        confirmation_response = types.FunctionResponse(
+            id=approval["approval_id"],
+            name="adk_request_confirmation",
+            response={"confirmed": confirmed},
+        )
+        parts.append(types.Part(function_response=confirmation_response))
+    return types.Content(role="user", parts=parts)
 
 # Day 3 - Helper functions
 async def run_session(
@@ -107,16 +147,30 @@ async def run_session(
     user_id: str = USER_ID,
     model_name: str = MODEL_NAME,
     user_queries: list[str] | str = None,
-    session_name: str = SESSION):
+    session_name: str = SESSION,
+    profile=False,
+    stream: bool = False):
     """Run a session asynchronously.
 
     Args:
         runner_instance: The runner instance
         user_queries: The user queries
         session_name: The session name
+        profile: True or a TurnProfiler to report allocations and event
+            counts per query (see agents_shared/turn_profiler.py)
+        stream: Print text as the model streams it (SSE), and report
+            time-to-first-token and inter-token latency per query
+
+    Returns:
+        With stream=True, one StreamMetrics per query
     """
     print(f"\n ### Session: {session_name}")
 
+    profiler = None
+    if profile:
+        from agents_shared.turn_profiler import TurnProfiler
+        profiler = profile if isinstance(profile, TurnProfiler) else TurnProfiler()
+
     # Get app name from the Runner
     app_name = runner_instance.app_name
 
@@ -134,32 +188,95 @@ async def run_session(
             session_id=session_name
         )
 
-    # Process queries if provided
-    if user_queries:
-        # Convert single query to list for uniform processing
-        if type(user_queries) == str:
-            user_queries = [user_queries]
-
-        # Process each query in the list sequentially
-        for query in user_queries:
-            print(f"\nUser > {query}")
-
-            # Convert the query string to the ADK Content format
-            query = types.Content(role="user", parts=[types.Part(text=query)])
-
-            # Stream the agent's response asynchronously
-            async for event in runner_instance.run_async(
-                user_id=user_id, session_id=session.id, new_message=query
-            ):
-                # Check if the event contains valid content
-                if event.content and event.content.parts:
-                    # Filter out empty or "None" responses before printing
-                    if (
-                        event.content.parts[0].text != "None"
-                        and event.content.parts[0].text
+    stream_metrics = []
+
+    try:
+        # Process queries if provided
+        if user_queries:
+            # Convert single query to list for uniform processing
+            if type(user_queries) == str:
+                user_queries = [user_queries]
+
+            # Process each query in the list sequentially
+            for query in user_queries:
+                print(f"\nUser > {query}")
+                if profiler:
+                    profiler.start_turn(query)
+
+                # Convert the query string to the ADK Content format
+                query = types.Content(role="user", parts=[types.Part(text=query)])
+
+                if stream:
+                    from agents_shared.streaming import StreamMetrics, stream_text, format_stream_metrics
+                    metrics = StreamMetrics(query=query.parts[0].text)
+                    author = None
+                    async for delta_author, delta in stream_text(
+                        runner_instance, user_id, session.id, query, metrics=metrics,
+                        on_event=profiler.record_event if profiler else None,
                     ):
-                        print(f"{model_name} > ", event.content.parts[0].text)
-    else:
-        print("No queries!")
+                        if delta_author != author:
+                            # A new response starts: same prefix as the non-streaming output
+                            print(("\n" if author else "") + f"{model_name} > ", end=" ")
+                            author = delta_author
+                        print(delta, end="", flush=True)
+                    print()
+                    print(format_stream_metrics(metrics))
+                    stream_metrics.append(metrics)
+                    if profiler:
+                        profiler.print_turn(profiler.end_turn())
+                    continue
+
+                # Stream the agent's response asynchronously
+                async for event in runner_instance.run_async(
+                    user_id=user_id, session_id=session.id, new_message=query
+                ):
+                    if profiler:
+                        profiler.record_event(event)
+                    # Check if the event contains valid content
+                    if event.content and event.content.parts:
+                        # Filter out empty or "None" responses before printing
+                        if (
+                            event.content.parts[0].text != "None"
+                            and event.content.parts[0].text
+                        ):
+                            print(f"{model_name} > ", event.content.parts[0].text)
+                if profiler:
+                    profiler.print_turn(profiler.end_turn())
+            if profiler:
+                profiler.print_summary()
+        else:
+            print("No queries!")
+    finally:
+        # Also stops the CPU sampler and tracemalloc when a turn raises
+        if profiler:
+            profiler.close()
+    if stream:
+        return stream_metrics
+
+# Performance helpers
+from agents_shared.batch_pipeline import run_pipelined_batch, print_pipeline_report
+from agents_shared.stand_in_model import StandInModel, use_stand_in_model
+from agents_shared.bounded_session_service import BoundedInMemorySessionService
+from agents_shared.journal_sessions import JournaledSessionService, print_journal_stats
+from agents_shared.session_snapshot import SnapshotDatabaseSessionService, SessionSnapshot, write_snapshot
+from agents_shared.compressed_sessions import CompressedDatabaseSessionService, load_dictionaries, decode_content_column
+from agents_shared.windowed_sessions import WindowedDatabaseSessionService
+from agents_shared.delta_sessions import DeltaEncodedDatabaseSessionService
+from agents_shared.sharded_sessions import ShardedSessionService, shard_urls
+from agents_shared.session_export import export_database, print_export_stats
+from agents_shared.async_sessions import AsyncDatabaseSessionService, LoopLagMonitor
+from agents_shared.worker_pool import SessionWorkerPool, print_worker_report
+from agents_shared.turn_profiler import TurnProfiler
+from agents_shared.pooled_code_executor import PooledCodeExecutor
+from agents_shared.concurrent_tools import ConcurrentFunctionTool, ToolDispatcher, concurrent_tools, print_tool_timings
+from agents_shared.inline_agent_tool import InlineAgentTool
+from agents_shared.best_of_n import BestOfNRefinement, print_refinement_report
+from agents_shared.memory_cache import CachedMemoryService, print_memory_cache_stats
+from agents_shared.memory_dedup import DedupMemoryService, print_dedup_stats
+from agents_shared.memory_preload import IncrementalMemoryPreload, print_preload_stats
+from agents_shared.streaming import StreamMetrics, stream_text
+from agents_shared.model_router import RouterModel, ModelTier, RouteRule, default_router, use_model_router, print_router_report
+from agents_shared.hedged_model import HedgedModel, print_hedge_report
+from agents_shared.model_clients import PooledGemini, model_clients, register_pooled_gemini, print_pool_stats, run_with_model_clients
 
 print("✅ Helper functions defined.")
\ No newline at end of file
@@ -0,0 +1,428 @@
+# Non-blocking session persistence for async runners
+#
+# DatabaseSessionService does its SQL (and the fsync of every commit) inside
+# `async def` methods, so each call blocks the event loop and every other
+# session of the process with it. AsyncDatabaseSessionService runs the same
+# tables through SQLAlchemy's asyncio engine on the aiosqlite driver
+# (`sqlite+aiosqlite://`), so the loop only awaits database work:
+#
+#   - append_event returns once its event is committed, like
+#     DatabaseSessionService
+#   - group commit: appends that arrive while a commit is in progress are
+#     written by the next one, in one transaction, so concurrent sessions
+#     share commits instead of queueing for one each
+#   - connections are opened per transaction (NullPool), so one service can
+#     be used from several event loops, e.g. successive asyncio.run() calls;
+#     the group commit state is kept per loop
+#
+# Usage (from the repository root):
+#   session_service = AsyncDatabaseSessionService("sqlite:///my_agent_data.db")
+#
+#   python -m agents_shared.async_sessions bench --users 32 --events 30
+import argparse
+import asyncio
+import gc
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import weakref
+from datetime import datetime
+from typing import Any, Optional
+
+from google.adk.errors.already_exists_error import AlreadyExistsError
+from google.adk.events import Event, EventActions
+from google.adk.sessions import BaseSessionService, DatabaseSessionService, Session
+from google.adk.sessions import _session_util
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+from google.adk.sessions.database_session_service import (
+    Base,
+    StorageAppState,
+    StorageEvent,
+    StorageSession,
+    StorageUserState,
+    _merge_state,
+    set_sqlite_pragma,
+)
+from google.genai import types
+from sqlalchemy import create_engine, delete, select
+from sqlalchemy import event as sqlalchemy_event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+
+try:
+    # Needs greenlet, plus aiosqlite for SQLite: pip install "sqlalchemy[asyncio]" aiosqlite
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+except ImportError:
+    create_async_engine = None
+
+
+def async_database_url(db_url: str) -> str:
+    """The asyncio driver URL of a database URL: sqlite:// becomes sqlite+aiosqlite://."""
+    url = make_url(db_url)
+    if url.drivername == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
+    return url.render_as_string(hide_password=False)
+
+
+def _sync_database_url(db_url: str) -> str:
+    url = make_url(db_url)
+    if url.drivername == "sqlite+aiosqlite":
+        url = url.set(drivername="sqlite")
+    return url.render_as_string(hide_password=False)
+
+
+class AsyncDatabaseSessionService(BaseSessionService):
+    """Session service on the tables of DatabaseSessionService, over an asyncio driver.
+
+    Reads and writes the same database file as DatabaseSessionService, so
+    the two can be swapped. Appends skip the stale-session check of
+    DatabaseSessionService: this service must be the only writer of the
+    sessions it appends to.
+    """
+
+    def __init__(self, db_url: str, max_batch: int = 100, **kwargs: Any):
+        """Initializes the service and creates the tables if needed.
+
+        Args:
+            db_url: The database URL, e.g. "sqlite:///my_agent_data.db" (the
+                driver is switched to aiosqlite) or "sqlite+aiosqlite:///..."
+            max_batch: Most appends written per transaction
+            kwargs: Passed on to create_async_engine
+        """
+        if create_async_engine is None:
+            raise ValueError('AsyncDatabaseSessionService needs: pip install "sqlalchemy[asyncio]" aiosqlite')
+        # Tables are created once, up front, so no event loop is needed for it
+        sync_engine = create_engine(_sync_database_url(db_url))
+        try:
+            Base.metadata.create_all(sync_engine)
+        finally:
+            sync_engine.dispose()
+
+        self.db_engine = create_async_engine(async_database_url(db_url), poolclass=NullPool, **kwargs)
+        if self.db_engine.dialect.name == "sqlite":
+            sqlalchemy_event.listen(self.db_engine.sync_engine, "connect", set_sqlite_pragma)
+        self.database_session_factory = async_sessionmaker(self.db_engine, expire_on_commit=False)
+        self.max_batch = max_batch
+        # Event loop -> {"pending": [(session, event, future)], "task": commit task}
+        self._loops: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self.stats = {"appends": 0, "commits": 0, "largest_batch": 0}
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        # Same rows as DatabaseSessionService.create_session
+        async with self.database_session_factory() as sql_session:
+            if session_id and await sql_session.get(StorageSession, (app_name, user_id, session_id)):
+                raise AlreadyExistsError(f"Session with id {session_id} already exists.")
+            storage_app_state = await sql_session.get(StorageAppState, (app_name))
+            if not storage_app_state:
+                storage_app_state = StorageAppState(app_name=app_name, state={})
+                sql_session.add(storage_app_state)
+            storage_user_state = await sql_session.get(StorageUserState, (app_name, user_id))
+            if not storage_user_state:
+                storage_user_state = StorageUserState(app_name=app_name, user_id=user_id, state={})
+                sql_session.add(storage_user_state)
+
+            deltas = _session_util.extract_state_delta(state)
+            if deltas["app"]:
+                storage_app_state.state = storage_app_state.state | deltas["app"]
+            if deltas["user"]:
+                storage_user_state.state = storage_user_state.state | deltas["user"]
+            storage_session = StorageSession(
+                app_name=app_name, user_id=user_id, id=session_id, state=deltas["session"]
+            )
+            sql_session.add(storage_session)
+            await sql_session.commit()
+            await sql_session.refresh(storage_session)
+            merged_state = _merge_state(storage_app_state.state, storage_user_state.state, deltas["session"])
+            return storage_session.to_session(state=merged_state)
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        async with self.database_session_factory() as sql_session:
+            storage_session = await sql_session.get(StorageSession, (app_name, user_id, session_id))
+            if storage_session is None:
+                return None
+            query = select(StorageEvent).where(
+                StorageEvent.app_name == app_name,
+                StorageEvent.user_id == user_id,
+                StorageEvent.session_id == session_id,
+            )
+            if config and config.after_timestamp:
+                query = query.where(StorageEvent.timestamp >= datetime.fromtimestamp(config.after_timestamp))
+            query = query.order_by(StorageEvent.timestamp.desc())
+            if config and config.num_recent_events:
+                query = query.limit(config.num_recent_events)
+            storage_events = (await sql_session.scalars(query)).all()
+
+            storage_app_state = await sql_session.get(StorageAppState, (app_name))
+            storage_user_state = await sql_session.get(StorageUserState, (app_name, user_id))
+            merged_state = _merge_state(
+                storage_app_state.state if storage_app_state else {},
+                storage_user_state.state if storage_user_state else {},
+                storage_session.state,
+            )
+            events = [e.to_event() for e in reversed(storage_events)]
+            return storage_session.to_session(state=merged_state, events=events)
+
+    async def list_sessions(
+        self, *, app_name: str, user_id: Optional[str] = None
+    ) -> ListSessionsResponse:
+        async with self.database_session_factory() as sql_session:
+            query = select(StorageSession).where(StorageSession.app_name == app_name)
+            user_query = select(StorageUserState).where(StorageUserState.app_name == app_name)
+            if user_id is not None:
+                query = query.where(StorageSession.user_id == user_id)
+                user_query = user_query.where(StorageUserState.user_id == user_id)
+            storage_sessions = (await sql_session.scalars(query)).all()
+            user_states = {row.user_id: row.state for row in (await sql_session.scalars(user_query)).all()}
+            storage_app_state = await sql_session.get(StorageAppState, (app_name))
+            app_state = storage_app_state.state if storage_app_state else {}
+            return ListSessionsResponse(
+                sessions=[
+                    storage_session.to_session(
+                        state=_merge_state(app_state, user_states.get(storage_session.user_id, {}), storage_session.state)
+                    )
+                    for storage_session in storage_sessions
+                ]
+            )
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        async with self.database_session_factory() as sql_session:
+            await sql_session.execute(
+                delete(StorageSession).where(
+                    StorageSession.app_name == app_name,
+                    StorageSession.user_id == user_id,
+                    StorageSession.id == session_id,
+                )
+            )
+            await sql_session.commit()
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        event = self._trim_temp_delta_state(event)
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            state = self._loops[loop] = {"pending": [], "task": None}
+        done = loop.create_future()
+        state["pending"].append((session, event, done))
+        if state["task"] is None or state["task"].done():
+            state["task"] = asyncio.create_task(self._commit_loop(state))
+        await done
+        # Only a committed event reaches the caller's session, so a failed
+        # append leaves it as it is in the database
+        self._update_session_state(session, event)
+        session.events.append(event)
+        return event
+
+    async def _commit_loop(self, state: dict):
+        while state["pending"]:
+            jobs = state["pending"][: self.max_batch]
+            del state["pending"][: self.max_batch]
+            try:
+                jobs = await self._commit_group(jobs)
+            except Exception as error:
+                for _, _, done in jobs:
+                    if not done.done():
+                        done.set_exception(error)
+                continue
+            self.stats["appends"] += len(jobs)
+            self.stats["largest_batch"] = max(self.stats["largest_batch"], len(jobs))
+            for _, _, done in jobs:
+                if not done.done():
+                    done.set_result(None)
+
+    async def _commit_group(self, jobs: list) -> list:
+        """Write the events of many appends in one transaction.
+
+        Same row changes as DatabaseSessionService.append_event, with one
+        commit for the whole group. An append that cannot be written, e.g.
+        to a deleted session, fails on its own and the others are committed.
+
+        Returns:
+            The jobs that were committed
+        """
+        committed = []
+        async with self.database_session_factory() as sql_session:
+            touched = {}
+            for job in jobs:
+                session, event, done = job
+                key = (session.app_name, session.user_id, session.id)
+                if key not in touched:
+                    storage_session = await sql_session.get(StorageSession, key)
+                    if storage_session is None:
+                        done.set_exception(ValueError(f"Session {session.id} not found."))
+                        continue
+                    touched[key] = (session, storage_session)
+                try:
+                    storage_event = StorageEvent.from_event(session, event)
+                except Exception as error:
+                    done.set_exception(error)
+                    continue
+                if event.actions and event.actions.state_delta:
+                    deltas = _session_util.extract_state_delta(event.actions.state_delta)
+                    if deltas["app"]:
+                        app_state = await sql_session.get(StorageAppState, (session.app_name))
+                        app_state.state = app_state.state | deltas["app"]
+                    if deltas["user"]:
+                        user_state = await sql_session.get(StorageUserState, (session.app_name, session.user_id))
+                        user_state.state = user_state.state | deltas["user"]
+                    if deltas["session"]:
+                        storage_session = touched[key][1]
+                        storage_session.state = storage_session.state | deltas["session"]
+                sql_session.add(storage_event)
+                committed.append(job)
+            if not committed:
+                return committed
+            await sql_session.commit()
+            for session, storage_session in touched.values():
+                await sql_session.refresh(storage_session)
+                session.last_update_time = storage_session.update_timestamp_tz
+        self.stats["commits"] += 1
+        return committed
+
+    async def close(self):
+        """Dispose of the engine."""
+        await self.db_engine.dispose()
+
+
+class LoopLagMonitor:
+    """Measure how late the event loop wakes up a sleeping task.
+
+    Use as `async with LoopLagMonitor() as lag: ...`, then read `lag.summary()`.
+    Anything that blocks the loop shows up as lag.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.lags: list[float] = []
+        self._task: Optional[asyncio.Task] = None
+        self._sleep_started = 0.0
+
+    async def _probe(self):
+        while True:
+            self._sleep_started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - self._sleep_started - self.interval))
+
+    async def __aenter__(self):
+        self._sleep_started = time.perf_counter()
+        self._task = asyncio.create_task(self._probe())
+        await asyncio.sleep(0)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        # A loop blocked for the whole block never woke the probe at all
+        self.lags.append(max(0.0, time.perf_counter() - self._sleep_started - self.interval))
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def summary(self) -> dict:
+        """Lag percentiles in milliseconds."""
+        if not self.lags:
+            return {"p50": 0.0, "p99": 0.0, "max": 0.0}
+        ordered = sorted(self.lags)
+        return {
+            "p50": statistics.median(ordered) * 1000,
+            "p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+            "max": ordered[-1] * 1000,
+        }
+
+
+async def _session_load(service: BaseSessionService, users: int, events: int, content_bytes: int) -> dict:
+    """Concurrent users appending events, with the loop lag measured throughout."""
+    text_part = "x" * content_bytes
+
+    async def one_user(index: int):
+        session = await service.create_session(app_name="bench", user_id=f"user-{index}")
+        for i in range(events):
+            await service.append_event(
+                session,
+                Event(
+                    author="bench",
+                    invocation_id=f"inv-{i}",
+                    content=types.Content(role="model", parts=[types.Part(text=text_part)]),
+                    actions=EventActions(state_delta={"turn": i}),
+                ),
+            )
+        loaded = await service.get_session(app_name="bench", user_id=session.user_id, session_id=session.id)
+        assert len(loaded.events) == events and loaded.state["turn"] == events - 1
+
+    started = time.perf_counter()
+    async with LoopLagMonitor() as lag:
+        await asyncio.gather(*(one_user(i) for i in range(users)))
+    seconds = time.perf_counter() - started
+    return {"appends_per_second": users * events / seconds, "lag_ms": lag.summary()}
+
+
+def benchmark(users: int = 32, events: int = 30, content_bytes: int = 1024) -> dict:
+    """Loop lag and throughput of DatabaseSessionService vs AsyncDatabaseSessionService."""
+    # The ADK import graph leaves ~500k objects behind, and a full collection
+    # of those stalls every thread for a few hundred ms, which would show up
+    # as loop lag unrelated to the database
+    gc.collect()
+    gc.freeze()
+    results = {}
+    for name in ("DatabaseSessionService", "AsyncDatabaseSessionService"):
+        workdir = tempfile.mkdtemp(prefix="adk_async_bench_")
+        db_url = f"sqlite:///{os.path.join(workdir, 'sessions.db')}"
+        if name == "DatabaseSessionService":
+            service = DatabaseSessionService(db_url=db_url)
+        else:
+            service = AsyncDatabaseSessionService(db_url=db_url)
+        try:
+            # Warm up first, so one-off ORM setup does not count as loop lag
+            asyncio.run(_session_load(service, 1, 1, content_bytes))
+            results[name] = asyncio.run(_session_load(service, users, events, content_bytes))
+        finally:
+            if isinstance(service, AsyncDatabaseSessionService):
+                results[name]["stats"] = dict(service.stats)
+                asyncio.run(service.close())
+            else:
+                service.db_engine.dispose()
+            shutil.rmtree(workdir)
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Event loop lag of session persistence.")
+    parser.add_argument("command", choices=["bench"])
+    parser.add_argument("--users", type=int, default=32, help="Concurrent users appending")
+    parser.add_argument("--events", type=int, default=30, help="Events appended per user")
+    parser.add_argument("--content-bytes", type=int, default=1024, help="Text size of every event")
+    args = parser.parse_args(argv)
+
+    results = benchmark(args.users, args.events, args.content_bytes)
+    print(f"\n ### Session persistence under load ({args.users} users x {args.events} events)")
+    for name, result in results.items():
+        lag = result["lag_ms"]
+        print(
+            f"   - {name:28s} {result['appends_per_second']:8.1f} appends/s,"
+            f" loop lag p50={lag['p50']:.1f}ms p99={lag['p99']:.1f}ms max={lag['max']:.1f}ms"
+        )
+        if "stats" in result:
+            print(f"     {result['stats']['commits']} commits, largest group {result['stats']['largest_batch']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
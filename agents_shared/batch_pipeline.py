@@ -0,0 +1,240 @@
+# Pipelined batch execution for SequentialAgent workflows
+#
+# A SequentialAgent runs one input end to end before the next one starts.
+# Here every sub-agent becomes its own stage with a group of workers, and the
+# stages are connected by bounded queues, so input N+1 can be in the first
+# stage while input N is still in the second one.
+import asyncio
+import time
+from dataclasses import dataclass, field
+
+from google.adk.agents import SequentialAgent
+from google.adk.agents.invocation_context import InvocationContext, new_invocation_context_id
+from google.adk.agents.run_config import RunConfig
+from google.adk.events import Event
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+# Marks the end of the input stream for one worker
+_DONE = object()
+
+
+@dataclass
+class StageStats:
+    """Counters collected for one pipeline stage."""
+
+    name: str
+    workers: int
+    items: int = 0
+    errors: int = 0
+    busy_seconds: float = 0.0
+    max_queue_depth: int = 0
+    queue_depth_total: int = 0
+    queue_depth_samples: int = 0
+
+    def utilization(self, wall_seconds: float) -> float:
+        """Fraction of the available worker time spent running the agent."""
+        if wall_seconds <= 0 or self.workers <= 0:
+            return 0.0
+        return self.busy_seconds / (wall_seconds * self.workers)
+
+    def mean_queue_depth(self) -> float:
+        if not self.queue_depth_samples:
+            return 0.0
+        return self.queue_depth_total / self.queue_depth_samples
+
+
+@dataclass
+class PipelineItem:
+    """One input travelling through the pipeline."""
+
+    index: int
+    query: str
+    session_id: str
+    invocation_id: str
+    session: object = None
+    state: dict = field(default_factory=dict)
+    error: str | None = None
+
+
+def _stage_worker_counts(stages, stage_workers) -> list[int]:
+    """Resolve `stage_workers` (int or {agent_name: int}) to one count per stage."""
+    if stage_workers is None:
+        stage_workers = 1
+    if isinstance(stage_workers, int):
+        counts = [stage_workers] * len(stages)
+    else:
+        counts = [stage_workers.get(stage.name, 1) for stage in stages]
+    if any(count < 1 for count in counts):
+        raise ValueError("Every stage needs at least one worker.")
+    return counts
+
+
+async def _run_stage(stage, item, session_service, run_config):
+    """Run one sub-agent over the item's session, as SequentialAgent would."""
+    ctx = InvocationContext(
+        session_service=session_service,
+        invocation_id=item.invocation_id,
+        agent=stage,
+        user_content=types.Content(role="user", parts=[types.Part(text=item.query)]),
+        session=item.session,
+        run_config=run_config,
+    )
+    async for event in stage.run_async(ctx):
+        if not event.partial:
+            await session_service.append_event(item.session, event)
+
+
+async def run_pipelined_batch(
+    pipeline: SequentialAgent,
+    inputs: list[str],
+    session_service=None,
+    app_name: str = "pipeline_batch",
+    user_id: str = "default",
+    stage_workers: int | dict[str, int] = 1,
+    queue_size: int = 4,
+    session_prefix: str = "batch",
+    run_config: RunConfig = None,
+):
+    """Run a SequentialAgent over many inputs with its stages pipelined.
+
+    Each input gets its own session. Stage k of input N runs concurrently
+    with stage k-1 of input N+1, and a stage with several workers processes
+    several inputs at once. An input that fails in one stage is skipped by
+    the remaining stages and reported with its error.
+
+    Args:
+        pipeline: The SequentialAgent whose sub_agents become the stages
+        inputs: The user queries, one per pipeline run
+        session_service: Where the per-input sessions live (in-memory by default)
+        app_name: The app name used for the sessions
+        user_id: The user id used for the sessions
+        stage_workers: Workers per stage, either one int for all stages or a
+            dict keyed by sub-agent name
+        queue_size: Capacity of the queue in front of every stage
+        session_prefix: Prefix of the generated session ids
+        run_config: Optional run config passed to every stage
+
+    Returns:
+        Tuple (results, report). `results` is a list, in input order, of
+        dicts with "query", "session_id", "state" and "error". `report` holds
+        the wall time and per-stage utilization and queue depth.
+    """
+    stages = list(pipeline.sub_agents)
+    if not stages:
+        raise ValueError(f"{pipeline.name} has no sub-agents to pipeline.")
+    session_service = session_service or InMemorySessionService()
+    run_config = run_config or RunConfig()
+    counts = _stage_worker_counts(stages, stage_workers)
+
+    # queues[k] feeds stage k, the last queue collects finished items
+    queues = [asyncio.Queue(maxsize=queue_size) for _ in stages]
+    finished: asyncio.Queue = asyncio.Queue()
+    queues.append(finished)
+    stats = [StageStats(name=stage.name, workers=n) for stage, n in zip(stages, counts)]
+
+    async def worker(k: int):
+        stage, stage_stats = stages[k], stats[k]
+        while True:
+            item = await queues[k].get()
+            if item is _DONE:
+                return
+            depth = queues[k].qsize()
+            stage_stats.queue_depth_total += depth
+            stage_stats.queue_depth_samples += 1
+            stage_stats.max_queue_depth = max(stage_stats.max_queue_depth, depth)
+
+            if item.error is None:
+                started = time.perf_counter()
+                try:
+                    await _run_stage(stage, item, session_service, run_config)
+                except Exception as e:
+                    item.error = f"{stage.name}: {e!r}"
+                    stage_stats.errors += 1
+                stage_stats.busy_seconds += time.perf_counter() - started
+                stage_stats.items += 1
+            await queues[k + 1].put(item)
+
+    async def stage_group(k: int):
+        await asyncio.gather(*(worker(k) for _ in range(counts[k])))
+        # Only stop the next stage once every worker of this one is done
+        if k + 1 < len(stages):
+            for _ in range(counts[k + 1]):
+                await queues[k + 1].put(_DONE)
+
+    async def feed():
+        for index, query in enumerate(inputs):
+            session_id = f"{session_prefix}-{index}"
+            session = await session_service.create_session(
+                app_name=app_name, user_id=user_id, session_id=session_id
+            )
+            item = PipelineItem(
+                index=index,
+                query=query,
+                session_id=session_id,
+                invocation_id=new_invocation_context_id(),
+                session=session,
+            )
+            # Record the user message once, like Runner does for a new invocation
+            await session_service.append_event(
+                session,
+                Event(
+                    invocation_id=item.invocation_id,
+                    author="user",
+                    content=types.Content(role="user", parts=[types.Part(text=query)]),
+                ),
+            )
+            await queues[0].put(item)
+        for _ in range(counts[0]):
+            await queues[0].put(_DONE)
+
+    started = time.perf_counter()
+    await asyncio.gather(feed(), *(stage_group(k) for k in range(len(stages))))
+    wall_seconds = time.perf_counter() - started
+
+    items = []
+    while not finished.empty():
+        items.append(finished.get_nowait())
+    items.sort(key=lambda item: item.index)
+
+    results = []
+    for item in items:
+        session = await session_service.get_session(
+            app_name=app_name, user_id=user_id, session_id=item.session_id
+        )
+        results.append({
+            "query": item.query,
+            "session_id": item.session_id,
+            "state": dict(session.state) if session else {},
+            "error": item.error,
+        })
+
+    report = {
+        "inputs": len(inputs),
+        "wall_seconds": wall_seconds,
+        "stages": [
+            {
+                "name": s.name,
+                "workers": s.workers,
+                "items": s.items,
+                "errors": s.errors,
+                "busy_seconds": s.busy_seconds,
+                "utilization": s.utilization(wall_seconds),
+                "max_queue_depth": s.max_queue_depth,
+                "mean_queue_depth": s.mean_queue_depth(),
+            }
+            for s in stats
+        ],
+    }
+    return results, report
+
+
+def print_pipeline_report(report: dict):
+    """Print the per-stage utilization and queue depth of a pipelined run."""
+    print(f"\n ### Pipelined batch: {report['inputs']} inputs in {report['wall_seconds']:.2f}s")
+    for stage in report["stages"]:
+        print(
+            f"  {stage['name']:<20} workers={stage['workers']} items={stage['items']}"
+            f" errors={stage['errors']} utilization={stage['utilization']:.0%}"
+            f" queue max={stage['max_queue_depth']} mean={stage['mean_queue_depth']:.1f}"
+        )
@@ -0,0 +1,254 @@
+# Best-of-N refinement: parallel candidate revisions, first approval wins
+#
+# A LoopAgent of critic -> refiner waits for every model call in turn: a
+# story that needs two revisions costs five sequential calls. BestOfNRefinement
+# takes the same critic and refiner and, every round, starts N candidate
+# revisions at once. Each candidate is refined, then reviewed by the critic,
+# independently of the others:
+#   - the first candidate whose critique is the approval phrase ("APPROVED")
+#     wins, and every other candidate still running is cancelled, so calls in
+#     flight stop instead of being paid in full
+#   - when no candidate is approved, the first one to finish carries its story
+#     and critique into the next round, up to max_rounds
+#   - candidates run in private copies of the session state (see
+#     inline_agent_tool.run_agent_inline); only the winner's story and critique
+#     are written back, in one event per round
+#
+# The price is up to N times the refiner and critic calls per round, minus
+# what cancellation saves; stats count the calls made, the calls cancelled in
+# flight and the tokens used, next to the wall time per story.
+#
+# Usage:
+#   refinement = BestOfNRefinement(name="StoryRefinement", sub_agents=[critic_agent, refiner_agent], candidates=3)
+#   root_agent = SequentialAgent(name="StoryPipeline", sub_agents=[initial_writer_agent, refinement])
+#   print_refinement_report(refinement)
+#
+#   python -m agents_shared.best_of_n --stories 20 --candidates 1 3
+# compares 1 candidate (the serial loop) with N on a stand-in model.
+import argparse
+import asyncio
+import sys
+import time
+from dataclasses import dataclass
+from typing import AsyncGenerator
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.genai import types
+from pydantic import PrivateAttr
+
+from agents_shared.inline_agent_tool import run_agent_inline
+
+
+@dataclass
+class RefinementStats:
+    stories: int = 0
+    approved: int = 0  # Stories a critique approved within max_rounds
+    rounds: int = 0
+    candidates_started: int = 0
+    candidates_cancelled: int = 0
+    model_calls: int = 0  # Completed refiner and critic calls
+    cancelled_calls: int = 0  # Calls in flight when their candidate was cancelled
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    wall_seconds: float = 0.0
+
+
+def _text(content) -> str:
+    if not content or not content.parts:
+        return ""
+    return "".join(part.text for part in content.parts if part.text and not part.thought).strip()
+
+
+class BestOfNRefinement(BaseAgent):
+    """Refines `story_key` with N parallel critic-reviewed candidates per round.
+
+    sub_agents are [critic, refiner], the agents of the critic -> refiner loop.
+    """
+
+    candidates: int = 3  # Candidate revisions per round
+    max_rounds: int = 2  # Rounds before the last round's story is kept
+    approval_phrase: str = "APPROVED"
+    story_key: str = "current_story"
+    critique_key: str = "critique"
+
+    _stats: RefinementStats = PrivateAttr(default_factory=RefinementStats)
+
+    @property
+    def stats(self) -> RefinementStats:
+        return self._stats
+
+    def _approved(self, critique: str) -> bool:
+        return critique.strip().strip("\"'.!").upper() == self.approval_phrase.upper()
+
+    def _count(self, event: Event):
+        if event.usage_metadata:
+            self._stats.model_calls += 1
+            self._stats.prompt_tokens += event.usage_metadata.prompt_token_count or 0
+            self._stats.output_tokens += event.usage_metadata.candidates_token_count or 0
+
+    async def _critique(self, ctx: InvocationContext, state: dict) -> str:
+        critic = self.sub_agents[0]
+        _, content = await run_agent_inline(critic, ctx, state, on_event=self._count)
+        return state.get(self.critique_key) or _text(content)
+
+    async def _candidate(self, ctx: InvocationContext, base_state: dict, phase: list) -> tuple[str, str]:
+        """Refine, then review, one candidate; phase[0] says which call is running."""
+        refiner = self.sub_agents[1]
+        state = dict(base_state)
+        phase[0] = "refine"
+        _, content = await run_agent_inline(refiner, ctx, state, on_event=self._count)
+        story = state.get(self.story_key) or _text(content) or base_state.get(self.story_key, "")
+        state[self.story_key] = story
+        phase[0] = "critique"
+        critique = await self._critique(ctx, state)
+        phase[0] = None
+        return story, critique
+
+    async def _round(self, ctx: InvocationContext, state: dict) -> tuple[str, str]:
+        stats = self._stats
+        phases = [[None] for _ in range(self.candidates)]
+        pending = {
+            asyncio.create_task(self._candidate(ctx, state, phases[i])): i for i in range(self.candidates)
+        }
+        stats.candidates_started += len(pending)
+        first = error = None
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    del pending[task]
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    story, critique = task.result()
+                    first = first or (story, critique)
+                    if self._approved(critique):
+                        return story, critique
+        finally:
+            for task, index in pending.items():
+                task.cancel()
+                stats.candidates_cancelled += 1
+                if phases[index][0]:
+                    stats.cancelled_calls += 1
+            await asyncio.gather(*pending, return_exceptions=True)
+        if first is None:
+            raise error
+        return first
+
+    def _commit(self, ctx: InvocationContext, story: str, critique: str) -> Event:
+        return Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            content=types.Content(role="model", parts=[types.Part(text=story)]),
+            actions=EventActions(state_delta={self.story_key: story, self.critique_key: critique}),
+        )
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        stats = self._stats
+        stats.stories += 1
+        started = time.perf_counter()
+        try:
+            state = {key: value for key, value in ctx.session.state.items() if not key.startswith("_adk")}
+            critique = await self._critique(ctx, state)
+            if self._approved(critique):
+                stats.approved += 1
+                yield self._commit(ctx, state.get(self.story_key, ""), critique)
+                return
+            state[self.critique_key] = critique
+            for _ in range(self.max_rounds):
+                stats.rounds += 1
+                story, critique = await self._round(ctx, state)
+                state.update({self.story_key: story, self.critique_key: critique})
+                yield self._commit(ctx, story, critique)
+                if self._approved(critique):
+                    stats.approved += 1
+                    return
+        finally:
+            stats.wall_seconds += time.perf_counter() - started
+
+
+def refinement_report(agent: BestOfNRefinement) -> dict:
+    stats = agent.stats
+    stories = stats.stories or 1
+    return {
+        "candidates": agent.candidates,
+        "stories": stats.stories,
+        "approved": stats.approved,
+        "seconds_per_story": stats.wall_seconds / stories,
+        "calls_per_story": stats.model_calls / stories,
+        "cancelled_calls_per_story": stats.cancelled_calls / stories,
+        "tokens_per_story": (stats.prompt_tokens + stats.output_tokens) / stories,
+        "candidates_cancelled": stats.candidates_cancelled,
+        "candidates_started": stats.candidates_started,
+    }
+
+
+def print_refinement_report(agent: BestOfNRefinement):
+    report = refinement_report(agent)
+    print(
+        f"   [best of {report['candidates']}] {report['stories']} stories, {report['approved']} approved;"
+        f" {report['seconds_per_story']:.2f}s, {report['calls_per_story']:.1f} model calls"
+        f" (+{report['cancelled_calls_per_story']:.1f} cancelled in flight), {report['tokens_per_story']:.0f} tokens per story;"
+        f" {report['candidates_cancelled']}/{report['candidates_started']} candidates cancelled"
+    )
+
+
+async def run_bench(args):
+    from google.adk.runners import InMemoryRunner
+
+    # The agent folder builds its refinement from agents_shared.best_of_n,
+    # not from this module when it runs as __main__
+    from agents_shared.best_of_n import BestOfNRefinement as FolderRefinement
+    from agents_shared.load_test import load_agent_folder
+    from agents_shared.stand_in_model import use_stand_in_model
+
+    print(f"\n ### Story refinement ({args.stories} stories, stand-in model {args.latency * 1000:.0f}ms"
+          f" +{args.jitter * 1000:.0f}ms jitter, critic approves {args.approve_rate:.0%})")
+    reports = []
+    for candidates in args.candidates:
+        root, _ = load_agent_folder("d1_loop_agent")
+        use_stand_in_model(root, latency=args.latency, latency_jitter=args.jitter)
+        refinement = next(agent for agent in root.sub_agents if isinstance(agent, FolderRefinement))
+        refinement.candidates = candidates
+        refinement.max_rounds = args.rounds
+        critic = refinement.sub_agents[0]
+        critic.model.fixed_reply, critic.model.fixed_reply_rate = refinement.approval_phrase, args.approve_rate
+
+        runner = InMemoryRunner(agent=root)
+        for i in range(args.stories):
+            session = await runner.session_service.create_session(app_name=runner.app_name, user_id="bench")
+            message = types.Content(role="user", parts=[types.Part(text=f"A story about lighthouse keeper {i}")])
+            async for _ in runner.run_async(user_id="bench", session_id=session.id, new_message=message):
+                pass
+        print_refinement_report(refinement)
+        reports.append(refinement_report(refinement))
+
+    serial = reports[0]
+    for report in reports[1:]:
+        print(
+            f"   - {report['candidates']} candidates vs {serial['candidates']}:"
+            f" {serial['seconds_per_story'] / report['seconds_per_story']:.1f}x faster per story,"
+            f" {report['tokens_per_story'] / serial['tokens_per_story']:.1f}x the tokens,"
+            f" {report['approved']}/{report['stories']} approved (was {serial['approved']}/{serial['stories']})"
+        )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Wall time and spend of best-of-N story refinement.")
+    parser.add_argument("--stories", type=int, default=20, help="Stories per setting")
+    parser.add_argument("--candidates", type=int, nargs="+", default=[1, 3], help="Candidate counts, the first is the baseline")
+    parser.add_argument("--rounds", type=int, default=3, help="Refinement rounds at most")
+    parser.add_argument("--latency", type=float, default=0.1, help="Stand-in model delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Extra random stand-in delay in seconds")
+    parser.add_argument("--approve-rate", type=float, default=0.3, help="Share of critiques that approve")
+    args = parser.parse_args(argv)
+    asyncio.run(run_bench(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
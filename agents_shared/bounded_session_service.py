@@ -0,0 +1,263 @@
+# Bounded in-memory session service with LRU/TTL eviction and spill-to-disk
+#
+# InMemorySessionService keeps every session and event for the lifetime of the
+# process. This subclass keeps only the hot sessions in RAM: once the session
+# count or byte cap is exceeded, or a session has been idle longer than the
+# TTL, the least recently used sessions are written to a spill file and
+# dropped from memory. Touching a spilled session reads it back transparently.
+import os
+import struct
+import tempfile
+import time
+import weakref
+import zlib
+from collections import OrderedDict
+from typing import Any, Optional
+
+from google.adk.events import Event
+from google.adk.sessions import InMemorySessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+
+# Every spill record is a 4-byte big-endian length followed by a zlib
+# compressed JSON dump of the session
+_RECORD_HEADER = struct.Struct(">I")
+
+
+def _remove_file(path: Optional[str]):
+    if path is not None and os.path.exists(path):
+        os.remove(path)
+
+
+class BoundedInMemorySessionService(InMemorySessionService):
+    """An InMemorySessionService that keeps at most a bounded set of sessions in RAM.
+
+    App and user state stay in memory, since they are shared by all sessions.
+    The spill file only lives as long as the service, like the in-memory data:
+    the default one is an anonymous temporary file, and a named one is
+    removed by close() or when the service is garbage collected or the
+    process exits.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        max_bytes: int = 256 * 2**20,
+        idle_ttl: Optional[float] = None,
+        spill_path: Optional[str] = None,
+        compression_level: int = 6,
+    ):
+        """Initializes the bounded session service.
+
+        Args:
+            max_sessions: Most sessions kept in memory at once
+            max_bytes: Most (approximate, JSON-encoded) session bytes kept in memory
+            idle_ttl: Seconds after which an untouched session is spilled, None to disable
+            spill_path: Spill file location, an anonymous temporary file by default
+            compression_level: zlib level used for spilled sessions
+        """
+        super().__init__()
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.compression_level = compression_level
+        self.spill_path = spill_path
+        self._spill_file = self._open_spill_file()
+        # Removes a named spill file with the service, close() or not
+        self._remove_spill_file = weakref.finalize(self, _remove_file, spill_path)
+        # Hot sessions in LRU order: key -> [approximate bytes, last access time]
+        self._lru: OrderedDict[tuple, list] = OrderedDict()
+        self._hot_bytes = 0
+        # Spilled sessions: key -> (offset, length) in the spill file
+        self._spilled: dict[tuple, tuple[int, int]] = {}
+        # Spill file bytes of the records in _spilled, and of superseded ones
+        self._live_bytes = 0
+        self._dead_bytes = 0
+        self.stats = {"spills": 0, "rehydrations": 0, "compactions": 0}
+
+    # -- bookkeeping -------------------------------------------------------
+
+    def _open_spill_file(self, suffix: str = ""):
+        if self.spill_path is None:
+            # Already unlinked, so nothing is left behind whatever happens to the process
+            return tempfile.TemporaryFile(prefix="adk_sessions_", suffix=".spill")
+        return open(self.spill_path + suffix, "w+b")
+
+    def _touch(self, key: tuple, added_bytes: int = 0):
+        entry = self._lru.get(key)
+        if entry is None:
+            entry = self._lru[key] = [0, 0.0]
+        entry[0] += added_bytes
+        entry[1] = time.monotonic()
+        self._hot_bytes += added_bytes
+        self._lru.move_to_end(key)
+
+    def _enforce_limits(self, protect: Optional[tuple] = None):
+        """Spill LRU sessions until the caps hold; `protect` is never spilled."""
+        now = time.monotonic()
+        while self._lru:
+            key, (size, last_access) = next(iter(self._lru.items()))
+            if key == protect:
+                if len(self._lru) == 1:
+                    break
+                self._lru.move_to_end(key)
+                continue
+            over_cap = len(self._lru) > self.max_sessions or self._hot_bytes > self.max_bytes
+            expired = self.idle_ttl is not None and now - last_access > self.idle_ttl
+            if not (over_cap or expired):
+                break
+            self._spill(key)
+
+    def _spill(self, key: tuple):
+        app_name, user_id, session_id = key
+        size, _ = self._lru.pop(key)
+        self._hot_bytes -= size
+        user_sessions = self.sessions[app_name][user_id]
+        session = user_sessions.pop(session_id)
+        if not user_sessions:
+            del self.sessions[app_name][user_id]
+
+        payload = zlib.compress(
+            session.model_dump_json(exclude_none=True).encode(), self.compression_level
+        )
+        self._spill_file.seek(0, os.SEEK_END)
+        offset = self._spill_file.tell()
+        self._spill_file.write(_RECORD_HEADER.pack(len(payload)) + payload)
+        self._spilled[key] = (offset, len(payload))
+        self._live_bytes += _RECORD_HEADER.size + len(payload)
+        self.stats["spills"] += 1
+
+    def _read_spilled(self, key: tuple) -> tuple[Session, int]:
+        offset, length = self._spilled[key]
+        self._spill_file.seek(offset + _RECORD_HEADER.size)
+        raw = zlib.decompress(self._spill_file.read(length))
+        return Session.model_validate_json(raw), len(raw)
+
+    def _ensure_hot(self, app_name: str, user_id: str, session_id: str) -> bool:
+        """Bring a spilled session back into memory. Returns whether it exists."""
+        key = (app_name, user_id, session_id)
+        if key in self._lru:
+            return True
+        if key not in self._spilled:
+            return False
+        session, size = self._read_spilled(key)
+        offset, length = self._spilled.pop(key)
+        self._forget_record(length)
+        self.sessions.setdefault(app_name, {}).setdefault(user_id, {})[session_id] = session
+        self._touch(key, size)
+        self.stats["rehydrations"] += 1
+        self._maybe_compact()
+        return True
+
+    def _forget_record(self, length: int):
+        """Count a spill record that is no longer read as dead."""
+        self._live_bytes -= _RECORD_HEADER.size + length
+        self._dead_bytes += _RECORD_HEADER.size + length
+
+    def _maybe_compact(self):
+        """Rewrite the spill file once most of it is dead records."""
+        if self._dead_bytes < 2**20 or self._dead_bytes < self._live_bytes:
+            return
+        compacted = self._open_spill_file(".compact")
+        for key, (offset, length) in self._spilled.items():
+            self._spill_file.seek(offset)
+            record = self._spill_file.read(_RECORD_HEADER.size + length)
+            self._spilled[key] = (compacted.tell(), length)
+            compacted.write(record)
+        self._spill_file.close()
+        if self.spill_path is None:
+            self._spill_file = compacted
+        else:
+            compacted.close()
+            os.replace(self.spill_path + ".compact", self.spill_path)
+            self._spill_file = open(self.spill_path, "r+b")
+        self._dead_bytes = 0
+        self.stats["compactions"] += 1
+
+    def memory_stats(self) -> dict:
+        """Hot/spilled session counts and byte totals, plus eviction counters."""
+        return {
+            "hot_sessions": len(self._lru),
+            "hot_bytes": self._hot_bytes,
+            "spilled_sessions": len(self._spilled),
+            "spill_file_bytes": os.fstat(self._spill_file.fileno()).st_size,
+            **self.stats,
+        }
+
+    def close(self):
+        """Close and remove the spill file."""
+        self._spill_file.close()
+        self._remove_spill_file()
+
+    # -- InMemorySessionService overrides ----------------------------------
+
+    def _create_session_impl(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        session = super()._create_session_impl(
+            app_name=app_name, user_id=user_id, state=state, session_id=session_id
+        )
+        key = (app_name, user_id, session.id)
+        self._touch(key, len(session.model_dump_json(exclude_none=True)))
+        self._enforce_limits(protect=key)
+        return session
+
+    def _get_session_impl(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        if not self._ensure_hot(app_name, user_id, session_id):
+            return None
+        key = (app_name, user_id, session_id)
+        self._touch(key)
+        session = super()._get_session_impl(
+            app_name=app_name, user_id=user_id, session_id=session_id, config=config
+        )
+        self._enforce_limits(protect=key)
+        return session
+
+    def _list_sessions_impl(
+        self, *, app_name: str, user_id: Optional[str] = None
+    ) -> ListSessionsResponse:
+        response = super()._list_sessions_impl(app_name=app_name, user_id=user_id)
+        # Spilled sessions are listed straight from disk without rehydrating them
+        for key in list(self._spilled):
+            if key[0] != app_name or (user_id is not None and key[1] != user_id):
+                continue
+            session, _ = self._read_spilled(key)
+            session.events = []
+            response.sessions.append(self._merge_state(app_name, key[1], session))
+        return response
+
+    def _delete_session_impl(
+        self, *, app_name: str, user_id: str, session_id: str
+    ) -> None:
+        key = (app_name, user_id, session_id)
+        if key in self._spilled:
+            offset, length = self._spilled.pop(key)
+            self._forget_record(length)
+            return
+        if key in self._lru:
+            size, _ = self._lru.pop(key)
+            self._hot_bytes -= size
+            self.sessions[app_name][user_id].pop(session_id)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        key = (session.app_name, session.user_id, session.id)
+        if not self._ensure_hot(*key):
+            # Unknown session: InMemorySessionService warns and drops the event
+            return await super().append_event(session=session, event=event)
+        event = await super().append_event(session=session, event=event)
+        self._touch(key, len(event.model_dump_json(exclude_none=True)))
+        self._enforce_limits(protect=key)
+        return event
@@ -0,0 +1,226 @@
+# Worker process of PooledCodeExecutor (see pooled_code_executor.py)
+#
+# Started as a plain script (`python -I code_worker.py '<json settings>'`) so
+# it never imports agents_shared or ADK: it only needs the standard library,
+# which keeps it small and quick to start. It reads one JSON request per line
+# on stdin and answers with one JSON line: {"stdout": ..., "stderr": ...}.
+#
+# Before the first snippet the worker confines itself, and refuses to run
+# snippets when any step fails:
+#   - its own empty network namespace and mount namespace (in a user
+#     namespace when not started as root)
+#   - chroot into an empty directory, then uid/gid nobody when it was root
+#   - rlimits on address space, file size, processes and CPU time
+#   - a seccomp filter denying sockets, exec, fork/clone, namespaces, mounts,
+#     ptrace and kernel interfaces, with no_new_privs set
+# The import allowlist and the builtins filter stay on top of that, but they
+# are not what keeps snippets in: allowed modules reach `os` and `sys`.
+import builtins
+import contextlib
+import ctypes
+import errno
+import importlib
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import traceback
+
+# Builtins model code has no business calling
+# Imported lazily by allowed modules (datetime.strptime), so preloaded and allowed
+_IMPLICIT_IMPORTS = ("_strptime",)
+_BLOCKED_BUILTINS = ("open", "input", "breakpoint", "exit", "quit", "help", "compile", "eval", "exec")
+
+_CLONE_NEWNS = 0x00020000
+_CLONE_NEWUSER = 0x10000000
+_CLONE_NEWNET = 0x40000000
+_NOBODY = 65534
+
+# Syscalls a snippet never needs and an escape would: networking, new
+# processes and programs, namespaces, mounts, tracing, kernel interfaces
+_DENIED_SYSCALLS = {
+    "x86_64": (0xC000003E, {
+        "socket": 41, "connect": 42, "accept": 43, "sendto": 44, "bind": 49, "listen": 50, "socketpair": 53,
+        "clone": 56, "fork": 57, "vfork": 58, "execve": 59, "kill": 62, "ptrace": 101, "setuid": 105,
+        "setgid": 106, "pivot_root": 155, "chroot": 161, "mount": 165, "umount2": 166, "reboot": 169,
+        "init_module": 175, "delete_module": 176, "kexec_load": 246, "add_key": 248, "request_key": 249,
+        "keyctl": 250, "unshare": 272, "accept4": 288, "perf_event_open": 298, "open_by_handle_at": 304,
+        "setns": 308, "process_vm_readv": 310, "process_vm_writev": 311, "finit_module": 313, "bpf": 321,
+        "execveat": 322, "userfaultfd": 323, "io_uring_setup": 425, "clone3": 435,
+    }),
+    "aarch64": (0xC00000B7, {
+        "umount2": 39, "mount": 40, "pivot_root": 41, "chroot": 51, "unshare": 97, "kexec_load": 104,
+        "init_module": 105, "delete_module": 106, "ptrace": 117, "kill": 129, "reboot": 142, "setgid": 144,
+        "setuid": 146, "socket": 198, "socketpair": 199, "bind": 200, "listen": 201, "accept": 202,
+        "connect": 203, "sendto": 206, "add_key": 217, "request_key": 218, "keyctl": 219, "clone": 220,
+        "execve": 221, "perf_event_open": 241, "accept4": 242, "open_by_handle_at": 265, "setns": 268,
+        "process_vm_readv": 270, "process_vm_writev": 271, "finit_module": 273, "bpf": 280, "execveat": 281,
+        "userfaultfd": 282, "io_uring_setup": 425, "clone3": 435,
+    }),
+}
+
+
+class SandboxError(RuntimeError):
+    pass
+
+
+class _SockFilter(ctypes.Structure):
+    _fields_ = [("code", ctypes.c_ushort), ("jt", ctypes.c_ubyte), ("jf", ctypes.c_ubyte), ("k", ctypes.c_uint)]
+
+
+class _SockFprog(ctypes.Structure):
+    _fields_ = [("len", ctypes.c_ushort), ("filter", ctypes.POINTER(_SockFilter))]
+
+
+def _libc():
+    return ctypes.CDLL(None, use_errno=True)
+
+
+def _enter_namespaces() -> bool:
+    """A private, empty network namespace and mount namespace; returns whether a user namespace was needed."""
+    libc = _libc()
+    if os.getuid() == 0:
+        if libc.unshare(_CLONE_NEWNET | _CLONE_NEWNS) != 0:
+            raise SandboxError(f"unshare failed: {os.strerror(ctypes.get_errno())}")
+        return False
+    # Unprivileged: a user namespace where this user is root, enough to chroot
+    uid, gid = os.getuid(), os.getgid()
+    if libc.unshare(_CLONE_NEWUSER | _CLONE_NEWNET | _CLONE_NEWNS) != 0:
+        raise SandboxError(f"unshare failed (user namespaces disabled?): {os.strerror(ctypes.get_errno())}")
+    for name, value in (("setgroups", "deny"), ("uid_map", f"0 {uid} 1"), ("gid_map", f"0 {gid} 1")):
+        with open(f"/proc/self/{name}", "w") as f:
+            f.write(value)
+    return True
+
+
+def _confine_filesystem(root: str, user_namespace: bool):
+    """Make an empty directory the whole filesystem and drop root."""
+    os.chroot(root)
+    os.chdir("/")
+    # Real root becomes nobody; in a user namespace only uid 0 is mapped, and
+    # it has no rights outside of it
+    if not user_namespace:
+        os.setgroups([])
+        os.setgid(_NOBODY)
+        os.setuid(_NOBODY)
+
+
+def _install_seccomp():
+    machine = platform.machine()
+    if machine not in _DENIED_SYSCALLS:
+        raise SandboxError(f"No syscall filter for {machine}")
+    audit_arch, denied = _DENIED_SYSCALLS[machine]
+    ld_abs, jeq, jge, ret = 0x20, 0x15, 0x35, 0x06
+    kill, allow = 0x80000000, 0x7FFF0000
+    eperm = 0x00050000 | errno.EPERM
+    program = [
+        (ld_abs, 0, 0, 4),  # seccomp_data.arch
+        (jeq, 1, 0, audit_arch),
+        (ret, 0, 0, kill),
+        (ld_abs, 0, 0, 0),  # seccomp_data.nr
+    ]
+    if machine == "x86_64":
+        # x32 syscalls alias the denied ones under other numbers
+        program += [(jge, 0, 1, 0x40000000), (ret, 0, 0, kill)]
+    for number in sorted(set(denied.values())):
+        program += [(jeq, 0, 1, number), (ret, 0, 0, eperm)]
+    program.append((ret, 0, 0, allow))
+
+    filters = (_SockFilter * len(program))(*(_SockFilter(*instruction) for instruction in program))
+    fprog = _SockFprog(len(program), filters)
+    libc = _libc()
+    if libc.prctl(38, 1, 0, 0, 0) != 0:  # PR_SET_NO_NEW_PRIVS
+        raise SandboxError(f"PR_SET_NO_NEW_PRIVS failed: {os.strerror(ctypes.get_errno())}")
+    if libc.prctl(22, 2, ctypes.byref(fprog), 0, 0) != 0:  # PR_SET_SECCOMP, SECCOMP_MODE_FILTER
+        raise SandboxError(f"seccomp failed: {os.strerror(ctypes.get_errno())}")
+
+
+def _limit_resources(memory_mb: int):
+    resource.setrlimit(resource.RLIMIT_AS, (memory_mb * 2**20, memory_mb * 2**20))
+    # No files written, no processes forked (binding once root is dropped)
+    resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+
+
+def _sandbox(root: str, memory_mb: int):
+    """Confine this process before any snippet runs; raises SandboxError if it cannot be."""
+    if sys.platform != "linux":
+        raise SandboxError("The code executor sandbox needs Linux namespaces and seccomp")
+    user_namespace = _enter_namespaces()
+    _confine_filesystem(root, user_namespace)
+    _limit_resources(memory_mb)
+    _install_seccomp()
+
+
+def _restricted_builtins(allowed_imports: set[str]) -> dict:
+    safe = {name: value for name, value in vars(builtins).items() if name not in _BLOCKED_BUILTINS}
+
+    def _import(name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name.split(".")[0] not in allowed_imports:
+            raise ImportError(f"Import of '{name}' is not allowed in the code executor")
+        return __import__(name, globals, locals, fromlist, level)
+
+    safe["__import__"] = _import
+    return safe
+
+
+def _run(code: str, safe_builtins: dict, cpu_seconds: int, max_output: int) -> dict:
+    # RLIMIT_CPU counts the whole process, so each run gets its budget on top
+    # of what the worker has used so far; going over it kills the worker
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = int(usage.ru_utime + usage.ru_stime) + 1
+    hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+    resource.setrlimit(resource.RLIMIT_CPU, (used + cpu_seconds, hard))
+
+    globals_ = {"__builtins__": safe_builtins, "__name__": "__main__"}
+    stdout = io.StringIO()
+    stderr = ""
+    try:
+        with contextlib.redirect_stdout(stdout):
+            exec(compile(code, "<generated>", "exec"), globals_)
+    except MemoryError:
+        stderr = "MemoryError: the code executor memory limit was exceeded"
+    except BaseException as e:
+        stderr = "".join(traceback.format_exception_only(type(e), e)).strip()
+    output = stdout.getvalue()
+    if len(output) > max_output:
+        output = output[:max_output] + "\n... output truncated"
+    return {"stdout": output, "stderr": stderr}
+
+
+def main():
+    settings = json.loads(sys.argv[1])
+    allowed = set(settings["allowed_imports"]) | set(_IMPLICIT_IMPORTS)
+    # Import the allowed modules up front, so snippets find them warm; nothing
+    # can be imported from disk once the filesystem is gone
+    for name in allowed:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+    requests = sys.stdin
+    replies = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    # Stray prints outside a snippet must not corrupt the replies
+    sys.stdout = sys.stderr
+    try:
+        _sandbox(settings["root"], settings["memory_mb"])
+    except (SandboxError, OSError) as e:
+        # Never run snippets unconfined
+        replies.write(json.dumps({"ready": False, "error": str(e)}) + "\n")
+        replies.flush()
+        sys.exit(1)
+    safe_builtins = _restricted_builtins(allowed)
+
+    replies.write(json.dumps({"ready": True}) + "\n")
+    replies.flush()
+    for line in requests:
+        request = json.loads(line)
+        reply = _run(request["code"], safe_builtins, settings["cpu_seconds"], settings["max_output"])
+        replies.write(json.dumps(reply) + "\n")
+        replies.flush()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,561 @@
+# Transparent compression of event content in the session database
+#
+# Model outputs, tool payloads and compaction summaries make up most of the
+# `events` table. CompressedDatabaseSessionService stores the `content` column
+# of large events as a compressed blob instead of JSON text. Smaller events are
+# compressed against a shared dictionary trained on earlier events. Blobs carry
+# a small header, so compressed and plain rows can live side by side:
+#
+#   b"\x00ZC" | u8 codec | u16 dictionary id | compressed JSON
+#
+# Usage (from the repository root):
+#   python -m agents_shared.compressed_sessions migrate my_agent_data.db
+#   python -m agents_shared.compressed_sessions bench my_agent_data.db
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime
+from typing import Any, Iterator, Optional
+
+from google.adk.sessions import DatabaseSessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig
+from google.adk.sessions.database_session_service import (
+    StorageAppState,
+    StorageEvent,
+    StorageSession,
+    StorageUserState,
+)
+from google.adk.sessions.state import State
+from google.genai import types
+from sqlalchemy import LargeBinary, literal_column, select, type_coerce, update
+from sqlalchemy import event as sqlalchemy_event
+from sqlalchemy.orm import defer
+from sqlalchemy.orm.attributes import set_committed_value
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+BLOB_MAGIC = b"\x00ZC"
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+_BLOB_HEADER = struct.Struct(">3sBH")
+
+# The content column read as-is (JSON text or blob), bypassing its JSON type.
+# A plain literal column keeps the statement cacheable.
+_RAW_CONTENT = literal_column("events.content", LargeBinary)
+
+DICTIONARY_TABLE = "content_dictionaries"
+DICTIONARY_SIZE = 32 * 1024
+
+
+def _default_codec() -> int:
+    return CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+
+
+def _ensure_dictionary_table(connection):
+    connection.execute(
+        f"CREATE TABLE IF NOT EXISTS {DICTIONARY_TABLE} ("
+        " id INTEGER PRIMARY KEY, codec INTEGER NOT NULL, data BLOB NOT NULL,"
+        " created_at REAL NOT NULL)"
+    )
+
+
+def load_dictionaries(connection) -> dict[int, tuple[int, bytes]]:
+    """Read every trained dictionary: id -> (codec, bytes)."""
+    _ensure_dictionary_table(connection)
+    rows = connection.execute(f"SELECT id, codec, data FROM {DICTIONARY_TABLE}").fetchall()
+    return {row[0]: (row[1], bytes(row[2])) for row in rows}
+
+
+def train_dictionary(samples: list[bytes], codec: Optional[int] = None) -> bytes:
+    """Build a shared dictionary from sample event contents.
+
+    zstd trains a real dictionary. zlib has no trainer, so its preset
+    dictionary is the most recent sample text (zlib looks back at most 32KB,
+    and the end of the dictionary is matched most cheaply). zstd falls back
+    to the same raw-content dictionary when there is too little sample data
+    to train on.
+    """
+    codec = codec or _default_codec()
+    if codec == CODEC_ZSTD:
+        try:
+            return zstandard.train_dictionary(DICTIONARY_SIZE, samples).as_bytes()
+        except zstandard.ZstdError:
+            pass
+    joined = b"".join(samples)
+    return joined[-DICTIONARY_SIZE:]
+
+
+def save_dictionary(connection, dictionary: bytes, codec: Optional[int] = None) -> int:
+    """Store a dictionary and return its id (new events use the newest one)."""
+    _ensure_dictionary_table(connection)
+    cursor = connection.execute(
+        f"INSERT INTO {DICTIONARY_TABLE} (codec, data, created_at) VALUES (?, ?, ?)",
+        (codec or _default_codec(), dictionary, time.time()),
+    )
+    connection.commit()
+    return cursor.lastrowid
+
+
+def compress_content(raw: bytes, codec: int, dictionary_id: int = 0, dictionary: bytes = b"") -> bytes:
+    if codec == CODEC_ZSTD:
+        zdict = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        body = zstandard.ZstdCompressor(level=3, dict_data=zdict).compress(raw)
+    else:
+        compressor = zlib.compressobj(6, zdict=dictionary) if dictionary else zlib.compressobj(6)
+        body = compressor.compress(raw) + compressor.flush()
+    return _BLOB_HEADER.pack(BLOB_MAGIC, codec, dictionary_id) + body
+
+
+def is_compressed(value) -> bool:
+    return isinstance(value, (bytes, memoryview)) and bytes(value[:3]) == BLOB_MAGIC
+
+
+def blob_codec(value) -> tuple[int, int]:
+    """The (codec, dictionary id) of a compressed content blob; dictionary id 0 means none."""
+    _, codec, dictionary_id = _BLOB_HEADER.unpack_from(bytes(value[: _BLOB_HEADER.size]))
+    return codec, dictionary_id
+
+
+def decompress_content(value, dictionaries: dict[int, tuple[int, bytes]]) -> bytes:
+    """Inflate a compressed content blob back to its JSON bytes."""
+    value = bytes(value)
+    codec, dictionary_id = blob_codec(value)
+    body = value[_BLOB_HEADER.size :]
+    dictionary = dictionaries[dictionary_id][1] if dictionary_id else b""
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("This content was compressed with zstd: pip install zstandard")
+        zdict = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        return zstandard.ZstdDecompressor(dict_data=zdict).decompress(body)
+    decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+    return decompressor.decompress(body) + decompressor.flush()
+
+
+def decode_content_column(value, dictionaries: dict[int, tuple[int, bytes]]) -> Optional[dict]:
+    """Turn a raw `content` column value (JSON text or compressed blob) into a dict."""
+    if value is None:
+        return None
+    if is_compressed(value):
+        return json.loads(decompress_content(value, dictionaries))
+    return json.loads(value)
+
+
+def load_raw_events(sql_session, service, *filters, order_by=None, limit=None) -> list[StorageEvent]:
+    """StorageEvent rows matching `filters`, with their content read raw and decoded.
+
+    Stands in for `sql_session.query(StorageEvent)` on an events table that
+    may hold compressed blobs. The dictionaries of `service` are used when it
+    is a CompressedDatabaseSessionService; any other service can still read
+    dictionary-less blobs and plain JSON rows.
+    """
+    dictionaries = service.dictionaries if isinstance(service, CompressedDatabaseSessionService) else {}
+    query = sql_session.query(StorageEvent, _RAW_CONTENT).options(defer(StorageEvent.content)).filter(*filters)
+    if order_by is not None:
+        query = query.order_by(order_by)
+    storage_events = []
+    for storage_event, raw_content in query.limit(limit).all():
+        # Sets the deferred column without marking the row dirty
+        set_committed_value(storage_event, "content", decode_content_column(raw_content, dictionaries))
+        storage_events.append(storage_event)
+    return storage_events
+
+
+class DictionaryTable(dict):
+    """Dictionaries by id (id -> (codec, bytes)) that reloads the table on a miss.
+
+    Another process writing to the same database may train a dictionary after
+    this one loaded the table, and then store events compressed against it.
+    """
+
+    def __init__(self, load):
+        super().__init__(load())
+        self._load = load
+
+    def reload(self):
+        self.update(self._load())
+
+    def __missing__(self, dictionary_id: int):
+        self.reload()
+        if not dict.__contains__(self, dictionary_id):
+            raise KeyError(f"Content dictionary {dictionary_id} is not in the {DICTIONARY_TABLE} table")
+        return dict.__getitem__(self, dictionary_id)
+
+
+class ContentCompressor:
+    """Decides how (and whether) one event's content JSON gets compressed."""
+
+    def __init__(self, threshold: int = 1024, dictionary_min: int = 128, codec: Optional[int] = None):
+        """
+        Args:
+            threshold: Content of at least this many bytes is always compressed
+            dictionary_min: Smaller content is compressed only with a dictionary,
+                and content below this size is left as JSON text
+            codec: CODEC_ZSTD or CODEC_ZLIB, zstd when zstandard is installed
+        """
+        self.threshold = threshold
+        self.dictionary_min = dictionary_min
+        self.codec = codec or _default_codec()
+        self.dictionary_id = 0
+        self.dictionary = b""
+        self.stats = {"events": 0, "compressed": 0, "raw_bytes": 0, "stored_bytes": 0}
+
+    def use_dictionaries(self, dictionaries: dict[int, tuple[int, bytes]]):
+        """Pick the newest dictionary trained for this codec."""
+        for dictionary_id in sorted(dictionaries, reverse=True):
+            codec, data = dictionaries[dictionary_id]
+            if codec == self.codec:
+                self.dictionary_id, self.dictionary = dictionary_id, data
+                return
+
+    def encode(self, raw: bytes):
+        """Return the compressed blob, or None to keep the JSON text."""
+        self.stats["events"] += 1
+        self.stats["raw_bytes"] += len(raw)
+        blob = None
+        if len(raw) >= self.threshold:
+            blob = compress_content(raw, self.codec, self.dictionary_id, self.dictionary)
+        elif len(raw) >= self.dictionary_min and self.dictionary:
+            blob = compress_content(raw, self.codec, self.dictionary_id, self.dictionary)
+        # Keep the plain text unless compression saves at least 10%
+        if blob is not None and len(blob) < len(raw) * 0.9:
+            self.stats["compressed"] += 1
+            self.stats["stored_bytes"] += len(blob)
+            return blob
+        self.stats["stored_bytes"] += len(raw)
+        return None
+
+
+class StoredEvent:
+    """Event metadata from the events table, with the body inflated on demand."""
+
+    __slots__ = ("id", "invocation_id", "author", "timestamp", "stored_bytes", "compressed", "_raw", "_dictionaries")
+
+    def __init__(self, row, dictionaries):
+        self.id, self.invocation_id, self.author, timestamp, self._raw = row
+        self.timestamp = timestamp.timestamp() if isinstance(timestamp, datetime) else timestamp
+        self.stored_bytes = len(self._raw) if self._raw is not None else 0
+        self.compressed = is_compressed(self._raw)
+        self._dictionaries = dictionaries
+
+    def content(self) -> Optional[types.Content]:
+        """Decode (and if needed decompress) the event content."""
+        data = decode_content_column(self._raw, self._dictionaries)
+        return types.Content.model_validate(data) if data is not None else None
+
+
+class CompressedDatabaseSessionService(DatabaseSessionService):
+    """DatabaseSessionService that compresses the content column of events.
+
+    Works with any database, but is meant for SQLite, which stores the blob in
+    the TEXT column as-is. Events written before compression was turned on are
+    read as plain JSON, so no migration is needed to start using it. Use
+    `migrate_database` to compress the existing rows.
+
+    Once events are compressed (by this service or by `migrate_database`),
+    the database can no longer be read by a plain DatabaseSessionService, so
+    neither by `adk web` / `adk api_server --session_service_uri`: they fail
+    to parse the blobs as JSON. Everything that reads it must use this
+    service, or `decode_content_column` for raw SQL.
+    """
+
+    def __init__(
+        self,
+        db_url: str,
+        threshold: int = 1024,
+        dictionary_min: int = 128,
+        codec: Optional[int] = None,
+        train_after: int = 1000,
+        **kwargs: Any,
+    ):
+        """Initializes the service.
+
+        Args:
+            db_url: The database URL, e.g. "sqlite:///my_agent_data.db"
+            threshold: Content of at least this many bytes is always compressed
+            dictionary_min: Smallest content compressed with the shared dictionary
+            codec: CODEC_ZSTD or CODEC_ZLIB, zstd when zstandard is installed
+            train_after: Small events to collect before training a dictionary,
+                when the database has none yet (0 disables training)
+        """
+        super().__init__(db_url=db_url, **kwargs)
+        self.compressor = ContentCompressor(threshold, dictionary_min, codec)
+        self.reload_dictionaries()
+        self.train_after = train_after
+        self._samples: list[bytes] = []
+        sqlalchemy_event.listen(self.database_session_factory, "after_flush", self._compress_new_events)
+        sqlalchemy_event.listen(self.database_session_factory, "after_commit", self._maybe_train)
+
+    @property
+    def compression_stats(self) -> dict:
+        """Events compressed and bytes saved since the service started."""
+        return self.compressor.stats
+
+    def _load_dictionaries(self) -> dict[int, tuple[int, bytes]]:
+        raw_connection = self.db_engine.raw_connection()
+        try:
+            dictionaries = load_dictionaries(raw_connection)
+            raw_connection.commit()
+        finally:
+            raw_connection.close()
+        return dictionaries
+
+    def reload_dictionaries(self):
+        if not hasattr(self, "dictionaries"):
+            self.dictionaries = DictionaryTable(self._load_dictionaries)
+        else:
+            self.dictionaries.reload()
+        self.compressor.use_dictionaries(self.dictionaries)
+
+    def _raw_content_select(self, *filters):
+        table = StorageEvent.__table__
+        return select(
+            table.c.id,
+            table.c.invocation_id,
+            table.c.author,
+            table.c.timestamp,
+            _RAW_CONTENT,
+        ).where(*filters)
+
+    def iter_stored_events(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        author: Optional[str] = None,
+        after_timestamp: Optional[float] = None,
+    ) -> Iterator[StoredEvent]:
+        """List or filter a session's events without inflating their bodies."""
+        filters = [
+            StorageEvent.app_name == app_name,
+            StorageEvent.user_id == user_id,
+            StorageEvent.session_id == session_id,
+        ]
+        if author is not None:
+            filters.append(StorageEvent.author == author)
+        if after_timestamp is not None:
+            filters.append(StorageEvent.timestamp >= datetime.fromtimestamp(after_timestamp))
+        query = self._raw_content_select(*filters).order_by(StorageEvent.timestamp)
+        with self.database_session_factory() as sql_session:
+            for row in sql_session.execute(query):
+                yield StoredEvent(tuple(row), self.dictionaries)
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        # Same query as DatabaseSessionService.get_session, except that the
+        # content column is read raw, so compressed blobs can be inflated here
+        with self.database_session_factory() as sql_session:
+            storage_session = sql_session.get(StorageSession, (app_name, user_id, session_id))
+            if storage_session is None:
+                return None
+
+            filters = [
+                StorageEvent.app_name == app_name,
+                StorageEvent.user_id == user_id,
+                StorageEvent.session_id == storage_session.id,
+            ]
+            if config and config.after_timestamp:
+                filters.append(StorageEvent.timestamp >= datetime.fromtimestamp(config.after_timestamp))
+            storage_events = load_raw_events(
+                sql_session,
+                self,
+                *filters,
+                order_by=StorageEvent.timestamp.desc(),
+                limit=config.num_recent_events if config and config.num_recent_events else None,
+            )
+
+            storage_app_state = sql_session.get(StorageAppState, (app_name))
+            storage_user_state = sql_session.get(StorageUserState, (app_name, user_id))
+            merged_state = dict(storage_session.state)
+            for key, value in (storage_app_state.state if storage_app_state else {}).items():
+                merged_state[State.APP_PREFIX + key] = value
+            for key, value in (storage_user_state.state if storage_user_state else {}).items():
+                merged_state[State.USER_PREFIX + key] = value
+
+            events = [e.to_event() for e in reversed(storage_events)]
+            return storage_session.to_session(state=merged_state, events=events)
+
+    def _maybe_train(self, sql_session):
+        """after_commit hook: train the shared dictionary once enough samples exist."""
+        if not self.train_after or not self._samples or self.compressor.dictionary:
+            return
+        if len(self._samples) < self.train_after:
+            return
+        samples, self._samples = self._samples, []
+        dictionary = train_dictionary(samples, self.compressor.codec)
+        raw_connection = self.db_engine.raw_connection()
+        try:
+            save_dictionary(raw_connection, dictionary, self.compressor.codec)
+        finally:
+            raw_connection.close()
+        self.reload_dictionaries()
+
+    def _compress_new_events(self, sql_session, flush_context):
+        """after_flush hook: swap the JSON content just inserted for a blob.
+
+        Runs inside the same transaction as the insert, so the compressed
+        content costs no extra commit.
+        """
+        for instance in sql_session.new:
+            if not isinstance(instance, StorageEvent) or instance.content is None:
+                continue
+            raw = json.dumps(instance.content).encode()
+            if self.train_after and not self.compressor.dictionary and len(raw) < self.compressor.threshold:
+                self._samples.append(raw)
+            blob = self.compressor.encode(raw)
+            if blob is None:
+                continue
+            sql_session.execute(
+                update(StorageEvent.__table__)
+                .where(
+                    StorageEvent.id == instance.id,
+                    StorageEvent.app_name == instance.app_name,
+                    StorageEvent.user_id == instance.user_id,
+                    StorageEvent.session_id == instance.session_id,
+                )
+                .values(content=type_coerce(blob, LargeBinary))
+            )
+
+
+def migrate_database(
+    db_path: str,
+    threshold: int = 1024,
+    dictionary_min: int = 128,
+    train: bool = True,
+    sample_size: int = 2000,
+    batch_size: int = 500,
+) -> dict:
+    """Compress the content column of existing events in a SQLite session DB.
+
+    Trains and stores a shared dictionary from a sample of the existing
+    small events first (when `train` is set), then rewrites rows in batches,
+    and finally VACUUMs the file so the space is returned.
+    """
+    compressor = ContentCompressor(threshold, dictionary_min)
+    connection = sqlite3.connect(db_path)
+    size_before = os.path.getsize(db_path)
+    try:
+        dictionaries = load_dictionaries(connection)
+        if train:
+            samples = [
+                row[0].encode() if isinstance(row[0], str) else bytes(row[0])
+                for row in connection.execute(
+                    "SELECT content FROM events WHERE content IS NOT NULL"
+                    " AND typeof(content) = 'text' AND length(content) < ?"
+                    " ORDER BY timestamp DESC LIMIT ?",
+                    (threshold, sample_size),
+                )
+            ]
+            if len(samples) >= 10:
+                dictionary = train_dictionary(samples, compressor.codec)
+                dictionary_id = save_dictionary(connection, dictionary, compressor.codec)
+                dictionaries[dictionary_id] = (compressor.codec, dictionary)
+        compressor.use_dictionaries(dictionaries)
+
+        rows = connection.execute(
+            "SELECT rowid, content FROM events WHERE content IS NOT NULL AND typeof(content) = 'text'"
+        ).fetchall()
+        for start in range(0, len(rows), batch_size):
+            updates = []
+            for rowid, content in rows[start : start + batch_size]:
+                blob = compressor.encode(content.encode())
+                if blob is not None:
+                    updates.append((blob, rowid))
+            connection.executemany("UPDATE events SET content = ? WHERE rowid = ?", updates)
+            connection.commit()
+        connection.execute("VACUUM")
+    finally:
+        connection.close()
+    return {
+        "size_before": size_before,
+        "size_after": os.path.getsize(db_path),
+        **compressor.stats,
+    }
+
+
+async def _time_full_reads(service, app_names: list[str]) -> tuple[float, int]:
+    started = time.perf_counter()
+    events = 0
+    for app_name in app_names:
+        listed = await service.list_sessions(app_name=app_name)
+        for item in listed.sessions:
+            session = await service.get_session(
+                app_name=app_name, user_id=item.user_id, session_id=item.id
+            )
+            events += len(session.events)
+    return time.perf_counter() - started, events
+
+
+def benchmark(db_path: str, threshold: int = 1024, dictionary_min: int = 128) -> dict:
+    """Compare DB size and full-session read latency before and after migrating.
+
+    Works on a copy, so the original database is left untouched.
+    """
+    import asyncio
+
+    workdir = tempfile.mkdtemp(prefix="adk_compress_bench_")
+    copy_path = os.path.join(workdir, "sessions.db")
+    shutil.copy(db_path, copy_path)
+    with sqlite3.connect(copy_path) as connection:
+        app_names = [row[0] for row in connection.execute("SELECT DISTINCT app_name FROM sessions")]
+
+    plain = DatabaseSessionService(db_url=f"sqlite:///{copy_path}")
+    before_seconds, events = asyncio.run(_time_full_reads(plain, app_names))
+    plain.db_engine.dispose()
+
+    migration = migrate_database(copy_path, threshold, dictionary_min)
+    compressed = CompressedDatabaseSessionService(
+        db_url=f"sqlite:///{copy_path}", threshold=threshold, dictionary_min=dictionary_min
+    )
+    after_seconds, _ = asyncio.run(_time_full_reads(compressed, app_names))
+    compressed.db_engine.dispose()
+    shutil.rmtree(workdir)
+    return {
+        "events": events,
+        "size_before": migration["size_before"],
+        "size_after": migration["size_after"],
+        "compressed_events": migration["compressed"],
+        "read_seconds_before": before_seconds,
+        "read_seconds_after": after_seconds,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compress event content in a SQLite session database.")
+    parser.add_argument("command", choices=["migrate", "bench"])
+    parser.add_argument("db_path", help="Path to the SQLite file, e.g. my_agent_data.db")
+    parser.add_argument("--threshold", type=int, default=1024, help="Always compress content of at least this many bytes")
+    parser.add_argument("--dictionary-min", type=int, default=128, help="Smallest content compressed with the shared dictionary")
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        result = migrate_database(args.db_path, args.threshold, args.dictionary_min)
+        print(f"✅ Compressed {result['compressed']} of {result['events']} events")
+        print(f"   - Content: {result['raw_bytes']} -> {result['stored_bytes']} bytes")
+        print(f"   - File: {result['size_before']} -> {result['size_after']} bytes")
+    else:
+        result = benchmark(args.db_path, args.threshold, args.dictionary_min)
+        print(f"\n ### Compression benchmark ({result['events']} events, {result['compressed_events']} compressed)")
+        print(f"   - DB size: {result['size_before']} -> {result['size_after']} bytes")
+        print(f"   - Read all sessions: {result['read_seconds_before'] * 1000:.1f}ms -> {result['read_seconds_after'] * 1000:.1f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+# Concurrent execution of the function calls of one model turn
+#
+# ADK starts one task per function call of a model response, but FunctionTool
+# calls a plain (sync) function directly on the event loop, so two lookups in
+# one turn still run back to back and their latencies add up. ConcurrentFunctionTool
+# runs sync functions on a shared thread pool instead (async functions stay on
+# the event loop), so the calls of one turn overlap. ADK merges the responses
+# in the order of the calls, whichever finishes first.
+#   - a per-turn cap limits how many calls of one model turn run at once
+#   - functions that take `tool_context` stay on the event loop, since they
+#     read and write session state, which is not thread-safe
+#   - every call is timed (queue wait and run time), and every turn reports
+#     its wall time against the summed call time
+#
+# Usage:
+#   dispatcher = ToolDispatcher(max_per_turn=4)
+#   agent = LlmAgent(..., tools=concurrent_tools([lookup_a, lookup_b], dispatcher))
+#   print_tool_timings(dispatcher)
+import asyncio
+import contextvars
+import functools
+import inspect
+import time
+import weakref
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from google.adk.tools import FunctionTool
+from google.adk.tools.tool_context import ToolContext
+
+
+@dataclass
+class ToolTiming:
+    calls: int = 0
+    threaded: int = 0  # Calls run on the thread pool
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    wait_seconds: float = 0.0  # Time spent waiting for the per-turn cap
+
+
+class _Turn:
+    """Calls of one model turn that are running or waiting."""
+
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.active = 0
+        self.calls = 0
+        self.started = time.perf_counter()
+        self.busy = 0.0  # Summed run time of the turn's calls
+
+
+class ToolDispatcher:
+    """Thread pool, per-turn cap and timings shared by ConcurrentFunctionTools."""
+
+    def __init__(self, max_workers: int = 8, max_per_turn: int = 4):
+        """Initializes the dispatcher.
+
+        Args:
+            max_workers: Threads running sync tool functions, for all turns
+            max_per_turn: Calls of one model turn running at the same time
+        """
+        self.max_per_turn = max_per_turn
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="adk-tool")
+        self.timings: dict[str, ToolTiming] = defaultdict(ToolTiming)
+        # Wall time and summed call time of finished turns with more than one call
+        self.turns = {"count": 0, "wall_seconds": 0.0, "call_seconds": 0.0}
+        self._turns: "weakref.WeakValueDictionary[str, _Turn]" = weakref.WeakValueDictionary()
+
+    def _turn(self, tool_context: Optional[ToolContext]) -> _Turn:
+        # The calls of one model response share the invocation and run together;
+        # the next model turn only starts once they have all finished
+        key = tool_context.invocation_id if tool_context is not None else ""
+        turn = self._turns.get(key)
+        if turn is None or (turn.active == 0 and turn.calls):
+            turn = _Turn(self.max_per_turn)
+            self._turns[key] = turn
+        return turn
+
+    def _finish(self, turn: _Turn):
+        turn.active -= 1
+        if turn.active == 0 and turn.calls > 1:
+            self.turns["count"] += 1
+            self.turns["wall_seconds"] += time.perf_counter() - turn.started
+            self.turns["call_seconds"] += turn.busy
+
+    async def call(
+        self,
+        name: str,
+        target: Callable[..., Any],
+        args: dict[str, Any],
+        tool_context: Optional[ToolContext],
+        threaded: bool,
+    ) -> Any:
+        turn = self._turn(tool_context)
+        turn.active += 1
+        turn.calls += 1
+        timing = self.timings[name]
+        queued = time.perf_counter()
+        try:
+            async with turn.semaphore:
+                started = time.perf_counter()
+                timing.wait_seconds += started - queued
+                try:
+                    if threaded:
+                        timing.threaded += 1
+                        # Context variables (tracing spans...) follow the call into the thread
+                        context = contextvars.copy_context()
+                        loop = asyncio.get_running_loop()
+                        return await loop.run_in_executor(
+                            self.executor, functools.partial(context.run, target, **args)
+                        )
+                    result = target(**args)
+                    if inspect.isawaitable(result):
+                        result = await result
+                    return result
+                finally:
+                    seconds = time.perf_counter() - started
+                    timing.calls += 1
+                    timing.seconds += seconds
+                    timing.max_seconds = max(timing.max_seconds, seconds)
+                    turn.busy += seconds
+        finally:
+            self._finish(turn)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+default_dispatcher = ToolDispatcher()
+_current_tool_context: contextvars.ContextVar = contextvars.ContextVar("current_tool_context", default=None)
+
+
+class ConcurrentFunctionTool(FunctionTool):
+    """FunctionTool whose sync function runs on a thread pool, so calls of one turn overlap."""
+
+    def __init__(self, func: Callable[..., Any], dispatcher: Optional[ToolDispatcher] = None, **kwargs):
+        super().__init__(func, **kwargs)
+        self.dispatcher = dispatcher or default_dispatcher
+        parameters = inspect.signature(func).parameters
+        is_async = inspect.iscoroutinefunction(func) or inspect.iscoroutinefunction(getattr(func, "__call__", None))
+        self.threaded = not is_async and "tool_context" not in parameters
+
+    async def run_async(self, *, args: dict[str, Any], tool_context: ToolContext) -> Any:
+        # Remembered for _invoke_callable, which is not given the context.
+        # Every function call runs in its own task, so this stays per call.
+        _current_tool_context.set(tool_context)
+        return await super().run_async(args=args, tool_context=tool_context)
+
+    async def _invoke_callable(self, target: Callable[..., Any], args_to_call: dict[str, Any]) -> Any:
+        if target is not self.func:
+            # require_confirmation callables and the like stay as they are
+            return await super()._invoke_callable(target, args_to_call)
+        return await self.dispatcher.call(
+            self.name, target, args_to_call, _current_tool_context.get(), self.threaded
+        )
+
+
+def concurrent_tools(tools: list, dispatcher: Optional[ToolDispatcher] = None) -> list:
+    """Wrap plain functions and FunctionTools as ConcurrentFunctionTools.
+
+    Other tools (AgentTool, built-in tools, toolsets) are returned unchanged.
+    """
+    wrapped = []
+    for tool in tools:
+        if type(tool) is FunctionTool:
+            wrapped.append(ConcurrentFunctionTool(
+                tool.func, dispatcher, require_confirmation=tool._require_confirmation
+            ))
+        elif inspect.isfunction(tool) or inspect.ismethod(tool):
+            wrapped.append(ConcurrentFunctionTool(tool, dispatcher))
+        else:
+            wrapped.append(tool)
+    return wrapped
+
+
+def print_tool_timings(dispatcher: Optional[ToolDispatcher] = None):
+    dispatcher = dispatcher or default_dispatcher
+    print("\n   [tools] name                          calls  threaded     avg ms     max ms    wait ms")
+    for name, timing in sorted(dispatcher.timings.items()):
+        average = timing.seconds / timing.calls * 1000 if timing.calls else 0.0
+        print(
+            f"           {name:28s} {timing.calls:6d} {timing.threaded:9d} {average:10.1f}"
+            f" {timing.max_seconds * 1000:10.1f} {timing.wait_seconds * 1000:10.1f}"
+        )
+    turns = dispatcher.turns
+    if turns["count"]:
+        print(
+            f"   [tools] {turns['count']} turns with several calls: {turns['wall_seconds'] * 1000:.0f}ms wall"
+            f" for {turns['call_seconds'] * 1000:.0f}ms of calls"
+        )
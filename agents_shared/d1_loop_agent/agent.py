@@ -1,14 +1,14 @@
 import sys
 sys.path.insert(0, '..')
 
-from agents_shared import Agent, google_search, LoopAgent, FunctionTool
+from agents_shared import Agent, google_search, LoopAgent, FunctionTool, PooledGemini
 from agents_shared import Agent, AgentTool, ParallelAgent, SequentialAgent
-from agents_shared import LoopAgent, FunctionTool
+from agents_shared import LoopAgent, FunctionTool, BestOfNRefinement
 
 # This agent runs ONCE at the beginning to create the first draft.
 initial_writer_agent = Agent(
     name="InitialWriterAgent",
-    model="gemini-2.5-flash-lite",
+    model=PooledGemini(model="gemini-2.5-flash-lite"),
     instruction="""Based on the user's prompt, 
     write the first draft of a short story (around 100-150 words).
     Output only the story text, with no introduction or explanation.""",
@@ -20,7 +20,7 @@ print("✅ initial_writer_agent created.")
 # This agent's only job is to provide feedback or the approval signal. It has no tools.
 critic_agent = Agent(
     name="CriticAgent",
-    model="gemini-2.5-flash-lite",
+    model=PooledGemini(model="gemini-2.5-flash-lite"),
     instruction="""You are a constructive story critic. 
     Review the story provided below.
     Story: {current_story}
@@ -48,7 +48,7 @@ print("✅ exit_loop function created.")
 # This agent refines the story based on critique OR calls the exit_loop function.
 refiner_agent = Agent(
     name="RefinerAgent",
-    model="gemini-2.5-flash-lite",
+    model=PooledGemini(model="gemini-2.5-flash-lite"),
     instruction="""You are a story refiner. Y
     ou have a story draft and critique.
     
@@ -66,11 +66,15 @@ refiner_agent = Agent(
 
 print("✅ refiner_agent created.")
 
-# The LoopAgent contains the agents that will run repeatedly: Critic -> Refiner.
-story_refinement_loop = LoopAgent(
+# The refinement runs the Critic -> Refiner cycle with 3 candidate revisions per round in parallel.
+# The first candidate the critic APPROVES wins and the others are cancelled.
+# (LoopAgent(name="StoryRefinementLoop", sub_agents=[critic_agent, refiner_agent], max_iterations=2)
+# is the serial version: one revision at a time.)
+story_refinement_loop = BestOfNRefinement(
     name="StoryRefinementLoop",
     sub_agents=[critic_agent, refiner_agent],
-    max_iterations=2, # Prevents infinite loops
+    candidates=3,
+    max_rounds=2, # Prevents infinite loops
 )
 
 # The root agent is a SequentialAgent that defines the overall workflow: Initial Write -> Refinement Loop.
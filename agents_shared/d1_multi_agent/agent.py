@@ -1,12 +1,12 @@
 import sys
 sys.path.insert(0, '..')
 
-from agents_shared import Agent, AgentTool, google_search
+from agents_shared import Agent, InlineAgentTool, google_search, PooledGemini
 
 # Research Agent: Its job is to use the google_search tool and present findings.
 research_agent = Agent(
     name="ResearchAgent",
-    model="gemini-2.5-flash-lite",
+    model=PooledGemini(model="gemini-2.5-flash-lite"),
     instruction="""You are a specialized research agent. Your only job is to use the
     google_search tool to find 2-3 pieces of relevant information on the given topic and present the findings with citations.""",
     tools=[google_search],
@@ -18,7 +18,7 @@ print("✅ research_agent created.")
 # Summarizer Agent: Its job is to summarize the text it receives.
 summarizer_agent = Agent(
     name="SummarizerAgent",
-    model="gemini-2.5-flash-lite",
+    model=PooledGemini(model="gemini-2.5-flash-lite"),
     # The instruction is modified to request a bulleted list for a clear output format.
     instruction="""Read the provided research findings: {research_findings}
 Create a concise summary as a bulleted list with 3-5 key points.""",
@@ -30,16 +30,17 @@ print("✅ summarizer_agent created.")
 # Root Coordinator: Orchestrates the workflow by calling the sub-agents as tools.
 root_agent = Agent(
     name="ResearchCoordinator",
-    model="gemini-2.5-flash-lite",
+    model=PooledGemini(model="gemini-2.5-flash-lite"),
     # This instruction tells the root agent HOW to use its tools (which are the other agents).
     instruction="""You are a research coordinator. Your goal is to answer the user's query by orchestrating a workflow.
 1. First, you MUST call the `ResearchAgent` tool to find relevant information on the topic provided by the user.
 2. Next, after receiving the research findings, you MUST call the `SummarizerAgent` tool to create a concise summary.
 3. Finally, present the final summary clearly to the user as your response.""",
-    # We wrap the sub-agents in `AgentTool` to make them callable tools for the root agent.
+    # We wrap the sub-agents in `InlineAgentTool` to make them callable tools for the root agent.
+    # It runs them in the coordinator's own invocation and only hands back their output_key.
     tools=[
-        AgentTool(research_agent),
-        AgentTool(summarizer_agent)
+        InlineAgentTool(research_agent),
+        InlineAgentTool(summarizer_agent)
     ],
 )
 
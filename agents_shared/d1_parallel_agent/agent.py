@@ -1,12 +1,12 @@
 import sys
 sys.path.insert(0, '..')
 
-from agents_shared import Agent, AgentTool, ParallelAgent, SequentialAgent, google_search
+from agents_shared import Agent, AgentTool, ParallelAgent, SequentialAgent, google_search, PooledGemini
 
 # Tech Researcher: Focuses on AI and ML trends.
 tech_researcher = Agent(
     name="TechResearcher",
-    model="gemini-2.5-flash-lite",
+    model=PooledGemini(model="gemini-2.5-flash-lite"),
     instruction="""Research the latest AI/ML trends. Include 3 key developments,
 the main companies involved, and the potential impact. Keep the report very concise (100 words).""",
     tools=[google_search],
@@ -18,7 +18,7 @@ print("✅ tech_researcher created.")
 # Health Researcher: Focuses on medical breakthroughs.
 health_researcher = Agent(
     name="HealthResearcher",
-    model="gemini-2.5-flash-lite",
+    model=PooledGemini(model="gemini-2.5-flash-lite"),
     instruction="""Research recent medical breakthroughs. Include 3 significant advances,
 their practical applications, and estimated timelines. Keep the report concise (100 words).""",
     tools=[google_search],
@@ -30,7 +30,7 @@ print("✅ health_researcher created.")
 # Finance Researcher: Focuses on fintech trends.
 finance_researcher = Agent(
     name="FinanceResearcher",
-    model="gemini-2.5-flash-lite",
+    model=PooledGemini(model="gemini-2.5-flash-lite"),
     instruction="""Research current fintech trends. Include 3 key trends,
 their market implications, and the future outlook. Keep the report concise (100 words).""",
     tools=[google_search],
@@ -42,7 +42,7 @@ print("✅ finance_researcher created.")
 # The AggregatorAgent runs *after* the parallel step to synthesize the results.
 aggregator_agent = Agent(
     name="AggregatorAgent",
-    model="gemini-2.5-flash-lite",
+    model=PooledGemini(model="gemini-2.5-flash-lite"),
     # It uses placeholders to inject the outputs from the parallel agents, which are now in the session state.
     instruction="""Combine these three research findings into a single executive summary:
 
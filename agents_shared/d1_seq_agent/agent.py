@@ -1,12 +1,13 @@
 import sys
 sys.path.insert(0, '..')
 
-from agents_shared import Agent, SequentialAgent
+from agents_shared import Agent, SequentialAgent, PooledGemini, run_with_model_clients
+from agents_shared import run_pipelined_batch, print_pipeline_report
 
 # Outline Agent: Creates the initial blog post outline.
 outline_agent = Agent(
     name="OutlineAgent",
-    model="gemini-2.5-flash-lite",
+    model=PooledGemini(model="gemini-2.5-flash-lite"),
     instruction="""Create a blog outline for the given topic with:
     1. A catchy headline
     2. An introduction hook
@@ -20,7 +21,7 @@ print("✅ outline_agent created.")
 # Writer Agent: Writes the full blog post based on the outline from the previous agent.
 writer_agent = Agent(
     name="WriterAgent",
-    model="gemini-2.5-flash-lite",
+    model=PooledGemini(model="gemini-2.5-flash-lite"),
     # The `{blog_outline}` placeholder automatically injects the state value from the previous agent's output.
     instruction="""Following this outline strictly: {blog_outline}
     Write a brief, 200 to 300-word blog post with an engaging and informative tone.""",
@@ -32,7 +33,7 @@ print("✅ writer_agent created.")
 # Editor Agent: Edits and polishes the draft from the writer agent.
 editor_agent = Agent(
     name="EditorAgent",
-    model="gemini-2.5-flash-lite",
+    model=PooledGemini(model="gemini-2.5-flash-lite"),
     # This agent receives the `{blog_draft}` from the writer agent's output.
     instruction="""Edit this draft: {blog_draft}
     Your task is to polish the text by fixing any grammatical errors, improving the flow and sentence structure, and enhancing overall clarity.""",
@@ -46,4 +47,28 @@ root_agent = SequentialAgent(
     sub_agents=[outline_agent, writer_agent, editor_agent],
 )
 
-print("✅ Sequential Agent created.")
\ No newline at end of file
+print("✅ Sequential Agent created.")
+
+
+# Pipelined batch mode: topic N+1 is outlined while topic N is still being written.
+# The writer is the slowest stage, so it gets more workers than the others.
+async def main():
+    topics = [
+        "Why tide pools matter",
+        "A beginner's guide to sourdough",
+        "How heat pumps work",
+        "The history of the bicycle",
+    ]
+    results, report = await run_pipelined_batch(
+        root_agent,
+        topics,
+        stage_workers={"OutlineAgent": 1, "WriterAgent": 2, "EditorAgent": 1},
+    )
+    for result in results:
+        status = result["error"] or f"{len(result['state'].get('final_blog', ''))} chars"
+        print(f"  {result['query']}: {status}")
+    print_pipeline_report(report)
+
+
+if __name__ == "__main__":
+    run_with_model_clients(main())
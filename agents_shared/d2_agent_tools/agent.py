@@ -1,7 +1,7 @@
 import sys
 sys.path.insert(0, '..')
 
-from agents_shared import types, LlmAgent, Gemini
+from agents_shared import types, LlmAgent, PooledGemini
 from agents_shared import McpToolset, StdioConnectionParams, StdioServerParameters
 from agents_shared import retry_config
 
@@ -27,7 +27,7 @@ print("✅ MCP Tool created")
 # Create image agent with MCP integration
 # image_agent
 root_agent = LlmAgent(
-    model=Gemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
+    model=PooledGemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
     name="image_agent",
     instruction="Use the MCP Tool to generate images for user queries",
     tools=[mcp_image_server],
@@ -1,7 +1,8 @@
 import sys
 sys.path.insert(0, '..')
 
-from agents_shared import types, LlmAgent, Gemini, BuiltInCodeExecutor, AgentTool
+from agents_shared import types, LlmAgent, PooledGemini, BuiltInCodeExecutor, InlineAgentTool
+from agents_shared import concurrent_tools
 from agents_shared import retry_config
 
 # Pay attention to the docstring, type hints, and return value.
@@ -87,7 +88,7 @@ print(f"💱 Test: {get_exchange_rate('USD', 'EUR')}")
 
 calculation_agent = LlmAgent(
     name="CalculationAgent",
-    model=Gemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
+    model=PooledGemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
     instruction="""You are a specialized calculator that ONLY responds with Python code. You are forbidden from providing any text, explanations, or conversational responses.
  
      Your task is to take a request for a calculation and translate it into a single block of Python code that calculates the answer.
@@ -101,12 +102,15 @@ calculation_agent = LlmAgent(
    
     Failure to follow these rules will result in an error.
        """,
-    code_executor=BuiltInCodeExecutor(),  # Use the built-in Code Executor Tool. This gives the agent code execution capabilities
+    # Use the built-in Code Executor Tool. This gives the agent code execution capabilities.
+    # PooledCodeExecutor() runs snippets locally in sandboxed warm workers
+    # instead (Linux only, see agents_shared/pooled_code_executor.py).
+    code_executor=BuiltInCodeExecutor(),
 )
 
 root_agent = LlmAgent(
     name="enhanced_currency_agent",
-    model=Gemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
+    model=PooledGemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
     # Updated instruction
     instruction="""You are a smart currency conversion assistant. You must strictly follow these steps and use the available tools.
 
@@ -125,9 +129,9 @@ root_agent = LlmAgent(
            * The exchange rate applied.
     """,
     tools=[
-        get_fee_for_payment_method,
-        get_exchange_rate,
-        AgentTool(agent=calculation_agent),  # Using another agent as a tool!
+        # Fee and rate lookups asked for in the same response run side by side
+        *concurrent_tools([get_fee_for_payment_method, get_exchange_rate]),
+        InlineAgentTool(agent=calculation_agent),  # Using another agent as a tool!
     ],
 )
 
@@ -1,6 +1,5 @@
 import sys
 import os
-import asyncio
 from dotenv import load_dotenv
 
 # Add parent directory to path so we can import agents_shared
@@ -13,8 +12,8 @@ sys.path.insert(0, grandparent_dir)
 env_path = os.path.join(parent_dir, '.env')
 load_dotenv(env_path)
 
-from agents_shared import ToolContext, types, LlmAgent, Gemini, FunctionTool
-from agents_shared import App, ResumabilityConfig, Runner, InMemorySessionService
+from agents_shared import ToolContext, types, LlmAgent, PooledGemini, run_with_model_clients, FunctionTool
+from agents_shared import App, ResumabilityConfig, Runner, JournaledSessionService
 from agents_shared import retry_config, uuid, print_agent_response, check_for_approval, create_approval_response
 
 
@@ -83,7 +82,7 @@ print("✅ Long-running functions created!")
 # Create shipping agent with pausable tool
 shipping_agent = LlmAgent(
     name="shipping_agent",
-    model=Gemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
+    model=PooledGemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
     instruction="""You are a shipping coordinator assistant.
   
   When users request to ship containers:
@@ -110,7 +109,13 @@ shipping_app = App(
 
 print("✅ Resumable app created!")
 
-session_service = InMemorySessionService()
+# Serves sessions from RAM and journals every change to disk, so orders paused
+# for approval survive a crash of the process. Only one process can own a
+# journal: point SHIPPING_SESSIONS_JOURNAL elsewhere to run a second one.
+journal_path = os.environ.get(
+    "SHIPPING_SESSIONS_JOURNAL", os.path.join(current_dir, "shipping_sessions.journal")
+)
+session_service = JournaledSessionService(journal_path)
 
 # Create runner with the resumable app
 shipping_runner = Runner(
@@ -153,17 +158,20 @@ async def run_shipping_workflow(query: str, auto_approve: bool = True):
 
     # -----------------------------------------------------------------------------------------------
     # -----------------------------------------------------------------------------------------------
-    # STEP 2: Loop through all the events generated and check if `adk_request_confirmation` is present.
+    # STEP 2: Loop through all the events generated and collect every pending `adk_request_confirmation`.
+    # One turn can place several large orders, and all of them are answered together below.
     approval_info = check_for_approval(events)
 
     # -----------------------------------------------------------------------------------------------
     # -----------------------------------------------------------------------------------------------
     # STEP 3: If the event is present, it's a large order - HANDLE APPROVAL WORKFLOW
     if approval_info:
-        print(f"⏸️  Pausing for approval...")
+        print(f"⏸️  Pausing for {len(approval_info['approvals'])} approval(s)...")
+        for approval in approval_info["approvals"]:
+            print(f"   {approval['hint']}")
         print(f"🤔 Human Decision: {'APPROVE ✅' if auto_approve else 'REJECT ❌'}\n")
 
-        # PATH A: Resume the agent by calling run_async() again with the approval decision
+        # PATH A: Resume the agent by calling run_async() again with all approval decisions in one message
         async for event in shipping_runner.run_async(
             user_id="test_user",
             session_id=session_id,
@@ -188,7 +196,8 @@ async def run_shipping_workflow(query: str, auto_approve: bool = True):
 
     print(f"{'='*60}\n")
 
-# Demo runs wrapped in an async main and executed with asyncio.run to allow top-level invocation
+# Demo runs wrapped in an async main and executed with run_with_model_clients (asyncio.run, then the
+# shared model client pool is closed) to allow top-level invocation
 async def main():
     # Demo 1: It's a small order. Agent receives auto-approved status from tool
     await run_shipping_workflow("Ship 3 containers to Singapore")
@@ -199,8 +208,11 @@ async def main():
     # Demo 3: Workflow simulates human decision: REJECT ❌
     await run_shipping_workflow("Ship 8 containers to Los Angeles", auto_approve=False)
 
+    # Demo 4: Two large orders in one request, both approved with a single resume
+    await run_shipping_workflow("Ship 10 containers to Rotterdam and 12 containers to Hamburg", auto_approve=True)
+
     print("✅ Workflow function ready")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_with_model_clients(main())
 
@@ -1,6 +1,5 @@
 import sys
 import os
-import asyncio
 from dotenv import load_dotenv
 
 # Add parent directory to path so we can import agents_shared
@@ -13,15 +12,16 @@ sys.path.insert(0, grandparent_dir)
 env_path = os.path.join(parent_dir, '.env')
 load_dotenv(env_path)
 
-from agents_shared import LlmAgent, Gemini
-from agents_shared import Runner, App, InMemorySessionService, InMemoryMemoryService
+from agents_shared import LlmAgent, PooledGemini, run_with_model_clients
+from agents_shared import Runner, App, BoundedInMemorySessionService, InMemoryMemoryService
+from agents_shared import CachedMemoryService, print_memory_cache_stats, DedupMemoryService, print_dedup_stats
 from agents_shared import retry_config, run_session, load_memory
 from agents_shared import (MODEL_NAME, APP_NAME, USER_ID)
 
 
-memory_service = (
-    InMemoryMemoryService()
-)  # ADK's built-in Memory Service for development and testing
+memory_service = CachedMemoryService(
+    DedupMemoryService(InMemoryMemoryService())
+)  # ADK's built-in Memory Service for development and testing, without near-duplicate events, with repeated searches cached
 
 
 # Define constants used throughout the notebook
@@ -33,7 +33,7 @@ async def main():
 
     # Create agent
     user_agent = LlmAgent(
-        model=Gemini(model=MODEL_NAME, retry_options=retry_config),
+        model=PooledGemini(model=MODEL_NAME, retry_options=retry_config),
         name="MemoryDemoAgent",
         instruction="Answer user questions in simple words.",
     )
@@ -41,7 +41,7 @@ async def main():
     print("✅ Agent created")
 
     # Create Session Service
-    session_service = InMemorySessionService()  # Handles conversations
+    session_service = BoundedInMemorySessionService()  # Handles conversations, spills idle ones to disk
 
     # Create runner with BOTH services
     runner = Runner(
@@ -85,7 +85,7 @@ async def main():
 
     # Create agent
     user_agent = LlmAgent(
-        model=Gemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
+        model=PooledGemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
         name="MemoryDemoAgent",
         instruction="Answer user questions in simple words. Use load_memory tool if you need to recall past conversations.",
         tools=[
@@ -148,6 +148,9 @@ async def main():
             text = memory.content.parts[0].text[:80]
             print(f"  [{memory.author}]: {text}...")
 
+    print_memory_cache_stats(memory_service)
+    print_dedup_stats(memory_service.inner)
+
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    run_with_model_clients(main())
\ No newline at end of file
@@ -1,6 +1,5 @@
 import sys
 import os
-import asyncio
 from dotenv import load_dotenv
 
 # Add parent directory to path so we can import agents_shared
@@ -13,13 +12,18 @@ sys.path.insert(0, grandparent_dir)
 env_path = os.path.join(parent_dir, '.env')
 load_dotenv(env_path)
 
-from agents_shared import LlmAgent, Gemini
-from agents_shared import Runner, App, InMemorySessionService, InMemoryMemoryService, load_memory
-from agents_shared import retry_config, run_session, preload_memory
+from agents_shared import LlmAgent, PooledGemini, run_with_model_clients
+from agents_shared import Runner, App, BoundedInMemorySessionService, InMemoryMemoryService, load_memory
+from agents_shared import CachedMemoryService, print_memory_cache_stats, DedupMemoryService, print_dedup_stats
+from agents_shared import retry_config, run_session
+from agents_shared import IncrementalMemoryPreload, print_preload_stats
 from agents_shared import (MODEL_NAME, APP_NAME, USER_ID)
 
-memory_service = (
-    InMemoryMemoryService()
+# Memory is searched for every user message; the cache answers repeats
+# until the auto-save callback adds the next turn, and near-duplicate events
+# (greetings, re-asked questions) are not stored twice
+memory_service = CachedMemoryService(
+    DedupMemoryService(InMemoryMemoryService())
 )
 
 # Define constants used throughout the notebook
@@ -37,24 +41,25 @@ print("✅ Callback created.")
 
 # Agent with automatic memory saving
 auto_memory_agent = LlmAgent(
-    model=Gemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
+    model=PooledGemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
     name="AutoMemoryAgent",
     instruction="Answer user questions.",
-    tools=[preload_memory],
     after_agent_callback=auto_save_to_memory,  # Saves after each turn!
 )
 
 print("✅ Agent created with automatic memory saving!")
 
 # Create Session Service
-session_service = InMemorySessionService()  # Handles conversations
+session_service = BoundedInMemorySessionService()  # Handles conversations, spills idle ones to disk
 
 
 # Create a runner for the auto-save agent
 # This connects our automated agent to the session and memory services
+# Relevant memories are added to each user message, leaving out those the
+# session already has (an incremental preload_memory)
+memory_preload = IncrementalMemoryPreload(max_tokens=400)
 auto_runner = Runner(
-    agent=auto_memory_agent,  # Use the agent with callback + preload_memory
-    app_name=APP_NAME,
+    app=App(name=APP_NAME, root_agent=auto_memory_agent, plugins=[memory_preload]),  # Agent with callback + memory preload
     session_service=session_service,  # Same services from Section 3
     memory_service=memory_service,
 )
@@ -83,6 +88,10 @@ async def main():
         session_name="auto-save-test-2",  # Different session ID - proves memory works across sessions!
     )
 
+    print_memory_cache_stats(memory_service)
+    print_dedup_stats(memory_service.inner)
+    print_preload_stats(memory_preload)
+
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    run_with_model_clients(main())
\ No newline at end of file
@@ -1,6 +1,5 @@
 import sys
 import os
-import asyncio
 from dotenv import load_dotenv
 import sqlite3
 
@@ -14,15 +13,19 @@ sys.path.insert(0, grandparent_dir)
 env_path = os.path.join(parent_dir, '.env')
 load_dotenv(env_path)
 
-from agents_shared import LlmAgent, Gemini
+from agents_shared import LlmAgent, PooledGemini, run_with_model_clients
 from agents_shared import Runner, DatabaseSessionService, App, EventsCompactionConfig
+from agents_shared import SnapshotDatabaseSessionService, CompressedDatabaseSessionService
+from agents_shared import WindowedDatabaseSessionService, DeltaEncodedDatabaseSessionService
+from agents_shared import load_dictionaries, decode_content_column
+from agents_shared import export_database, print_export_stats
 from agents_shared import retry_config, run_session
 from agents_shared import (MODEL_NAME, APP_NAME, USER_ID)
 
 
 # Step 1: Create the same agent (notice we use LlmAgent this time)
 chatbot_agent = LlmAgent(
-    model=Gemini(model=MODEL_NAME, retry_options=retry_config),
+    model=PooledGemini(model=MODEL_NAME, retry_options=retry_config),
     name="text_chat_bot",
     description="A text chatbot with persistent memory",
 )
@@ -30,7 +33,23 @@ chatbot_agent = LlmAgent(
 # Step 2: Switch to DatabaseSessionService
 # SQLite database will be created automatically
 db_url = "sqlite:///my_agent_data.db"  # Local SQLite file
-session_service = DatabaseSessionService(db_url=db_url)
+# Warm-starts from a binary snapshot of the active sessions, loads only the
+# events after the last compaction on each turn, stores long state values as
+# patches against their previous version (see agents_shared/delta_sessions.py)
+# and large event content compressed (see agents_shared/compressed_sessions.py)
+class PersistentSessionService(
+    SnapshotDatabaseSessionService,
+    DeltaEncodedDatabaseSessionService,
+    WindowedDatabaseSessionService,
+    CompressedDatabaseSessionService,
+):
+    pass
+
+
+snapshot_path = "my_agent_data.snapshot"
+session_service = PersistentSessionService(db_url=db_url)
+if os.path.exists(snapshot_path):
+    print(f"   - Warm start: {session_service.load_snapshot(snapshot_path)} sessions in snapshot")
 
 # Step 3: Create a new runner with persistent storage
 runner = Runner(agent=chatbot_agent, app_name=APP_NAME, session_service=session_service)
@@ -42,13 +61,15 @@ print(f"   - Sessions will survive restarts!")
 
 def check_data_in_db():
     with sqlite3.connect("my_agent_data.db") as connection:
+        # Large contents are stored compressed, decode them for display
+        dictionaries = load_dictionaries(connection)
         cursor = connection.cursor()
         result = cursor.execute(
             "select app_name, session_id, author, content from events"
         )
         print([_[0] for _ in result.description])
-        for each in result.fetchall():
-            print(each)
+        for app_name, session_id, author, content in result.fetchall():
+            print((app_name, session_id, author, decode_content_column(content, dictionaries)))
 
 
 # Re-define our app with Events Compaction enabled
@@ -157,7 +178,22 @@ async def main():
             "\n❌ No compaction event found. Try increasing the number of turns in the demo."
         )    
 
+    # Snapshot the active sessions so the next start does not rebuild them row by row
+    snapshot = await session_service.save_snapshot(
+        snapshot_path, app_name=research_runner_compacting.app_name
+    )
+    print(f"✅ Snapshot saved: {snapshot['sessions']} sessions, {snapshot['file_bytes']} bytes")
+
+    # Append the new events and sessions to the Parquet export used for analytics
+    # (needs pyarrow; see agents_shared/session_export.py)
+    try:
+        export_stats = export_database("my_agent_data.db", "analytics")
+    except RuntimeError as error:
+        print(f"   - Analytics export skipped: {error}")
+    else:
+        print_export_stats(export_stats, "analytics")
+
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    run_with_model_clients(main())
\ No newline at end of file
@@ -1,6 +1,5 @@
 import sys
 import os
-import asyncio
 from dotenv import load_dotenv
 
 # Add parent directory to path so we can import agents_shared
@@ -13,7 +12,7 @@ sys.path.insert(0, grandparent_dir)
 env_path = os.path.join(parent_dir, '.env')
 load_dotenv(env_path)
 
-from agents_shared import types, LlmAgent, Gemini, Runner, InMemorySessionService
+from agents_shared import types, LlmAgent, PooledGemini, run_with_model_clients, Runner, BoundedInMemorySessionService
 from agents_shared import retry_config, Dict, Any, ToolContext, run_session
 
 # Define scope levels for state keys (following best practices)
@@ -60,7 +59,7 @@ MODEL_NAME = "gemini-2.5-flash-lite"
 
 # Create an agent with session state tools
 root_agent = LlmAgent(
-    model=Gemini(model=MODEL_NAME, retry_options=retry_config),
+    model=PooledGemini(model=MODEL_NAME, retry_options=retry_config),
     name="text_chat_bot",
     description="""A text chatbot.
     Tools for managing user context:
@@ -71,7 +70,8 @@ root_agent = LlmAgent(
 )
 
 # Set up session service and runner
-session_service = InMemorySessionService()
+# Keeps hot sessions in RAM and spills idle ones to disk, so a long-lived process stays bounded
+session_service = BoundedInMemorySessionService(max_sessions=1000, idle_ttl=3600)
 runner = Runner(agent=root_agent, session_service=session_service, app_name="default")
 
 print("✅ Agent with session state tools initialized!")
@@ -116,4 +116,4 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    run_with_model_clients(main())
\ No newline at end of file
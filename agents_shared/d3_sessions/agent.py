@@ -1,6 +1,5 @@
 import sys
 import os
-import asyncio
 from dotenv import load_dotenv
 
 # Add parent directory to path so we can import agents_shared
@@ -13,8 +12,8 @@ sys.path.insert(0, grandparent_dir)
 env_path = os.path.join(parent_dir, '.env')
 load_dotenv(env_path)
 
-from agents_shared import ToolContext, types, LlmAgent, Gemini, FunctionTool, Agent
-from agents_shared import App, ResumabilityConfig, Runner, InMemorySessionService
+from agents_shared import ToolContext, types, LlmAgent, PooledGemini, run_with_model_clients, FunctionTool, Agent
+from agents_shared import App, ResumabilityConfig, Runner, BoundedInMemorySessionService
 from agents_shared import retry_config, uuid, print_agent_response, check_for_approval, create_approval_response, run_session
 
 
@@ -27,14 +26,15 @@ MODEL_NAME = "gemini-2.5-flash-lite"
 
 # Step 1: Create the LLM Agent
 root_agent = Agent(
-    model=Gemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
+    model=PooledGemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
     name="text_chat_bot",
     description="A text chatbot",  # Description of the agent's purpose
 )
 
 # Step 2: Set up Session Management
-# InMemorySessionService stores conversations in RAM (temporary)
-session_service = InMemorySessionService()
+# BoundedInMemorySessionService stores recent conversations in RAM (temporary)
+# and spills least recently used or idle ones to a disk file
+session_service = BoundedInMemorySessionService(max_sessions=1000, idle_ttl=3600)
 
 # Step 3: Create the Runner
 runner = Runner(agent=root_agent, app_name=APP_NAME, session_service=session_service)
@@ -63,4 +63,4 @@ async def main():
         session_name="stateful-agentic-session")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    run_with_model_clients(main())
\ No newline at end of file
@@ -0,0 +1,424 @@
+# Patch-encoded state deltas in the session database
+#
+# An agent with an output_key writes its whole output into the state delta of
+# its event, and the events table keeps every delta: a RefinerAgent rewriting
+# `current_story` in a loop stores the full story once per iteration.
+# DeltaEncodedDatabaseSessionService stores a long text value as a patch
+# against the previous version of the same key instead, with a full keyframe
+# every `keyframe_interval` versions (or whenever a patch would not be much
+# smaller). The patch is a list of copied ranges of the previous version and
+# inserted text, diffed word by word:
+#
+#   {"__state_patch__": [[0, 812], " sea-worn ", [830, 1460]],
+#    "keyframe": <timestamp of the keyframe event>, "n": 3, "crc": <crc32>}
+#
+# Events are decoded as they are loaded, so callers only ever see full values.
+# A window that starts in the middle of a chain (num_recent_events,
+# WindowedDatabaseSessionService) reads the chain back to its keyframe.
+# Session, user and app state rows keep full values; only the event history
+# is encoded.
+#
+# Usage (from the repository root):
+#   python -m agents_shared.delta_sessions bench --iterations 8
+import argparse
+import asyncio
+import difflib
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Optional
+
+from google.adk.events import Event
+from google.adk.sessions import DatabaseSessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig
+from google.adk.sessions.database_session_service import (
+    StorageAppState,
+    StorageEvent,
+    StorageSession,
+    StorageUserState,
+)
+from google.adk.sessions.state import State
+from sqlalchemy import event as sqlalchemy_event
+from sqlalchemy import inspect as sqlalchemy_inspect
+from sqlalchemy import select
+from sqlalchemy.orm import load_only
+from sqlalchemy.orm.util import identity_key
+from pydantic import PrivateAttr
+
+from agents_shared.stand_in_model import StandInModel
+
+PATCH_KEY = "__state_patch__"
+_TOKENS = re.compile(r"\s+|\S+")
+
+
+def make_patch(base: str, value: str) -> list:
+    """Ranges of `base` to copy ([start, end]) and text to insert (str)."""
+    base_tokens = _TOKENS.findall(base)
+    value_tokens = _TOKENS.findall(value)
+    offsets = [0]
+    for token in base_tokens:
+        offsets.append(offsets[-1] + len(token))
+    ops: list = []
+    matcher = difflib.SequenceMatcher(None, base_tokens, value_tokens, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([offsets[i1], offsets[i2]])
+        elif j2 > j1:
+            text = "".join(value_tokens[j1:j2])
+            if ops and isinstance(ops[-1], str):
+                ops[-1] += text
+            else:
+                ops.append(text)
+    return ops
+
+
+def apply_patch(base: str, ops: list) -> str:
+    return "".join(base[op[0] : op[1]] if isinstance(op, list) else op for op in ops)
+
+
+def is_patch(value) -> bool:
+    return isinstance(value, dict) and PATCH_KEY in value
+
+
+def _patch_size(ops: list) -> int:
+    return sum(12 if isinstance(op, list) else len(op) + 4 for op in ops)
+
+
+class DeltaEncodedDatabaseSessionService(DatabaseSessionService):
+    """DatabaseSessionService that stores long state delta values as patches.
+
+    Events stored before this service was used, or by a plain
+    DatabaseSessionService, are full values and read as they are, so no
+    migration is needed. Reading patched events with a plain
+    DatabaseSessionService shows the patch dicts instead of the values.
+    """
+
+    def __init__(
+        self,
+        db_url: str,
+        min_size: int = 256,
+        keyframe_interval: int = 8,
+        max_patch_ratio: float = 0.5,
+        max_cached_sessions: int = 1000,
+        **kwargs: Any,
+    ):
+        """Initializes the service.
+
+        Args:
+            db_url: The database URL, e.g. "sqlite:///my_agent_data.db"
+            min_size: Shortest string value stored as a patch
+            keyframe_interval: Versions of a key between two full values; also
+                bounds the patches applied to rebuild one value
+            max_patch_ratio: Store the full value when the patch is not
+                smaller than this share of it
+            max_cached_sessions: Sessions whose latest values are kept in
+                memory as patch bases
+        """
+        super().__init__(db_url=db_url, **kwargs)
+        self.min_size = min_size
+        self.keyframe_interval = keyframe_interval
+        self.max_patch_ratio = max_patch_ratio
+        self.max_cached_sessions = max_cached_sessions
+        # (app, user, session) -> {state key: (value, keyframe timestamp, versions since keyframe)}
+        self._latest: OrderedDict = OrderedDict()
+        self.delta_stats = {"keyframes": 0, "patches": 0, "raw_bytes": 0, "stored_bytes": 0, "chain_reads": 0}
+        sqlalchemy_event.listen(self.database_session_factory, "before_flush", self._encode_new_events)
+        sqlalchemy_event.listen(self.database_session_factory, "after_commit", self._commit_latest)
+        sqlalchemy_event.listen(self.database_session_factory, "after_rollback", self._drop_pending)
+
+    def _remember_version(self, session_key, key, value, keyframe: float, n: int):
+        versions = self._latest.setdefault(session_key, {})
+        versions[key] = (value, keyframe, n)
+        self._latest.move_to_end(session_key)
+        while len(self._latest) > self.max_cached_sessions:
+            self._latest.popitem(last=False)
+
+    def _stored_value(self, sql_session, session_key, key):
+        """The committed value of a state key, as loaded by this transaction."""
+        app_name, user_id, session_id = session_key
+        if key.startswith(State.APP_PREFIX):
+            model, pk, inner = StorageAppState, (app_name,), key.removeprefix(State.APP_PREFIX)
+        elif key.startswith(State.USER_PREFIX):
+            model, pk, inner = StorageUserState, (app_name, user_id), key.removeprefix(State.USER_PREFIX)
+        else:
+            model, pk, inner = StorageSession, session_key, key
+        instance = sql_session.identity_map.get(identity_key(model, pk))
+        if instance is None:
+            return None
+        history = sqlalchemy_inspect(instance).attrs.state.history
+        old = history.deleted[0] if history.deleted else (history.unchanged or [None])[0]
+        return old.get(inner) if old else None
+
+    def _encode_new_events(self, sql_session, flush_context, instances):
+        """before_flush hook: swap long state values of new events for patches.
+
+        The event's own actions are left alone (the in-memory session keeps
+        the full values); the stored row gets an encoded copy.
+        """
+        pending = sql_session.info.setdefault("delta_versions", [])
+        for instance in list(sql_session.new):
+            if not isinstance(instance, StorageEvent) or not instance.actions:
+                continue
+            state_delta = instance.actions.state_delta
+            if not state_delta:
+                continue
+            session_key = (instance.app_name, instance.user_id, instance.session_id)
+            timestamp = instance.timestamp.timestamp()
+            encoded = {}
+            for key, value in state_delta.items():
+                if not isinstance(value, str) or len(value) < self.min_size:
+                    encoded[key] = value
+                    continue
+                self.delta_stats["raw_bytes"] += len(value)
+                previous = self._latest.get(session_key, {}).get(key)
+                ops = None
+                if (
+                    previous is not None
+                    and previous[2] + 1 < self.keyframe_interval
+                    # Only patch against what the database holds right now
+                    and self._stored_value(sql_session, session_key, key) == previous[0]
+                ):
+                    ops = make_patch(previous[0], value)
+                    if _patch_size(ops) >= self.max_patch_ratio * len(value):
+                        ops = None
+                if ops is None:
+                    encoded[key] = value
+                    pending.append((session_key, key, value, timestamp, 0))
+                    self.delta_stats["keyframes"] += 1
+                    self.delta_stats["stored_bytes"] += len(value)
+                else:
+                    _, keyframe, n = previous
+                    encoded[key] = {PATCH_KEY: ops, "keyframe": keyframe, "n": n + 1, "crc": zlib.crc32(value.encode())}
+                    pending.append((session_key, key, value, keyframe, n + 1))
+                    self.delta_stats["patches"] += 1
+                    self.delta_stats["stored_bytes"] += _patch_size(ops)
+            if encoded != state_delta:
+                instance.actions = instance.actions.model_copy(update={"state_delta": encoded})
+
+    def _commit_latest(self, sql_session):
+        for version in sql_session.info.pop("delta_versions", []):
+            self._remember_version(*version)
+
+    def _drop_pending(self, sql_session):
+        sql_session.info.pop("delta_versions", None)
+
+    def _read_chain(self, session_key, key: str, keyframe: float, before: float) -> Optional[str]:
+        """Rebuild the value of `key` just before `before` from its keyframe on."""
+        self.delta_stats["chain_reads"] += 1
+        query = (
+            select(StorageEvent)
+            .options(load_only(StorageEvent.actions, StorageEvent.timestamp))
+            .where(
+                StorageEvent.app_name == session_key[0],
+                StorageEvent.user_id == session_key[1],
+                StorageEvent.session_id == session_key[2],
+                StorageEvent.timestamp >= datetime.fromtimestamp(keyframe),
+                StorageEvent.timestamp < datetime.fromtimestamp(before),
+            )
+            .order_by(StorageEvent.timestamp)
+        )
+        value = None
+        with self.database_session_factory() as sql_session:
+            for storage_event in sql_session.scalars(query):
+                actions = storage_event.actions
+                delta = actions.state_delta if actions else None
+                if not delta or key not in delta:
+                    continue
+                stored = delta[key]
+                if is_patch(stored):
+                    if value is None:
+                        raise ValueError(f"State patch for {key!r} without a keyframe in session {session_key[2]}")
+                    value = apply_patch(value, stored[PATCH_KEY])
+                else:
+                    value = stored
+        return value
+
+    def decode_events(self, session_key, events: list[Event]) -> list[Event]:
+        """Replace the state patches in `events` (any window of one session) by full values."""
+        values: dict[str, str] = {}
+        for event in sorted(events, key=lambda event: event.timestamp):
+            delta = event.actions.state_delta if event.actions else None
+            if not delta:
+                continue
+            for key, stored in delta.items():
+                if not is_patch(stored):
+                    values[key] = stored
+                    if isinstance(stored, str) and len(stored) >= self.min_size:
+                        self._remember_version(session_key, key, stored, event.timestamp, 0)
+                    continue
+                base = values.get(key)
+                if base is None:
+                    base = self._read_chain(session_key, key, stored["keyframe"], event.timestamp)
+                    if base is None:
+                        raise ValueError(f"State patch for {key!r} without a keyframe in session {session_key[2]}")
+                value = apply_patch(base, stored[PATCH_KEY])
+                if zlib.crc32(value.encode()) != stored["crc"]:
+                    raise ValueError(f"State patch for {key!r} in event {event.id} does not match its base")
+                delta[key] = value
+                values[key] = value
+                self._remember_version(session_key, key, value, stored["keyframe"], stored["n"])
+        return events
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        session = await super().get_session(
+            app_name=app_name, user_id=user_id, session_id=session_id, config=config
+        )
+        if session is not None:
+            self.decode_events((app_name, user_id, session_id), session.events)
+        return session
+
+    async def delete_session(self, app_name: str, user_id: str, session_id: str) -> None:
+        self._latest.pop((app_name, user_id, session_id), None)
+        await super().delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+
+
+def _actions_bytes(db_path: str) -> int:
+    with sqlite3.connect(db_path) as connection:
+        return connection.execute("SELECT COALESCE(SUM(LENGTH(actions)), 0) FROM events").fetchone()[0]
+
+
+async def _run_pipelines(service, runs: int, iterations: int, story_words: int) -> dict:
+    from google.adk.runners import Runner
+    from google.genai import types
+
+    from agents_shared.load_test import load_agent_folder
+
+    agent, _ = load_agent_folder("d1_loop_agent")
+    # One candidate per round, so the plain and patched runs store the same revisions
+    agent.sub_agents[1].max_rounds = iterations
+    agent.sub_agents[1].candidates = 1
+    writer, (critic, refiner) = agent.sub_agents[0], agent.sub_agents[1].sub_agents
+    # The writer and the refiner work on the same story; the critic never approves
+    writer.model = refiner.model = _RevisingModel(story_words=story_words)
+    critic.model = StandInModel()
+    runner = Runner(agent=agent, app_name="story", session_service=service)
+    session_ids = []
+    turns = 0
+    for run in range(runs):
+        session = await service.create_session(app_name="story", user_id="bench")
+        message = types.Content(role="user", parts=[types.Part(text="A lighthouse keeper finds a message in a bottle.")])
+        async for event in runner.run_async(user_id="bench", session_id=session.id, new_message=message):
+            turns += 1
+        session_ids.append(session.id)
+    return {"session_ids": session_ids, "events": turns}
+
+
+def _reconstruction_ms(service, session_ids: list[str], config=None) -> float:
+    async def read_all():
+        for session_id in session_ids:
+            await service.get_session(app_name="story", user_id="bench", session_id=session_id, config=config)
+
+    started = time.perf_counter()
+    asyncio.run(read_all())
+    return (time.perf_counter() - started) * 1000 / len(session_ids)
+
+
+def benchmark(runs: int = 5, iterations: int = 8, story_words: int = 300) -> dict:
+    """Bytes of event actions stored and session read latency, plain vs patched.
+
+    Runs StoryPipeline (d1_loop_agent) with a stand-in model that revises a
+    few sentences of the story per iteration.
+    """
+    workdir = tempfile.mkdtemp(prefix="adk_delta_bench_")
+    results = {}
+    try:
+        for name, service_class in (("plain", DatabaseSessionService), ("patched", DeltaEncodedDatabaseSessionService)):
+            path = os.path.join(workdir, f"{name}.db")
+            service = service_class(db_url=f"sqlite:///{path}")
+            run = asyncio.run(_run_pipelines(service, runs, iterations, story_words))
+            results[name] = {
+                "actions_bytes": _actions_bytes(path),
+                "events": run["events"],
+                "full_read_ms": _reconstruction_ms(service, run["session_ids"]),
+                "tail_read_ms": _reconstruction_ms(service, run["session_ids"], GetSessionConfig(num_recent_events=3)),
+                "file_bytes": os.path.getsize(path),
+            }
+            if name == "plain":
+                plain, plain_ids = service, run["session_ids"]
+                continue
+            results[name].update(service.delta_stats)
+            # Every decoded value must match what the plain run stored
+            for plain_id, session_id in zip(plain_ids, run["session_ids"]):
+                expected = asyncio.run(plain.get_session(app_name="story", user_id="bench", session_id=plain_id))
+                session = asyncio.run(service.get_session(app_name="story", user_id="bench", session_id=session_id))
+                assert session.state == expected.state
+                assert [e.actions.state_delta for e in session.events] == [e.actions.state_delta for e in expected.events]
+            results["story_chars"] = len(session.state.get("current_story", ""))
+            plain.db_engine.dispose()
+            service.db_engine.dispose()
+    finally:
+        shutil.rmtree(workdir)
+    return results
+
+
+class _RevisingStory:
+    """Deterministic story text with a few sentences changed per revision."""
+
+    WORDS = ("the keeper lamp sea night storm bottle message tide rock light boat gull wind old "
+             "harbor cold bright letter shore wave salt island fog bell").split()
+
+    def __init__(self, story_words: int, seed: int = 7):
+        import random
+
+        self.random = random.Random(seed)
+        self.sentences = [self._sentence() for _ in range(max(1, story_words // 10))]
+
+    def _sentence(self) -> str:
+        words = [self.random.choice(self.WORDS) for _ in range(10)]
+        return " ".join(words).capitalize() + "."
+
+    def revise(self) -> str:
+        for _ in range(max(1, len(self.sentences) // 15)):
+            self.sentences[self.random.randrange(len(self.sentences))] = self._sentence()
+        return " ".join(self.sentences)
+
+
+class _RevisingModel(StandInModel):
+    """Stand-in writer that returns the story with a few sentences revised."""
+
+    story_words: int = 300
+    _story: Optional[_RevisingStory] = PrivateAttr(default=None)
+
+    def _reply_text(self, llm_request) -> str:
+        if self._story is None:
+            self._story = _RevisingStory(self.story_words)
+        return self._story.revise()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="State delta patch encoding on StoryPipeline runs.")
+    parser.add_argument("command", choices=["bench"])
+    parser.add_argument("--runs", type=int, default=5, help="StoryPipeline runs, one session each")
+    parser.add_argument("--iterations", type=int, default=8, help="Refinement rounds per run")
+    parser.add_argument("--story-words", type=int, default=300, help="Length of the stand-in story")
+    args = parser.parse_args(argv)
+    result = benchmark(args.runs, args.iterations, args.story_words)
+    plain, patched = result["plain"], result["patched"]
+    print(f"\n ### State delta encoding ({args.runs} runs x {args.iterations} iterations, {result['story_chars']} char story)")
+    print(f"   - Event actions stored: {plain['actions_bytes']} -> {patched['actions_bytes']} bytes"
+          f" ({plain['actions_bytes'] / args.runs:.0f} -> {patched['actions_bytes'] / args.runs:.0f} bytes per pipeline turn)")
+    print(f"   - DB file: {plain['file_bytes']} -> {patched['file_bytes']} bytes")
+    print(f"   - Values: {patched['keyframes']} keyframes, {patched['patches']} patches,"
+          f" {patched['raw_bytes']} -> {patched['stored_bytes']} bytes")
+    print(f"   - Full session read: {plain['full_read_ms']:.1f}ms -> {patched['full_read_ms']:.1f}ms")
+    print(f"   - Last 3 events read: {plain['tail_read_ms']:.1f}ms -> {patched['tail_read_ms']:.1f}ms"
+          f" ({patched['chain_reads']} chain reads)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+# Hedged model requests against slow outliers
+#
+# retry_config only acts on errors; a call that succeeds slowly still sets the
+# p99. HedgedModel wraps a model (usually Gemini) and, when a call has not
+# produced its first response within the hedge delay, sends the same request a
+# second time. Whichever request answers first is used and the other one is
+# cancelled. Each request is read by a task of its own into a queue, so its
+# generator is never resumed or closed from another task.
+#   - the hedge delay is a percentile (p95 by default) of recent latencies to
+#     the first response, so only the slowest few percent of calls are hedged
+#   - a token bucket caps hedges to max_hedge_rate of calls, so an overloaded
+#     backend does not get twice the traffic
+#   - calls, hedges fired, hedges won and budget refusals are counted
+#
+# Usage:
+#   model = HedgedModel(inner=Gemini(model=MODEL_NAME, retry_options=retry_config))
+#   agent = LlmAgent(..., model=model)
+#   print_hedge_report(model)
+#
+#   python -m agents_shared.hedged_model --calls 400
+# compares latency percentiles with and without hedging on a stand-in model.
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import AsyncGenerator, Optional
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from pydantic import ConfigDict, model_validator
+
+
+# Queued after the last response of an attempt
+_END = object()
+
+
+@dataclass
+class HedgeStats:
+    calls: int = 0
+    hedges_fired: int = 0
+    hedges_won: int = 0  # Hedges that answered before the original request
+    over_budget: int = 0  # Calls past the hedge delay that the budget did not allow to hedge
+    latencies: deque = field(default_factory=lambda: deque(maxlen=1000))  # Seconds to the first response
+    tokens: float = 0.0  # Hedge budget left, one token per hedge
+
+
+class HedgedModel(BaseLlm):
+    """Sends a second copy of a slow request and uses whichever answers first.
+
+    `model` defaults to the wrapped model's name.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    model: str = ""
+    inner: BaseLlm  # The model every request goes to
+    percentile: float = 95.0  # Latency percentile used as the hedge delay
+    min_samples: int = 20  # Latencies needed before the percentile is trusted
+    initial_delay: float = 2.0  # Hedge delay in seconds until then
+    min_delay: float = 0.05  # Never hedge sooner than this
+    window: int = 200  # Recent latencies the percentile is taken over
+    max_hedge_rate: float = 0.05  # Hedges allowed per call on average
+    max_burst: float = 2.0  # Hedges that may be fired back to back
+    stats: Optional[HedgeStats] = None
+
+    @model_validator(mode="after")
+    def _defaults(self):
+        if not self.model:
+            self.model = self.inner.model
+        if self.stats is None:
+            self.stats = HedgeStats(latencies=deque(maxlen=self.window), tokens=self.max_burst)
+        return self
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for the first response before hedging."""
+        latencies = self.stats.latencies
+        if len(latencies) < self.min_samples:
+            return max(self.initial_delay, self.min_delay)
+        ordered = sorted(latencies)
+        index = min(len(ordered) - 1, int(self.percentile / 100 * len(ordered)))
+        return max(ordered[index], self.min_delay)
+
+    def _take_hedge_token(self) -> bool:
+        if self.stats.tokens >= 1:
+            self.stats.tokens -= 1
+            return True
+        self.stats.over_budget += 1
+        return False
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        stats = self.stats
+        stats.calls += 1
+        stats.tokens = min(self.max_burst, stats.tokens + self.max_hedge_rate)
+        started = time.perf_counter()
+
+        primary = self._start(llm_request, stream)
+        # Task waiting for the first item of an attempt -> the attempt
+        first_items = {asyncio.ensure_future(primary[1].get()): primary}
+        hedge = None
+        winner = first = None
+        try:
+            done, _ = await asyncio.wait(first_items, timeout=self.hedge_delay())
+            if not done and self._take_hedge_token():
+                stats.hedges_fired += 1
+                # The wrapped model may adjust the request it is given, so the
+                # hedge gets its own copy
+                hedge = self._start(llm_request.model_copy(deep=True), stream)
+                first_items[asyncio.ensure_future(hedge[1].get())] = hedge
+            while winner is None:
+                done, _ = await asyncio.wait(first_items, return_when=asyncio.FIRST_COMPLETED)
+                for getter in list(first_items):
+                    if getter not in done:
+                        continue
+                    attempt = first_items.pop(getter)
+                    # An error only counts when no other attempt is left to answer
+                    if not isinstance(getter.result(), Exception) or not first_items:
+                        winner, first = attempt, getter.result()
+                        break
+        finally:
+            for getter, (task, _) in first_items.items():
+                getter.cancel()
+                task.cancel()
+            await asyncio.gather(*first_items, *(task for task, _ in first_items.values()), return_exceptions=True)
+
+        task, responses = winner
+        try:
+            if isinstance(first, Exception):
+                raise first
+            if first is _END:
+                return
+            if winner is hedge:
+                stats.hedges_won += 1
+            stats.latencies.append(time.perf_counter() - started)
+            yield first
+            while (item := await responses.get()) is not _END:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Stops the request when the caller stops reading early
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    def _start(self, llm_request: LlmRequest, stream: bool) -> tuple[asyncio.Task, asyncio.Queue]:
+        """Send one attempt of a request, drained into a queue by a task of its own."""
+        responses = asyncio.Queue()
+        task = asyncio.create_task(_drain(self.inner.generate_content_async(llm_request, stream=stream), responses))
+        return task, responses
+
+
+async def _drain(request: AsyncGenerator[LlmResponse, None], responses: asyncio.Queue):
+    """Put every response of a request on the queue, then its error or _END.
+
+    The request's generator is iterated and closed in this one task only;
+    cancelling the task cancels the request.
+    """
+    try:
+        async for response in request:
+            responses.put_nowait(response)
+    except Exception as error:
+        responses.put_nowait(error)
+    else:
+        responses.put_nowait(_END)
+    finally:
+        await request.aclose()
+
+
+def hedge_report(model: HedgedModel) -> dict:
+    stats = model.stats
+    latencies = sorted(stats.latencies)
+    return {
+        "calls": stats.calls,
+        "hedges_fired": stats.hedges_fired,
+        "hedges_won": stats.hedges_won,
+        "over_budget": stats.over_budget,
+        "hedge_rate": stats.hedges_fired / stats.calls if stats.calls else 0.0,
+        "hedge_delay_ms": model.hedge_delay() * 1000,
+        "latency_p50_ms": statistics.median(latencies) * 1000 if latencies else None,
+        "latency_p99_ms": latencies[int(0.99 * (len(latencies) - 1))] * 1000 if latencies else None,
+    }
+
+
+def print_hedge_report(model: HedgedModel):
+    report = hedge_report(model)
+    print(
+        f"   [hedge] {report['calls']} calls, {report['hedges_fired']} hedges fired"
+        f" ({report['hedge_rate']:.1%}), {report['hedges_won']} won, {report['over_budget']} over budget;"
+        f" delay now {report['hedge_delay_ms']:.0f}ms"
+    )
+
+
+async def _measure(model: BaseLlm, calls: int, concurrency: int) -> list[float]:
+    from google.genai import types
+
+    request = LlmRequest(contents=[types.Content(role="user", parts=[types.Part(text="Hello there")])])
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            async for _ in model.generate_content_async(request):
+                pass
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return sorted(latencies)
+
+
+def _percentiles(latencies: list[float]) -> str:
+    pick = lambda pct: latencies[int(pct / 100 * (len(latencies) - 1))] * 1000
+    return f"p50 {pick(50):.0f}ms p95 {pick(95):.0f}ms p99 {pick(99):.0f}ms max {latencies[-1] * 1000:.0f}ms"
+
+
+async def run_bench(args):
+    from agents_shared.stand_in_model import StandInModel
+
+    def stand_in():
+        return StandInModel(
+            latency=args.latency, latency_jitter=args.latency / 2,
+            tail_rate=args.tail_rate, tail_latency=args.tail_latency,
+        )
+
+    plain = await _measure(stand_in(), args.calls, args.concurrency)
+    print(f"   - Unhedged: {_percentiles(plain)}")
+    hedged_model = HedgedModel(inner=stand_in(), max_hedge_rate=args.max_hedge_rate, initial_delay=args.latency * 3)
+    hedged = await _measure(hedged_model, args.calls, args.concurrency)
+    print(f"   - Hedged:   {_percentiles(hedged)}")
+    print_hedge_report(hedged_model)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Latency percentiles with and without request hedging.")
+    parser.add_argument("--calls", type=int, default=400, help="Model calls per run")
+    parser.add_argument("--concurrency", type=int, default=10, help="Calls in flight")
+    parser.add_argument("--latency", type=float, default=0.02, help="Typical stand-in latency in seconds")
+    parser.add_argument("--tail-rate", type=float, default=0.03, help="Share of slow outliers")
+    parser.add_argument("--tail-latency", type=float, default=0.5, help="Extra seconds of an outlier")
+    parser.add_argument("--max-hedge-rate", type=float, default=0.05, help="Hedges allowed per call")
+    args = parser.parse_args(argv)
+    asyncio.run(run_bench(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+# AgentTool fast path: run the wrapped agent inside the caller's invocation
+#
+# AgentTool builds a new Runner, an InMemorySessionService, an
+# InMemoryMemoryService and a sub-session holding a copy of the caller's state
+# for every call, and the in-memory service deep-copies the sub-session on
+# every event. InlineAgentTool runs the wrapped agent directly in a child of
+# the caller's invocation context instead:
+#   - the child sees the caller's state through a shallow per-call overlay;
+#     what the agent writes stays in the overlay
+#   - only the agent's output_key (plus any forward_keys) is written back to
+#     the caller's state, not every delta the sub-agent produced
+#   - the sub-agent's events live in a plain Session object that is never
+#     stored anywhere
+#   - services (memory, credentials, plugins) and the LLM call budget are the
+#     caller's; artifacts are forwarded to the caller like AgentTool does
+#
+# Runner-level plugin callbacks (before_run, on_user_message...) do not run
+# for the inline call; agent, model and tool callbacks still do.
+#
+# Usage:
+#   root_agent = Agent(..., tools=[InlineAgentTool(research_agent)])
+#
+#   python -m agents_shared.inline_agent_tool --calls 200
+# measures the framework overhead per sub-agent call of both tools.
+import argparse
+import asyncio
+import sys
+import time
+from typing import Any, Callable, Optional
+
+from google.adk.agents import LlmAgent
+from google.adk.agents.invocation_context import new_invocation_context_id
+from google.adk.events import Event
+from google.adk.sessions import Session
+from google.adk.sessions.state import State
+from google.adk.tools import AgentTool
+from google.adk.tools._forwarding_artifact_service import ForwardingArtifactService
+from google.adk.tools.tool_context import ToolContext
+from google.adk.utils.context_utils import Aclosing
+from google.genai import types
+
+
+async def run_agent_inline(
+    agent,
+    parent,
+    state: dict,
+    content: Optional[types.Content] = None,
+    on_event: Optional[Callable[[Event], None]] = None,
+    **context_updates,
+) -> tuple[set[str], Optional[types.Content]]:
+    """Run an agent in a child of `parent` over a private state dict.
+
+    Args:
+        agent: The agent to run
+        parent: The caller's InvocationContext
+        state: State the agent reads and writes; updated in place
+        content: User message of the run, the caller's one when None
+        on_event: Called with every complete event of the run
+        context_updates: Other InvocationContext fields to override
+
+    Returns:
+        Tuple (keys the agent wrote, content of its last event with content)
+    """
+    invocation_id = new_invocation_context_id()
+    content = content or parent.user_content
+    session = Session(
+        id=f"{parent.session.id}/{agent.name}",
+        app_name=parent.app_name,
+        user_id=parent.user_id,
+        state=state,
+        events=[Event(invocation_id=invocation_id, author="user", content=content)] if content else [],
+    )
+    context = parent.model_copy(
+        update={
+            "invocation_id": invocation_id,
+            "agent": agent,
+            "session": session,
+            "user_content": content,
+            "branch": None,
+            "agent_states": {},
+            "end_of_agents": {},
+            "end_invocation": False,
+            **context_updates,
+        }
+    )
+
+    written = set()
+    last_content = None
+    async with Aclosing(agent.run_async(context)) as agen:
+        async for event in agen:
+            if event.partial:
+                continue
+            # What BaseSessionService.append_event does, minus the storage
+            if event.actions and event.actions.state_delta:
+                for key, value in event.actions.state_delta.items():
+                    if not key.startswith(State.TEMP_PREFIX):
+                        # Session() copied `state`: later steps read session.state
+                        session.state[key] = value
+                        state[key] = value
+                        written.add(key)
+            session.events.append(event)
+            if on_event is not None:
+                on_event(event)
+            if event.content:
+                last_content = event.content
+    return written, last_content
+
+
+class InlineAgentTool(AgentTool):
+    """AgentTool that runs its agent in the caller's invocation, without a nested Runner."""
+
+    def __init__(self, agent, skip_summarization: bool = False, forward_keys: tuple[str, ...] = ()):
+        """Initializes the tool.
+
+        Args:
+            agent: The agent to call
+            skip_summarization: As for AgentTool
+            forward_keys: State keys written back to the caller besides the
+                agent's output_key
+        """
+        super().__init__(agent=agent, skip_summarization=skip_summarization)
+        self.forward_keys = forward_keys
+
+    def _request_content(self, args: dict[str, Any]) -> types.Content:
+        if isinstance(self.agent, LlmAgent) and self.agent.input_schema:
+            text = self.agent.input_schema.model_validate(args).model_dump_json(exclude_none=True)
+        else:
+            text = args["request"]
+        return types.Content(role="user", parts=[types.Part.from_text(text=text)])
+
+    async def run_async(self, *, args: dict[str, Any], tool_context: ToolContext) -> Any:
+        if self.skip_summarization:
+            tool_context.actions.skip_summarization = True
+        content = self._request_content(args)
+        # Shallow overlay of the caller's state, same keys AgentTool copies
+        state = {key: value for key, value in tool_context.state.to_dict().items() if not key.startswith("_adk")}
+        written, last_content = await run_agent_inline(
+            self.agent, tool_context._invocation_context, state, content,
+            artifact_service=ForwardingArtifactService(tool_context),
+        )
+
+        output_key = self.agent.output_key if isinstance(self.agent, LlmAgent) else None
+        for key in (output_key, *self.forward_keys):
+            if key and key in written:
+                tool_context.state[key] = state[key]
+
+        if not last_content:
+            return ""
+        merged_text = "\n".join(part.text for part in last_content.parts or [] if part.text)
+        if isinstance(self.agent, LlmAgent) and self.agent.output_schema:
+            return self.agent.output_schema.model_validate_json(merged_text).model_dump(exclude_none=True)
+        return merged_text
+
+
+async def _time_agent(agent, calls: int) -> float:
+    """Seconds per run of the agent alone, with nothing around it."""
+    from google.adk.agents.invocation_context import InvocationContext
+    from google.adk.agents.run_config import RunConfig
+    from google.adk.sessions import InMemorySessionService
+
+    session_service = InMemorySessionService()
+    started = time.perf_counter()
+    for i in range(calls):
+        content = types.Content(role="user", parts=[types.Part.from_text(text=f"Summarize finding {i}")])
+        invocation_id = new_invocation_context_id()
+        session = Session(
+            id="bench", app_name="bench", user_id="bench", state={"note_0": "lorem ipsum"},
+            events=[Event(invocation_id=invocation_id, author="user", content=content)],
+        )
+        context = InvocationContext(
+            session_service=session_service, invocation_id=invocation_id, agent=agent,
+            session=session, user_content=content, run_config=RunConfig(),
+        )
+        async for _ in agent.run_async(context):
+            pass
+    return (time.perf_counter() - started) / calls
+
+
+async def _time_calls(tool: AgentTool, parent_agent, calls: int, state_keys: int) -> float:
+    from google.adk.agents.invocation_context import InvocationContext
+    from google.adk.agents.run_config import RunConfig
+    from google.adk.artifacts import InMemoryArtifactService
+    from google.adk.memory import InMemoryMemoryService
+    from google.adk.plugins.plugin_manager import PluginManager
+    from google.adk.sessions import InMemorySessionService
+
+    session_service = InMemorySessionService()
+    session = await session_service.create_session(
+        app_name="bench", user_id="bench",
+        state={f"note_{i}": "lorem ipsum " * 20 for i in range(state_keys)},
+    )
+    context = InvocationContext(
+        session_service=session_service,
+        artifact_service=InMemoryArtifactService(),
+        memory_service=InMemoryMemoryService(),
+        invocation_id=new_invocation_context_id(),
+        agent=parent_agent,
+        session=session,
+        plugin_manager=PluginManager(),
+        run_config=RunConfig(),
+    )
+    # Warm up imports and caches before timing
+    await tool.run_async(args={"request": "warm up"}, tool_context=ToolContext(context))
+    started = time.perf_counter()
+    for i in range(calls):
+        await tool.run_async(args={"request": f"Summarize finding {i}"}, tool_context=ToolContext(context))
+    return (time.perf_counter() - started) / calls
+
+
+async def run_bench(args):
+    from agents_shared.stand_in_model import StandInModel
+
+    def sub_agent():
+        return LlmAgent(
+            name="SummarizerAgent",
+            model=StandInModel(),
+            instruction="Summarize: {note_0}",
+            output_key="final_summary",
+        )
+
+    parent = LlmAgent(name="ResearchCoordinator", model=StandInModel())
+    # The sub-agent's own run (prompt building, model call) is the same for
+    # both tools; what is left is what the tool adds around it
+    alone = await _time_agent(sub_agent(), args.calls)
+    nested = await _time_calls(AgentTool(sub_agent()), parent, args.calls, args.state_keys)
+    inline = await _time_calls(InlineAgentTool(sub_agent()), parent, args.calls, args.state_keys)
+    print(f"\n ### Sub-agent call overhead ({args.calls} calls, {args.state_keys} state keys, stand-in model)")
+    print(f"   - Agent run alone: {alone * 1000:.2f}ms per call")
+    print(f"   - AgentTool:       {nested * 1000:.2f}ms per call, {max(0.0, nested - alone) * 1000:.2f}ms overhead")
+    print(f"   - InlineAgentTool: {inline * 1000:.2f}ms per call, {max(0.0, inline - alone) * 1000:.2f}ms overhead")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Framework overhead per AgentTool call.")
+    parser.add_argument("--calls", type=int, default=200, help="Sub-agent calls timed per tool")
+    parser.add_argument("--state-keys", type=int, default=20, help="Keys in the caller's session state")
+    args = parser.parse_args(argv)
+    asyncio.run(run_bench(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
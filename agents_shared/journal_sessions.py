@@ -0,0 +1,625 @@
+# Durable in-memory sessions: an append-only journal with snapshots
+#
+# InMemorySessionService answers every call from RAM, but a crash loses every
+# session, including the paused approvals of d2_lro_hitl. A database session
+# service keeps them, at the price of a transaction per event.
+# JournaledSessionService still serves everything from RAM, and makes each
+# change durable by appending it to a journal file:
+#
+#   record   u32 payload length | u32 crc32 | u64 sequence | u8 kind | payload (JSON)
+#
+#   - session creations, deletions and appended events (their state deltas
+#     included) are journaled after they are applied in memory; the call
+#     returns once the record is written (and fsynced, with fsync=True)
+#   - group commit: records that arrive while a write is in progress are
+#     written and fsynced together by the next write, so concurrent sessions
+#     share fsyncs instead of queueing for one each
+#   - every snapshot_every records the whole store (sessions, app and user
+#     state) is written to a snapshot file, renamed into place, and the
+#     journal is truncated; records carry a sequence number, so a journal
+#     left over by a crash between the two steps is skipped on replay
+#   - at startup the snapshot is loaded and the journal tail replayed; a
+#     record cut short by a crash (length or checksum mismatch) ends the
+#     replay and is cut off the file
+#   - one process owns a journal at a time (an exclusive lock on
+#     <journal>.lock); a second one fails at startup instead of interleaving
+#   - a failed journal write fails the service: memory may then hold changes
+#     the journal does not, so later changes and snapshots raise RuntimeError
+#     until a restart recovers from what the journal holds
+#   - recovered events stay JSON until their session is first read (state
+#     and timestamps are applied from the plain JSON), so a restart does not
+#     pay pydantic validation for sessions nobody resumes
+#
+# Serving stays as fast as InMemorySessionService; an append waits for one
+# shared write instead of a database transaction. A snapshot serializes the
+# store on the event loop, so keep snapshot_every large for big stores.
+#
+# Usage:
+#   session_service = JournaledSessionService("sessions.journal")
+#   runner = Runner(..., session_service=session_service)
+#   print_journal_stats(session_service)
+#
+#   python -m agents_shared.journal_sessions bench
+# reports append latency, recovery time per million events (at startup, and
+# with every session decoded) and whether every acknowledged event survives
+# kill -9.
+import argparse
+import asyncio
+import gc
+import json
+import os
+import signal
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Iterator, Optional
+
+from google.adk.events import Event, EventActions
+from google.adk.sessions import InMemorySessionService, Session
+from google.adk.sessions import _session_util
+from google.genai import types
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks
+    fcntl = None
+
+_RECORD = struct.Struct(">IIQB")
+_SEQUENCE = struct.Struct(">QB")
+
+KIND_CREATE = 1
+KIND_APPEND = 2
+KIND_DELETE = 3
+KIND_SNAPSHOT = 4  # Snapshot header: sequence covered, app and user state
+KIND_SESSION = 5  # One session of a snapshot
+KIND_END = 6  # Last record of a complete snapshot
+
+
+@dataclass
+class JournalStats:
+    records: int = 0
+    bytes_written: int = 0
+    writes: int = 0  # Group commits; one fsync each with fsync=True
+    write_seconds: float = 0.0
+    snapshots: int = 0
+    snapshot_seconds: float = 0.0
+    snapshot_failures: int = 0
+    recovered_sessions: int = 0
+    recovered_events: int = 0
+    replayed_records: int = 0  # Journal records applied on top of the snapshot
+    torn_bytes: int = 0  # Bytes cut off the end of the journal at recovery
+    recovery_seconds: float = 0.0
+
+
+def encode_record(sequence: int, kind: int, payload: bytes) -> bytes:
+    header = _SEQUENCE.pack(sequence, kind)
+    return _RECORD.pack(len(payload), zlib.crc32(payload, zlib.crc32(header)), sequence, kind) + payload
+
+
+def read_records(file) -> Iterator[tuple[int, int, bytes, int]]:
+    """(sequence, kind, payload, end offset) of every intact record, stopping at the first torn one."""
+    while True:
+        header = file.read(_RECORD.size)
+        if len(header) < _RECORD.size:
+            return
+        length, crc, sequence, kind = _RECORD.unpack(header)
+        payload = file.read(length)
+        if len(payload) < length or zlib.crc32(payload, zlib.crc32(_SEQUENCE.pack(sequence, kind))) != crc:
+            return
+        yield sequence, kind, payload, file.tell()
+
+
+class JournaledSessionService(InMemorySessionService):
+    """An InMemorySessionService whose changes are journaled to disk and recovered at startup."""
+
+    def __init__(
+        self,
+        journal_path: str,
+        snapshot_path: Optional[str] = None,
+        snapshot_every: int = 10000,
+        fsync: bool = True,
+        commit_delay: float = 0.0,
+    ):
+        """Initializes the service and recovers what the journal and snapshot hold.
+
+        Args:
+            journal_path: Journal file, created if missing
+            snapshot_path: Snapshot file, journal_path + ".snapshot" by default
+            snapshot_every: Records between two snapshots, 0 to snapshot only on request
+            fsync: Whether a write waits for the disk; without it, data survives
+                a killed process but not a power loss
+            commit_delay: Seconds a write waits for more records to share it
+        """
+        super().__init__()
+        self.journal_path = journal_path
+        self.snapshot_path = snapshot_path or journal_path + ".snapshot"
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self.commit_delay = commit_delay
+        self.stats = JournalStats()
+        self._sequence = 0
+        self._since_snapshot = 0
+        self._pending: list[bytes] = []
+        self._waiters: list[asyncio.Future] = []
+        self._io_lock: Optional[asyncio.Lock] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._failed: Optional[Exception] = None  # The journal write that failed, if any
+        # Recovered events kept as JSON until their session is read: key -> event JSONs
+        self._undecoded: dict[tuple, list[bytes]] = {}
+        self._lock_file = open(journal_path + ".lock", "w")
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self._lock_file.close()
+                raise RuntimeError(f"Journal {journal_path} is in use by another process.") from None
+        try:
+            self._recover()
+            self._file = open(journal_path, "ab", buffering=0)
+        except BaseException:
+            self._lock_file.close()
+            raise
+
+    # -- recovery ----------------------------------------------------------
+
+    def _load_snapshot(self) -> int:
+        """Load the snapshot into memory; returns the last sequence it covers."""
+        if not os.path.exists(self.snapshot_path):
+            return 0
+        covered, sessions, complete = 0, [], False
+        with open(self.snapshot_path, "rb") as file:
+            for _, kind, payload, _ in read_records(file):
+                if kind == KIND_SNAPSHOT:
+                    header = json.loads(payload)
+                    covered = header["sequence"]
+                    app_state, user_state = header["app_state"], header["user_state"]
+                elif kind == KIND_SESSION:
+                    # The session without events, then one event JSON per line
+                    session_json, _, events = payload.partition(b"\n")
+                    sessions.append((Session.model_validate_json(session_json), events.split(b"\n") if events else []))
+                elif kind == KIND_END:
+                    complete = True
+        if not complete:
+            # Snapshots are renamed into place once complete, so this is damage, not a crash
+            raise RuntimeError(f"Snapshot {self.snapshot_path} is incomplete or corrupt.")
+        self.app_state, self.user_state = app_state, user_state
+        for session, events in sessions:
+            self.sessions.setdefault(session.app_name, {}).setdefault(session.user_id, {})[session.id] = session
+            if events:
+                self._undecoded[(session.app_name, session.user_id, session.id)] = events
+            self.stats.recovered_events += len(events)
+        self.stats.recovered_sessions += len(sessions)
+        return covered
+
+    def _decode_events(self, app_name: str, user_id: str, session_id: str):
+        """Decode the recovered events of a session, the first time it is used."""
+        events = self._undecoded.pop((app_name, user_id, session_id), None)
+        if events:
+            stored = self.sessions[app_name][user_id][session_id]
+            stored.events.extend(Event.model_validate_json(event_json) for event_json in events)
+
+    def _replay_event(self, app_name: str, user_id: str, session_id: str, event_json: bytes):
+        """Apply a journaled event as InMemorySessionService.append_event does, decoding it later."""
+        stored = self.sessions.get(app_name, {}).get(user_id, {}).get(session_id)
+        if stored is None:
+            return
+        # Plain JSON is enough for the timestamp and state; pydantic waits for the first read
+        event = json.loads(event_json)
+        self._undecoded.setdefault((app_name, user_id, session_id), []).append(event_json)
+        stored.last_update_time = event["timestamp"]
+        state_delta = (event.get("actions") or {}).get("state_delta")
+        if state_delta:
+            deltas = _session_util.extract_state_delta(state_delta)
+            if deltas["app"]:
+                self.app_state.setdefault(app_name, {}).update(deltas["app"])
+            if deltas["user"]:
+                self.user_state.setdefault(app_name, {}).setdefault(user_id, {}).update(deltas["user"])
+            if deltas["session"]:
+                stored.state.update(deltas["session"])
+
+    def _replay(self, kind: int, payload: bytes):
+        if kind == KIND_APPEND:
+            # Header line, then the event JSON
+            header, _, event_json = payload.partition(b"\n")
+            record = json.loads(header)
+            self._replay_event(record["app_name"], record["user_id"], record["session_id"], event_json)
+            self.stats.recovered_events += 1
+            return
+        record = json.loads(payload)
+        if kind == KIND_CREATE:
+            super()._create_session_impl(
+                app_name=record["app_name"], user_id=record["user_id"],
+                state=record["state"], session_id=record["session_id"],
+            )
+            self.sessions[record["app_name"]][record["user_id"]][record["session_id"]].last_update_time = record["time"]
+            self.stats.recovered_sessions += 1
+        elif kind == KIND_DELETE:
+            self._delete_session_impl(
+                app_name=record["app_name"], user_id=record["user_id"], session_id=record["session_id"]
+            )
+
+    def _recover(self):
+        started = time.perf_counter()
+        covered = self._load_snapshot()
+        self._sequence = covered
+        if os.path.exists(self.journal_path):
+            end = 0
+            with open(self.journal_path, "rb") as file:
+                for sequence, kind, payload, end in read_records(file):
+                    if sequence <= covered:
+                        continue
+                    self._replay(kind, payload)
+                    self._sequence = sequence
+                    self._since_snapshot += 1
+                    self.stats.replayed_records += 1
+            size = os.path.getsize(self.journal_path)
+            if size > end:
+                # The last write was cut short: drop it, later records must follow intact ones
+                self.stats.torn_bytes = size - end
+                os.truncate(self.journal_path, end)
+        self.stats.recovery_seconds = time.perf_counter() - started
+
+    # -- journal -----------------------------------------------------------
+
+    def _check_writable(self):
+        if self._failed is not None:
+            raise RuntimeError(
+                f"Journal {self.journal_path} failed a write ({self._failed!r}) and may miss changes held"
+                " in memory; restart the service to recover from the journal."
+            )
+
+    def _write(self, data: bytes):
+        self._file.write(data)
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    async def _journal(self, kind: int, payload: dict, body: bytes = b""):
+        """Queue a record and wait until it is written by a group commit."""
+        self._sequence += 1
+        data = json.dumps(payload).encode() + (b"\n" + body if body else b"")
+        self._pending.append(encode_record(self._sequence, kind, data))
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        await waiter
+
+    async def _flush_loop(self):
+        if self._io_lock is None:
+            self._io_lock = asyncio.Lock()
+        while self._pending:
+            if self.commit_delay:
+                await asyncio.sleep(self.commit_delay)
+            async with self._io_lock:
+                await self._flush()
+                if self._failed is None and self.snapshot_every and self._since_snapshot >= self.snapshot_every:
+                    try:
+                        await self._snapshot()
+                    except OSError:
+                        # The journal still holds everything; try again snapshot_every records later
+                        self._since_snapshot = 0
+                        self.stats.snapshot_failures += 1
+
+    async def _flush(self):
+        records, waiters = self._pending, self._waiters
+        if not records:
+            return
+        self._pending, self._waiters = [], []
+        data = b"".join(records)
+        started = time.perf_counter()
+        try:
+            self._check_writable()
+            await asyncio.to_thread(self._write, data)
+        except Exception as error:
+            # These changes are applied in memory already; a later snapshot must not persist them
+            self._failed = self._failed or error
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(error)
+            return
+        self.stats.write_seconds += time.perf_counter() - started
+        self.stats.writes += 1
+        self.stats.records += len(records)
+        self.stats.bytes_written += len(data)
+        self._since_snapshot += len(records)
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    # -- snapshots ---------------------------------------------------------
+
+    def _write_snapshot(self, records: list[bytes]):
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            for record in records:
+                file.write(record)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        # Everything in the journal is in the snapshot now
+        self._file.close()
+        with open(self.journal_path + ".tmp", "wb") as file:
+            os.fsync(file.fileno())
+        os.replace(self.journal_path + ".tmp", self.journal_path)
+        self._file = open(self.journal_path, "ab", buffering=0)
+
+    async def _snapshot(self):
+        """Snapshot the store and truncate the journal; the caller holds the io lock."""
+        started = time.perf_counter()
+        # Serialized in one go on the loop, so the snapshot matches the sequence exactly
+        covered = self._sequence
+        header = {"sequence": covered, "app_state": self.app_state, "user_state": self.user_state}
+        records = [encode_record(covered, KIND_SNAPSHOT, json.dumps(header).encode())]
+        for user_sessions in self.sessions.values():
+            for sessions in user_sessions.values():
+                for session in sessions.values():
+                    key = (session.app_name, session.user_id, session.id)
+                    events = [event.model_dump_json(exclude_none=True).encode() for event in session.events]
+                    lines = [session.model_dump_json(exclude_none=True, exclude={"events"}).encode(), *events,
+                             *self._undecoded.get(key, ())]
+                    records.append(encode_record(covered, KIND_SESSION, b"\n".join(lines)))
+        records.append(encode_record(covered, KIND_END, b""))
+        # Records queued meanwhile are covered by the snapshot too
+        pending, waiters = self._pending, self._waiters
+        self._pending, self._waiters = [], []
+        try:
+            await asyncio.to_thread(self._write_snapshot, records)
+        except Exception:
+            self._pending, self._waiters = pending + self._pending, waiters + self._waiters
+            if self._file.closed:
+                self._file = open(self.journal_path, "ab", buffering=0)
+            raise
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._since_snapshot = 0
+        self.stats.snapshots += 1
+        self.stats.snapshot_seconds += time.perf_counter() - started
+
+    async def snapshot(self):
+        """Write a snapshot now and truncate the journal."""
+        self._check_writable()
+        if self._io_lock is None:
+            self._io_lock = asyncio.Lock()
+        async with self._io_lock:
+            await self._flush()
+            self._check_writable()
+            await self._snapshot()
+
+    async def close(self):
+        """Write what is queued and close the journal."""
+        if self._flush_task is not None:
+            await self._flush_task
+        self._file.close()
+        self._lock_file.close()
+
+    # -- InMemorySessionService overrides ----------------------------------
+
+    def _get_session_impl(self, *, app_name: str, user_id: str, session_id: str, config=None) -> Optional[Session]:
+        if (app_name, user_id, session_id) in self._undecoded:
+            self._decode_events(app_name, user_id, session_id)
+        return super()._get_session_impl(app_name=app_name, user_id=user_id, session_id=session_id, config=config)
+
+    def _delete_session_impl(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        self._undecoded.pop((app_name, user_id, session_id), None)
+        super()._delete_session_impl(app_name=app_name, user_id=user_id, session_id=session_id)
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        self._check_writable()
+        session = self._create_session_impl(app_name=app_name, user_id=user_id, state=state, session_id=session_id)
+        await self._journal(KIND_CREATE, {
+            "app_name": app_name, "user_id": user_id, "session_id": session.id,
+            "state": state, "time": session.last_update_time,
+        })
+        return session
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        self._check_writable()
+        self._delete_session_impl(app_name=app_name, user_id=user_id, session_id=session_id)
+        await self._journal(KIND_DELETE, {"app_name": app_name, "user_id": user_id, "session_id": session_id})
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        self._check_writable()
+        known = session.id in self.sessions.get(session.app_name, {}).get(session.user_id, {})
+        if known:
+            # Appended after the recovered events, so those come first
+            self._decode_events(session.app_name, session.user_id, session.id)
+        event = await super().append_event(session=session, event=event)
+        if known:
+            await self._journal(
+                KIND_APPEND,
+                {"app_name": session.app_name, "user_id": session.user_id, "session_id": session.id},
+                event.model_dump_json(exclude_none=True).encode(),
+            )
+        return event
+
+
+def print_journal_stats(session_service: JournaledSessionService):
+    stats = session_service.stats
+    writes = stats.writes or 1
+    print(
+        f"   [journal] {stats.records} records in {stats.writes} writes ({stats.records / writes:.1f} per write,"
+        f" {stats.write_seconds / writes * 1000:.2f}ms each), {stats.bytes_written / 1024:.1f} KiB;"
+        f" {stats.snapshots} snapshots; recovered {stats.recovered_sessions} sessions and"
+        f" {stats.recovered_events} events in {stats.recovery_seconds * 1000:.0f}ms"
+        f" ({stats.replayed_records} journal records, {stats.torn_bytes} torn bytes dropped)"
+    )
+
+
+def _bench_event(i: int, text: str) -> Event:
+    return Event(
+        author="bench",
+        invocation_id=f"inv-{i}",
+        content=types.Content(role="model", parts=[types.Part(text=text)]),
+        actions=EventActions(state_delta={"turn": i}),
+    )
+
+
+def _percentile(values: list[float], share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+async def _append_latency(service, sessions: int, events: int, content_bytes: int) -> tuple[list[float], float]:
+    """Latencies of concurrent appends, and the wall time of all of them."""
+    text, latencies = "x" * content_bytes, []
+
+    async def one_session(index: int):
+        session = await service.create_session(app_name="bench", user_id=f"user-{index}")
+        for i in range(events):
+            started = time.perf_counter()
+            await service.append_event(session, _bench_event(i, text))
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_session(i) for i in range(sessions)))
+    return latencies, time.perf_counter() - started
+
+
+def _bench_appends(args, workdir: str):
+    print(f"\n ### Append latency ({args.sessions} concurrent sessions x {args.events} events,"
+          f" {args.content_bytes} bytes each)")
+    settings = [("InMemorySessionService", None), ("Journal, write only", False), ("Journal, fsync", True)]
+    for name, fsync in settings:
+        if fsync is None:
+            service = InMemorySessionService()
+        else:
+            service = JournaledSessionService(os.path.join(workdir, f"append-{fsync}.journal"), fsync=fsync,
+                                              snapshot_every=0)
+        # A full collection of the previous run's garbage would land in this run's p99
+        gc.collect()
+        latencies, seconds = asyncio.run(_append_latency(service, args.sessions, args.events, args.content_bytes))
+        line = (f"   - {name:24s} p50 {_percentile(latencies, 0.5) * 1000:6.2f}ms, p99 {_percentile(latencies, 0.99) * 1000:6.2f}ms,"
+                f" {len(latencies) / seconds:8.0f} appends/s")
+        if fsync is not None:
+            line += f", {service.stats.records / (service.stats.writes or 1):.1f} records per write"
+            asyncio.run(service.close())
+        print(line)
+
+
+def _decode_all(service: JournaledSessionService) -> float:
+    """Seconds to decode every recovered event, as first reads of all sessions would."""
+    started = time.perf_counter()
+    for key in list(service._undecoded):
+        service._decode_events(*key)
+    return time.perf_counter() - started
+
+
+def _bench_recovery(args, workdir: str):
+    path = os.path.join(workdir, "recovery.journal")
+    service = JournaledSessionService(path, fsync=False, snapshot_every=0)
+    asyncio.run(_append_latency(service, args.sessions, args.recovery_events // args.sessions, args.content_bytes))
+    asyncio.run(service.close())
+
+    print(f"\n ### Recovery ({service.stats.records} records, {os.path.getsize(path) / 2**20:.1f} MiB journal)")
+    for name in ("Journal replay", "From snapshot"):
+        recovered = JournaledSessionService(path)
+        stats = recovered.stats
+        # Startup leaves events as JSON; decoding them is paid when each session is first read
+        decode_seconds = _decode_all(recovered)
+        line = (f"   - {name + ':':16s} {stats.recovery_seconds:.2f}s, {stats.recovery_seconds / stats.recovered_events * 1e6:.1f}s"
+                f" per million events; decoding every session {decode_seconds:.2f}s more,"
+                f" {(stats.recovery_seconds + decode_seconds) / stats.recovered_events * 1e6:.1f}s per million in total")
+        if name == "From snapshot":
+            line += f" ({os.path.getsize(recovered.snapshot_path) / 2**20:.1f} MiB snapshot)"
+        else:
+            asyncio.run(recovered.snapshot())
+        print(line)
+        asyncio.run(recovered.close())
+
+
+async def _crash_writer(path: str, snapshot_every: int):
+    """Append until killed, printing every acknowledged event."""
+    service = JournaledSessionService(path, snapshot_every=snapshot_every)
+    session = await service.create_session(app_name="bench", user_id="crash", session_id=f"run-{os.getpid()}")
+    print(f"ACK session {session.id}", flush=True)
+
+    async def writer(index: int):
+        for i in range(sys.maxsize):
+            await service.append_event(session, _bench_event(i, f"writer {index} event {i} " * 8))
+            print(f"ACK {index} {i}", flush=True)
+
+    await asyncio.gather(*(writer(index) for index in range(4)))
+
+
+def _bench_crash(args, workdir: str):
+    path = os.path.join(workdir, "crash.journal")
+    print(f"\n ### Durability under kill -9 ({args.crash_runs} runs of {args.crash_seconds}s, 4 concurrent writers)")
+    for run in range(args.crash_runs):
+        acks_path = os.path.join(workdir, "acks.txt")
+        with open(acks_path, "w") as acks:
+            process = subprocess.Popen(
+                [sys.executable, "-m", "agents_shared.journal_sessions", "crash-writer", path,
+                 "--snapshot-every", str(args.snapshot_every)],
+                stdout=acks, stderr=subprocess.DEVNULL,
+            )
+        # Start the clock once the writer has imported everything and made its session
+        while process.poll() is None and "ACK session" not in open(acks_path).read(4096):
+            time.sleep(0.05)
+        time.sleep(args.crash_seconds)
+        process.send_signal(signal.SIGKILL)
+        process.wait()
+        with open(acks_path) as acks:
+            acked = [line.split()[1:] for line in acks if line.startswith("ACK ") and line.endswith("\n")]
+        session_id = next(ack[1] for ack in acked if ack[0] == "session")
+        acked_events = {(int(ack[0]), int(ack[1])) for ack in acked if ack[0] != "session"}
+
+        recovered = JournaledSessionService(path)
+        session = asyncio.run(recovered.get_session(app_name="bench", user_id="crash", session_id=session_id))
+        found = set()
+        for event in session.events if session else []:
+            writer, _, index = event.content.parts[0].text.split()[1:4]
+            found.add((int(writer), int(index)))
+        asyncio.run(recovered.close())
+        lost = len(acked_events - found)
+        print(f"   - Run {run + 1}: {len(acked_events)} acknowledged, {len(found)} recovered, {lost} lost,"
+              f" {recovered.stats.torn_bytes} torn bytes dropped,"
+              f" {recovered.stats.replayed_records} journal records replayed on the snapshot")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Journaled in-memory session service benchmarks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    bench = commands.add_parser("bench", help="Append latency, recovery time and kill -9 durability")
+    bench.add_argument("--sessions", type=int, default=32, help="Concurrent sessions appending")
+    bench.add_argument("--events", type=int, default=50, help="Events appended per session")
+    bench.add_argument("--content-bytes", type=int, default=512, help="Text size of every event")
+    bench.add_argument("--recovery-events", type=int, default=50000, help="Events in the recovery journal")
+    bench.add_argument("--crash-runs", type=int, default=3, help="Processes killed with SIGKILL")
+    bench.add_argument("--crash-seconds", type=float, default=2.0, help="Seconds a process appends before the kill")
+    bench.add_argument("--snapshot-every", type=int, default=2000, help="Records between snapshots of the killed process")
+    crash_writer = commands.add_parser("crash-writer", help=argparse.SUPPRESS)
+    crash_writer.add_argument("path")
+    crash_writer.add_argument("--snapshot-every", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    if args.command == "crash-writer":
+        asyncio.run(_crash_writer(args.path, args.snapshot_every))
+        return 0
+    workdir = tempfile.mkdtemp(prefix="adk_journal_bench_")
+    try:
+        _bench_appends(args, workdir)
+        _bench_recovery(args, workdir)
+        _bench_crash(args, workdir)
+    finally:
+        for name in os.listdir(workdir):
+            os.remove(os.path.join(workdir, name))
+        os.rmdir(workdir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
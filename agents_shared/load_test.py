@@ -0,0 +1,269 @@
+# Load generator and soak test for Runner plus session services
+#
+# Usage (from the repository root):
+#   python -m agents_shared.load_test d3_sessions --users 20 --turns 5 --duration 600
+#
+# Simulates concurrent virtual users against the agent of any agent folder,
+# with every model replaced by a local StandInModel. Records throughput,
+# latency percentiles, RSS over time and tracemalloc top allocators, and
+# fails (exit code 1) when memory grows linearly over the run.
+import argparse
+import asyncio
+import importlib.util
+import os
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+
+from google.adk.agents import BaseAgent
+from google.adk.apps.app import App
+from google.adk.runners import Runner
+from google.adk.sessions import BaseSessionService, InMemorySessionService
+from google.genai import types
+
+from agents_shared.stand_in_model import use_stand_in_model
+
+AGENTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_agent_folder(folder: str):
+    """Import `<folder>/agent.py` and find what to drive in it.
+
+    Returns:
+        Tuple (agent_or_app, session_service). The agent is `root_agent` when
+        the module defines one, otherwise the first App, Runner or agent found
+        at module level. The session service is the module's own one when it
+        has one, so its memory behaviour is what gets measured.
+    """
+    path = folder if folder.endswith(".py") else os.path.join(AGENTS_DIR, folder, "agent.py")
+    spec = importlib.util.spec_from_file_location(f"load_test_{os.path.basename(folder)}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    values = list(vars(module).values())
+    target = getattr(module, "root_agent", None)
+    for kind in (App, Runner, BaseAgent):
+        if target is not None:
+            break
+        target = next((value for value in values if isinstance(value, kind)), None)
+    if isinstance(target, Runner):
+        target = target.app or target.agent
+    if target is None:
+        raise ValueError(f"No agent, App or Runner found in {path}")
+
+    session_service = next(
+        (value for value in values if isinstance(value, BaseSessionService)), None
+    )
+    return target, session_service or InMemorySessionService()
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB (peak RSS where /proc is missing)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS and KB on Linux
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def linear_fit(xs: list[float], ys: list[float]) -> tuple[float, float]:
+    """Least squares slope and r² of ys against xs."""
+    if len(xs) < 3 or len(set(xs)) < 2:
+        return 0.0, 0.0
+    mean_x, mean_y = statistics.fmean(xs), statistics.fmean(ys)
+    sxx = sum((x - mean_x) ** 2 for x in xs)
+    sxy = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    syy = sum((y - mean_y) ** 2 for y in ys)
+    slope = sxy / sxx
+    r_squared = (sxy * sxy) / (sxx * syy) if syy else 0.0
+    return slope, r_squared
+
+
+async def virtual_user(runner, session_service, user_index, args, stats, deadline):
+    """One simulated user: open sessions and send turns with think time between."""
+    user_id = f"vu-{user_index}"
+    session_count = 0
+    while time.monotonic() < deadline:
+        if args.sessions_per_user and session_count >= args.sessions_per_user:
+            return
+        session = await session_service.create_session(
+            app_name=runner.app_name,
+            user_id=user_id,
+            session_id=f"{user_id}-s{session_count}",
+        )
+        session_count += 1
+        stats["sessions"] += 1
+        for turn in range(args.turns):
+            if time.monotonic() >= deadline:
+                return
+            message = types.Content(
+                role="user",
+                parts=[types.Part(text=f"Turn {turn} from {user_id}: {args.prompt}")],
+            )
+            started = time.perf_counter()
+            try:
+                async for _ in runner.run_async(
+                    user_id=user_id, session_id=session.id, new_message=message
+                ):
+                    pass
+                stats["latencies"].append(time.perf_counter() - started)
+            except Exception as e:
+                stats["errors"] += 1
+                stats["last_error"] = repr(e)
+            if args.think_time:
+                await asyncio.sleep(args.think_time)
+
+
+async def sample_memory(args, samples, allocators, started, stop):
+    """Record RSS and traced memory, and the top allocators, every interval."""
+    while not stop.is_set():
+        elapsed = time.monotonic() - started
+        traced, _ = tracemalloc.get_traced_memory()
+        samples.append((elapsed, current_rss_mb(), traced / 2**20))
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),)
+        )
+        top = snapshot.statistics("lineno")[: args.top]
+        allocators.append((elapsed, [(str(stat.traceback), stat.size, stat.count) for stat in top]))
+        if args.verbose:
+            print(f"  t={elapsed:7.1f}s rss={samples[-1][1]:8.1f}MB traced={samples[-1][2]:8.1f}MB")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=args.sample_interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+def check_memory_growth(samples, args) -> dict:
+    """Flag linear memory growth after the warm-up part of the run.
+
+    Growth counts as a leak when the traced memory fits a line well
+    (r² >= --min-r2) and the slope exceeds --max-growth-mb-per-min.
+    """
+    steady = [s for s in samples if s[0] >= args.warmup]
+    xs = [s[0] / 60 for s in steady]
+    rss_slope, rss_r2 = linear_fit(xs, [s[1] for s in steady])
+    traced_slope, traced_r2 = linear_fit(xs, [s[2] for s in steady])
+    leak = traced_r2 >= args.min_r2 and traced_slope > args.max_growth_mb_per_min
+    return {
+        "rss_mb_per_min": rss_slope,
+        "rss_r2": rss_r2,
+        "traced_mb_per_min": traced_slope,
+        "traced_r2": traced_r2,
+        "samples": len(steady),
+        "leak": leak,
+    }
+
+
+async def run_load_test(args) -> dict:
+    """Run the load test described by the parsed command line `args`."""
+    target, session_service = load_agent_folder(args.folder)
+    root = target.root_agent if isinstance(target, App) else target
+    switched = use_stand_in_model(
+        root, latency=args.model_latency, response_words=args.response_words
+    )
+    if isinstance(target, App):
+        runner = Runner(app=target, session_service=session_service)
+    else:
+        runner = Runner(agent=target, app_name=args.app_name, session_service=session_service)
+    print(f"\n ### Load test: {args.folder} ({root.name}, {switched} stand-in models)")
+    print(f"   - {args.users} users, {args.turns} turns/session, think time {args.think_time}s")
+    print(f"   - Session service: {session_service.__class__.__name__}")
+
+    tracemalloc.start(args.frames)
+    stats = {"latencies": [], "errors": 0, "sessions": 0, "last_error": None}
+    samples, allocators = [], []
+    stop = asyncio.Event()
+    started = time.monotonic()
+    deadline = started + args.duration
+    sampler = asyncio.create_task(sample_memory(args, samples, allocators, started, stop))
+    await asyncio.gather(*(
+        virtual_user(runner, session_service, i, args, stats, deadline)
+        for i in range(args.users)
+    ))
+    elapsed = time.monotonic() - started
+    stop.set()
+    await sampler
+    tracemalloc.stop()
+
+    latencies = stats["latencies"]
+    return {
+        "elapsed_seconds": elapsed,
+        "turns": len(latencies),
+        "sessions": stats["sessions"],
+        "errors": stats["errors"],
+        "last_error": stats["last_error"],
+        "turns_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            f"p{pct}": percentile(latencies, pct) * 1000 for pct in (50, 90, 95, 99)
+        },
+        "memory_samples": samples,
+        "top_allocators": allocators,
+        "growth": check_memory_growth(samples, args),
+    }
+
+
+def print_load_test_report(report: dict):
+    print(f"\n ### Results after {report['elapsed_seconds']:.1f}s")
+    print(f"   - Turns: {report['turns']} ({report['turns_per_second']:.1f}/s), sessions: {report['sessions']}, errors: {report['errors']}")
+    if report["last_error"]:
+        print(f"   - Last error: {report['last_error']}")
+    print("   - Latency: " + ", ".join(f"{k}={v:.1f}ms" for k, v in report["latency_ms"].items()))
+    if report["memory_samples"]:
+        first, last = report["memory_samples"][0], report["memory_samples"][-1]
+        print(f"   - RSS: {first[1]:.1f}MB -> {last[1]:.1f}MB, traced: {first[2]:.1f}MB -> {last[2]:.1f}MB")
+    if report["top_allocators"]:
+        print("   - Top allocators at end of run:")
+        for where, size, count in report["top_allocators"][-1][1]:
+            print(f"       {size / 1024:10.1f} KiB {count:8d} blocks  {where}")
+    growth = report["growth"]
+    print(
+        f"   - Growth: traced {growth['traced_mb_per_min']:.3f}MB/min (r²={growth['traced_r2']:.2f}),"
+        f" RSS {growth['rss_mb_per_min']:.3f}MB/min (r²={growth['rss_r2']:.2f})"
+    )
+    print("❌ Linear memory growth detected!" if growth["leak"] else "✅ No linear memory growth.")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load and soak test an agent folder.")
+    parser.add_argument("folder", help="Agent folder under agents_shared (e.g. d3_sessions) or a path to an agent.py")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent virtual users")
+    parser.add_argument("--turns", type=int, default=5, help="Turns per session")
+    parser.add_argument("--sessions-per-user", type=int, default=0, help="Stop a user after this many sessions (0 = until --duration)")
+    parser.add_argument("--think-time", type=float, default=0.1, help="Seconds between turns of one user")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to run")
+    parser.add_argument("--prompt", default="Tell me something interesting.", help="Text sent on every turn")
+    parser.add_argument("--app-name", default="load_test", help="App name when the folder has no App")
+    parser.add_argument("--model-latency", type=float, default=0.01, help="Stand-in model delay in seconds")
+    parser.add_argument("--response-words", type=int, default=40, help="Stand-in model reply length")
+    parser.add_argument("--sample-interval", type=float, default=5, help="Seconds between memory samples")
+    parser.add_argument("--warmup", type=float, default=10, help="Seconds ignored by the growth check")
+    parser.add_argument("--max-growth-mb-per-min", type=float, default=1.0, help="Allowed traced memory growth")
+    parser.add_argument("--min-r2", type=float, default=0.9, help="How linear growth must be to count as a leak")
+    parser.add_argument("--top", type=int, default=10, help="Allocators to record per sample")
+    parser.add_argument("--frames", type=int, default=1, help="tracemalloc frames per allocation")
+    parser.add_argument("--verbose", action="store_true", help="Print every memory sample")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    report = asyncio.run(run_load_test(args))
+    print_load_test_report(report)
+    return 1 if report["growth"]["leak"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+# Query-result cache in front of a memory service
+#
+# preload_memory searches memory before every model call, and load_memory is
+# asked the same questions again and again, while the memory itself only
+# changes when a session is added to it. CachedMemoryService wraps any
+# BaseMemoryService and answers repeated searches from an LRU cache:
+#   - entries are keyed on (app_name, user_id, normalized query); queries that
+#     only differ in case, spacing or surrounding punctuation share an entry
+#   - every user has a generation counter that add_session_to_memory bumps;
+#     an entry stored under an older generation is a miss, so a user's
+#     searches see their new memories at once and other users keep their cache
+#   - the cache holds at most max_entries results, least recently used first out
+#   - hits, misses, stale entries and evictions are counted
+#
+# Writes that bypass the wrapper (another process, the inner service used
+# directly) are not seen; call invalidate() after those, or set a ttl.
+#
+# Usage:
+#   memory_service = CachedMemoryService(InMemoryMemoryService())
+#   runner = Runner(..., memory_service=memory_service)
+#   print_memory_cache_stats(memory_service)
+#
+#   python -m agents_shared.memory_cache --sessions 50 --searches 1000
+# compares search time with and without the cache on an in-memory service.
+import argparse
+import asyncio
+import random
+import re
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from google.adk.memory import BaseMemoryService
+from google.adk.memory.base_memory_service import SearchMemoryResponse
+
+
+@dataclass
+class MemoryCacheStats:
+    hits: int = 0
+    misses: int = 0
+    stale: int = 0  # Misses on an entry from an older generation or past its ttl
+    evictions: int = 0
+    invalidations: int = 0  # Generation bumps
+
+
+def normalize_query(query: str) -> str:
+    """Case-folded query with runs of whitespace collapsed and outer punctuation removed."""
+    return re.sub(r"\s+", " ", query.casefold()).strip(" \t\n.,;:!?\"'")
+
+
+class CachedMemoryService(BaseMemoryService):
+    """A memory service that caches search results until the user's memory changes."""
+
+    def __init__(self, inner: BaseMemoryService, max_entries: int = 1024, ttl: Optional[float] = None):
+        """Initializes the cache.
+
+        Args:
+            inner: The memory service searched on a miss and written through
+            max_entries: Most search results kept
+            ttl: Seconds a result is trusted, None to rely on invalidation only
+        """
+        self.inner = inner
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = MemoryCacheStats()
+        # (app_name, user_id) -> generation, bumped by every write for the user
+        self._generations: dict[tuple[str, str], int] = {}
+        # (app_name, user_id, normalized query) -> (generation, stored at, response)
+        self._entries: OrderedDict[tuple, tuple[int, float, SearchMemoryResponse]] = OrderedDict()
+
+    def generation(self, app_name: str, user_id: str) -> int:
+        return self._generations.get((app_name, user_id), 0)
+
+    def invalidate(self, app_name: str, user_id: str):
+        """Drop every cached result of the user, lazily."""
+        key = (app_name, user_id)
+        self._generations[key] = self._generations.get(key, 0) + 1
+        self.stats.invalidations += 1
+
+    async def add_session_to_memory(self, session):
+        try:
+            await self.inner.add_session_to_memory(session)
+        finally:
+            # Also after a failed write, which may have stored part of the session
+            self.invalidate(session.app_name, session.user_id)
+
+    async def search_memory(self, *, app_name: str, user_id: str, query: str) -> SearchMemoryResponse:
+        key = (app_name, user_id, normalize_query(query))
+        generation = self.generation(app_name, user_id)
+        entry = self._entries.get(key)
+        if entry is not None:
+            stored_generation, stored_at, response = entry
+            if stored_generation == generation and (self.ttl is None or time.monotonic() - stored_at < self.ttl):
+                self.stats.hits += 1
+                self._entries.move_to_end(key)
+                # Callers may extend the list they get; the cached one stays as it is
+                return SearchMemoryResponse(memories=list(response.memories))
+            self.stats.stale += 1
+            del self._entries[key]
+
+        self.stats.misses += 1
+        response = await self.inner.search_memory(app_name=app_name, user_id=user_id, query=query)
+        # Stored under the generation read before the search: a write that
+        # landed meanwhile makes the entry stale instead of hiding the write
+        self._entries[key] = (generation, time.monotonic(), SearchMemoryResponse(memories=list(response.memories)))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+        return response
+
+    def hit_rate(self) -> float:
+        lookups = self.stats.hits + self.stats.misses
+        return self.stats.hits / lookups if lookups else 0.0
+
+
+def print_memory_cache_stats(memory_service: CachedMemoryService):
+    stats = memory_service.stats
+    print(
+        f"   [memory cache] {stats.hits} hits, {stats.misses} misses ({memory_service.hit_rate():.0%} hit rate),"
+        f" {stats.stale} stale, {stats.evictions} evicted; {len(memory_service._entries)} cached,"
+        f" {stats.invalidations} invalidations"
+    )
+
+
+async def _fill(memory_service: BaseMemoryService, sessions: int, words: list[str]):
+    from google.adk.events import Event
+    from google.adk.sessions import Session
+    from google.genai import types
+
+    for i in range(sessions):
+        events = [
+            Event(
+                author="user" if turn % 2 == 0 else "MemoryDemoAgent",
+                content=types.Content(
+                    role="user" if turn % 2 == 0 else "model",
+                    parts=[types.Part(text=" ".join(random.choices(words, k=30)))],
+                ),
+            )
+            for turn in range(10)
+        ]
+        await memory_service.add_session_to_memory(
+            Session(id=f"history-{i}", app_name="MemoryDemoApp", user_id="demo_user", events=events)
+        )
+
+
+async def _drive(memory_service: BaseMemoryService, queries: list[str], searches: int, write_every: int, words):
+    started = time.perf_counter()
+    for i in range(searches):
+        if write_every and i and i % write_every == 0:
+            # A turn finished and was saved, as the auto-save callback does
+            await _fill(memory_service, 1, words)
+        await memory_service.search_memory(app_name="MemoryDemoApp", user_id="demo_user", query=random.choice(queries))
+    return time.perf_counter() - started
+
+
+async def run_bench(args):
+    from google.adk.memory import InMemoryMemoryService
+
+    random.seed(7)
+    # Letters only: the in-memory service matches on alphabetic words
+    words = ["".join(random.choices("abcdefghijklmnopqrstuvwxyz", k=6)) for _ in range(500)]
+    queries = [f"What did I say about {random.choice(words)}?" for _ in range(args.queries)]
+
+    plain = InMemoryMemoryService()
+    await _fill(plain, args.sessions, words)
+    random.seed(11)
+    uncached = await _drive(plain, queries, args.searches, args.write_every, words)
+
+    cached = CachedMemoryService(InMemoryMemoryService())
+    random.seed(7)
+    await _fill(cached.inner, args.sessions, words)
+    random.seed(11)
+    seconds = await _drive(cached, queries, args.searches, args.write_every, words)
+
+    print(f"\n ### Memory search ({args.sessions} sessions, {args.searches} searches over {args.queries} queries,"
+          f" a write every {args.write_every})")
+    print(f"   - Uncached: {uncached / args.searches * 1000:.2f}ms per search")
+    print(f"   - Cached:   {seconds / args.searches * 1000:.2f}ms per search")
+    print_memory_cache_stats(cached)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Memory search time with and without the query cache.")
+    parser.add_argument("--sessions", type=int, default=50, help="Sessions already in memory")
+    parser.add_argument("--searches", type=int, default=1000, help="Searches to run")
+    parser.add_argument("--queries", type=int, default=50, help="Distinct queries the searches pick from")
+    parser.add_argument("--write-every", type=int, default=100, help="Searches between two session writes, 0 for none")
+    args = parser.parse_args(argv)
+    asyncio.run(run_bench(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+# Near-duplicate suppression when sessions are added to memory
+#
+# Saved sessions repeat themselves: greetings, questions asked again in other
+# words, summaries that overlap the turns they summarize. Every copy is one
+# more memory entry to scan on search and one more line preloaded into the
+# prompt. DedupMemoryService wraps a memory service and drops events whose
+# text is a near-duplicate of something the user's memory already holds:
+#   - every text event gets a MinHash signature of its word 3-grams (the
+#     whole text for shorter ones), so signature agreement estimates the
+#     Jaccard similarity of two texts
+#   - an LSH index (signature bands -> events) per (app, user) finds
+#     candidate duplicates without comparing against every stored event;
+#     candidates by the same author at or above `threshold` are duplicates
+#   - the index grows with each ingestion and remembers which events it kept
+#     and dropped, so re-saving a session (the auto-save callback saves the
+#     whole session after every turn) keeps its earlier events as they were
+#   - events seen, dropped, text bytes saved and ingestion time per event are
+#     counted
+#
+# Usage:
+#   memory_service = DedupMemoryService(InMemoryMemoryService(), threshold=0.8)
+#   print_dedup_stats(memory_service)
+#
+#   python -m agents_shared.memory_dedup --sessions 40
+# compares stored entries and search time with and without deduplication.
+import argparse
+import asyncio
+import hashlib
+import random
+import re
+import sys
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from google.adk.memory import BaseMemoryService
+from google.adk.memory.base_memory_service import SearchMemoryResponse
+
+from agents_shared.memory_preload import is_memory_block
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+@dataclass
+class DedupStats:
+    events_seen: int = 0  # New text events offered to memory
+    events_dropped: int = 0
+    bytes_seen: int = 0
+    bytes_dropped: int = 0
+    ingest_seconds: float = 0.0  # Time spent signing and indexing
+
+
+def shingles(text: str, size: int = 3) -> set[str]:
+    """Word n-grams of a text, lower-cased; the whole text when it is shorter."""
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """MinHash signatures over num_perm universal hash permutations."""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+
+    def signature(self, items: set[str]) -> tuple[int, ...]:
+        hashes = [int.from_bytes(hashlib.blake2b(item.encode(), digest_size=8).digest(), "little") for item in items]
+        if not hashes:
+            return (_MAX_HASH,) * self.num_perm
+        return tuple(min(((a * h + b) % _PRIME) & _MAX_HASH for h in hashes) for a, b in self._perms)
+
+
+def similarity(first: tuple[int, ...], second: tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of the sets behind two signatures."""
+    return sum(1 for x, y in zip(first, second) if x == y) / len(first)
+
+
+def lsh_bands(num_perm: int, threshold: float) -> tuple[int, int]:
+    """(bands, rows) with bands * rows <= num_perm whose S-curve turns closest to threshold."""
+    options = [(bands, num_perm // bands) for bands in range(1, num_perm + 1)]
+    return min(options, key=lambda option: abs((1 / option[0]) ** (1 / option[1]) - threshold))
+
+
+class _UserIndex:
+    """LSH index of the events kept in one user's memory."""
+
+    def __init__(self, bands: int, rows: int):
+        self.bands = bands
+        self.rows = rows
+        self.buckets: dict[tuple, list[str]] = {}
+        self.entries: dict[str, tuple[str, tuple[int, ...]]] = {}  # Event id -> (author, signature)
+        self.dropped: set[str] = set()  # Event ids dropped as near-duplicates
+
+    def _keys(self, signature: tuple[int, ...]):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows : (band + 1) * self.rows]
+
+    def find(self, author: str, signature: tuple[int, ...], threshold: float) -> Optional[str]:
+        checked = set()
+        for key in self._keys(signature):
+            for event_id in self.buckets.get(key, ()):
+                if event_id in checked:
+                    continue
+                checked.add(event_id)
+                other_author, other = self.entries[event_id]
+                if other_author == author and similarity(signature, other) >= threshold:
+                    return event_id
+        return None
+
+    def add(self, event_id: str, author: str, signature: tuple[int, ...]):
+        self.entries[event_id] = (author, signature)
+        for key in self._keys(signature):
+            self.buckets.setdefault(key, []).append(event_id)
+
+
+def _event_text(event) -> str:
+    if not event.content or not event.content.parts:
+        return ""
+    # Memories IncrementalMemoryPreload added to a message are not the user's words
+    return " ".join(part.text for part in event.content.parts if part.text and not is_memory_block(part))
+
+
+class DedupMemoryService(BaseMemoryService):
+    """A memory service that leaves out near-duplicate events when sessions are added."""
+
+    def __init__(self, inner: BaseMemoryService, threshold: float = 0.8, num_perm: int = 64):
+        """Initializes the service.
+
+        Args:
+            inner: The memory service that stores what is kept
+            threshold: Estimated Jaccard similarity from which two texts are duplicates
+            num_perm: MinHash permutations; more is more precise and slower
+        """
+        self.inner = inner
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm)
+        self.bands, self.rows = lsh_bands(num_perm, threshold)
+        self.stats = DedupStats()
+        self._indexes: dict[tuple[str, str], _UserIndex] = {}
+
+    def _index(self, app_name: str, user_id: str) -> _UserIndex:
+        key = (app_name, user_id)
+        if key not in self._indexes:
+            self._indexes[key] = _UserIndex(self.bands, self.rows)
+        return self._indexes[key]
+
+    def filter_events(self, session) -> list:
+        """The session's events without the near-duplicates of the user's memory."""
+        index = self._index(session.app_name, session.user_id)
+        stats = self.stats
+        started = time.perf_counter()
+        kept = []
+        for event in session.events:
+            text = _event_text(event)
+            if not text or event.id in index.entries:
+                kept.append(event)
+                continue
+            if event.id in index.dropped:
+                continue
+            stats.events_seen += 1
+            stats.bytes_seen += len(text.encode())
+            signature = self.hasher.signature(shingles(text))
+            if index.find(event.author, signature, self.threshold) is not None:
+                index.dropped.add(event.id)
+                stats.events_dropped += 1
+                stats.bytes_dropped += len(text.encode())
+                continue
+            index.add(event.id, event.author, signature)
+            kept.append(event)
+        stats.ingest_seconds += time.perf_counter() - started
+        return kept
+
+    async def add_session_to_memory(self, session):
+        events = self.filter_events(session)
+        await self.inner.add_session_to_memory(session.model_copy(update={"events": events}))
+
+    async def search_memory(self, *, app_name: str, user_id: str, query: str) -> SearchMemoryResponse:
+        return await self.inner.search_memory(app_name=app_name, user_id=user_id, query=query)
+
+
+def print_dedup_stats(memory_service: DedupMemoryService):
+    stats = memory_service.stats
+    seen = stats.events_seen or 1
+    print(
+        f"   [memory dedup] {stats.events_dropped}/{stats.events_seen} events dropped"
+        f" ({stats.bytes_dropped / 1024:.1f} of {stats.bytes_seen / 1024:.1f} KiB saved),"
+        f" {stats.ingest_seconds / seen * 1e6:.0f}us per event"
+        f" (threshold {memory_service.threshold}, {memory_service.bands} bands x {memory_service.rows} rows)"
+    )
+
+
+def _chatty_session(index: int, rng: random.Random):
+    """A session with the repetition of real chats: greetings, re-asked questions, recaps."""
+    from google.adk.events import Event
+    from google.adk.sessions import Session
+    from google.genai import types
+
+    facts = ["my favorite color is blue-green", "my birthday is on March 15th",
+             "I gifted a new toy to my nephew", "I am planning a trip to Lisbon with my sister",
+             f"I started a new pottery class number {index}"]
+    turns = []
+    for turn in range(8):
+        kind = rng.random()
+        if turn == 0 or kind < 0.2:
+            text = rng.choice(["Hi there!", "Hello!", "hi", "Hey, hello there", "Good morning!"])
+        elif kind < 0.6:
+            fact = rng.choice(facts)
+            text = rng.choice(["Remember that {}.", "Just so you know, {}.", "Can you remember that {}?"]).format(fact)
+        else:
+            fact = rng.choice(facts)
+            text = f"Quick recap of what we discussed: {fact}, and we talked about it for a while."
+        turns.append(Event(author="user", content=types.Content(role="user", parts=[types.Part(text=text)])))
+        turns.append(Event(
+            author="MemoryDemoAgent",
+            content=types.Content(role="model", parts=[types.Part(text=f"Got it, I will remember that. {text}")]),
+        ))
+    return Session(id=f"chat-{index}", app_name="MemoryDemoApp", user_id="demo_user", events=turns)
+
+
+async def run_bench(args):
+    from google.adk.memory import InMemoryMemoryService
+
+    plain, deduped = InMemoryMemoryService(), DedupMemoryService(InMemoryMemoryService(), threshold=args.threshold)
+    rng = random.Random(3)
+    for i in range(args.sessions):
+        session = _chatty_session(i, rng)
+        await plain.add_session_to_memory(session)
+        await deduped.add_session_to_memory(session)
+        # Saved again after the last turn, as the auto-save callback does
+        await deduped.add_session_to_memory(session)
+
+    queries = ["What is my favorite color?", "When is my birthday?", "Where am I travelling?", "hello"]
+    print(f"\n ### Memory ingestion ({args.sessions} sessions of 16 events)")
+    for name, service in (("Plain", plain), ("Deduplicated", deduped)):
+        stored = sum(len(events) for sessions in (service.inner if service is deduped else service)._session_events.values()
+                     for events in sessions.values())
+        started = time.perf_counter()
+        found = 0
+        for _ in range(args.searches):
+            for query in queries:
+                found += len((await service.search_memory(app_name="MemoryDemoApp", user_id="demo_user", query=query)).memories)
+        seconds = (time.perf_counter() - started) / (args.searches * len(queries))
+        print(f"   - {name}: {stored} entries stored, {seconds * 1000:.2f}ms and"
+              f" {found / (args.searches * len(queries)):.0f} entries per search")
+    print_dedup_stats(deduped)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Memory size and search time with near-duplicate suppression.")
+    parser.add_argument("--sessions", type=int, default=40, help="Sessions added to memory")
+    parser.add_argument("--searches", type=int, default=20, help="Rounds of searches timed")
+    parser.add_argument("--threshold", type=float, default=0.8, help="Similarity from which events are duplicates")
+    args = parser.parse_args(argv)
+    asyncio.run(run_bench(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+# Incremental memory preload: give the model each memory once per session
+#
+# preload_memory searches memory on every model call and puts the results in
+# the system instruction, which is rebuilt for every request. With the
+# auto-save callback of d3_memory_2 the same memories come back turn after turn,
+# including the session's own earlier turns, which the model already sees in
+# the conversation. So the prompt keeps growing by memories it has already read.
+#
+# IncrementalMemoryPreload is a plugin that runs once per user message instead.
+# It adds the memories to the message itself, so they become part of the
+# session history and stay visible to the model on later turns.
+#   - entries that are already in the session (delivered on an earlier turn,
+#     or turns of this session saved by auto-save) are left out, so later
+#     turns only add new entries, or entries that did not fit the budget then
+#     and rank higher now
+#   - entries are ranked by the words they share with the message, then in
+#     the order the memory service returned them
+#   - what is added per message is capped at max_tokens (about 4 characters
+#     per token)
+#
+# What was delivered is read back from the session history, so it survives
+# restarts and works with any session service.
+#
+# Usage:
+#   app = App(name=APP_NAME, root_agent=agent, plugins=[IncrementalMemoryPreload(max_tokens=400)])
+#   runner = Runner(app=app, session_service=..., memory_service=...)
+#
+#   python -m agents_shared.memory_preload --turns 8
+# compares prompt tokens per turn with preload_memory on a stand-in model.
+import argparse
+import asyncio
+import re
+import sys
+from dataclasses import dataclass
+from typing import Optional
+
+from google.adk.plugins.base_plugin import BasePlugin
+from google.genai import types
+
+# Same wording as preload_memory, so the model reads the memories the same way
+MEMORY_PREAMBLE = (
+    "The following content is from your previous conversations with the user.\n"
+    "They may be useful for answering the user's current query.\n"
+    "<PAST_CONVERSATIONS>\n"
+)
+MEMORY_EPILOGUE = "</PAST_CONVERSATIONS>"
+
+
+@dataclass
+class PreloadStats:
+    messages: int = 0
+    found: int = 0  # Entries returned by the memory searches
+    injected: int = 0
+    already_seen: int = 0  # Entries left out because the session already has them
+    over_budget: int = 0  # Entries left out because max_tokens was reached
+    tokens_injected: int = 0
+
+
+def _words(text: str) -> set[str]:
+    return {word.lower() for word in re.findall(r"[A-Za-z]+", text)}
+
+
+def is_memory_block(part: types.Part) -> bool:
+    """Whether a part is a memory block added by IncrementalMemoryPreload."""
+    return bool(part.text) and part.text.startswith(MEMORY_PREAMBLE)
+
+
+def _plain_text(content: Optional[types.Content]) -> str:
+    """Text of a content without memory blocks, on one line."""
+    if not content or not content.parts:
+        return ""
+    text = " ".join(part.text for part in content.parts if part.text and not is_memory_block(part))
+    return " ".join(text.split())
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+class IncrementalMemoryPreload(BasePlugin):
+    """Adds the memories relevant to a user message to it, skipping those the session already has."""
+
+    def __init__(self, max_tokens: int = 400, name: str = "incremental_memory_preload"):
+        """Initializes the plugin.
+
+        Args:
+            max_tokens: Most memory tokens added to one user message
+            name: Plugin name
+        """
+        super().__init__(name=name)
+        self.max_tokens = max_tokens
+        self.stats = PreloadStats()
+
+    def _seen_lines(self, session) -> set[str]:
+        # "author: text" lines the model gets from the history: the events
+        # themselves and the memory blocks added to earlier messages
+        seen = set()
+        for event in session.events:
+            if not event.content or not event.content.parts:
+                continue
+            if text := _plain_text(event.content):
+                seen.add(f"{event.author}: {text}")
+            for part in event.content.parts:
+                if is_memory_block(part):
+                    seen.update(line.strip() for line in part.text.splitlines())
+        return seen
+
+    async def on_user_message_callback(self, *, invocation_context, user_message: types.Content):
+        memory_service = invocation_context.memory_service
+        query = _plain_text(user_message)
+        if memory_service is None or not query:
+            return None
+        self.stats.messages += 1
+        response = await memory_service.search_memory(
+            app_name=invocation_context.app_name, user_id=invocation_context.user_id, query=query
+        )
+        self.stats.found += len(response.memories)
+
+        query_words = _words(query)
+        seen = self._seen_lines(invocation_context.session)
+        candidates = {}
+        for index, memory in enumerate(response.memories):
+            text = _plain_text(memory.content)
+            if not text:
+                continue
+            line = f"{memory.author}: {text}" if memory.author else text
+            if line in seen:
+                self.stats.already_seen += 1
+                continue
+            if line not in candidates:
+                candidates[line] = (-len(query_words & _words(text)), index, memory.timestamp)
+
+        lines, budget = [], self.max_tokens
+        for line, (_, _, timestamp) in sorted(candidates.items(), key=lambda item: item[1][:2]):
+            entry = f"Time: {timestamp}\n{line}" if timestamp else line
+            tokens = _estimate_tokens(entry)
+            if tokens > budget:
+                # A shorter entry further down may still fit
+                self.stats.over_budget += 1
+                continue
+            budget -= tokens
+            lines.append(entry)
+        if not lines:
+            return None
+
+        self.stats.injected += len(lines)
+        self.stats.tokens_injected += self.max_tokens - budget
+        block = MEMORY_PREAMBLE + "\n".join(lines) + "\n" + MEMORY_EPILOGUE
+        # The user's own text stays first: preload_memory and load_memory read parts[0]
+        return types.Content(role=user_message.role or "user", parts=[*user_message.parts, types.Part(text=block)])
+
+
+def print_preload_stats(plugin: IncrementalMemoryPreload):
+    stats = plugin.stats
+    print(
+        f"   [memory preload] {stats.messages} messages, {stats.found} entries found, {stats.injected} injected"
+        f" (~{stats.tokens_injected} tokens), {stats.already_seen} already in the session,"
+        f" {stats.over_budget} over budget"
+    )
+
+
+async def _run_turns(agent, plugins: list, queries: list[str]) -> list[int]:
+    """Prompt tokens of the first model call of every turn of one session."""
+    from google.adk.apps import App
+    from google.adk.memory import InMemoryMemoryService
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+
+    from agents_shared.model_router import estimate_prompt_tokens
+
+    memory_service = InMemoryMemoryService()
+    session_service = InMemorySessionService()
+    runner = Runner(
+        app=App(name="MemoryDemoApp", root_agent=agent, plugins=plugins),
+        session_service=session_service,
+        memory_service=memory_service,
+    )
+    # Earlier conversations the memory already holds
+    for i, fact in enumerate(["My nephew turned one and I gifted him a new toy.",
+                              "My favorite color is blue-green.",
+                              "My birthday is on March 15th.",
+                              "I am planning a trip to Lisbon with my sister."]):
+        session = await session_service.create_session(app_name="MemoryDemoApp", user_id="demo_user")
+        async for _ in runner.run_async(user_id="demo_user", session_id=session.id,
+                                        new_message=types.UserContent(parts=[types.Part(text=fact)])):
+            pass
+
+    tokens = []
+
+    def measure(callback_context, llm_request):
+        if len(tokens) < turn + 1:
+            tokens.append(estimate_prompt_tokens(llm_request))
+
+    agent.before_model_callback = measure
+    session = await session_service.create_session(app_name="MemoryDemoApp", user_id="demo_user")
+    for turn, query in enumerate(queries):
+        async for _ in runner.run_async(user_id="demo_user", session_id=session.id,
+                                        new_message=types.UserContent(parts=[types.Part(text=query)])):
+            pass
+    return tokens
+
+
+async def run_bench(args):
+    from google.adk.agents import LlmAgent
+    from google.adk.tools import preload_memory
+
+    from agents_shared.stand_in_model import StandInModel
+
+    async def auto_save_to_memory(callback_context):
+        await callback_context._invocation_context.memory_service.add_session_to_memory(
+            callback_context._invocation_context.session
+        )
+
+    def agent(tools):
+        return LlmAgent(
+            name="AutoMemoryAgent", model=StandInModel(), instruction="Answer user questions.",
+            tools=tools, after_agent_callback=auto_save_to_memory,
+        )
+
+    topics = ["my nephew and the toy I gifted him", "my favorite color", "my birthday",
+              "my trip to Lisbon with my sister"]
+    queries = [f"Remind me about {topics[i % len(topics)]}, please." for i in range(args.turns)]
+    plugin = IncrementalMemoryPreload(max_tokens=args.max_tokens)
+    plain = await _run_turns(agent([preload_memory]), [], queries)
+    incremental = await _run_turns(agent([]), [plugin], queries)
+
+    print(f"\n ### Prompt tokens per turn ({args.turns} turns, auto-save after every turn, stand-in model)")
+    print(f"   - preload_memory:           {' '.join(f'{t:5d}' for t in plain)}  total {sum(plain)}")
+    print(f"   - IncrementalMemoryPreload: {' '.join(f'{t:5d}' for t in incremental)}  total {sum(incremental)}")
+    print_preload_stats(plugin)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Prompt tokens with preload_memory and the incremental preload.")
+    parser.add_argument("--turns", type=int, default=8, help="Turns of the measured session")
+    parser.add_argument("--max-tokens", type=int, default=400, help="Memory tokens added per message")
+    args = parser.parse_args(argv)
+    asyncio.run(run_bench(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
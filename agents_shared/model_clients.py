@@ -0,0 +1,387 @@
+# Process-wide registry of Gemini API clients over one pooled HTTP client
+#
+# Every Gemini(...) instance builds its own genai Client, and with it its own
+# HTTP connection pools and SSL context; an agent given a model name string
+# even gets a fresh Gemini, and so a fresh client, on every call. PooledGemini
+# takes its client from ModelClientRegistry instead:
+#   - clients are deduplicated by their HTTP options (headers, retry options,
+#     API version...), so agents with the same configuration share one
+#   - all clients send their requests through one httpx client with tuned
+#     keep-alive limits, over HTTP/2 when the `h2` package is installed
+#     (httpx[http2] in requirements.txt; print_pool_stats says when it falls
+#     back to HTTP/1.1), so the process keeps a few warm connections instead
+#     of one cold pool per agent
+#   - the shared pool reports requests in flight, peak concurrency, requests
+#     that found every connection busy (saturation) and connections opened
+#
+# HTTP connections belong to the event loop that opened them, so the registry
+# keeps one pool per running loop (one per process in the usual asyncio.run
+# program), closed by `await model_clients.aclose()` before the loop ends.
+# Clients asked for outside an event loop only share the synchronous pool,
+# and stats() outside a loop reports the totals of every pool so far.
+#
+# Usage:
+#   root_agent = Agent(model=PooledGemini(model="gemini-2.5-flash-lite"), ...)
+#   run_with_model_clients(main())  # asyncio.run(main()), then closes the pool
+#
+#   register_pooled_gemini()
+# resolves `model="gemini-..."` strings to PooledGemini too; it changes
+# ADK's model registry for the whole process, so call it in the program's
+# entry point, not in a module other programs import.
+#
+#   python -m agents_shared.model_clients --agents 30 --calls 300
+# counts the connections a local fake Gemini endpoint sees with and without
+# the shared pool.
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Any, Awaitable, Optional
+
+import httpx
+from google.adk.models.google_llm import Gemini
+from google.adk.models.registry import LLMRegistry
+from google.genai import Client, types
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Enough connections for a busy process, kept open between agent turns
+POOL_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=120)
+# Model calls can take a while; only connecting should fail fast
+POOL_TIMEOUT = httpx.Timeout(connect=10.0, read=600.0, write=60.0, pool=600.0)
+
+
+@dataclass
+class PoolStats:
+    requests: int = 0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    saturated: int = 0  # Requests started while every connection was busy
+    connections_opened: int = 0
+    failed: int = 0  # Requests that ended in a transport error
+
+
+class _CountedStream(httpx.AsyncByteStream):
+    """Response body that marks its request finished once it is closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, done):
+        self._stream = stream
+        self._done = done
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._done()
+
+
+class MeteredTransport(httpx.AsyncBaseTransport):
+    """An httpx connection pool that counts its load."""
+
+    def __init__(self, limits: httpx.Limits = POOL_LIMITS, http2: bool = HTTP2_AVAILABLE):
+        self.limits = limits
+        self.http2 = http2
+        self.stats = PoolStats()
+        self._transport = httpx.AsyncHTTPTransport(limits=limits, http2=http2)
+
+    def _capacity(self) -> int:
+        # One HTTP/2 connection carries many requests at once
+        streams = 100 if self.http2 else 1
+        return (self.limits.max_connections or 1) * streams
+
+    async def _trace(self, name: str, info: dict):
+        if name == "connection.connect_tcp.complete":
+            self.stats.connections_opened += 1
+
+    def _finished(self):
+        self.stats.in_flight -= 1
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        stats = self.stats
+        stats.requests += 1
+        if stats.in_flight >= self._capacity():
+            stats.saturated += 1
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        request.extensions.setdefault("trace", self._trace)
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            stats.failed += 1
+            self._finished()
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_CountedStream(response.stream, self._finished),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class ModelClientRegistry:
+    """genai Clients shared by configuration, over one HTTP pool per event loop."""
+
+    def __init__(self, limits: httpx.Limits = POOL_LIMITS, http2: bool = HTTP2_AVAILABLE):
+        self.limits = limits
+        self.http2 = http2
+        self._lock = threading.Lock()
+        # Event loop -> {"transport", "http_client", "clients": {options key: Client}}
+        self._pools: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        # Clients made outside an event loop, on the synchronous pool only
+        self._sync_clients: dict[str, Client] = {}
+        self._sync_http_client: Optional[httpx.Client] = None
+        # Stats of every pool made, kept after their loop is gone
+        self._pool_stats: list[PoolStats] = []
+        self._options_keys: set[str] = set()
+
+    def _pool(self) -> Optional[dict]:
+        """The pool of the running event loop, None outside one."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        pool = self._pools.get(loop)
+        if pool is None:
+            transport = MeteredTransport(self.limits, self.http2)
+            self._pool_stats.append(transport.stats)
+            pool = {
+                "transport": transport,
+                "http_client": httpx.AsyncClient(transport=transport, timeout=POOL_TIMEOUT),
+                "clients": {},
+            }
+            self._pools[loop] = pool
+        return pool
+
+    def _sync_client(self) -> httpx.Client:
+        # Only used by synchronous genai calls, which ADK agents do not make
+        if self._sync_http_client is None:
+            self._sync_http_client = httpx.Client(limits=self.limits, timeout=POOL_TIMEOUT)
+        return self._sync_http_client
+
+    def client(self, http_options: types.HttpOptions, options_key: Optional[str] = None) -> Client:
+        """The shared client for these HTTP options, created on first use.
+
+        Outside an event loop the client gets the shared synchronous pool
+        only; genai then makes its own async pool if it is used in a loop.
+
+        Args:
+            http_options: Options without httpx clients of their own
+            options_key: Precomputed dedup key of http_options
+        """
+        if options_key is None:
+            options_key = options_cache_key(http_options)
+        with self._lock:
+            self._options_keys.add(options_key)
+            pool = self._pool()
+            clients = pool["clients"] if pool is not None else self._sync_clients
+            client = clients.get(options_key)
+            if client is None:
+                update = {"httpx_client": self._sync_client()}
+                if pool is not None:
+                    update["httpx_async_client"] = pool["http_client"]
+                client = Client(http_options=http_options.model_copy(update=update))
+                clients[options_key] = client
+            return client
+
+    async def aclose(self):
+        """Close the HTTP pool of the running event loop.
+
+        Call it before the loop ends; clients asked for afterwards get a new pool.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            pool = self._pools.pop(loop, None)
+        if pool is not None:
+            await pool["http_client"].aclose()
+
+    def stats(self) -> dict:
+        """Load and connections opened of the pool of the running event loop.
+
+        Outside an event loop: the totals of every pool made so far.
+        """
+        with self._lock:
+            pool = self._pool()
+        if pool is not None:
+            transport = pool["transport"]
+            return {
+                "clients": len(pool["clients"]),
+                "http2": transport.http2,
+                "max_connections": self.limits.max_connections,
+                **vars(transport.stats),
+            }
+        totals = PoolStats()
+        for stats in self._pool_stats:
+            totals.requests += stats.requests
+            totals.in_flight += stats.in_flight
+            totals.peak_in_flight = max(totals.peak_in_flight, stats.peak_in_flight)
+            totals.saturated += stats.saturated
+            totals.connections_opened += stats.connections_opened
+            totals.failed += stats.failed
+        return {
+            "clients": len(self._options_keys),
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            **vars(totals),
+        }
+
+
+def options_cache_key(http_options: types.HttpOptions) -> str:
+    # The API key and project come from the environment when the client is made
+    environment = {name: os.environ.get(name) for name in (
+        "GOOGLE_API_KEY", "GEMINI_API_KEY", "GOOGLE_GENAI_USE_VERTEXAI", "GOOGLE_CLOUD_PROJECT",
+        "GOOGLE_CLOUD_LOCATION", "GOOGLE_GEMINI_BASE_URL",
+    )}
+    return json.dumps([http_options.model_dump(mode="json", exclude_none=True), environment], sort_keys=True)
+
+
+model_clients = ModelClientRegistry()
+
+
+class PooledGemini(Gemini):
+    """Gemini whose API client comes from the process-wide registry."""
+
+    @cached_property
+    def _http_options(self) -> types.HttpOptions:
+        return types.HttpOptions(headers=self._tracking_headers, retry_options=self.retry_options)
+
+    @cached_property
+    def _options_key(self) -> str:
+        return options_cache_key(self._http_options)
+
+    @property
+    def api_client(self) -> Client:
+        return model_clients.client(self._http_options, self._options_key)
+
+
+def register_pooled_gemini():
+    """Resolve gemini-* model name strings to PooledGemini."""
+    LLMRegistry.register(PooledGemini)
+    LLMRegistry.resolve.cache_clear()
+
+
+def run_with_model_clients(main: Awaitable) -> Any:
+    """asyncio.run(main), closing the loop's shared HTTP pool before the loop ends."""
+
+    async def run_and_close():
+        try:
+            return await main
+        finally:
+            await model_clients.aclose()
+
+    return asyncio.run(run_and_close())
+
+
+def print_pool_stats():
+    stats = model_clients.stats()
+    print(
+        f"   [model clients] {stats['clients']} clients, {stats['connections_opened']} connections opened;"
+        f" {stats['requests']} requests, peak {stats['peak_in_flight']} in flight,"
+        f" {stats['saturated']} saturated, {'HTTP/2' if stats['http2'] else 'HTTP/1.1'}"
+        f"{'' if HTTP2_AVAILABLE else ' (h2 is not installed: pip install httpx[http2])'}"
+    )
+
+
+def _start_fake_endpoint() -> tuple[str, dict]:
+    """A local HTTP/1.1 server answering generateContent like the Gemini API."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    counts = {"connections": 0, "requests": 0}
+    body = json.dumps({
+        "candidates": [{"content": {"role": "model", "parts": [{"text": "OK"}]}, "finishReason": "STOP"}],
+        "usageMetadata": {"promptTokenCount": 5, "candidatesTokenCount": 1},
+    }).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            counts["connections"] += 1
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            counts["requests"] += 1
+            time.sleep(0.005)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}", counts
+
+
+async def _drive(models: list[Gemini], calls: int, concurrency: int) -> float:
+    from google.adk.models.llm_request import LlmRequest
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index: int):
+        model = models[index % len(models)]
+        request = LlmRequest(
+            model=model.model, contents=[types.Content(role="user", parts=[types.Part(text="Hi")])]
+        )
+        async with semaphore:
+            async for _ in model.generate_content_async(request):
+                pass
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    return time.perf_counter() - started
+
+
+async def run_bench(args):
+    base_url, counts = _start_fake_endpoint()
+    os.environ["GOOGLE_GEMINI_BASE_URL"] = base_url
+    os.environ.setdefault("GOOGLE_API_KEY", "fake-key-for-the-local-endpoint")
+    os.environ.pop("GOOGLE_GENAI_USE_VERTEXAI", None)
+    retry = types.HttpRetryOptions(attempts=2)
+
+    for name, model_class in (("Per-agent clients", Gemini), ("Shared pool", PooledGemini)):
+        counts.update(connections=0, requests=0)
+        models = [model_class(model="gemini-2.5-flash-lite", retry_options=retry) for _ in range(args.agents)]
+        seconds = await _drive(models, args.calls, args.concurrency)
+        print(
+            f"   - {name}: {counts['requests']} requests over {counts['connections']} connections"
+            f" in {seconds:.2f}s ({args.calls / seconds:.0f} calls/s)"
+        )
+    print_pool_stats()
+    await model_clients.aclose()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Connections used by per-agent and shared model clients.")
+    parser.add_argument("--agents", type=int, default=30, help="Gemini instances (agents)")
+    parser.add_argument("--calls", type=int, default=300, help="Model calls, spread over the agents")
+    parser.add_argument("--concurrency", type=int, default=10, help="Calls in flight")
+    args = parser.parse_args(argv)
+    asyncio.run(run_bench(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
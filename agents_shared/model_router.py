@@ -0,0 +1,386 @@
+# Per-call model routing by prompt size, agent, tools and observed latency
+#
+# Every agent folder pins one model, so a one-word "APPROVED" check costs the
+# same model as a 200-word synthesis. RouterModel is a BaseLlm that holds
+# several model tiers and picks one per call:
+#   - RouteRules are checked in order; the first one whose conditions hold
+#     (agent name, estimated prompt tokens, tools present, the tier's observed
+#     latency) picks the tier, otherwise the default tier answers
+#   - every tier can name a fallback tier; a call refused as throttled
+#     (429 RESOURCE_EXHAUSTED, 503 UNAVAILABLE) moves down the chain, and the
+#     throttled tier is skipped for `cooldown` seconds
+#   - latency, tokens and cost are recorded per tier, routing decisions per
+#     agent and tier
+#
+# Usage:
+#   router = default_router()
+#   use_model_router(root_agent, router)  # each LlmAgent gets router.for_agent(name)
+#   ...
+#   print_router_report(router)
+#
+#   python -m agents_shared.model_router d1_parallel_agent --runs 5
+# runs an agent folder with stand-in tiers and prints the routing report.
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import AsyncGenerator, Optional
+
+from google.adk.agents import LlmAgent
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.tools import AgentTool
+from google.genai import types
+from pydantic import ConfigDict, model_validator
+
+from agents_shared.model_clients import PooledGemini
+
+# Throttling is what fallbacks are for, so tiers retry server errors only
+TIER_RETRY_OPTIONS = types.HttpRetryOptions(attempts=3, initial_delay=1, http_status_codes=[500, 504])
+
+
+@dataclass
+class ModelTier:
+    name: str
+    model: BaseLlm
+    input_price: float = 0.0  # USD per million prompt tokens
+    output_price: float = 0.0  # USD per million response tokens
+    fallback: Optional[str] = None  # Tier tried when this one is throttled
+
+
+@dataclass
+class RouteRule:
+    tier: str
+    agents: tuple[str, ...] = ()  # Agent names the rule applies to, all when empty
+    min_prompt_tokens: int = 0
+    max_prompt_tokens: Optional[int] = None
+    tools: Optional[bool] = None  # True: only requests with tools, False: only without
+    max_latency: Optional[float] = None  # Skip the rule while the tier's average latency (s) is above this
+
+    def matches(self, agent: str, prompt_tokens: int, has_tools: bool, tier_latency: Optional[float]) -> bool:
+        if self.agents and agent not in self.agents:
+            return False
+        if prompt_tokens < self.min_prompt_tokens:
+            return False
+        if self.max_prompt_tokens is not None and prompt_tokens > self.max_prompt_tokens:
+            return False
+        if self.tools is not None and has_tools != self.tools:
+            return False
+        if self.max_latency is not None and tier_latency is not None and tier_latency > self.max_latency:
+            return False
+        return True
+
+
+@dataclass
+class TierStats:
+    calls: int = 0
+    errors: int = 0
+    throttled: int = 0  # Calls refused as throttled, each followed by a fallback
+    skipped: int = 0  # Calls routed here but sent on while the tier cooled down
+    latencies: deque = field(default_factory=lambda: deque(maxlen=1000))  # Seconds per answered call
+    average_latency: Optional[float] = None  # Exponentially weighted, drives max_latency rules
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    cost: float = 0.0
+    throttled_until: float = 0.0  # time.monotonic() the cooldown ends
+
+
+class RouterStats:
+    """Per-tier statistics and routing decisions, shared by every agent's router copy."""
+
+    def __init__(self, tiers: list[str], latency_weight: float):
+        self.tiers = {name: TierStats() for name in tiers}
+        self.decisions: Counter = Counter()  # (agent, rule tier, answering tier) -> calls
+        self.latency_weight = latency_weight
+
+    def record_latency(self, tier: str, seconds: float):
+        stats = self.tiers[tier]
+        stats.latencies.append(seconds)
+        if stats.average_latency is None:
+            stats.average_latency = seconds
+        else:
+            stats.average_latency += self.latency_weight * (seconds - stats.average_latency)
+
+
+def estimate_prompt_tokens(llm_request: LlmRequest) -> int:
+    """Rough prompt size in tokens (about 4 characters per token)."""
+    chars = 0
+    instruction = llm_request.config.system_instruction if llm_request.config else None
+    if isinstance(instruction, str):
+        chars += len(instruction)
+    elif isinstance(instruction, types.Content):
+        chars += sum(len(part.text or "") for part in instruction.parts or [])
+    for content in llm_request.contents:
+        for part in content.parts or []:
+            if part.text:
+                chars += len(part.text)
+            elif part.function_call or part.function_response:
+                chars += len(str((part.function_call or part.function_response).model_dump(exclude_none=True)))
+    return chars // 4
+
+
+def is_throttled_error(error: Exception) -> bool:
+    """True for quota and overload refusals worth sending to another tier."""
+    code = getattr(error, "code", None)
+    status = getattr(error, "status", None)
+    return code in (429, 503) or status in ("RESOURCE_EXHAUSTED", "UNAVAILABLE")
+
+
+class RouterModel(BaseLlm):
+    """A BaseLlm that answers every call with the tier its rules pick.
+
+    `model` defaults to the default tier's model name, which is the name
+    built-in tools such as google_search check.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    model: str = ""
+    tiers: list[ModelTier]
+    rules: list[RouteRule] = []
+    default_tier: str = ""  # First tier when empty
+    cooldown: float = 30.0  # Seconds a throttled tier is skipped
+    latency_weight: float = 0.2  # Weight of the newest call in a tier's average latency
+    agent_name: str = ""  # Set by for_agent
+    stats: Optional[RouterStats] = None
+
+    @model_validator(mode="after")
+    def _check_tiers(self):
+        names = [tier.name for tier in self.tiers]
+        if not names or len(set(names)) != len(names):
+            raise ValueError("RouterModel needs at least one tier and unique tier names")
+        if not self.default_tier:
+            self.default_tier = names[0]
+        for tier_name in [self.default_tier] + [rule.tier for rule in self.rules] + [
+            tier.fallback for tier in self.tiers if tier.fallback
+        ]:
+            if tier_name not in names:
+                raise ValueError(f"Unknown model tier: {tier_name}")
+        if not self.model:
+            self.model = self.tier(self.default_tier).model.model
+        if self.stats is None:
+            self.stats = RouterStats(names, self.latency_weight)
+        return self
+
+    def tier(self, name: str) -> ModelTier:
+        return next(tier for tier in self.tiers if tier.name == name)
+
+    def for_agent(self, agent_name: str) -> "RouterModel":
+        """A copy that routes as `agent_name`, sharing tiers and statistics."""
+        return self.model_copy(update={"agent_name": agent_name})
+
+    def choose(self, llm_request: LlmRequest) -> tuple[str, list[str]]:
+        """The tier the rules pick for a request, and its fallback chain.
+
+        Returns:
+            Tuple (rule tier, tiers to try in order)
+        """
+        prompt_tokens = estimate_prompt_tokens(llm_request)
+        has_tools = bool(llm_request.tools_dict) or bool(llm_request.config and llm_request.config.tools)
+        chosen = self.default_tier
+        for rule in self.rules:
+            if rule.matches(self.agent_name, prompt_tokens, has_tools, self.stats.tiers[rule.tier].average_latency):
+                chosen = rule.tier
+                break
+        chain = [chosen]
+        while self.tier(chain[-1]).fallback and self.tier(chain[-1]).fallback not in chain:
+            chain.append(self.tier(chain[-1]).fallback)
+        return chosen, chain
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        chosen, chain = self.choose(llm_request)
+        now = time.monotonic()
+        ready = [name for name in chain if self.stats.tiers[name].throttled_until <= now]
+        for name in chain:
+            if name not in ready:
+                self.stats.tiers[name].skipped += 1
+        if not ready:
+            # The whole chain is cooling down: try the tier that recovers first
+            ready = [min(chain, key=lambda name: self.stats.tiers[name].throttled_until)]
+
+        for position, name in enumerate(ready):
+            tier = self.tier(name)
+            stats = self.stats.tiers[name]
+            stats.calls += 1
+            request = llm_request.model_copy(update={"model": tier.model.model})
+            started = time.perf_counter()
+            usage = None
+            answered = False
+            failed = False
+            try:
+                async for response in tier.model.generate_content_async(request, stream=stream):
+                    answered = True
+                    if response.usage_metadata:
+                        usage = response.usage_metadata
+                    yield response
+            except Exception as e:
+                failed = True
+                # Once part of a response went out, the caller has to see the error
+                if answered or position == len(ready) - 1 or not is_throttled_error(e):
+                    stats.errors += 1
+                    raise
+                stats.throttled += 1
+                stats.throttled_until = time.monotonic() + self.cooldown
+                continue
+            finally:
+                # The flow may close this generator right after the final
+                # response, so the answer is recorded here rather than after the loop
+                if answered and not failed:
+                    self._record_answer(tier, chosen, time.perf_counter() - started, usage)
+            return
+
+    def _record_answer(self, tier: ModelTier, chosen: str, seconds: float, usage):
+        stats = self.stats.tiers[tier.name]
+        self.stats.record_latency(tier.name, seconds)
+        if usage:
+            stats.prompt_tokens += usage.prompt_token_count or 0
+            stats.output_tokens += usage.candidates_token_count or 0
+            stats.cost += (
+                (usage.prompt_token_count or 0) * tier.input_price
+                + (usage.candidates_token_count or 0) * tier.output_price
+            ) / 1e6
+        self.stats.decisions[(self.agent_name, chosen, tier.name)] += 1
+
+
+def default_router(**kwargs) -> RouterModel:
+    """Flash-lite for most calls, flash for synthesis and long prompts.
+
+    Each tier falls back to the other when throttled. Prices are USD per
+    million tokens (paid tier list prices).
+    """
+    tiers = [
+        ModelTier(
+            "lite",
+            PooledGemini(model="gemini-2.5-flash-lite", retry_options=TIER_RETRY_OPTIONS),
+            input_price=0.10,
+            output_price=0.40,
+            fallback="flash",
+        ),
+        ModelTier(
+            "flash",
+            PooledGemini(model="gemini-2.5-flash", retry_options=TIER_RETRY_OPTIONS),
+            input_price=0.30,
+            output_price=2.50,
+            fallback="lite",
+        ),
+    ]
+    rules = [
+        # Short yes/no checks never need the bigger model
+        RouteRule("lite", agents=("CriticAgent",)),
+        RouteRule("flash", agents=("AggregatorAgent",), max_latency=20.0),
+        RouteRule("flash", min_prompt_tokens=4000, tools=False, max_latency=20.0),
+    ]
+    return RouterModel(tiers=tiers, rules=rules, default_tier="lite", **kwargs)
+
+
+def use_model_router(agent, router: RouterModel) -> int:
+    """Give every LlmAgent under `agent` its own copy of `router`.
+
+    Walks sub_agents and agents wrapped in AgentTool, like use_stand_in_model.
+
+    Returns:
+        The number of agents that were switched
+    """
+    switched = 0
+    seen = set()
+    pending = [agent]
+    while pending:
+        current = pending.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        if isinstance(current, LlmAgent):
+            if current.model:
+                current.model = router.for_agent(current.name)
+                switched += 1
+            pending.extend(tool.agent for tool in current.tools if isinstance(tool, AgentTool))
+        pending.extend(current.sub_agents)
+    return switched
+
+
+def router_report(router: RouterModel) -> dict:
+    tiers = {}
+    for tier in router.tiers:
+        stats = router.stats.tiers[tier.name]
+        latencies = sorted(stats.latencies)
+        tiers[tier.name] = {
+            "model": tier.model.model,
+            "calls": stats.calls,
+            "answered": len(stats.latencies),
+            "throttled": stats.throttled,
+            "skipped": stats.skipped,
+            "errors": stats.errors,
+            "latency_p50_ms": statistics.median(latencies) * 1000 if latencies else None,
+            "latency_p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000 if latencies else None,
+            "prompt_tokens": stats.prompt_tokens,
+            "output_tokens": stats.output_tokens,
+            "cost_usd": stats.cost,
+        }
+    return {"tiers": tiers, "decisions": dict(router.stats.decisions)}
+
+
+def print_router_report(router: RouterModel):
+    report = router_report(router)
+    print("\n📊 Model router")
+    for name, tier in report["tiers"].items():
+        latency = (
+            f"p50 {tier['latency_p50_ms']:.0f}ms p95 {tier['latency_p95_ms']:.0f}ms"
+            if tier["latency_p50_ms"] is not None else "no answers"
+        )
+        print(
+            f"   - {name} ({tier['model']}): {tier['answered']}/{tier['calls']} answered,"
+            f" {tier['throttled']} throttled, {tier['skipped']} skipped, {tier['errors']} errors; {latency};"
+            f" {tier['prompt_tokens']} in / {tier['output_tokens']} out tokens, ${tier['cost_usd']:.6f}"
+        )
+    print("   Decisions (agent: rule tier -> answering tier):")
+    for (agent, chosen, answered), calls in sorted(report["decisions"].items()):
+        print(f"       {agent or '-':24s} {chosen} -> {answered}: {calls}")
+
+
+async def run_demo(args) -> RouterModel:
+    from google.adk.runners import InMemoryRunner
+
+    from agents_shared.load_test import load_agent_folder
+    from agents_shared.stand_in_model import StandInModel
+
+    agent, _ = load_agent_folder(args.folder)
+    router = default_router(cooldown=args.cooldown)
+    # Same tiers and rules, answered locally: the bigger tier is slower and
+    # the small one is refused now and then
+    router.tier("lite").model = StandInModel(
+        model="gemini-2.5-flash-lite", latency=args.lite_latency, throttle_rate=args.lite_throttle_rate
+    )
+    router.tier("flash").model = StandInModel(model="gemini-2.5-flash", latency=args.flash_latency, response_words=80)
+    use_model_router(agent, router)
+
+    runner = InMemoryRunner(agent=agent, app_name="model_router")
+    for run in range(args.runs):
+        session = await runner.session_service.create_session(app_name="model_router", user_id="router")
+        message = types.Content(role="user", parts=[types.Part(text=args.prompt)])
+        async for _ in runner.run_async(user_id="router", session_id=session.id, new_message=message):
+            pass
+    return router
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run an agent folder through the model router with stand-in tiers.")
+    parser.add_argument("folder", help="Agent folder under agents_shared (e.g. d1_parallel_agent) or a path to an agent.py")
+    parser.add_argument("--runs", type=int, default=5, help="Queries sent, one session each")
+    parser.add_argument("--prompt", default="Write about a lighthouse keeper.", help="Text of every query")
+    parser.add_argument("--lite-latency", type=float, default=0.01, help="Seconds per call of the small tier")
+    parser.add_argument("--flash-latency", type=float, default=0.05, help="Seconds per call of the bigger tier")
+    parser.add_argument("--lite-throttle-rate", type=float, default=0.2, help="Share of small tier calls refused with 429")
+    parser.add_argument("--cooldown", type=float, default=0.0, help="Seconds a throttled tier is skipped")
+    args = parser.parse_args(argv)
+    print_router_report(asyncio.run(run_demo(args)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
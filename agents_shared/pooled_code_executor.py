@@ -0,0 +1,199 @@
+# Local code execution in a pool of warm, resource-limited worker processes
+#
+# BuiltInCodeExecutor runs generated code on the model side, one remote round
+# trip per snippet. PooledCodeExecutor runs it locally instead, in worker
+# processes started ahead of time and reused across calls, so an arithmetic
+# snippet returns in milliseconds. Every worker (see code_worker.py):
+#   - starts with an empty environment, so no API key or other secret from
+#     .env reaches it
+#   - confines itself before running anything: empty network namespace,
+#     chroot into an empty directory, uid nobody, rlimits and a seccomp
+#     filter (no sockets, exec, fork or namespace calls); a worker that
+#     cannot confine itself refuses to start
+#   - only lets snippets import modules from an allowlist
+#   - is killed and replaced when a snippet runs past the timeout
+#
+# The sandbox needs Linux with namespaces and seccomp. It is opt-in: agents
+# keep BuiltInCodeExecutor unless they pass `code_executor=PooledCodeExecutor()`.
+import atexit
+import json
+import os
+import queue
+import select
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Optional
+
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.code_executors import BaseCodeExecutor
+from google.adk.code_executors.code_execution_utils import CodeExecutionInput, CodeExecutionResult
+from pydantic import Field, PrivateAttr
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "code_worker.py")
+
+DEFAULT_ALLOWED_IMPORTS = (
+    "math", "cmath", "decimal", "fractions", "statistics", "random", "numbers",
+    "datetime", "calendar", "time", "itertools", "functools", "operator",
+    "collections", "heapq", "bisect", "re", "string", "json", "textwrap",
+)
+
+
+class _Worker:
+    def __init__(self, settings: dict):
+        # Becomes the worker's whole filesystem: empty, and only root may enter it
+        self.root = tempfile.mkdtemp(prefix="adk_code_")
+        self.process = subprocess.Popen(
+            [sys.executable, "-I", WORKER_SCRIPT, json.dumps({**settings, "root": self.root})],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            start_new_session=True,
+            env={},
+            cwd=self.root,
+        )
+        self.runs = 0
+
+    def wait_ready(self, timeout: float):
+        """Raises RuntimeError unless the worker reports it is confined and ready."""
+        reply = self.read_reply(timeout)
+        if reply != {"ready": True}:
+            error = (reply or {}).get("error", "no reply")
+            raise RuntimeError(f"Code executor worker failed to start its sandbox: {error}")
+
+    def read_reply(self, timeout: float) -> Optional[dict]:
+        """Next reply line, or None when the worker died or ran out of time."""
+        ready, _, _ = select.select([self.process.stdout], [], [], timeout)
+        if not ready:
+            return None
+        line = self.process.stdout.readline()
+        return json.loads(line) if line else None
+
+    def run(self, code: str, timeout: float) -> Optional[dict]:
+        self.runs += 1
+        try:
+            self.process.stdin.write(json.dumps({"code": code}) + "\n")
+            self.process.stdin.flush()
+        except BrokenPipeError:
+            return None
+        return self.read_reply(timeout)
+
+    def kill(self):
+        self.process.kill()
+        self.process.wait()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+class PooledCodeExecutor(BaseCodeExecutor):
+    """Runs model-generated Python in a pool of warm local worker processes.
+
+    Plug it in with `LlmAgent(..., code_executor=PooledCodeExecutor())`.
+    """
+
+    # Like UnsafeLocalCodeExecutor: every snippet starts from a clean namespace
+    stateful: bool = Field(default=False, frozen=True, exclude=True)
+    optimize_data_file: bool = Field(default=False, frozen=True, exclude=True)
+
+    workers: int = 2  # Worker processes kept warm
+    timeout: float = 5.0  # Wall clock seconds before a snippet's worker is killed
+    cpu_seconds: int = 5  # CPU seconds a snippet may use
+    memory_mb: int = 512  # Address space limit of every worker
+    allowed_imports: tuple[str, ...] = DEFAULT_ALLOWED_IMPORTS  # Top-level modules snippets may import
+    max_output: int = 64 * 1024  # Characters of stdout kept per snippet
+    max_runs_per_worker: int = 500  # Snippets run before a worker is replaced
+    wait_timeout: float = 60.0  # Seconds a snippet waits for a free worker
+
+    _idle: Optional[queue.Queue] = PrivateAttr(default=None)
+    _all: list = PrivateAttr(default_factory=list)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def _settings(self) -> dict:
+        return {
+            "allowed_imports": list(self.allowed_imports),
+            "cpu_seconds": self.cpu_seconds,
+            "memory_mb": self.memory_mb,
+            "max_output": self.max_output,
+        }
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._settings())
+        try:
+            worker.wait_ready(timeout=30)
+        except RuntimeError:
+            worker.kill()
+            raise
+        self._all.append(worker)
+        return worker
+
+    def start(self):
+        """Start the worker pool (done on first use otherwise)."""
+        with self._lock:
+            if self._idle is not None:
+                return
+            self._idle = queue.Queue()
+            for _ in range(self.workers):
+                self._idle.put(self._spawn())
+            atexit.register(self.close)
+
+    def _replace(self) -> Optional[_Worker]:
+        """A new worker, or None when it cannot start; None keeps its pool slot to retry later."""
+        with self._lock:
+            try:
+                return self._spawn()
+            except (OSError, RuntimeError):
+                return None
+
+    def _retire(self, worker: _Worker):
+        worker.kill()
+        with self._lock:
+            self._all.remove(worker)
+        self._idle.put(self._replace())
+
+    def run_code(self, code: str) -> CodeExecutionResult:
+        """Run one snippet on a pooled worker."""
+        self.start()
+        try:
+            worker = self._idle.get(timeout=self.wait_timeout)
+        except queue.Empty:
+            stderr = f"RuntimeError: no code executor worker became free within {self.wait_timeout:g}s"
+            return CodeExecutionResult(stdout="", stderr=stderr, output_files=[])
+        if worker is None:
+            worker = self._replace()
+            if worker is None:
+                self._idle.put(None)
+                stderr = "RuntimeError: the code executor worker could not be restarted"
+                return CodeExecutionResult(stdout="", stderr=stderr, output_files=[])
+        started = time.monotonic()
+        reply = worker.run(code, self.timeout)
+        if reply is None:
+            timed_out = time.monotonic() - started >= self.timeout
+            self._retire(worker)
+            if timed_out:
+                stderr = f"TimeoutError: execution exceeded {self.timeout:g}s"
+            else:
+                stderr = "RuntimeError: the code executor worker stopped (CPU limit reached or crashed)"
+            return CodeExecutionResult(stdout="", stderr=stderr, output_files=[])
+        if worker.runs >= self.max_runs_per_worker:
+            self._retire(worker)
+        else:
+            self._idle.put(worker)
+        return CodeExecutionResult(stdout=reply["stdout"], stderr=reply["stderr"], output_files=[])
+
+    def execute_code(
+        self,
+        invocation_context: InvocationContext,
+        code_execution_input: CodeExecutionInput,
+    ) -> CodeExecutionResult:
+        return self.run_code(code_execution_input.code)
+
+    def close(self):
+        """Stop every worker."""
+        with self._lock:
+            for worker in self._all:
+                worker.kill()
+            self._all.clear()
+            self._idle = None
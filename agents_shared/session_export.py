@@ -0,0 +1,370 @@
+# Columnar export of the session database for analytics
+#
+# Turn counts, tool usage and state sizes are questions about every event,
+# and answering them from the `events` table means reading every row back
+# through SQLite, inflating compressed content and unpickling actions one
+# row at a time. export_database streams the `sessions` and `events` tables
+# into Parquet files once, so analytics jobs scan a few flat columns instead:
+#   - events are read in keyset batches of batch_size rows ordered by
+#     (timestamp, id), so memory stays bounded by one batch whatever the
+#     size of the table; an index on (timestamp, id) is added to the
+#     database the first time
+#   - each event becomes one row of flat columns: author, timestamp, text
+#     length, function call and response names, state-delta keys and size,
+#     token counts and flags (see flatten_event); content compressed by
+#     compressed_sessions is decoded, delta_sessions patches keep their keys
+#   - files are partitioned by app and date, hive style, so a reader can
+#     prune them: <out>/events/app_name=<app>/date=<YYYY-MM-DD>/part-*.parquet
+#   - a watermark (<out>/_export_state.json) records the last (timestamp, id)
+#     exported and is saved after every batch, so each run appends what was
+#     written since the last one, and a run that stops halfway resumes where
+#     it stopped; part names derive from the batch start, so a batch written
+#     again after a crash replaces its own files
+#   - events newer than settle_seconds are left for the next run, so a turn
+#     that is still being written does not land behind the watermark
+#   - sessions are exported the same way, keyed on update_time: a session
+#     that changed since the last run is appended again, and readers keep
+#     the row with the latest update_time per session. SQLite stores
+#     update_time as CURRENT_TIMESTAMP, in UTC and whole seconds, so a
+#     second change within the second of an earlier one keeps the same
+#     update_time; sessions are only exported once their second is over
+#     (and settle_seconds, at least one, have passed), so no change can
+#     land in a second that was already exported
+#
+# Writing Parquet needs pyarrow (pip install pyarrow).
+#
+# Usage (from the repository root):
+#   python -m agents_shared.session_export export my_agent_data.db analytics/
+#   python -m agents_shared.session_export status analytics/
+#
+#   pyarrow.dataset.dataset("analytics/events", partitioning="hive")
+# reads the export back, with app_name and date as columns.
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from urllib.parse import quote
+
+from agents_shared.compressed_sessions import decode_content_column, load_dictionaries
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+STATE_FILE = "_export_state.json"
+EVENTS_INDEX = "ix_events_export_order"
+
+_EVENT_COLUMNS = (
+    "app_name, user_id, session_id, id, invocation_id, author, branch, timestamp, actions, content,"
+    " usage_metadata, partial, turn_complete, error_code"
+)
+_SESSION_COLUMNS = "app_name, user_id, id, state, create_time, update_time"
+
+
+def _require_pyarrow():
+    if pyarrow is None:
+        raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow")
+
+
+def event_schema():
+    """Arrow schema of the exported event rows (app_name and date are partition keys)."""
+    _require_pyarrow()
+    string_list = pyarrow.list_(pyarrow.string())
+    return pyarrow.schema([
+        ("user_id", pyarrow.string()),
+        ("session_id", pyarrow.string()),
+        ("event_id", pyarrow.string()),
+        ("invocation_id", pyarrow.string()),
+        ("author", pyarrow.string()),
+        ("branch", pyarrow.string()),
+        ("timestamp", pyarrow.timestamp("us")),
+        ("text_chars", pyarrow.int64()),
+        ("content_bytes", pyarrow.int64()),  # As stored, compressed or not
+        ("function_calls", string_list),
+        ("function_responses", string_list),
+        ("state_delta_keys", string_list),
+        ("state_delta_bytes", pyarrow.int64()),
+        ("prompt_tokens", pyarrow.int64()),
+        ("output_tokens", pyarrow.int64()),
+        ("partial", pyarrow.bool_()),
+        ("turn_complete", pyarrow.bool_()),
+        ("error_code", pyarrow.string()),
+        ("transfer_to_agent", pyarrow.string()),
+        ("escalate", pyarrow.bool_()),
+        ("compaction", pyarrow.bool_()),
+    ])
+
+
+def session_schema():
+    """Arrow schema of the exported session rows (app_name and date are partition keys)."""
+    _require_pyarrow()
+    return pyarrow.schema([
+        ("user_id", pyarrow.string()),
+        ("session_id", pyarrow.string()),
+        ("create_time", pyarrow.timestamp("us", tz="UTC")),
+        ("update_time", pyarrow.timestamp("us", tz="UTC")),
+        ("state_keys", pyarrow.list_(pyarrow.string())),
+        ("state_bytes", pyarrow.int64()),
+    ])
+
+
+@dataclass
+class ExportWatermark:
+    event_timestamp: str = ""  # As stored in the events table
+    event_id: str = ""
+    session_update_time: str = ""
+    session_key: list = field(default_factory=list)  # (app_name, user_id, id) of the last session
+    runs: int = 0
+    events_exported: int = 0
+    sessions_exported: int = 0
+
+    @classmethod
+    def load(cls, out_dir: str) -> "ExportWatermark":
+        path = os.path.join(out_dir, STATE_FILE)
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as file:
+            return cls(**json.load(file))
+
+    def save(self, out_dir: str):
+        path = os.path.join(out_dir, STATE_FILE)
+        with open(path + ".tmp", "w") as file:
+            json.dump(asdict(self), file, indent=2)
+        os.replace(path + ".tmp", path)
+
+
+@dataclass
+class ExportStats:
+    events: int = 0
+    sessions: int = 0
+    batches: int = 0
+    files: int = 0
+    bytes_written: int = 0
+    read_seconds: float = 0.0  # Querying and flattening
+    write_seconds: float = 0.0
+
+
+def _parse_time(value) -> Optional[datetime]:
+    if value is None:
+        return None
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+
+def flatten_event(row, dictionaries: dict[int, tuple[int, bytes]]) -> dict:
+    """One events table row as flat analytics columns, plus app_name and date."""
+    (app_name, user_id, session_id, event_id, invocation_id, author, branch, timestamp, actions, content,
+     usage_metadata, partial, turn_complete, error_code) = row
+    data = decode_content_column(content, dictionaries) or {}
+    text_chars, calls, responses = 0, [], []
+    for part in data.get("parts") or ():
+        if part.get("text") and not part.get("thought"):
+            text_chars += len(part["text"])
+        if part.get("function_call"):
+            calls.append(part["function_call"].get("name") or "")
+        if part.get("function_response"):
+            responses.append(part["function_response"].get("name") or "")
+
+    # Pickled EventActions, as DatabaseSessionService stores them
+    actions = pickle.loads(actions) if actions is not None else None
+    state_delta = (actions.state_delta if actions else None) or {}
+    usage = json.loads(usage_metadata) if usage_metadata else {}
+    timestamp = _parse_time(timestamp)
+    return {
+        "app_name": app_name,
+        "date": timestamp.date().isoformat(),
+        "user_id": user_id,
+        "session_id": session_id,
+        "event_id": event_id,
+        "invocation_id": invocation_id,
+        "author": author,
+        "branch": branch,
+        "timestamp": timestamp,
+        "text_chars": text_chars,
+        "content_bytes": len(content) if content is not None else 0,
+        "function_calls": calls,
+        "function_responses": responses,
+        "state_delta_keys": sorted(state_delta),
+        "state_delta_bytes": len(json.dumps(state_delta, default=str)) if state_delta else 0,
+        "prompt_tokens": usage.get("prompt_token_count"),
+        "output_tokens": usage.get("candidates_token_count"),
+        "partial": bool(partial) if partial is not None else None,
+        "turn_complete": bool(turn_complete) if turn_complete is not None else None,
+        "error_code": error_code,
+        "transfer_to_agent": actions.transfer_to_agent if actions else None,
+        "escalate": actions.escalate if actions else None,
+        "compaction": bool(actions and actions.compaction),
+    }
+
+
+def flatten_session(row) -> dict:
+    """One sessions table row as flat analytics columns, plus app_name and date (UTC)."""
+    app_name, user_id, session_id, state, create_time, update_time = row
+    update_time = _parse_time(update_time)
+    return {
+        "app_name": app_name,
+        "date": update_time.date().isoformat(),
+        "user_id": user_id,
+        "session_id": session_id,
+        "create_time": _parse_time(create_time),
+        "update_time": update_time,
+        "state_keys": sorted(json.loads(state)) if state else [],
+        "state_bytes": len(state) if state else 0,
+    }
+
+
+def _write_part(path: str, rows: list[dict], schema):
+    table = pyarrow.Table.from_pylist(rows, schema=schema)
+    pyarrow.parquet.write_table(table, path + ".tmp", compression="zstd")
+    os.replace(path + ".tmp", path)
+
+
+def _write_batch(out_dir: str, table: str, rows: list[dict], schema, batch_start: str, stats: ExportStats):
+    """Write one batch as one file per (app_name, date) partition."""
+    partitions: dict[tuple[str, str], list[dict]] = {}
+    for row in rows:
+        partitions.setdefault((row.pop("app_name"), row.pop("date")), []).append(row)
+    name = f"part-{hashlib.blake2b(batch_start.encode(), digest_size=8).hexdigest()}.parquet"
+    started = time.perf_counter()
+    for (app_name, date), partition_rows in partitions.items():
+        directory = os.path.join(out_dir, table, f"app_name={quote(app_name, safe='')}", f"date={date}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, name)
+        _write_part(path, partition_rows, schema)
+        stats.files += 1
+        stats.bytes_written += os.path.getsize(path)
+    stats.write_seconds += time.perf_counter() - started
+
+
+def _export_events(connection, out_dir: str, watermark: ExportWatermark, cutoff: str, batch_size: int,
+                   stats: ExportStats):
+    dictionaries = load_dictionaries(connection)
+    schema = event_schema()
+    while True:
+        started = time.perf_counter()
+        rows = connection.execute(
+            f"SELECT {_EVENT_COLUMNS} FROM events WHERE (timestamp, id) > (?, ?) AND timestamp < ?"
+            " ORDER BY timestamp, id LIMIT ?",
+            (watermark.event_timestamp, watermark.event_id, cutoff, batch_size),
+        ).fetchall()
+        if not rows:
+            return
+        batch_start = f"{watermark.event_timestamp}|{watermark.event_id}"
+        flattened = [flatten_event(row, dictionaries) for row in rows]
+        stats.read_seconds += time.perf_counter() - started
+        _write_batch(out_dir, "events", flattened, schema, batch_start, stats)
+
+        watermark.event_timestamp, watermark.event_id = str(rows[-1][7]), rows[-1][3]
+        watermark.events_exported += len(rows)
+        watermark.save(out_dir)
+        stats.events += len(rows)
+        stats.batches += 1
+
+
+def _export_sessions(connection, out_dir: str, watermark: ExportWatermark, cutoff: str, batch_size: int,
+                     stats: ExportStats):
+    schema = session_schema()
+    while True:
+        started = time.perf_counter()
+        key = watermark.session_key or ["", "", ""]
+        rows = connection.execute(
+            f"SELECT {_SESSION_COLUMNS} FROM sessions"
+            " WHERE (update_time, app_name, user_id, id) > (?, ?, ?, ?) AND update_time < ?"
+            " ORDER BY update_time, app_name, user_id, id LIMIT ?",
+            (watermark.session_update_time, *key, cutoff, batch_size),
+        ).fetchall()
+        if not rows:
+            return
+        batch_start = f"{watermark.session_update_time}|{'|'.join(key)}"
+        flattened = [flatten_session(row) for row in rows]
+        stats.read_seconds += time.perf_counter() - started
+        _write_batch(out_dir, "sessions", flattened, schema, batch_start, stats)
+
+        last = rows[-1]
+        watermark.session_update_time, watermark.session_key = str(last[5]), [last[0], last[1], last[2]]
+        watermark.sessions_exported += len(rows)
+        watermark.save(out_dir)
+        stats.sessions += len(rows)
+        stats.batches += 1
+
+
+def export_database(db_path: str, out_dir: str, batch_size: int = 10000, settle_seconds: float = 5.0) -> ExportStats:
+    """Append the events and sessions written since the last export to Parquet files in out_dir.
+
+    Args:
+        db_path: Path to the SQLite session database
+        out_dir: Export directory; holds the partitions and the watermark
+        batch_size: Rows read, flattened and written at a time
+        settle_seconds: Rows younger than this are left for the next run (sessions: at least 1s)
+
+    Returns:
+        What this run exported.
+    """
+    _require_pyarrow()
+    os.makedirs(out_dir, exist_ok=True)
+    watermark = ExportWatermark.load(out_dir)
+    stats = ExportStats()
+    # Event timestamps are stored as local time text, which sorts chronologically
+    event_cutoff = (datetime.now() - timedelta(seconds=settle_seconds)).isoformat(" ")
+    # Session times are UTC whole seconds: stop before the latest full second
+    session_cutoff = (
+        datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=max(settle_seconds, 1.0))
+    ).isoformat(" ", timespec="seconds")
+    connection = sqlite3.connect(db_path)
+    try:
+        connection.execute(f"CREATE INDEX IF NOT EXISTS {EVENTS_INDEX} ON events (timestamp, id)")
+        connection.commit()
+        _export_events(connection, out_dir, watermark, event_cutoff, batch_size, stats)
+        _export_sessions(connection, out_dir, watermark, session_cutoff, batch_size, stats)
+    finally:
+        connection.close()
+    watermark.runs += 1
+    watermark.save(out_dir)
+    return stats
+
+
+def print_export_stats(stats: ExportStats, out_dir: str):
+    watermark = ExportWatermark.load(out_dir)
+    rows = stats.events + stats.sessions
+    seconds = stats.read_seconds + stats.write_seconds
+    print(f"✅ Exported {stats.events} events and {stats.sessions} sessions to {out_dir}")
+    print(f"   - {stats.files} files in {stats.batches} batches, {stats.bytes_written / 1024:.1f} KiB")
+    print(f"   - {seconds:.2f}s ({stats.read_seconds:.2f}s reading, {stats.write_seconds:.2f}s writing),"
+          f" {rows / seconds if seconds else 0:.0f} rows/s")
+    print(f"   - Watermark: events up to {watermark.event_timestamp or '-'}, sessions up to"
+          f" {watermark.session_update_time or '-'} (run {watermark.runs})")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Export a SQLite session database to partitioned Parquet files.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export = subparsers.add_parser("export", help="Append what changed since the last export")
+    export.add_argument("db_path", help="Path to the SQLite file, e.g. my_agent_data.db")
+    export.add_argument("out_dir", help="Export directory")
+    export.add_argument("--batch-size", type=int, default=10000, help="Rows read and written at a time")
+    export.add_argument("--settle-seconds", type=float, default=5.0, help="Leave rows younger than this for the next run")
+    status = subparsers.add_parser("status", help="Show the export watermark")
+    status.add_argument("out_dir", help="Export directory")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        stats = export_database(args.db_path, args.out_dir, args.batch_size, args.settle_seconds)
+        print_export_stats(stats, args.out_dir)
+    else:
+        watermark = ExportWatermark.load(args.out_dir)
+        print(f"\n ### Export state of {args.out_dir} ({watermark.runs} runs)")
+        print(f"   - Events: {watermark.events_exported} exported, up to {watermark.event_timestamp or '-'}")
+        print(f"   - Sessions: {watermark.sessions_exported} exported, up to {watermark.session_update_time or '-'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,378 @@
+# Compact binary session snapshots for fast warm restarts
+#
+# A restarted worker backed by DatabaseSessionService rebuilds every session
+# row by row, JSON-decoding each event, the first time it is touched. A
+# snapshot stores the active sessions in one versioned binary file instead:
+#
+#   header   MAGIC | u16 version | u8 codec
+#   records  u32 length | payload           (payload = compressed session JSON)
+#   index    u32 count | entries            (key, event count, last event time, offset, length)
+#   footer   u64 index offset | MAGIC
+#
+# Loading maps the file and reads only the index. A session's record is
+# decompressed and decoded the first time that session is requested.
+import copy
+import mmap
+import os
+import struct
+import zlib
+from collections import OrderedDict
+from typing import Any, Optional
+
+from google.adk.events import Event
+from google.adk.sessions import DatabaseSessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig
+from google.adk.sessions.database_session_service import (
+    StorageAppState,
+    StorageEvent,
+    StorageSession,
+    StorageUserState,
+)
+from google.adk.sessions.state import State
+from sqlalchemy import func
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+SNAPSHOT_MAGIC = b"ADKSNAP1"
+SNAPSHOT_VERSION = 1
+CODECS = {"none": 0, "zlib": 1, "zstd": 2}
+
+_HEADER = struct.Struct(">8sHB")
+_LENGTH = struct.Struct(">I")
+_INDEX_ENTRY = struct.Struct(">IdQI")
+_FOOTER = struct.Struct(">Q8s")
+
+
+def _compress(codec: int, data: bytes) -> bytes:
+    if codec == CODECS["zlib"]:
+        return zlib.compress(data, 6)
+    if codec == CODECS["zstd"]:
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return data
+
+
+def _decompress(codec: int, data: bytes) -> bytes:
+    if codec == CODECS["zlib"]:
+        return zlib.decompress(data)
+    if codec == CODECS["zstd"]:
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+def _pack_str(value: str) -> bytes:
+    raw = value.encode()
+    return struct.pack(">H", len(raw)) + raw
+
+
+def write_snapshot(sessions: list[Session], path: str, compression: str = "zlib") -> dict:
+    """Write full sessions (state plus events) to a snapshot file.
+
+    The file is written next to `path` and renamed into place, so a reader
+    never sees a half-written snapshot.
+
+    Args:
+        sessions: Sessions to store, as returned by get_session
+        path: Snapshot file to create
+        compression: "zlib", "zstd" (needs the zstandard package) or "none"
+
+    Returns:
+        Dict with the number of sessions, raw and written bytes
+    """
+    if compression not in CODECS:
+        raise ValueError(f"Unknown snapshot compression '{compression}'.")
+    if compression == "zstd" and zstandard is None:
+        raise ValueError("zstd snapshots need the 'zstandard' package: pip install zstandard")
+    codec = CODECS[compression]
+
+    raw_bytes = 0
+    index = []
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, codec))
+        for session in sessions:
+            raw = session.model_dump_json(exclude_none=True).encode()
+            raw_bytes += len(raw)
+            payload = _compress(codec, raw)
+            offset = f.tell()
+            f.write(_LENGTH.pack(len(payload)) + payload)
+            index.append((session, offset, len(payload)))
+
+        index_offset = f.tell()
+        f.write(_LENGTH.pack(len(index)))
+        for session, offset, length in index:
+            f.write(_pack_str(session.app_name) + _pack_str(session.user_id) + _pack_str(session.id))
+            f.write(_INDEX_ENTRY.pack(*_fingerprint(session.events), offset, length))
+        f.write(_FOOTER.pack(index_offset, SNAPSHOT_MAGIC))
+        f.flush()
+        os.fsync(f.fileno())
+        written = f.tell()
+    os.replace(tmp_path, path)
+    return {"sessions": len(index), "raw_bytes": raw_bytes, "file_bytes": written}
+
+
+class SessionSnapshot:
+    """A memory-mapped snapshot file whose sessions are decoded on demand."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, codec = _HEADER.unpack_from(self._map, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a session snapshot.")
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {version} in {path}.")
+        if codec == CODECS["zstd"] and zstandard is None:
+            raise ValueError("This snapshot needs the 'zstandard' package: pip install zstandard")
+        self.codec = codec
+
+        index_offset, footer_magic = _FOOTER.unpack_from(self._map, len(self._map) - _FOOTER.size)
+        if footer_magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"Snapshot {path} is truncated.")
+        # key -> (event count, last event time, offset, length)
+        self.index: dict[tuple[str, str, str], tuple[int, float, int, int]] = {}
+        (count,) = _LENGTH.unpack_from(self._map, index_offset)
+        pos = index_offset + _LENGTH.size
+        for _ in range(count):
+            key = []
+            for _ in range(3):
+                (size,) = struct.unpack_from(">H", self._map, pos)
+                key.append(bytes(self._map[pos + 2 : pos + 2 + size]).decode())
+                pos += 2 + size
+            self.index[tuple(key)] = _INDEX_ENTRY.unpack_from(self._map, pos)
+            pos += _INDEX_ENTRY.size
+
+    def __contains__(self, key) -> bool:
+        return key in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def fingerprint(self, key) -> tuple[int, float]:
+        return self.index[key][:2]
+
+    def load(self, key) -> Session:
+        """Decompress and decode one session."""
+        _, _, offset, length = self.index[key]
+        start = offset + _LENGTH.size
+        raw = _decompress(self.codec, self._map[start : start + length])
+        return Session.model_validate_json(raw)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def _fingerprint(events: list[Event]) -> tuple[int, float]:
+    """Event count and last event time, used to tell whether a copy is current."""
+    return len(events), events[-1].timestamp if events else 0.0
+
+
+def _same_fingerprint(a: tuple[int, float], b: tuple[int, float]) -> bool:
+    # Timestamps go through a datetime column, so allow for rounding
+    return a[0] == b[0] and abs(a[1] - b[1]) < 1e-5
+
+
+def _select_events(events: list[Event], config: GetSessionConfig) -> list[Event]:
+    """Apply a GetSessionConfig to a full event list, as the database query would."""
+    if config.after_timestamp:
+        events = [event for event in events if event.timestamp >= config.after_timestamp]
+    if config.num_recent_events:
+        events = events[-config.num_recent_events :]
+    return list(events)
+
+
+def _merge_state(app_state: dict, user_state: dict, session_state: dict) -> dict:
+    merged = copy.deepcopy(session_state)
+    for key, value in app_state.items():
+        merged[State.APP_PREFIX + key] = value
+    for key, value in user_state.items():
+        merged[State.USER_PREFIX + key] = value
+    return merged
+
+
+class SnapshotDatabaseSessionService(DatabaseSessionService):
+    """DatabaseSessionService that can warm-start from a snapshot file.
+
+    The database stays the source of truth. A session is served from the
+    snapshot only if its event count and last event time in the database
+    still match the snapshot, so a stale snapshot falls back to the normal
+    row-by-row load. That check is one aggregate query, with no event decoding.
+    Sessions served from the snapshot stay in a small write-through cache, so
+    later turns do not reload their events from the database either.
+
+    A hit returns the same events a database load would: a GetSessionConfig
+    is applied to the cached events, and when composed with
+    WindowedDatabaseSessionService a call without config gets its window.
+    """
+
+    def __init__(
+        self,
+        db_url: str,
+        max_warm_sessions: int = 1000,
+        max_warm_events: int = 100_000,
+        **kwargs: Any,
+    ):
+        """Initializes the service.
+
+        Args:
+            db_url: The database URL, e.g. "sqlite:///my_agent_data.db"
+            max_warm_sessions: Sessions kept in the warm cache
+            max_warm_events: Events kept in the warm cache, over all sessions
+        """
+        super().__init__(db_url=db_url, **kwargs)
+        self.snapshot: Optional[SessionSnapshot] = None
+        self.max_warm_sessions = max_warm_sessions
+        self.max_warm_events = max_warm_events
+        self._warm: OrderedDict[tuple, Session] = OrderedDict()
+        self._warm_events = 0
+        self.snapshot_stats = {"snapshot_hits": 0, "warm_hits": 0, "db_loads": 0}
+
+    def load_snapshot(self, path: str) -> int:
+        """Map a snapshot; returns the number of sessions it holds."""
+        if self.snapshot:
+            self.snapshot.close()
+        self.snapshot = SessionSnapshot(path)
+        return len(self.snapshot)
+
+    async def save_snapshot(
+        self,
+        path: str,
+        app_name: str,
+        user_id: Optional[str] = None,
+        compression: str = "zlib",
+    ) -> dict:
+        """Snapshot every session of an app (optionally of one user)."""
+        listed = await self.list_sessions(app_name=app_name, user_id=user_id)
+        sessions = []
+        for item in listed.sessions:
+            # An explicit config loads every event, even through a windowed service
+            session = await self.get_session(
+                app_name=item.app_name,
+                user_id=item.user_id,
+                session_id=item.id,
+                config=GetSessionConfig(),
+            )
+            if session:
+                sessions.append(session)
+        return write_snapshot(sessions, path, compression=compression)
+
+    def _remember_warm(self, key, session: Session):
+        self._forget_warm(key)
+        self._warm[key] = session
+        self._warm_events += len(session.events)
+        self._trim_warm()
+
+    def _forget_warm(self, key):
+        session = self._warm.pop(key, None)
+        if session is not None:
+            self._warm_events -= len(session.events)
+
+    def _trim_warm(self):
+        """Evict the least recently used sessions until both caps hold."""
+        while self._warm and (
+            len(self._warm) > self.max_warm_sessions or self._warm_events > self.max_warm_events
+        ):
+            _, session = self._warm.popitem(last=False)
+            self._warm_events -= len(session.events)
+
+    def _window_events(self, session: Session) -> list[Event]:
+        """The events get_session without a config returns, picked from a full session.
+
+        All of them, unless a service after this one in the MRO (such as
+        WindowedDatabaseSessionService) defines its own window.
+        """
+        window = getattr(super(), "_window_events", None)
+        return window(session) if window else list(session.events)
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        key = (app_name, user_id, session_id)
+        in_snapshot = self.snapshot is not None and key in self.snapshot
+        if key not in self._warm and not in_snapshot:
+            self.snapshot_stats["db_loads"] += 1
+            return await super().get_session(
+                app_name=app_name, user_id=user_id, session_id=session_id, config=config
+            )
+
+        # Only the session row, the app/user state rows and one aggregate over
+        # the events are read here
+        with self.database_session_factory() as sql_session:
+            storage_session = sql_session.get(StorageSession, key)
+            if storage_session is None:
+                self._forget_warm(key)
+                return None
+            storage_app_state = sql_session.get(StorageAppState, (app_name))
+            storage_user_state = sql_session.get(StorageUserState, (app_name, user_id))
+            update_time = storage_session.update_timestamp_tz
+            count, last_time = (
+                sql_session.query(func.count(StorageEvent.id), func.max(StorageEvent.timestamp))
+                .filter(
+                    StorageEvent.app_name == app_name,
+                    StorageEvent.user_id == user_id,
+                    StorageEvent.session_id == session_id,
+                )
+                .one()
+            )
+            db_fingerprint = (count, last_time.timestamp() if last_time else 0.0)
+            merged_state = _merge_state(
+                storage_app_state.state if storage_app_state else {},
+                storage_user_state.state if storage_user_state else {},
+                storage_session.state,
+            )
+
+        cached = self._warm.get(key)
+        if cached is None or not _same_fingerprint(_fingerprint(cached.events), db_fingerprint):
+            cached = None
+            if in_snapshot and _same_fingerprint(self.snapshot.fingerprint(key), db_fingerprint):
+                cached = self.snapshot.load(key)
+                self.snapshot_stats["snapshot_hits"] += 1
+        else:
+            self.snapshot_stats["warm_hits"] += 1
+        if cached is None:
+            # Changed since the snapshot was taken, the database wins
+            self._forget_warm(key)
+            self.snapshot_stats["db_loads"] += 1
+            return await super().get_session(
+                app_name=app_name, user_id=user_id, session_id=session_id, config=config
+            )
+
+        self._remember_warm(key, cached)
+        if config is not None:
+            events = _select_events(cached.events, config)
+        else:
+            events = self._window_events(cached)
+        return Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=merged_state,
+            events=events,
+            last_update_time=update_time,
+        )
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await super().append_event(session=session, event=event)
+        key = (session.app_name, session.user_id, session.id)
+        cached = self._warm.get(key)
+        if cached is not None and not event.partial:
+            # Keep the warm copy in step with the database
+            cached.events.append(event)
+            self._warm_events += 1
+            self._warm.move_to_end(key)
+            self._trim_warm()
+        return event
+
+    async def delete_session(self, app_name: str, user_id: str, session_id: str) -> None:
+        self._forget_warm((app_name, user_id, session_id))
+        await super().delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
@@ -0,0 +1,443 @@
+# Sharded multi-file SQLite session store
+#
+# A single SQLite file serializes every writer on one lock, so all appends of
+# all users queue behind each other. ShardedSessionService spreads users over
+# N database files by hashing (app_name, user_id). Every shard has its own
+# DatabaseSessionService (own engine, own connections) driven by its own
+# writer thread, so appends to different shards commit in parallel. All
+# sessions of a user live on one shard, so user state never spans files.
+#
+# App state ("app:" keys) is shared by every user, so after a write that
+# changes it, the new value is copied to the other shards.
+#
+# Usage (from the repository root):
+#   python -m agents_shared.sharded_sessions bench --shards 1 2 4 8
+#   python -m agents_shared.sharded_sessions reshard my_agent_data --from-shards 4 --to-shards 8
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from typing import Any, Callable, Optional
+
+from google.adk.events import Event, EventActions
+from google.adk.sessions import BaseSessionService, DatabaseSessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+from google.adk.sessions.state import State
+from google.genai import types
+from sqlalchemy import inspect, text
+
+from agents_shared.compressed_sessions import (
+    blob_codec,
+    compress_content,
+    decompress_content,
+    is_compressed,
+)
+
+
+def shard_urls(base_path: str, shards: int) -> list[str]:
+    """SQLite URLs of a shard set, e.g. my_agent_data.shard0of4.db, ..."""
+    return [f"sqlite:///{base_path}.shard{i}of{shards}.db" for i in range(shards)]
+
+
+def shard_index(app_name: str, user_id: str, shards: int) -> int:
+    """Stable shard of a user (the same in every process and Python version)."""
+    return zlib.crc32(f"{app_name}\x00{user_id}".encode()) % shards
+
+
+class _Shard:
+    """One database file with its own session service and writer thread."""
+
+    def __init__(self, index: int, db_url: str, service_factory: Callable[..., DatabaseSessionService]):
+        self.index = index
+        self.db_url = db_url
+        self.service = service_factory(db_url=db_url)
+        if self.service.db_engine.dialect.name == "sqlite":
+            with self.service.db_engine.connect() as connection:
+                # Readers no longer block the writer of the same shard
+                connection.exec_driver_sql("PRAGMA journal_mode=WAL")
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name=f"session-shard-{index}", daemon=True
+        )
+        self.thread.start()
+
+    async def call(self, method: str, **kwargs) -> Any:
+        """Run a session service coroutine on this shard's thread."""
+        coroutine = getattr(self.service, method)(**kwargs)
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, self.loop))
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Run a blocking function on this shard's thread."""
+        async def _run():
+            return fn(*args)
+
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(_run(), self.loop))
+
+    def user_keys(self) -> list[tuple[str, str]]:
+        with self.service.db_engine.connect() as connection:
+            return [tuple(row) for row in connection.execute(text("SELECT DISTINCT app_name, user_id FROM sessions"))]
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.service.db_engine.dispose()
+
+
+def _user_tables(engine) -> list[tuple[str, list[str]]]:
+    """Tables holding per-user rows, `sessions` first so foreign keys hold."""
+    inspector = inspect(engine)
+    tables = []
+    for name in inspector.get_table_names():
+        columns = [column["name"] for column in inspector.get_columns(name)]
+        if "app_name" in columns and "user_id" in columns:
+            tables.append((name, columns))
+    return sorted(tables, key=lambda table: table[0] != "sessions")
+
+
+def _copy_app_state(source: _Shard, target: _Shard, app_name: str):
+    with source.service.db_engine.connect() as connection:
+        row = connection.execute(
+            text("SELECT state, update_time FROM app_states WHERE app_name = :app_name"),
+            {"app_name": app_name},
+        ).first()
+    if row is None:
+        return
+    values = {"app_name": app_name, "state": row[0], "update_time": row[1]}
+    with target.service.db_engine.begin() as connection:
+        updated = connection.execute(
+            text("UPDATE app_states SET state = :state, update_time = :update_time WHERE app_name = :app_name"),
+            values,
+        )
+        if not updated.rowcount:
+            connection.execute(
+                text("INSERT INTO app_states (app_name, state, update_time) VALUES (:app_name, :state, :update_time)"),
+                values,
+            )
+
+
+def _move_user(source: _Shard, target: _Shard, app_name: str, user_id: str) -> int:
+    """Copy every row of one user to another shard, then delete it at the source.
+
+    Rows are copied as stored (no JSON or pickle round trip). Content
+    compressed against a shared dictionary is recompressed without it, since
+    dictionary ids are local to one database file.
+    """
+    where = {"app_name": app_name, "user_id": user_id}
+    target_tables = {name for name, _ in _user_tables(target.service.db_engine)}
+    dictionaries = getattr(source.service, "dictionaries", {})
+    tables = [table for table in _user_tables(source.service.db_engine) if table[0] in target_tables]
+    moved = 0
+    with source.service.db_engine.begin() as src, target.service.db_engine.begin() as dst:
+        for name, columns in tables:
+            column_list = ", ".join(columns)
+            rows = src.execute(
+                text(f"SELECT {column_list} FROM {name} WHERE app_name = :app_name AND user_id = :user_id"),
+                where,
+            ).all()
+            insert = text(
+                f"INSERT INTO {name} ({column_list}) VALUES ({', '.join(':' + c for c in columns)})"
+            )
+            for row in rows:
+                values = dict(zip(columns, row))
+                content = values.get("content") if name == "events" else None
+                if is_compressed(content):
+                    codec, dictionary_id = blob_codec(content)
+                    if dictionary_id:
+                        values["content"] = compress_content(decompress_content(content, dictionaries), codec)
+                dst.execute(insert, values)
+            if name == "sessions":
+                moved = len(rows)
+        for name, _ in reversed(tables):
+            src.execute(text(f"DELETE FROM {name} WHERE app_name = :app_name AND user_id = :user_id"), where)
+    _copy_app_state(source, target, app_name)
+    return moved
+
+
+class ShardedSessionService(BaseSessionService):
+    """Session service that hashes users across several database files.
+
+    Calls for one user go to its shard only. Listing the sessions of a whole
+    app asks every shard at once and merges the answers.
+    """
+
+    def __init__(
+        self,
+        db_urls: list[str],
+        service_factory: Callable[..., DatabaseSessionService] = DatabaseSessionService,
+    ):
+        """Initializes the sharded service.
+
+        Args:
+            db_urls: One database URL per shard; `shard_urls` builds SQLite ones
+            service_factory: Session service class (or factory taking `db_url`)
+                used for every shard, e.g. CompressedDatabaseSessionService
+        """
+        if not db_urls:
+            raise ValueError("ShardedSessionService needs at least one shard.")
+        self.service_factory = service_factory
+        self.shards = [_Shard(i, url, service_factory) for i, url in enumerate(db_urls)]
+        # Reshard bookkeeping: users already moved, users being moved, calls in flight
+        self._moved: dict[tuple[str, str], _Shard] = {}
+        self._moving: dict[tuple[str, str], asyncio.Event] = {}
+        self._in_flight: dict[tuple[str, str], int] = {}
+        self._next_shards: Optional[list[_Shard]] = None
+        self._paused: Optional[asyncio.Event] = None
+
+    def shard_for(self, app_name: str, user_id: str) -> _Shard:
+        moved = self._moved.get((app_name, user_id))
+        if moved is not None:
+            return moved
+        return self.shards[shard_index(app_name, user_id, len(self.shards))]
+
+    async def _call(self, key: tuple[str, str], method: str, **kwargs) -> tuple[Any, _Shard]:
+        """Run a service method on the shard of user `key`; waits out a move of that user."""
+        while self._paused is not None or key in self._moving:
+            await (self._paused or self._moving[key]).wait()
+        shard = self.shard_for(*key)
+        self._in_flight[key] = self._in_flight.get(key, 0) + 1
+        try:
+            return await shard.call(method, **kwargs), shard
+        finally:
+            self._in_flight[key] -= 1
+            if not self._in_flight[key]:
+                del self._in_flight[key]
+
+    async def _replicate_app_state(self, app_name: str, source: _Shard):
+        shards = self.shards + (self._next_shards or [])
+        await asyncio.gather(*(
+            shard.run(_copy_app_state, source, shard, app_name)
+            for shard in shards
+            if shard is not source
+        ))
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        session, shard = await self._call(
+            (app_name, user_id),
+            "create_session",
+            app_name=app_name,
+            user_id=user_id,
+            state=state,
+            session_id=session_id,
+        )
+        if state and any(key.startswith(State.APP_PREFIX) for key in state):
+            await self._replicate_app_state(app_name, shard)
+        return session
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        session, _ = await self._call(
+            (app_name, user_id),
+            "get_session",
+            app_name=app_name,
+            user_id=user_id,
+            session_id=session_id,
+            config=config,
+        )
+        return session
+
+    async def list_sessions(
+        self, *, app_name: str, user_id: Optional[str] = None
+    ) -> ListSessionsResponse:
+        if user_id is not None:
+            response, _ = await self._call(
+                (app_name, user_id), "list_sessions", app_name=app_name, user_id=user_id
+            )
+            return response
+        # Scatter-gather; while resharding a user may briefly be on both sides
+        shards = self.shards + (self._next_shards or [])
+        responses = await asyncio.gather(*(
+            shard.call("list_sessions", app_name=app_name, user_id=None) for shard in shards
+        ))
+        sessions = {}
+        for response in responses:
+            for session in response.sessions:
+                sessions.setdefault((session.user_id, session.id), session)
+        return ListSessionsResponse(
+            sessions=sorted(sessions.values(), key=lambda s: s.last_update_time, reverse=True)
+        )
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        await self._call(
+            (app_name, user_id),
+            "delete_session",
+            app_name=app_name,
+            user_id=user_id,
+            session_id=session_id,
+        )
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        event, shard = await self._call(
+            (session.app_name, session.user_id), "append_event", session=session, event=event
+        )
+        state_delta = event.actions.state_delta if event.actions else None
+        if state_delta and any(k.startswith(State.APP_PREFIX) for k in state_delta):
+            await self._replicate_app_state(session.app_name, shard)
+        return event
+
+    async def _move(self, key: tuple[str, str], source: _Shard, target: _Shard) -> int:
+        done = self._moving[key] = asyncio.Event()
+        try:
+            while self._in_flight.get(key):
+                await asyncio.sleep(0.001)
+            moved = await source.run(_move_user, source, target, *key)
+            self._moved[key] = target
+            return moved
+        finally:
+            del self._moving[key]
+            done.set()
+
+    async def reshard(self, db_urls: list[str], concurrency: int = 8) -> dict:
+        """Move every user onto a new set of shards while the service stays up.
+
+        Users are moved one at a time. Calls for a user wait only while that
+        user's rows are being copied. A short global pause at the end picks up
+        users that appeared during the move, then the new shards take over.
+
+        Args:
+            db_urls: URLs of the new shard set (must not overlap the current one)
+            concurrency: Users moved at the same time
+
+        Returns:
+            Dict with the number of users and sessions moved and the seconds taken
+        """
+        if self._next_shards is not None:
+            raise ValueError("A reshard is already running.")
+        if set(db_urls) & {shard.db_url for shard in self.shards}:
+            raise ValueError("The new shard set must use new database files.")
+        started = time.perf_counter()
+        old_shards = self.shards
+        self._next_shards = [_Shard(i, url, self.service_factory) for i, url in enumerate(db_urls)]
+        limit = asyncio.Semaphore(concurrency)
+        users = sessions = 0
+
+        async def move_one(key, source):
+            async with limit:
+                target = self._next_shards[shard_index(*key, len(self._next_shards))]
+                return await self._move(key, source, target)
+
+        async def move_pass() -> int:
+            nonlocal users, sessions
+            jobs = []
+            for shard in old_shards:
+                for key in await shard.run(shard.user_keys):
+                    if key not in self._moved:
+                        jobs.append(move_one(key, shard))
+            for moved in await asyncio.gather(*jobs):
+                sessions += moved
+            users += len(jobs)
+            return len(jobs)
+
+        try:
+            await move_pass()
+            # Final pass with every call paused, so nobody writes to the old shards
+            self._paused = asyncio.Event()
+            while self._in_flight:
+                await asyncio.sleep(0.001)
+            await move_pass()
+            self.shards, self._next_shards = self._next_shards, None
+            self._moved.clear()
+        finally:
+            paused, self._paused = self._paused, None
+            if paused is not None:
+                paused.set()
+        for shard in old_shards:
+            shard.close()
+        return {"users": users, "sessions": sessions, "seconds": time.perf_counter() - started}
+
+    def close(self):
+        """Stop the shard threads and release their connections."""
+        for shard in self.shards:
+            shard.close()
+
+
+async def _append_load(service: BaseSessionService, users: int, events: int, content_bytes: int) -> float:
+    """Concurrent users each appending `events` events; returns appends per second."""
+    text_part = "x" * content_bytes
+
+    async def one_user(index: int):
+        session = await service.create_session(app_name="bench", user_id=f"user-{index}")
+        for i in range(events):
+            await service.append_event(
+                session,
+                Event(
+                    author="bench",
+                    invocation_id=f"inv-{i}",
+                    content=types.Content(role="model", parts=[types.Part(text=text_part)]),
+                    actions=EventActions(state_delta={"turn": i}),
+                ),
+            )
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_user(i) for i in range(users)))
+    return users * events / (time.perf_counter() - started)
+
+
+def benchmark(shard_counts: list[int], users: int = 64, events: int = 50, content_bytes: int = 1024) -> list[tuple[int, float]]:
+    """Append throughput of fresh shard sets of each size, in a temporary directory."""
+    results = []
+    for shards in shard_counts:
+        workdir = tempfile.mkdtemp(prefix="adk_shard_bench_")
+        service = ShardedSessionService(shard_urls(os.path.join(workdir, "sessions"), shards))
+        try:
+            rate = asyncio.run(_append_load(service, users, events, content_bytes))
+        finally:
+            service.close()
+            shutil.rmtree(workdir)
+        results.append((shards, rate))
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Sharded SQLite session store tools.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    bench = commands.add_parser("bench", help="Measure append throughput per shard count")
+    bench.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8], help="Shard counts to compare")
+    bench.add_argument("--users", type=int, default=64, help="Concurrent users appending")
+    bench.add_argument("--events", type=int, default=50, help="Events appended per user")
+    bench.add_argument("--content-bytes", type=int, default=1024, help="Text size of every event")
+    reshard = commands.add_parser("reshard", help="Move a shard set onto a different shard count")
+    reshard.add_argument("base_path", help="Shard file prefix, e.g. my_agent_data")
+    reshard.add_argument("--from-shards", type=int, required=True, help="Current shard count")
+    reshard.add_argument("--to-shards", type=int, required=True, help="New shard count")
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        print(f"\n ### Append throughput ({args.users} users x {args.events} events, {os.cpu_count()} CPUs)")
+        baseline = None
+        for shards, rate in benchmark(args.shards, args.users, args.events, args.content_bytes):
+            baseline = baseline or rate
+            print(f"   - {shards:3d} shards: {rate:9.1f} appends/s ({rate / baseline:.2f}x)")
+    else:
+        if args.from_shards == args.to_shards:
+            raise ValueError("--from-shards and --to-shards must differ.")
+        service = ShardedSessionService(shard_urls(args.base_path, args.from_shards))
+        result = asyncio.run(service.reshard(shard_urls(args.base_path, args.to_shards)))
+        service.close()
+        print(f"✅ Moved {result['users']} users ({result['sessions']} sessions) in {result['seconds']:.2f}s")
+        print(f"   - Old shard files {args.base_path}.shard*of{args.from_shards}.db can be removed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
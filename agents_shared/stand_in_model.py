@@ -0,0 +1,126 @@
+# Local stand-in model for load tests and benchmarks
+#
+# Answers every request locally, with a configurable delay, so agent folders
+# can be exercised without API keys, quota or network round trips.
+import asyncio
+import random
+
+from google.adk.agents import LlmAgent
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.adk.tools import AgentTool
+from google.genai import errors, types
+
+
+class StandInModel(BaseLlm):
+    """A BaseLlm that replies locally instead of calling Gemini.
+
+    The `model` field keeps the name of the model it replaces, so built-in
+    tools that check for a Gemini model name (google_search, the built-in code
+    executor) still accept the request.
+    """
+
+    model: str = "gemini-2.5-flash-lite"
+    latency: float = 0.0  # Seconds before the first chunk
+    latency_jitter: float = 0.0  # Extra uniform random delay in seconds
+    tail_rate: float = 0.0  # Share of calls that also wait tail_latency (slow outliers)
+    tail_latency: float = 0.0  # Extra seconds of a slow outlier
+    response_words: int = 20  # Length of the canned reply
+    chunk_words: int = 4  # Words per partial chunk when streaming
+    tool_args: dict[str, dict] = {}  # Function tools to call, with their args
+    throttle_rate: float = 0.0  # Share of calls refused with a 429 RESOURCE_EXHAUSTED error
+    fixed_reply: str = ""  # Reply given instead of the canned text on fixed_reply_rate of calls
+    fixed_reply_rate: float = 0.0
+    calls: int = 0
+
+    def _reply_text(self, llm_request) -> str:
+        prompt = ""
+        for content in reversed(llm_request.contents):
+            if content.role == "user" and content.parts and content.parts[0].text:
+                prompt = content.parts[0].text
+                break
+        words = ["Reply", "to:"] + prompt.split()[:8]
+        while len(words) < self.response_words:
+            words.append("lorem")
+        return " ".join(words[: self.response_words])
+
+    def _function_calls(self, llm_request) -> list[types.Part]:
+        # Only call tools on a fresh user message, never after a tool response
+        last = llm_request.contents[-1] if llm_request.contents else None
+        if not last or any(part.function_response for part in last.parts or []):
+            return []
+        return [
+            types.Part(function_call=types.FunctionCall(name=name, args=args))
+            for name, args in self.tool_args.items()
+            if name in llm_request.tools_dict
+        ]
+
+    async def generate_content_async(self, llm_request, stream: bool = False):
+        self.calls += 1
+        delay = self.latency + random.uniform(0, self.latency_jitter)
+        if self.tail_rate and random.random() < self.tail_rate:
+            delay += self.tail_latency
+        if delay:
+            await asyncio.sleep(delay)
+        if self.throttle_rate and random.random() < self.throttle_rate:
+            raise errors.ClientError(
+                429, {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED", "message": "Stand-in quota exceeded"}}
+            )
+
+        function_calls = self._function_calls(llm_request)
+        if function_calls:
+            yield LlmResponse(content=types.Content(role="model", parts=function_calls))
+            return
+
+        text = self._reply_text(llm_request)
+        if self.fixed_reply and random.random() < self.fixed_reply_rate:
+            text = self.fixed_reply
+        if stream:
+            words = text.split()
+            for i in range(0, len(words), self.chunk_words):
+                chunk = " ".join(words[i : i + self.chunk_words]) + " "
+                yield LlmResponse(
+                    content=types.Content(role="model", parts=[types.Part(text=chunk)]),
+                    partial=True,
+                )
+                if self.latency:
+                    await asyncio.sleep(self.latency / 10)
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[types.Part(text=text)]),
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=sum(
+                    len((part.text or "").split())
+                    for content in llm_request.contents
+                    for part in content.parts or []
+                ),
+                candidates_token_count=len(text.split()),
+            ),
+            turn_complete=True,
+        )
+
+
+def use_stand_in_model(agent, **model_kwargs) -> int:
+    """Swap the model of every LlmAgent under `agent` for a StandInModel.
+
+    Walks sub_agents and agents wrapped in AgentTool. The stand-in keeps the
+    replaced model's name.
+
+    Returns:
+        The number of agents that were switched
+    """
+    switched = 0
+    seen = set()
+    pending = [agent]
+    while pending:
+        current = pending.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        if isinstance(current, LlmAgent):
+            if current.model:
+                name = current.model if isinstance(current.model, str) else current.model.model
+                current.model = StandInModel(model=name, **model_kwargs)
+                switched += 1
+            pending.extend(tool.agent for tool in current.tools if isinstance(tool, AgentTool))
+        pending.extend(current.sub_agents)
+    return switched
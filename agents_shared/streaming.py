@@ -0,0 +1,118 @@
+# Token streaming for the session helpers, with time-to-first-token metrics
+#
+# With StreamingMode.SSE the runner yields partial events carrying text
+# deltas as the model produces them, then one final event with the whole
+# text. Session services never store partial events, so the final event is
+# the only stored copy. stream_text yields each delta once and skips the
+# final text of a response it already streamed, so nothing is printed twice.
+#
+# StreamMetrics records, per turn, the time to the first text delta (TTFT)
+# and the gaps between deltas (inter-token latency; one delta is one
+# streamed chunk, usually a few tokens).
+import statistics
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Optional
+
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.events import Event
+from google.adk.runners import Runner
+from google.genai import types
+
+
+@dataclass
+class StreamMetrics:
+    query: str
+    started: float = field(default_factory=time.perf_counter)
+    arrivals: list[float] = field(default_factory=list)  # perf_counter of every text delta
+    chars: int = 0
+    finished: Optional[float] = None
+
+    def record(self, text: str):
+        self.arrivals.append(time.perf_counter())
+        self.chars += len(text)
+
+    @property
+    def ttft(self) -> Optional[float]:
+        """Seconds from sending the query to the first text delta."""
+        return self.arrivals[0] - self.started if self.arrivals else None
+
+    @property
+    def inter_token(self) -> list[float]:
+        """Seconds between consecutive text deltas."""
+        return [b - a for a, b in zip(self.arrivals, self.arrivals[1:])]
+
+    def summary(self) -> dict:
+        gaps = sorted(self.inter_token)
+        return {
+            "ttft_ms": self.ttft * 1000 if self.ttft is not None else None,
+            "inter_token_p50_ms": statistics.median(gaps) * 1000 if gaps else None,
+            "inter_token_p95_ms": gaps[int(0.95 * (len(gaps) - 1))] * 1000 if gaps else None,
+            "deltas": len(self.arrivals),
+            "chars": self.chars,
+            "total_ms": ((self.finished or time.perf_counter()) - self.started) * 1000,
+        }
+
+
+def format_stream_metrics(metrics: StreamMetrics) -> str:
+    summary = metrics.summary()
+    if summary["ttft_ms"] is None:
+        return f"   [stream] no text, {summary['total_ms']:.0f}ms total"
+    line = f"   [stream] TTFT {summary['ttft_ms']:.0f}ms"
+    if summary["inter_token_p50_ms"] is not None:
+        line += f", inter-token p50 {summary['inter_token_p50_ms']:.1f}ms p95 {summary['inter_token_p95_ms']:.1f}ms"
+    return line + f", {summary['deltas']} deltas, {summary['chars']} chars, {summary['total_ms']:.0f}ms total"
+
+
+async def stream_text(
+    runner: Runner,
+    user_id: str,
+    session_id: str,
+    new_message: types.Content,
+    metrics: Optional[StreamMetrics] = None,
+    run_config: Optional[RunConfig] = None,
+    on_event: Optional[Callable[[Event], None]] = None,
+) -> AsyncIterator[tuple[str, str]]:
+    """Run one turn with SSE streaming and yield (author, text delta) pairs.
+
+    A response that arrives without partial events (a non-streaming model,
+    a tool's text) is yielded whole, once.
+
+    Args:
+        runner: The runner to drive
+        user_id: The user id
+        session_id: An existing session id
+        new_message: The user message
+        metrics: Filled in with the timing of every delta when given
+        run_config: Base run config; its streaming mode is switched to SSE
+        on_event: Called with every event the runner yields, partial or not
+    """
+    if run_config is None:
+        run_config = RunConfig(streaming_mode=StreamingMode.SSE)
+    else:
+        run_config = run_config.model_copy(update={"streaming_mode": StreamingMode.SSE})
+    streamed = set()  # authors whose current response was already streamed
+    async for event in runner.run_async(
+        user_id=user_id, session_id=session_id, new_message=new_message, run_config=run_config
+    ):
+        if on_event:
+            on_event(event)
+        parts = event.content.parts if event.content and event.content.parts else []
+        text = "".join(part.text for part in parts if part.text and not part.thought)
+        if event.partial:
+            if text:
+                streamed.add(event.author)
+                if metrics:
+                    metrics.record(text)
+                yield event.author, text
+            continue
+        if event.author in streamed:
+            # Final event of a streamed response: its text is what was streamed
+            streamed.discard(event.author)
+            continue
+        if text:
+            if metrics:
+                metrics.record(text)
+            yield event.author, text
+    if metrics:
+        metrics.finished = time.perf_counter()
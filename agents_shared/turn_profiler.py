@@ -0,0 +1,224 @@
+# Per-turn memory and CPU profiling for run_session
+#
+# TurnProfiler takes a tracemalloc snapshot before and after every query of a
+# session and reports what the turn allocated (and did not free), grouped by
+# the part of the stack that asked for it: ADK sessions, the rest of ADK,
+# genai types, our agent tools, our helpers... It also counts the events the
+# turn produced, and can write a sampled CPU profile of every turn as a
+# folded-stack file (one "frame;frame;frame count" line per stack, the input
+# format of flamegraph.pl and speedscope).
+#
+# Usage:
+#   await run_session(runner, session_service, queries, "s1", profile=True)
+#   await run_session(..., profile=TurnProfiler(cpu_profile_dir="profiles"))
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Optional
+
+AGENTS_DIR = os.path.dirname(os.path.abspath(__file__))
+# Agent folders (d1_..., d2_..., ...) hold the agents and their tools
+AGENT_FOLDERS = sorted(
+    name for name in os.listdir(AGENTS_DIR)
+    if re.match(r"d[0-9]+_", name) and os.path.isdir(os.path.join(AGENTS_DIR, name))
+)
+
+# An allocation belongs to the innermost frame of its stack that matches one of
+# these groups (checked in order for each frame), so a pydantic model built by
+# the session service counts as "ADK sessions", not "pydantic"
+DEFAULT_GROUPS = [
+    *(("agent tools", os.path.join(AGENTS_DIR, name) + os.sep) for name in AGENT_FOLDERS),
+    ("agents_shared", AGENTS_DIR + os.sep),
+    ("ADK sessions", os.path.join("google", "adk", "sessions") + os.sep),
+    ("ADK models", os.path.join("google", "adk", "models") + os.sep),
+    ("ADK other", os.path.join("google", "adk") + os.sep),
+    ("genai types", os.path.join("google", "genai") + os.sep),
+]
+
+# Used only when no frame matches a group above
+LIBRARY_GROUPS = [
+    ("sqlalchemy", os.sep + "sqlalchemy" + os.sep),
+    ("pydantic", os.sep + "pydantic" + os.sep),
+]
+
+
+def _event_kind(event) -> str:
+    if event.partial:
+        return "partial"
+    if event.actions and event.actions.compaction:
+        return "compaction"
+    parts = event.content.parts if event.content and event.content.parts else []
+    if any(part.function_call for part in parts):
+        return "function_call"
+    if any(part.function_response for part in parts):
+        return "function_response"
+    if any(part.text for part in parts):
+        return "text"
+    return "other"
+
+
+class _StackSampler:
+    """Sample the stack of one thread at a fixed interval into folded stacks."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="turn-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class TurnProfiler:
+    """Collects allocation deltas, event counts and optional CPU samples per turn."""
+
+    def __init__(
+        self,
+        groups: Optional[list[tuple[str, str]]] = None,
+        frames: int = 25,
+        top: int = 5,
+        cpu_profile_dir: Optional[str] = None,
+        cpu_sample_interval: float = 0.005,
+    ):
+        """Initializes the profiler.
+
+        Args:
+            groups: (name, path fragment) pairs used to group allocations,
+                DEFAULT_GROUPS when None
+            frames: Stack frames recorded per allocation; more frames let
+                allocations inside pydantic or json be tied to their caller
+            top: Allocation sites listed per turn
+            cpu_profile_dir: Directory for one folded-stack CPU profile per
+                turn, None to skip CPU profiling
+            cpu_sample_interval: Seconds between CPU stack samples
+        """
+        self.groups = DEFAULT_GROUPS if groups is None else groups
+        self.frames = frames
+        self.top = top
+        self.cpu_profile_dir = cpu_profile_dir
+        self.cpu_sample_interval = cpu_sample_interval
+        self.turns: list[dict] = []
+        self._started_tracing = False
+        self._turn: Optional[dict] = None
+
+    def _attribute(self, traceback) -> tuple[str, object]:
+        """Group of an allocation and the frame that put it there."""
+        for groups in (self.groups, LIBRARY_GROUPS):
+            # Traceback frames run from the oldest to the most recent call
+            for frame in reversed(traceback):
+                for name, fragment in groups:
+                    if fragment in frame.filename:
+                        return name, frame
+        return "other", traceback[-1]
+
+    def start_turn(self, query: str):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        self._turn = {
+            "index": len(self.turns) + 1,
+            "query": query,
+            "events": Counter(),
+            "sampler": None,
+            "snapshot": tracemalloc.take_snapshot(),
+            "started": time.perf_counter(),
+        }
+        if self.cpu_profile_dir:
+            os.makedirs(self.cpu_profile_dir, exist_ok=True)
+            sampler = _StackSampler(threading.get_ident(), self.cpu_sample_interval)
+            sampler.start()
+            self._turn["sampler"] = sampler
+
+    def record_event(self, event):
+        self._turn["events"][_event_kind(event)] += 1
+
+    def end_turn(self) -> dict:
+        """Finish the current turn and return its report."""
+        turn, self._turn = self._turn, None
+        seconds = time.perf_counter() - turn["started"]
+        sampler = turn.pop("sampler")
+        if sampler is not None:
+            sampler.stop()
+            turn["cpu_profile"] = os.path.join(self.cpu_profile_dir, f"turn_{turn['index']:03d}.folded")
+            sampler.write(turn["cpu_profile"])
+
+        before = turn.pop("snapshot")
+        after = tracemalloc.take_snapshot()
+        ignore = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__))
+        diffs = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "traceback")
+        by_group = Counter()
+        blocks = Counter()
+        sites = Counter()
+        for diff in diffs:
+            group, frame = self._attribute(diff.traceback)
+            by_group[group] += diff.size_diff
+            blocks[group] += diff.count_diff
+            sites[f"{frame.filename}:{frame.lineno}"] += diff.size_diff
+
+        turn.update(
+            seconds=seconds,
+            net_bytes=sum(by_group.values()),
+            by_group=dict(by_group),
+            blocks=dict(blocks),
+            top_sites=sites.most_common(self.top),
+            traced_bytes=tracemalloc.get_traced_memory()[0],
+            events=dict(turn["events"]),
+        )
+        self.turns.append(turn)
+        return turn
+
+    def close(self):
+        """Stop the CPU sampler of a turn cut short by an error, and tracemalloc if this profiler started it."""
+        if self._turn is not None:
+            if self._turn["sampler"] is not None:
+                self._turn["sampler"].stop()
+            self._turn = None
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def print_turn(self, turn: dict):
+        events = ", ".join(f"{kind}={count}" for kind, count in sorted(turn["events"].items()))
+        print(f"\n   [profile] turn {turn['index']}: {turn['seconds']:.2f}s, {sum(turn['events'].values())} events ({events})")
+        print(f"   [profile] net allocated {turn['net_bytes'] / 1024:+.1f} KiB, traced {turn['traced_bytes'] / 2**20:.1f} MiB")
+        for group, size in sorted(turn["by_group"].items(), key=lambda item: -abs(item[1])):
+            if size:
+                print(f"       {group:14s} {size / 1024:+10.1f} KiB {turn['blocks'][group]:+8d} blocks")
+        for where, size in turn["top_sites"]:
+            print(f"       {size / 1024:+10.1f} KiB  {where}")
+        if "cpu_profile" in turn:
+            print(f"   [profile] CPU samples: {turn['cpu_profile']}")
+
+    def print_summary(self):
+        if not self.turns:
+            return
+        largest = max(self.turns, key=lambda turn: turn["net_bytes"])
+        total = sum(turn["net_bytes"] for turn in self.turns)
+        print(f"\n   [profile] {len(self.turns)} turns, net {total / 1024:+.1f} KiB;"
+              f" largest turn {largest['index']} ({largest['net_bytes'] / 1024:+.1f} KiB): {largest['query'][:60]!r}")
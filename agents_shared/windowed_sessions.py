@@ -0,0 +1,244 @@
+# Windowed and lazy event loading for get_session
+#
+# DatabaseSessionService.get_session materializes every event of a session,
+# and the Runner calls it on every turn. With compaction enabled, events
+# covered by the last compaction are never sent to the model again, so the
+# turn only needs:
+#   - every compaction event (each one summarizes a different range), and
+#   - the raw events from the start of the last compaction onwards (the
+#     compactor needs the overlap invocations inside that range).
+# WindowedDatabaseSessionService loads exactly that window. Sessions without
+# compaction can be capped to their last N events. Older events stay
+# reachable through `older_events`, which pages through them lazily.
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Optional
+
+from google.adk.events import Event
+from google.adk.sessions import DatabaseSessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig
+from google.adk.sessions.database_session_service import StorageEvent
+from sqlalchemy import Column, Float, MetaData, String, Table, Text, select
+
+from agents_shared.compressed_sessions import load_raw_events
+
+_metadata = MetaData()
+
+# One row per session: where its window starts and which events are compactions
+session_windows = Table(
+    "session_windows",
+    _metadata,
+    Column("app_name", String(128), primary_key=True),
+    Column("user_id", String(128), primary_key=True),
+    Column("session_id", String(128), primary_key=True),
+    Column("last_compaction_start", Float, nullable=True),
+    Column("compaction_event_ids", Text, nullable=False, default="[]"),
+)
+
+
+def _compaction_start(event: Event) -> float:
+    compaction = event.actions.compaction
+    # Events loaded by DatabaseSessionService carry it as a plain dict
+    if isinstance(compaction, dict):
+        return compaction["start_timestamp"]
+    return compaction.start_timestamp
+
+
+class WindowedDatabaseSessionService(DatabaseSessionService):
+    """DatabaseSessionService whose get_session loads O(window) events.
+
+    get_session without a config returns the compaction window described at
+    the top of this module. Passing any GetSessionConfig, even an empty one,
+    loads the session exactly like DatabaseSessionService does.
+    """
+
+    def __init__(self, db_url: str, window_events: Optional[int] = None, **kwargs: Any):
+        """Initializes the service.
+
+        Args:
+            db_url: The database URL, e.g. "sqlite:///my_agent_data.db"
+            window_events: Events to load for sessions that have no compaction
+                yet, None to load them in full
+        """
+        super().__init__(db_url=db_url, **kwargs)
+        self.window_events = window_events
+        _metadata.create_all(self.db_engine)
+
+    def _read_window(self, key) -> Optional[tuple[Optional[float], list[str]]]:
+        with self.db_engine.connect() as connection:
+            row = connection.execute(
+                select(session_windows.c.last_compaction_start, session_windows.c.compaction_event_ids)
+                .where(
+                    session_windows.c.app_name == key[0],
+                    session_windows.c.user_id == key[1],
+                    session_windows.c.session_id == key[2],
+                )
+            ).first()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def _write_window(self, key, last_compaction_start, compaction_event_ids):
+        values = {
+            "last_compaction_start": last_compaction_start,
+            "compaction_event_ids": json.dumps(compaction_event_ids),
+        }
+        where = (
+            session_windows.c.app_name == key[0],
+            session_windows.c.user_id == key[1],
+            session_windows.c.session_id == key[2],
+        )
+        with self.db_engine.begin() as connection:
+            updated = connection.execute(session_windows.update().where(*where).values(**values))
+            if not updated.rowcount:
+                connection.execute(
+                    session_windows.insert().values(
+                        app_name=key[0], user_id=key[1], session_id=key[2], **values
+                    )
+                )
+
+    def _index_session(self, session: Session):
+        """Build the window row of a session from its full event list."""
+        compactions = [e for e in session.events if e.actions and e.actions.compaction]
+        last_start = _compaction_start(compactions[-1]) if compactions else None
+        self._write_window(
+            (session.app_name, session.user_id, session.id),
+            last_start,
+            [event.id for event in compactions],
+        )
+
+    def _window_events(self, session: Session) -> list[Event]:
+        """The events get_session without a config returns, picked from a full session."""
+        window = self._read_window((session.app_name, session.user_id, session.id))
+        if window is None:
+            self._index_session(session)
+            window = self._read_window((session.app_name, session.user_id, session.id))
+        last_compaction_start, compaction_event_ids = window
+        if last_compaction_start is not None:
+            compactions = set(compaction_event_ids)
+            return [
+                event
+                for event in session.events
+                if event.timestamp >= last_compaction_start or event.id in compactions
+            ]
+        if self.window_events:
+            return session.events[-self.window_events :]
+        return list(session.events)
+
+    def _query_events(self, key, *filters, order_by=None, limit=None) -> list[Event]:
+        """Load events of one session, inflating compressed content if any."""
+        with self.database_session_factory() as sql_session:
+            storage_events = load_raw_events(
+                sql_session,
+                self,
+                StorageEvent.app_name == key[0],
+                StorageEvent.user_id == key[1],
+                StorageEvent.session_id == key[2],
+                *filters,
+                order_by=order_by,
+                limit=limit,
+            )
+            return [storage_event.to_event() for storage_event in storage_events]
+
+    async def create_session(self, *, app_name: str, user_id: str, state=None, session_id=None) -> Session:
+        session = await super().create_session(
+            app_name=app_name, user_id=user_id, state=state, session_id=session_id
+        )
+        self._write_window((app_name, user_id, session.id), None, [])
+        return session
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        if config is not None:
+            return await super().get_session(
+                app_name=app_name, user_id=user_id, session_id=session_id, config=config
+            )
+        key = (app_name, user_id, session_id)
+        window = self._read_window(key)
+        if window is None:
+            # Session written before windowing: load it in full once to index it
+            session = await super().get_session(
+                app_name=app_name, user_id=user_id, session_id=session_id
+            )
+            if session:
+                self._index_session(session)
+            return session
+
+        last_compaction_start, compaction_event_ids = window
+        if last_compaction_start is not None:
+            window_config = GetSessionConfig(after_timestamp=last_compaction_start)
+        elif self.window_events:
+            window_config = GetSessionConfig(num_recent_events=self.window_events)
+        else:
+            window_config = None
+        session = await super().get_session(
+            app_name=app_name, user_id=user_id, session_id=session_id, config=window_config
+        )
+        if session is None or last_compaction_start is None:
+            return session
+
+        # Earlier compaction summaries still cover their own ranges
+        loaded = {event.id for event in session.events}
+        missing = [i for i in compaction_event_ids if i not in loaded]
+        older = self._query_events(key, StorageEvent.id.in_(missing)) if missing else []
+        if older:
+            session.events = sorted(older + session.events, key=lambda event: event.timestamp)
+        return session
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await super().append_event(session=session, event=event)
+        if event.partial or not (event.actions and event.actions.compaction):
+            return event
+        key = (session.app_name, session.user_id, session.id)
+        window = self._read_window(key)
+        compaction_event_ids = window[1] if window else []
+        self._write_window(
+            key,
+            _compaction_start(event),
+            compaction_event_ids + [event.id],
+        )
+        return event
+
+    async def delete_session(self, app_name: str, user_id: str, session_id: str) -> None:
+        await super().delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        with self.db_engine.begin() as connection:
+            connection.execute(
+                session_windows.delete().where(
+                    session_windows.c.app_name == app_name,
+                    session_windows.c.user_id == user_id,
+                    session_windows.c.session_id == session_id,
+                )
+            )
+
+    async def older_events(self, session: Session, page_size: int = 100) -> AsyncIterator[Event]:
+        """Yield the events before the loaded window, newest first, one page per query.
+
+        Compaction events already in `session.events` are skipped. Stored
+        compressed content (see compressed_sessions) is inflated as it is read.
+        """
+        non_compaction = [e for e in session.events if not (e.actions and e.actions.compaction)]
+        loaded = {event.id for event in session.events}
+        before = min((e.timestamp for e in non_compaction), default=None)
+        if before is None:
+            return
+        key = (session.app_name, session.user_id, session.id)
+        before_dt = datetime.fromtimestamp(before)
+        while True:
+            page = self._query_events(
+                key,
+                StorageEvent.timestamp < before_dt,
+                order_by=StorageEvent.timestamp.desc(),
+                limit=page_size,
+            )
+            for event in page:
+                if event.id not in loaded:
+                    yield event
+            if len(page) < page_size:
+                return
+            before_dt = datetime.fromtimestamp(page[-1].timestamp)
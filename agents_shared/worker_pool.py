@@ -0,0 +1,486 @@
+# Multi-process, session-affine serving of an agent folder
+#
+# One process running Runner.run_async does all event (de)serialization,
+# instruction templating and tool work on one core. SessionWorkerPool spreads
+# turns over N worker processes, each with its own Runner and session service:
+#   - every (user_id, session_id) goes to a fixed worker, picked on a
+#     consistent-hash ring, so a session's turns always hit the process that
+#     holds it in memory (in-memory services, caches); changing the worker
+#     count only moves the sessions of the ring segments that changed hands
+#   - a worker runs the turns of different sessions concurrently and the
+#     turns of one session in order
+#   - a worker that dies is restarted in the same ring slot; the turns it was
+#     running fail with RuntimeError (they may have been partly applied)
+#   - close() drains: no new turns are accepted, turns in flight finish, then
+#     every worker is told to exit and is killed only after drain_timeout
+#   - a folder whose session service only one process can own (the journal
+#     of JournaledSessionService, as in d2_lro_hitl) is rejected by start()
+#     when workers > 1, after the first worker reports it
+#
+# Workers are `python -m agents_shared.worker_pool worker` processes that
+# exchange JSON lines with the pool over stdin/stdout, like code_worker.py.
+# Sessions held in memory are lost when their worker restarts; use a
+# database session service in the agent folder when that matters.
+#
+# Usage (from the repository root):
+#   pool = SessionWorkerPool("d3_sessions", workers=4)
+#   await pool.start()
+#   reply = await pool.run_turn("user-1", "session-1", "Hello!")
+#   await pool.close()
+#
+#   python -m agents_shared.worker_pool bench d3_sessions --workers 1 2 4
+# measures turns/second per worker count with a local stand-in model.
+import argparse
+import asyncio
+import bisect
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+AGENTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(AGENTS_DIR)
+
+# Largest JSON line a worker or the pool will read
+MAX_LINE = 16 * 2**20
+
+
+def _ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent-hash ring mapping keys to node indexes."""
+
+    def __init__(self, nodes: int, replicas: int = 64):
+        """Initializes the ring.
+
+        Args:
+            nodes: Number of nodes (workers), indexed from 0
+            replicas: Points per node on the ring; more points even out the load
+        """
+        points = sorted((_ring_hash(f"worker-{node}#{replica}"), node)
+                        for node in range(nodes) for replica in range(replicas))
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key: str) -> int:
+        index = bisect.bisect(self._hashes, _ring_hash(key)) % len(self._hashes)
+        return self._nodes[index]
+
+
+def session_key(user_id: str, session_id: str) -> str:
+    return f"{user_id}\x00{session_id}"
+
+
+@dataclass
+class WorkerStats:
+    turns: int = 0
+    errors: int = 0  # Turns that raised in the worker
+    failed: int = 0  # Turns lost to a worker crash
+    restarts: int = 0
+    busy: int = 0  # Turns in flight right now
+    sessions: set = field(default_factory=set)  # Session keys routed to the worker
+
+
+class _WorkerProcess:
+    """One worker process and the turns waiting for its replies."""
+
+    def __init__(self, index: int, settings: dict, on_exit):
+        self.index = index
+        self.settings = settings
+        self.on_exit = on_exit
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.pending: dict[int, asyncio.Future] = {}
+        self.ready = asyncio.Event()
+        self.error: Optional[str] = None  # Set when the worker could not be restarted
+        self.info: dict = {}  # The worker's ready line
+        self.stats = WorkerStats()
+        self._reader: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self.ready.clear()
+        self.error = None
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "agents_shared.worker_pool", "worker", json.dumps(self.settings),
+            cwd=REPO_DIR,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=None if self.settings.get("verbose") else asyncio.subprocess.DEVNULL,
+            limit=MAX_LINE,
+            # Ctrl-C reaches the pool only, which then drains its workers
+            start_new_session=True,
+        )
+        line = await asyncio.wait_for(self._ready_line(), timeout=120)
+        if not line or json.loads(line).get("ready") is not True:
+            self.process.kill()
+            await self.process.wait()
+            raise RuntimeError(f"Worker {self.index} failed to start")
+        self.info = json.loads(line)
+        self._reader = asyncio.create_task(self._read_replies(self.process))
+        self.ready.set()
+
+    async def _ready_line(self) -> bytes:
+        # Importing agents_shared prints before the worker can move its
+        # output to stderr; skip up to the first JSON line
+        while line := await self.process.stdout.readline():
+            if line.startswith(b"{"):
+                return line
+        return b""
+
+    async def _read_replies(self, process):
+        while True:
+            line = await process.stdout.readline()
+            if not line:
+                break
+            reply = json.loads(line)
+            future = self.pending.pop(reply["id"], None)
+            if future is not None and not future.done():
+                future.set_result(reply)
+        await process.wait()
+        # Whatever was still running died with the process
+        for future in self.pending.values():
+            if not future.done():
+                self.stats.failed += 1
+                future.set_exception(RuntimeError(
+                    f"Worker {self.index} stopped (exit code {process.returncode}) during the turn"
+                ))
+        self.pending.clear()
+        await self.on_exit(self)
+
+    async def send(self, request: dict) -> dict:
+        await self.ready.wait()
+        if self.error:
+            raise RuntimeError(self.error)
+        if self.process.returncode is not None or self.process.stdin.is_closing():
+            raise RuntimeError(f"Worker {self.index} stopped before the turn was sent")
+        future = asyncio.get_running_loop().create_future()
+        # Registered before the write: the reply may arrive while draining
+        self.pending[request["id"]] = future
+        try:
+            self.process.stdin.write((json.dumps(request) + "\n").encode())
+            await self.process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError) as e:
+            self.pending.pop(request["id"], None)
+            raise RuntimeError(f"Worker {self.index} stopped before the turn was sent") from e
+        return await future
+
+    async def stop(self, timeout: float):
+        """Ask the worker to exit once its turns are done, kill it after timeout."""
+        self.ready.clear()
+        if self.process is None or self.process.returncode is not None:
+            return
+        self.process.stdin.close()
+        try:
+            await asyncio.wait_for(self.process.wait(), timeout)
+        except asyncio.TimeoutError:
+            self.process.kill()
+            await self.process.wait()
+        if self._reader is not None:
+            await self._reader
+
+
+class SessionWorkerPool:
+    """Serves turns of an agent folder from worker processes, one fixed worker per session."""
+
+    def __init__(
+        self,
+        folder: str,
+        workers: Optional[int] = None,
+        app_name: str = "worker_pool",
+        stand_in: bool = False,
+        model_latency: float = 0.0,
+        response_words: int = 40,
+        drain_timeout: float = 30.0,
+        verbose: bool = False,
+    ):
+        """Initializes the pool (call start() before use).
+
+        Args:
+            folder: Agent folder under agents_shared, or a path to an agent.py
+            workers: Worker processes, the CPU count by default
+            app_name: App name when the folder has no App
+            stand_in: Replace every model with a local StandInModel
+            model_latency: Stand-in model delay in seconds
+            response_words: Stand-in model reply length
+            drain_timeout: Seconds close() waits for turns in flight
+            verbose: Let workers write their output to this process's stderr
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.drain_timeout = drain_timeout
+        self.ring = HashRing(self.workers)
+        self._settings = {
+            "folder": folder,
+            "app_name": app_name,
+            "stand_in": stand_in,
+            "model_latency": model_latency,
+            "response_words": response_words,
+            "verbose": verbose,
+        }
+        self._workers: list[_WorkerProcess] = []
+        self._ids = itertools.count()
+        self._closing = False
+        # Turns accepted and not finished, including those waiting for a worker to (re)start
+        self._turns = 0
+        self._drained = asyncio.Event()
+        self._drained.set()
+
+    async def start(self):
+        self._workers = [_WorkerProcess(index, self._settings, self._worker_exited) for index in range(self.workers)]
+        # The first worker tells whether the folder's sessions can be split
+        # over processes before the others try to open them
+        await self._workers[0].start()
+        if self.workers > 1 and self._workers[0].info.get("single_process"):
+            self._closing = True
+            await self._workers[0].stop(self.drain_timeout)
+            raise ValueError(
+                f"The session service of {self._settings['folder']} can only be owned by one"
+                " process; use workers=1."
+            )
+        await asyncio.gather(*(worker.start() for worker in self._workers[1:]))
+
+    async def _worker_exited(self, worker: _WorkerProcess):
+        if self._closing:
+            return
+        worker.stats.restarts += 1
+        for attempt in range(3):
+            try:
+                await worker.start()
+                return
+            except Exception as e:
+                worker.error = f"Worker {worker.index} could not be restarted: {e!r}"
+                await asyncio.sleep(1 + attempt)
+        # Turns routed to the worker fail fast instead of waiting forever
+        worker.ready.set()
+
+    def worker_for(self, user_id: str, session_id: str) -> int:
+        return self.ring.node_for(session_key(user_id, session_id))
+
+    async def run_turn(self, user_id: str, session_id: str, text: str) -> dict:
+        """Run one turn on the session's worker, creating the session on first use.
+
+        Returns:
+            {"text": final response text, "events": events of the turn, "worker": index}
+        """
+        if self._closing:
+            raise RuntimeError("The worker pool is shutting down")
+        self._turns += 1
+        self._drained.clear()
+        try:
+            return await self._run_turn(user_id, session_id, text)
+        finally:
+            self._turns -= 1
+            if not self._turns:
+                self._drained.set()
+
+    async def _run_turn(self, user_id: str, session_id: str, text: str) -> dict:
+        index = self.worker_for(user_id, session_id)
+        worker = self._workers[index]
+        stats = worker.stats
+        stats.sessions.add(session_key(user_id, session_id))
+        stats.busy += 1
+        try:
+            reply = await worker.send(
+                {"id": next(self._ids), "user_id": user_id, "session_id": session_id, "text": text}
+            )
+        finally:
+            stats.busy -= 1
+        if reply.get("error"):
+            stats.errors += 1
+            raise RuntimeError(f"Worker {index}: {reply['error']}")
+        stats.turns += 1
+        return {"text": reply["text"], "events": reply["events"], "worker": index}
+
+    async def close(self):
+        """Drain turns in flight, then stop every worker."""
+        self._closing = True
+        try:
+            await asyncio.wait_for(self._drained.wait(), self.drain_timeout)
+        except asyncio.TimeoutError:
+            pass
+        await asyncio.gather(*(worker.stop(self.drain_timeout) for worker in self._workers))
+        # Turns still waiting for a worker fail instead of waiting forever
+        for worker in self._workers:
+            worker.error = "The worker pool is shut down"
+            worker.ready.set()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def stats(self) -> list[dict]:
+        return [
+            {
+                "worker": worker.index,
+                "pid": worker.process.pid if worker.process else None,
+                "turns": worker.stats.turns,
+                "sessions": len(worker.stats.sessions),
+                "errors": worker.stats.errors,
+                "failed": worker.stats.failed,
+                "restarts": worker.stats.restarts,
+            }
+            for worker in self._workers
+        ]
+
+
+def print_worker_report(pool: SessionWorkerPool):
+    for row in pool.stats():
+        print(
+            f"   [worker {row['worker']}] pid {row['pid']}: {row['turns']} turns, {row['sessions']} sessions,"
+            f" {row['errors']} errors, {row['failed']} lost to crashes, {row['restarts']} restarts"
+        )
+
+
+# -- worker process ----------------------------------------------------------
+
+
+async def _serve(settings: dict, replies):
+    from google.adk.apps.app import App
+    from google.adk.runners import Runner
+    from google.genai import types
+
+    from agents_shared.journal_sessions import JournaledSessionService
+    from agents_shared.load_test import load_agent_folder
+    from agents_shared.model_clients import model_clients
+    from agents_shared.stand_in_model import use_stand_in_model
+
+    target, session_service = load_agent_folder(settings["folder"])
+    root = target.root_agent if isinstance(target, App) else target
+    if settings["stand_in"]:
+        use_stand_in_model(root, latency=settings["model_latency"], response_words=settings["response_words"])
+    if isinstance(target, App):
+        runner = Runner(app=target, session_service=session_service)
+    else:
+        runner = Runner(agent=target, app_name=settings["app_name"], session_service=session_service)
+
+    loop = asyncio.get_running_loop()
+    requests = asyncio.StreamReader(limit=MAX_LINE)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(requests), sys.stdin)
+    # Session key -> [lock held while one of its turns runs, turns running or waiting]
+    session_locks: dict[str, list] = {}
+    running: set[asyncio.Task] = set()
+
+    def reply(message: dict):
+        replies.write(json.dumps(message) + "\n")
+        replies.flush()
+
+    async def turn(request: dict):
+        key = session_key(request["user_id"], request["session_id"])
+        entry = session_locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                session = await session_service.get_session(
+                    app_name=runner.app_name, user_id=request["user_id"], session_id=request["session_id"]
+                )
+                if session is None:
+                    await session_service.create_session(
+                        app_name=runner.app_name, user_id=request["user_id"], session_id=request["session_id"]
+                    )
+                events, text = 0, ""
+                message = types.Content(role="user", parts=[types.Part(text=request["text"])])
+                async for event in runner.run_async(
+                    user_id=request["user_id"], session_id=request["session_id"], new_message=message
+                ):
+                    events += 1
+                    if event.content and event.content.parts and not event.partial:
+                        text = "".join(part.text for part in event.content.parts if part.text) or text
+            reply({"id": request["id"], "text": text, "events": events})
+        except Exception as e:
+            reply({"id": request["id"], "error": repr(e)})
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del session_locks[key]
+
+    # A journal is locked by the process that opened it
+    single_process = isinstance(session_service, JournaledSessionService)
+    reply({"ready": True, "pid": os.getpid(), "single_process": single_process})
+    # Closed stdin means the pool is shutting down: finish what is running
+    while line := await requests.readline():
+        task = asyncio.create_task(turn(json.loads(line)))
+        running.add(task)
+        task.add_done_callback(running.discard)
+    if running:
+        await asyncio.wait(running)
+    await model_clients.aclose()
+
+
+def worker_main(settings: dict) -> int:
+    # Replies go over the original stdout; everything the agent folder
+    # prints (including at import) goes to stderr instead
+    replies = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    asyncio.run(_serve(settings, replies))
+    return 0
+
+
+# -- benchmark ---------------------------------------------------------------
+
+
+async def _bench_run(args, workers: int) -> tuple[float, SessionWorkerPool]:
+    pool = SessionWorkerPool(
+        args.folder, workers=workers, stand_in=True,
+        model_latency=args.model_latency, response_words=args.response_words,
+    )
+    await pool.start()
+
+    async def user(index: int):
+        for turn in range(args.turns):
+            await pool.run_turn(f"vu-{index}", f"vu-{index}-s0", f"Turn {turn}: {args.prompt}")
+
+    # One warm-up turn per worker process before timing
+    await asyncio.gather(*(pool.run_turn(f"warmup-{i}", "warmup", "Hello") for i in range(workers * 4)))
+    started = time.perf_counter()
+    await asyncio.gather(*(user(i) for i in range(args.users)))
+    seconds = time.perf_counter() - started
+    await pool.close()
+    return seconds, pool
+
+
+async def run_bench(args):
+    print(f"\n ### Worker pool: {args.folder}, {args.users} users x {args.turns} turns, stand-in model"
+          f" ({os.cpu_count()} CPUs)")
+    if max(args.workers) > (os.cpu_count() or 1):
+        print(f"   - Only {os.cpu_count()} CPUs: worker counts above that show the pool's overhead, not scaling")
+    baseline = None
+    for workers in args.workers:
+        seconds, pool = await _bench_run(args, workers)
+        rate = args.users * args.turns / seconds
+        baseline = baseline or rate
+        print(f"   - {workers} workers: {rate:7.1f} turns/s ({rate / baseline:.2f}x)")
+        if args.verbose:
+            print_worker_report(pool)
+
+
+def main(argv=None) -> int:
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv[:1] == ["worker"]:
+        return worker_main(json.loads(argv[1]))
+
+    parser = argparse.ArgumentParser(description="Session-affine multi-process serving of an agent folder.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    bench = subcommands.add_parser("bench", help="Turns/second per worker count with a stand-in model")
+    bench.add_argument("folder", help="Agent folder under agents_shared (e.g. d3_sessions)")
+    bench.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to compare")
+    bench.add_argument("--users", type=int, default=32, help="Concurrent users, one session each")
+    bench.add_argument("--turns", type=int, default=10, help="Turns per session")
+    bench.add_argument("--prompt", default="Tell me something interesting.", help="Text sent on every turn")
+    bench.add_argument("--model-latency", type=float, default=0.0, help="Stand-in model delay in seconds")
+    bench.add_argument("--response-words", type=int, default=40, help="Stand-in model reply length")
+    bench.add_argument("--verbose", action="store_true", help="Print per-worker counters")
+    args = parser.parse_args(argv)
+    asyncio.run(run_bench(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
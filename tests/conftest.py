@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The tests import agents_shared from the repository root, as the agent folders do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,68 @@
+import asyncio
+
+from google.adk.agents import LlmAgent
+from google.adk.apps.app import App, ResumabilityConfig
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.adk.tools import ToolContext
+from google.genai import types
+
+from agents_shared import check_for_approval, create_approval_response
+from agents_shared.stand_in_model import StandInModel
+
+
+def _order(port: str, tool_context: ToolContext) -> dict:
+    if not tool_context.tool_confirmation:
+        tool_context.request_confirmation(hint=f"Ship to {port}?", payload={"port": port})
+        return {"status": "pending"}
+    return {"status": "approved" if tool_context.tool_confirmation.confirmed else "rejected"}
+
+
+def ship_to_rotterdam(tool_context: ToolContext) -> dict:
+    """Ships an order to Rotterdam."""
+    return _order("Rotterdam", tool_context)
+
+
+def ship_to_lagos(tool_context: ToolContext) -> dict:
+    """Ships an order to Lagos."""
+    return _order("Lagos", tool_context)
+
+
+def test_every_pending_approval_is_answered_in_one_resume():
+    model = StandInModel(tool_args={"ship_to_rotterdam": {}, "ship_to_lagos": {}})
+    agent = LlmAgent(name="Shipping", model=model, tools=[ship_to_rotterdam, ship_to_lagos])
+    app = App(name="shipping", root_agent=agent, resumability_config=ResumabilityConfig(is_resumable=True))
+    session_service = InMemorySessionService()
+    runner = Runner(app=app, session_service=session_service)
+
+    async def scenario():
+        session = await session_service.create_session(app_name="shipping", user_id="user")
+        message = types.Content(role="user", parts=[types.Part(text="Ship both orders")])
+        events = [event async for event in runner.run_async(user_id="user", session_id=session.id, new_message=message)]
+        approval_info = check_for_approval(events)
+
+        by_port = {approval["payload"]["port"]: approval["approval_id"] for approval in approval_info["approvals"]}
+        answer = create_approval_response(approval_info, {by_port["Rotterdam"]: True})
+        resumed = [
+            event
+            async for event in runner.run_async(
+                user_id="user",
+                session_id=session.id,
+                new_message=answer,
+                invocation_id=approval_info["invocation_id"],
+            )
+        ]
+        stored = await session_service.get_session(app_name="shipping", user_id="user", session_id=session.id)
+        return events, approval_info, resumed, stored
+
+    events, approval_info, resumed, stored = asyncio.run(scenario())
+    assert sorted(a["tool"] for a in approval_info["approvals"]) == ["ship_to_lagos", "ship_to_rotterdam"]
+    assert approval_info["approval_id"] == approval_info["approvals"][0]["approval_id"]
+    results = {
+        response.name: response.response["status"]
+        for event in resumed
+        for response in event.get_function_responses()
+    }
+    assert results == {"ship_to_rotterdam": "approved", "ship_to_lagos": "rejected"}
+    # The session holds the answers, so nothing is pending any more
+    assert check_for_approval(stored.events) is None
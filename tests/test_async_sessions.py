@@ -0,0 +1,99 @@
+import asyncio
+
+from google.adk.events import Event, EventActions
+from google.adk.sessions import DatabaseSessionService
+from google.genai import types
+
+from agents_shared.async_sessions import AsyncDatabaseSessionService, async_database_url
+
+
+def _event(i: int) -> Event:
+    return Event(
+        author="writer",
+        invocation_id=f"inv-{i}",
+        content=types.Content(role="model", parts=[types.Part(text=f"turn {i}")]),
+        actions=EventActions(state_delta={"turn": i, "user:turns": i + 1}),
+    )
+
+
+def test_uses_the_aiosqlite_driver(tmp_path):
+    assert async_database_url(f"sqlite:///{tmp_path}/a.db") == f"sqlite+aiosqlite:///{tmp_path}/a.db"
+    service = AsyncDatabaseSessionService(f"sqlite:///{tmp_path / 'sessions.db'}")
+    assert service.db_engine.url.drivername == "sqlite+aiosqlite"
+
+
+def test_append_is_committed_when_it_returns(tmp_path):
+    db_url = f"sqlite:///{tmp_path / 'sessions.db'}"
+    service = AsyncDatabaseSessionService(db_url)
+    plain = DatabaseSessionService(db_url=db_url)
+
+    async def scenario():
+        session = await service.create_session(app_name="app", user_id="user", state={"topic": "tides"})
+        for i in range(3):
+            await service.append_event(session, _event(i))
+            # Another connection sees the event as soon as append_event returns
+            stored = await plain.get_session(app_name="app", user_id="user", session_id=session.id)
+            assert len(stored.events) == i + 1
+            assert stored.state["turn"] == i
+        return session
+
+    session = asyncio.run(scenario())
+    stored = asyncio.run(plain.get_session(app_name="app", user_id="user", session_id=session.id))
+    assert stored.state == {"topic": "tides", "turn": 2, "user:turns": 3}
+    assert [event.content.parts[0].text for event in stored.events] == ["turn 0", "turn 1", "turn 2"]
+
+
+def test_concurrent_appends_share_commits_across_event_loops(tmp_path):
+    service = AsyncDatabaseSessionService(f"sqlite:///{tmp_path / 'sessions.db'}")
+
+    async def users(count: int, events: int) -> list:
+        sessions = [await service.create_session(app_name="app", user_id=f"user-{i}") for i in range(count)]
+
+        async def one_user(session):
+            for i in range(events):
+                await service.append_event(session, _event(i))
+
+        await asyncio.gather(*(one_user(session) for session in sessions))
+        return sessions
+
+    # Each asyncio.run() is a new event loop; the service must work in all of them
+    for _ in range(2):
+        sessions = asyncio.run(users(8, 5))
+    assert service.stats["appends"] == 2 * 8 * 5
+    assert service.stats["commits"] < service.stats["appends"]
+    assert service.stats["largest_batch"] > 1
+
+    async def read_back():
+        listed = await service.list_sessions(app_name="app")
+        loaded = await service.get_session(app_name="app", user_id="user-0", session_id=sessions[0].id)
+        await service.delete_session(app_name="app", user_id="user-0", session_id=sessions[0].id)
+        gone = await service.get_session(app_name="app", user_id="user-0", session_id=sessions[0].id)
+        return listed, loaded, gone
+
+    listed, loaded, gone = asyncio.run(read_back())
+    assert len(listed.sessions) == 16
+    assert len(loaded.events) == 5 and loaded.state["turn"] == 4
+    assert gone is None
+
+
+def test_an_append_to_a_deleted_session_fails_alone(tmp_path):
+    service = AsyncDatabaseSessionService(f"sqlite:///{tmp_path / 'sessions.db'}")
+
+    async def scenario():
+        kept = await service.create_session(app_name="app", user_id="user")
+        deleted = await service.create_session(app_name="app", user_id="user")
+        await service.delete_session(app_name="app", user_id="user", session_id=deleted.id)
+        # Both appends land in the same commit group
+        results = await asyncio.gather(
+            service.append_event(kept, _event(0)), service.append_event(deleted, _event(0)), return_exceptions=True
+        )
+        stored = await service.get_session(app_name="app", user_id="user", session_id=kept.id)
+        return kept, deleted, results, stored
+
+    kept, deleted, results, stored = asyncio.run(scenario())
+    assert isinstance(results[1], ValueError) and not isinstance(results[0], Exception)
+    assert service.stats["commits"] == 1 and service.stats["appends"] == 1
+    assert len(stored.events) == 1 and stored.state["turn"] == 0
+    # The failed append is not applied to the caller's session either
+    assert len(kept.events) == 1 and kept.state["turn"] == 0
+    assert deleted.events == [] and "turn" not in deleted.state
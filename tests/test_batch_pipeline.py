@@ -0,0 +1,38 @@
+import asyncio
+
+from google.adk.agents import LlmAgent, SequentialAgent
+
+from agents_shared.batch_pipeline import run_pipelined_batch
+from agents_shared.stand_in_model import StandInModel
+
+
+def _pipeline(latency: float, **editor_model) -> SequentialAgent:
+    return SequentialAgent(
+        name="Pipeline",
+        sub_agents=[
+            LlmAgent(name="Drafter", model=StandInModel(latency=latency), output_key="draft"),
+            LlmAgent(name="Editor", model=StandInModel(latency=latency, **editor_model), output_key="edited"),
+        ],
+    )
+
+
+def test_stages_overlap_and_every_input_gets_its_session():
+    queries = [f"topic {i}" for i in range(6)]
+    results, report = asyncio.run(run_pipelined_batch(_pipeline(0.1), queries))
+
+    assert [result["query"] for result in results] == queries
+    for query, result in zip(queries, results):
+        assert result["error"] is None
+        assert result["state"]["draft"].startswith(f"Reply to: {query}")
+        assert "edited" in result["state"]
+    assert [stage["items"] for stage in report["stages"]] == [6, 6]
+    # One input after another would take 6 x 2 x 0.1s
+    assert report["wall_seconds"] < 1.0
+
+
+def test_a_failed_input_skips_the_remaining_stages():
+    results, report = asyncio.run(run_pipelined_batch(_pipeline(0.0, throttle_rate=1.0), ["a", "b"]))
+
+    assert all(result["error"].startswith("Editor:") for result in results)
+    assert all("draft" in result["state"] and "edited" not in result["state"] for result in results)
+    assert report["stages"][1]["errors"] == 2
@@ -0,0 +1,74 @@
+import asyncio
+
+from google.adk.agents import LlmAgent
+from google.adk.models.llm_response import LlmResponse
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+
+from agents_shared.best_of_n import BestOfNRefinement
+from agents_shared.stand_in_model import StandInModel
+
+
+class ScriptedModel(StandInModel):
+    """Replies and delays taken in order, one per call."""
+
+    replies: list[str] = []
+    delays: list[float] = []
+
+    async def generate_content_async(self, llm_request, stream: bool = False):
+        call = self.calls
+        self.calls += 1
+        if call < len(self.delays):
+            await asyncio.sleep(self.delays[call])
+        text = self.replies[min(call, len(self.replies) - 1)]
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=text)]))
+
+
+def _refinement(critic_replies, refiner_delays, candidates=3, max_rounds=2):
+    critic = LlmAgent(
+        name="Critic", model=ScriptedModel(replies=critic_replies), instruction="Review the story.",
+        output_key="critique",
+    )
+    refiner = LlmAgent(
+        name="Refiner", model=ScriptedModel(replies=["A better story."], delays=refiner_delays),
+        instruction="Improve the story.", output_key="current_story",
+    )
+    return BestOfNRefinement(
+        name="Refinement", sub_agents=[critic, refiner], candidates=candidates, max_rounds=max_rounds,
+    )
+
+
+async def _run(agent):
+    runner = InMemoryRunner(agent=agent)
+    session = await runner.session_service.create_session(
+        app_name=runner.app_name, user_id="user", state={"current_story": "A draft."}
+    )
+    message = types.Content(role="user", parts=[types.Part(text="Write a story")])
+    async for _ in runner.run_async(user_id="user", session_id=session.id, new_message=message):
+        pass
+    return await runner.session_service.get_session(app_name=runner.app_name, user_id="user", session_id=session.id)
+
+
+def test_first_approved_candidate_wins_and_cancels_the_rest():
+    agent = _refinement(["Needs more detail.", "APPROVED"], refiner_delays=[0.0, 1.0, 1.0])
+    session = asyncio.run(_run(agent))
+
+    assert session.state["current_story"] == "A better story."
+    assert session.state["critique"] == "APPROVED"
+    stats = agent.stats
+    assert (stats.stories, stats.approved, stats.rounds) == (1, 1, 1)
+    assert stats.candidates_started == 3
+    assert stats.candidates_cancelled == 2
+    assert stats.cancelled_calls == 2
+    # Only the winner is written, in one event
+    assert [event.author for event in session.events if event.author == "Refinement"] == ["Refinement"]
+
+
+def test_unapproved_story_stops_after_max_rounds():
+    agent = _refinement(["Needs more detail."], refiner_delays=[], candidates=2, max_rounds=2)
+    session = asyncio.run(_run(agent))
+
+    assert session.state["critique"] == "Needs more detail."
+    assert agent.stats.rounds == 2
+    assert agent.stats.approved == 0
+    assert sum(event.author == "Refinement" for event in session.events) == 2
@@ -0,0 +1,85 @@
+import asyncio
+import gc
+import glob
+import os
+import tempfile
+
+from google.adk.events import Event
+from google.genai import types
+
+from agents_shared import BoundedInMemorySessionService
+
+
+def _event(text: str) -> Event:
+    return Event(author="writer", invocation_id="inv", content=types.Content(role="model", parts=[types.Part(text=text)]))
+
+
+async def _fill(service, sessions: int, text: str) -> list:
+    created = []
+    for i in range(sessions):
+        session = await service.create_session(app_name="app", user_id="user", state={"index": i})
+        await service.append_event(session, _event(text))
+        created.append(session.id)
+    return created
+
+
+async def _read_all(service, session_ids: list) -> list:
+    loaded = []
+    for session_id in session_ids:
+        session = await service.get_session(app_name="app", user_id="user", session_id=session_id)
+        loaded.append(session.state["index"])
+    return loaded
+
+
+def test_default_spill_file_leaves_nothing_on_disk():
+    pattern = os.path.join(tempfile.gettempdir(), "adk_sessions_*")
+    before = set(glob.glob(pattern))
+    service = BoundedInMemorySessionService(max_sessions=2)
+    assert set(glob.glob(pattern)) == before
+
+    session_ids = asyncio.run(_fill(service, 5, "hello " * 50))
+    assert service.memory_stats()["spilled_sessions"] == 3
+    assert asyncio.run(_read_all(service, session_ids)) == [0, 1, 2, 3, 4]
+    assert service.stats["rehydrations"] >= 3
+    assert set(glob.glob(pattern)) == before
+    service.close()
+
+
+def test_compaction_keeps_spilled_sessions(tmp_path):
+    # Incompressible text, so the spill file passes the 1 MiB compaction floor
+    text = os.urandom(300 * 1024).hex()
+    for spill_path in (None, str(tmp_path / "sessions.spill")):
+        service = BoundedInMemorySessionService(max_sessions=1, spill_path=spill_path)
+        session_ids = asyncio.run(_fill(service, 3, text))
+        for _ in range(3):
+            assert asyncio.run(_read_all(service, session_ids)) == [0, 1, 2]
+        assert service.stats["compactions"] >= 1
+        assert service.memory_stats()["spill_file_bytes"] < 4 * len(text)
+        service.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_named_spill_file_is_removed_with_the_service(tmp_path):
+    spill_path = tmp_path / "sessions.spill"
+    service = BoundedInMemorySessionService(max_sessions=1, spill_path=str(spill_path))
+    asyncio.run(_fill(service, 2, "hello"))
+    assert spill_path.exists()
+    del service
+    gc.collect()
+    assert not spill_path.exists()
+
+
+def test_append_to_a_deleted_session_is_dropped():
+    service = BoundedInMemorySessionService(max_sessions=1)
+
+    async def scenario():
+        session = await service.create_session(app_name="app", user_id="user")
+        await service.delete_session(app_name="app", user_id="user", session_id=session.id)
+        await service.append_event(session, _event("too late"))
+        # Spilling the LRU session must not trip over the deleted one
+        return await _fill(service, 2, "hello")
+
+    session_ids = asyncio.run(scenario())
+    assert service.memory_stats()["hot_sessions"] == 1
+    assert asyncio.run(_read_all(service, session_ids)) == [0, 1]
+    service.close()
@@ -0,0 +1,103 @@
+import asyncio
+import sqlite3
+
+import pytest
+from google.adk.events import Event
+from google.adk.sessions import DatabaseSessionService
+from google.genai import types
+
+from agents_shared.compressed_sessions import (
+    CODEC_ZLIB,
+    CODEC_ZSTD,
+    DICTIONARY_TABLE,
+    CompressedDatabaseSessionService,
+    migrate_database,
+    zstandard,
+)
+
+CODECS = [
+    CODEC_ZLIB,
+    pytest.param(CODEC_ZSTD, marks=pytest.mark.skipif(zstandard is None, reason="zstandard is not installed")),
+]
+
+
+def _event(text: str) -> Event:
+    return Event(author="writer", invocation_id="inv", content=types.Content(role="model", parts=[types.Part(text=text)]))
+
+
+def _texts(session) -> list[str]:
+    return [event.content.parts[0].text for event in session.events]
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_reads_dictionaries_trained_by_another_service(tmp_path, codec):
+    db_url = f"sqlite:///{tmp_path / 'sessions.db'}"
+
+    async def scenario():
+        # Both services start before any dictionary exists
+        reader = CompressedDatabaseSessionService(db_url=db_url, codec=codec)
+        writer = CompressedDatabaseSessionService(db_url=db_url, codec=codec, train_after=5)
+        session = await writer.create_session(app_name="app", user_id="user")
+        texts = [
+            f"The lighthouse keeper climbed the stairs for night number {i} and lit the great lamp"
+            " so that the fishing boats could find the harbour."
+            for i in range(8)
+        ]
+        for text in texts:
+            await writer.append_event(session, _event(text))
+        assert writer.compressor.dictionary_id
+        assert not reader.compressor.dictionary_id
+
+        loaded = await reader.get_session(app_name="app", user_id="user", session_id=session.id)
+        assert _texts(loaded) == texts
+        stored = list(reader.iter_stored_events(app_name="app", user_id="user", session_id=session.id))
+        assert any(event.compressed for event in stored)
+        assert [event.content().parts[0].text for event in stored] == texts
+
+    asyncio.run(scenario())
+
+
+def test_train_after_zero_never_trains(tmp_path):
+    db_path = tmp_path / "sessions.db"
+    service = CompressedDatabaseSessionService(db_url=f"sqlite:///{db_path}", codec=CODEC_ZLIB, train_after=0)
+
+    async def scenario():
+        session = await service.create_session(app_name="app", user_id="user")
+        for i in range(5):
+            await service.append_event(session, _event(f"short note {i} about the harbour"))
+
+    asyncio.run(scenario())
+    assert not service.compressor.dictionary_id
+    with sqlite3.connect(db_path) as connection:
+        assert connection.execute(f"SELECT count(*) FROM {DICTIONARY_TABLE}").fetchone()[0] == 0
+
+
+def test_unknown_dictionary_is_still_an_error(tmp_path):
+    db_url = f"sqlite:///{tmp_path / 'sessions.db'}"
+    service = CompressedDatabaseSessionService(db_url=db_url, codec=CODEC_ZLIB)
+    with pytest.raises(KeyError, match="dictionary 7"):
+        service.dictionaries[7]
+
+
+def test_migrated_database_reads_back(tmp_path):
+    db_path = tmp_path / "sessions.db"
+    db_url = f"sqlite:///{db_path}"
+
+    async def write():
+        plain = DatabaseSessionService(db_url=db_url)
+        session = await plain.create_session(app_name="app", user_id="user")
+        texts = ["word " * 400] + [f"short note {i} about the harbour and the boats in it" for i in range(20)]
+        for text in texts:
+            await plain.append_event(session, _event(text))
+        plain.db_engine.dispose()
+        return session.id, texts
+
+    session_id, texts = asyncio.run(write())
+    result = migrate_database(str(db_path))
+    assert result["compressed"] >= 1
+    with sqlite3.connect(db_path) as connection:
+        assert connection.execute("SELECT count(*) FROM events WHERE typeof(content) = 'blob'").fetchone()[0]
+
+    service = CompressedDatabaseSessionService(db_url=db_url)
+    loaded = asyncio.run(service.get_session(app_name="app", user_id="user", session_id=session_id))
+    assert _texts(loaded) == texts
@@ -0,0 +1,81 @@
+import asyncio
+import threading
+import time
+
+from google.adk.agents import LlmAgent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.adk.tools import FunctionTool, ToolContext
+from google.genai import types
+
+from agents_shared.concurrent_tools import ConcurrentFunctionTool, ToolDispatcher, concurrent_tools
+from agents_shared.stand_in_model import StandInModel
+
+threads = {}
+
+
+def lookup_weather(city: str) -> dict:
+    """Looks up the weather of a city."""
+    threads["lookup_weather"] = threading.current_thread().name
+    time.sleep(0.3)
+    return {"weather": f"sunny in {city}"}
+
+
+def lookup_flights(city: str) -> dict:
+    """Looks up flights to a city."""
+    threads["lookup_flights"] = threading.current_thread().name
+    time.sleep(0.3)
+    return {"flights": 3}
+
+
+def remember_city(city: str, tool_context: ToolContext) -> dict:
+    """Remembers the city in the session state."""
+    threads["remember_city"] = threading.current_thread().name
+    tool_context.state["city"] = city
+    return {"remembered": city}
+
+
+def _run_turn(dispatcher: ToolDispatcher):
+    tools = concurrent_tools([lookup_weather, FunctionTool(lookup_flights), remember_city], dispatcher)
+    calls = {tool.name: {"city": "Oslo"} for tool in tools}
+    agent = LlmAgent(name="Travel", model=StandInModel(tool_args=calls), tools=tools)
+    session_service = InMemorySessionService()
+    runner = Runner(app_name="app", agent=agent, session_service=session_service)
+
+    async def scenario():
+        session = await session_service.create_session(app_name="app", user_id="user")
+        message = types.Content(role="user", parts=[types.Part(text="Plan a trip")])
+        started = time.perf_counter()
+        events = [event async for event in runner.run_async(user_id="user", session_id=session.id, new_message=message)]
+        seconds = time.perf_counter() - started
+        stored = await session_service.get_session(app_name="app", user_id="user", session_id=session.id)
+        return events, seconds, stored
+
+    return tools, *asyncio.run(scenario())
+
+
+def test_sync_calls_of_one_turn_overlap():
+    dispatcher = ToolDispatcher(max_per_turn=4)
+    tools, events, seconds, stored = _run_turn(dispatcher)
+
+    assert all(isinstance(tool, ConcurrentFunctionTool) for tool in tools)
+    responses = [response.name for event in events for response in event.get_function_responses()]
+    # Merged in the order of the calls
+    assert responses == ["lookup_weather", "lookup_flights", "remember_city"]
+    assert stored.state["city"] == "Oslo"
+    assert seconds < 0.55
+    assert threads["lookup_weather"].startswith("adk-tool") and threads["lookup_flights"].startswith("adk-tool")
+    # Functions that touch session state stay on the event loop
+    assert threads["remember_city"] == "MainThread"
+    assert dispatcher.timings["remember_city"].threaded == 0
+    assert dispatcher.turns["count"] == 1
+    assert dispatcher.turns["wall_seconds"] < dispatcher.turns["call_seconds"]
+    dispatcher.shutdown()
+
+
+def test_the_per_turn_cap_limits_overlap():
+    dispatcher = ToolDispatcher(max_per_turn=1)
+    _, _, seconds, _ = _run_turn(dispatcher)
+    assert seconds >= 0.6
+    assert dispatcher.timings["lookup_weather"].wait_seconds + dispatcher.timings["lookup_flights"].wait_seconds >= 0.3
+    dispatcher.shutdown()
@@ -0,0 +1,62 @@
+import asyncio
+import random
+
+from google.adk.events import Event, EventActions
+from google.adk.sessions import DatabaseSessionService
+from google.adk.sessions.base_session_service import GetSessionConfig
+
+from agents_shared import DeltaEncodedDatabaseSessionService
+from agents_shared.delta_sessions import _actions_bytes, apply_patch, make_patch
+
+
+def _revisions(count: int) -> list[str]:
+    """A story revised a sentence at a time, like the refinement loop of d1_loop_agent."""
+    rng = random.Random(3)
+    sentences = [f"Sentence {i} tells of the harbour and the {rng.choice(['tide', 'gull', 'lamp'])}." for i in range(30)]
+    revisions = []
+    for _ in range(count):
+        sentences[rng.randrange(len(sentences))] = f"A revised line about the {rng.choice(['storm', 'keeper', 'ship'])}."
+        revisions.append(" ".join(sentences))
+    return revisions
+
+
+def _event(story: str) -> Event:
+    return Event(author="writer", invocation_id="inv", actions=EventActions(state_delta={"current_story": story}))
+
+
+async def _write(service, stories: list[str]) -> str:
+    session = await service.create_session(app_name="app", user_id="user")
+    for story in stories:
+        await service.append_event(session, _event(story))
+    return session.id
+
+
+def test_patches_round_trip():
+    base, value = _revisions(2)
+    assert apply_patch(base, make_patch(base, value)) == value
+
+
+def test_any_window_of_events_reads_back_full_values(tmp_path):
+    stories = _revisions(12)
+
+    async def scenario():
+        plain = DatabaseSessionService(db_url=f"sqlite:///{tmp_path / 'plain.db'}")
+        await _write(plain, stories)
+        service = DeltaEncodedDatabaseSessionService(db_url=f"sqlite:///{tmp_path / 'delta.db'}", keyframe_interval=4)
+        session_id = await _write(service, stories)
+
+        # A new service has no cached bases and has to follow the patch chains
+        reader = DeltaEncodedDatabaseSessionService(db_url=f"sqlite:///{tmp_path / 'delta.db'}")
+        full = await reader.get_session(app_name="app", user_id="user", session_id=session_id)
+        window = await reader.get_session(
+            app_name="app", user_id="user", session_id=session_id, config=GetSessionConfig(num_recent_events=3)
+        )
+        return service, reader, full, window
+
+    service, reader, full, window = asyncio.run(scenario())
+    assert [event.actions.state_delta["current_story"] for event in full.events] == stories
+    assert [event.actions.state_delta["current_story"] for event in window.events] == stories[-3:]
+    assert full.state["current_story"] == stories[-1]
+    assert reader.delta_stats["chain_reads"] >= 1
+    assert service.delta_stats["keyframes"] == 3 and service.delta_stats["patches"] == 9
+    assert _actions_bytes(str(tmp_path / "delta.db")) < _actions_bytes(str(tmp_path / "plain.db")) / 2
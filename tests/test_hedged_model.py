@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from agents_shared.hedged_model import HedgedModel
+
+
+class ScriptedModel(BaseLlm):
+    """Answers call N after delays[N] seconds; a negative delay raises after that long."""
+
+    model: str = "gemini-2.5-flash-lite"
+    delays: list = []
+    calls: int = 0
+    cancelled: list = []
+
+    async def generate_content_async(self, llm_request, stream: bool = False):
+        call = self.calls
+        self.calls += 1
+        delay = self.delays[call % len(self.delays)]
+        try:
+            await asyncio.sleep(abs(delay))
+        except asyncio.CancelledError:
+            self.cancelled.append(call)
+            raise
+        if delay < 0:
+            raise RuntimeError(f"call {call} failed")
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=f"call {call}")]))
+
+
+def _ask(model: HedgedModel) -> tuple[str, float]:
+    async def one():
+        request = LlmRequest(contents=[types.Content(role="user", parts=[types.Part(text="hi")])])
+        return [response async for response in model.generate_content_async(request)]
+
+    started = time.perf_counter()
+    responses = asyncio.run(one())
+    return responses[0].content.parts[0].text, time.perf_counter() - started
+
+
+def test_a_slow_call_is_hedged_and_the_loser_cancelled():
+    inner = ScriptedModel(delays=[2.0, 0.01])
+    model = HedgedModel(inner=inner, initial_delay=0.05)
+
+    text, seconds = _ask(model)
+    assert text == "call 1" and seconds < 1.0
+    assert inner.cancelled == [0]
+    assert (model.stats.calls, model.stats.hedges_fired, model.stats.hedges_won) == (1, 1, 1)
+
+
+def test_a_failed_call_waits_for_its_hedge():
+    model = HedgedModel(inner=ScriptedModel(delays=[-0.2, 0.3]), initial_delay=0.05)
+    text, _ = _ask(model)
+    assert text == "call 1"
+
+
+def test_hedges_stay_within_the_budget():
+    inner = ScriptedModel(delays=[0.2])
+    model = HedgedModel(inner=inner, initial_delay=0.05, max_burst=1.0, max_hedge_rate=0.0)
+    _ask(model)
+    _ask(model)
+    # The only token went to the first call
+    assert (model.stats.hedges_fired, model.stats.over_budget) == (1, 1)
+    assert inner.calls == 3
+
+
+def test_hedge_delay_follows_the_latency_percentile():
+    model = HedgedModel(inner=ScriptedModel(delays=[0.01]), min_samples=10, percentile=90, initial_delay=3.0)
+    assert model.hedge_delay() == 3.0
+    model.stats.latencies.extend(i / 10 for i in range(1, 11))
+    assert model.hedge_delay() == 1.0
+    assert model.model == "gemini-2.5-flash-lite"
+
+
+class StreamingModel(BaseLlm):
+    """Streams three responses per call, the first after delays[N] seconds, noting the task of every step."""
+
+    model: str = "gemini-2.5-flash-lite"
+    delays: list = []
+    calls: int = 0
+    tasks: dict = {}
+
+    async def generate_content_async(self, llm_request, stream: bool = False):
+        call = self.calls
+        self.calls += 1
+        steps = self.tasks.setdefault(call, [])
+        try:
+            steps.append(asyncio.current_task())
+            await asyncio.sleep(self.delays[call])
+            for chunk in range(3):
+                steps.append(asyncio.current_task())
+                yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=f"call {call} chunk {chunk}")]))
+                await asyncio.sleep(0.01)
+        finally:
+            steps.append(asyncio.current_task())
+
+
+def test_each_request_runs_in_one_task():
+    inner = StreamingModel(delays=[2.0, 0.01])
+    model = HedgedModel(inner=inner, initial_delay=0.05)
+
+    async def one():
+        request = LlmRequest(contents=[types.Content(role="user", parts=[types.Part(text="hi")])])
+        return [response.content.parts[0].text async for response in model.generate_content_async(request, stream=True)]
+
+    assert asyncio.run(one()) == [f"call 1 chunk {chunk}" for chunk in range(3)]
+    # The loser is cancelled and closed in the task that ran it
+    assert set(inner.tasks) == {0, 1}
+    assert all(len(set(steps)) == 1 for steps in inner.tasks.values())
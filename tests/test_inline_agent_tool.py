@@ -0,0 +1,64 @@
+import asyncio
+
+from google.adk.agents import LlmAgent, SequentialAgent
+from google.adk.agents.invocation_context import InvocationContext, new_invocation_context_id
+from google.adk.agents.run_config import RunConfig
+from google.adk.artifacts import InMemoryArtifactService
+from google.adk.memory import InMemoryMemoryService
+from google.adk.plugins.plugin_manager import PluginManager
+from google.adk.sessions import InMemorySessionService
+from google.adk.tools.tool_context import ToolContext
+
+from agents_shared import InlineAgentTool
+from agents_shared.stand_in_model import StandInModel
+
+
+async def _call(tool: InlineAgentTool, request: str):
+    session_service = InMemorySessionService()
+    session = await session_service.create_session(app_name="app", user_id="user", state={"topic": "tides"})
+    context = InvocationContext(
+        session_service=session_service,
+        artifact_service=InMemoryArtifactService(),
+        memory_service=InMemoryMemoryService(),
+        invocation_id=new_invocation_context_id(),
+        agent=LlmAgent(name="Coordinator", model=StandInModel()),
+        session=session,
+        plugin_manager=PluginManager(),
+        run_config=RunConfig(),
+    )
+    tool_context = ToolContext(context)
+    result = await tool.run_async(args={"request": request}, tool_context=tool_context)
+    return result, tool_context
+
+
+def test_later_steps_see_earlier_writes():
+    seen = []
+
+    def capture(callback_context, llm_request):
+        seen.append(llm_request.config.system_instruction)
+
+    pipeline = SequentialAgent(
+        name="Pipeline",
+        sub_agents=[
+            LlmAgent(name="Drafter", model=StandInModel(), instruction="Draft about {topic}", output_key="first"),
+            LlmAgent(
+                name="Editor", model=StandInModel(), instruction="Edit this draft: {first}",
+                output_key="second", before_model_callback=capture,
+            ),
+        ],
+    )
+    result, tool_context = asyncio.run(_call(InlineAgentTool(pipeline, forward_keys=("second",)), "Write it"))
+
+    assert result
+    assert "Reply to: Write it" in seen[0]
+    assert tool_context.state["second"].startswith("Reply to:")
+    # Only forwarded keys reach the caller
+    assert "first" not in tool_context.state
+
+
+def test_output_key_written_back():
+    agent = LlmAgent(name="Summarizer", model=StandInModel(), instruction="Summarize {topic}", output_key="summary")
+    result, tool_context = asyncio.run(_call(InlineAgentTool(agent), "Summarize the notes"))
+
+    assert result == tool_context.state["summary"]
+    assert result.startswith("Reply to: Summarize the notes")
@@ -0,0 +1,104 @@
+import asyncio
+import os
+
+import pytest
+from google.adk.events import Event, EventActions
+from google.genai import types
+
+from agents_shared import JournaledSessionService
+from agents_shared.load_test import load_agent_folder
+
+
+def _event(text: str, **state) -> Event:
+    return Event(
+        author="writer",
+        invocation_id="inv",
+        content=types.Content(role="model", parts=[types.Part(text=text)]),
+        actions=EventActions(state_delta=state),
+    )
+
+
+def test_sessions_survive_a_restart(tmp_path):
+    path = str(tmp_path / "sessions.journal")
+
+    async def write():
+        service = JournaledSessionService(path, snapshot_every=3)
+        session = await service.create_session(app_name="app", user_id="user", state={"order": 1})
+        for i in range(4):
+            await service.append_event(session, _event(f"step {i}", step=i))
+        await service.close()
+        return session.id
+
+    async def read(session_id):
+        service = JournaledSessionService(path)
+        session = await service.get_session(app_name="app", user_id="user", session_id=session_id)
+        await service.close()
+        return session
+
+    session_id = asyncio.run(write())
+    session = asyncio.run(read(session_id))
+    assert session.state == {"order": 1, "step": 3}
+    assert [event.content.parts[0].text for event in session.events] == [f"step {i}" for i in range(4)]
+
+
+def test_a_journal_has_one_owner(tmp_path):
+    path = str(tmp_path / "sessions.journal")
+    owner = JournaledSessionService(path)
+    with pytest.raises(RuntimeError, match="in use"):
+        JournaledSessionService(path)
+    asyncio.run(owner.close())
+    asyncio.run(JournaledSessionService(path).close())
+
+
+def test_shipping_agent_journal_path_is_configurable(tmp_path, monkeypatch):
+    services = []
+    for name in ("first", "second"):
+        # Two copies of the folder run side by side with their own journals
+        monkeypatch.setenv("SHIPPING_SESSIONS_JOURNAL", str(tmp_path / f"{name}.journal"))
+        _, session_service = load_agent_folder("d2_lro_hitl")
+        assert session_service.journal_path == str(tmp_path / f"{name}.journal")
+        services.append(session_service)
+    assert sorted(os.listdir(tmp_path)) == ["first.journal", "first.journal.lock", "second.journal", "second.journal.lock"]
+    for service in services:
+        asyncio.run(service.close())
+
+
+def test_a_failed_write_stops_the_service(tmp_path):
+    path = str(tmp_path / "sessions.journal")
+
+    def failing_write(data):
+        raise OSError("disk full")
+
+    async def scenario():
+        service = JournaledSessionService(path)
+        session = await service.create_session(app_name="app", user_id="user")
+        await service.append_event(session, _event("kept", step=1))
+        service._write = failing_write
+        with pytest.raises(OSError, match="disk full"):
+            await service.append_event(session, _event("lost", step=2))
+        # Memory holds the lost event now; nothing may persist it later
+        with pytest.raises(RuntimeError, match="restart"):
+            await service.append_event(session, _event("refused", step=3))
+        with pytest.raises(RuntimeError, match="restart"):
+            await service.snapshot()
+        await service.close()
+
+        service = JournaledSessionService(path)
+        recovered = await service.get_session(app_name="app", user_id="user", session_id=session.id)
+        await service.close()
+        return recovered
+
+    recovered = asyncio.run(scenario())
+    assert recovered.state == {"step": 1}
+    assert [event.content.parts[0].text for event in recovered.events] == ["kept"]
+
+
+def test_a_corrupt_snapshot_releases_the_lock(tmp_path):
+    path = str(tmp_path / "sessions.journal")
+    (tmp_path / "sessions.journal.snapshot").write_bytes(b"not a snapshot")
+    with pytest.raises(RuntimeError, match="corrupt") as failed:
+        JournaledSessionService(path)
+    os.remove(path + ".snapshot")
+    # Still holding the failed attempt, so the lock must have been released explicitly
+    assert failed.value
+    asyncio.run(JournaledSessionService(path).close())
@@ -0,0 +1,28 @@
+import asyncio
+
+from agents_shared.load_test import check_memory_growth, linear_fit, parse_args, run_load_test
+
+
+def test_linear_growth_is_flagged_after_the_warmup():
+    args = parse_args(["d3_sessions", "--warmup", "60", "--max-growth-mb-per-min", "1"])
+    # (seconds, RSS MB, traced MB): a spike during warm-up, then 2 MB/min
+    leaking = [(0, 100, 50)] + [(60 * minute, 100 + minute, 10 + 2 * minute) for minute in range(1, 6)]
+    assert check_memory_growth(leaking, args)["leak"]
+    assert abs(check_memory_growth(leaking, args)["traced_mb_per_min"] - 2) < 1e-9
+
+    flat = [(60 * minute, 100, 10 + (minute % 2)) for minute in range(1, 8)]
+    assert not check_memory_growth(flat, args)["leak"]
+    assert linear_fit([1, 2], [1, 2]) == (0.0, 0.0)
+
+
+def test_runs_an_agent_folder_with_stand_in_models():
+    args = parse_args([
+        "d3_sessions", "--users", "3", "--turns", "2", "--sessions-per-user", "1",
+        "--think-time", "0", "--duration", "30", "--model-latency", "0", "--sample-interval", "0.5",
+    ])
+    report = asyncio.run(run_load_test(args))
+
+    assert report["errors"] == 0, report["last_error"]
+    assert (report["sessions"], report["turns"]) == (3, 6)
+    assert report["latency_ms"]["p50"] > 0
+    assert report["memory_samples"]
@@ -0,0 +1,58 @@
+import asyncio
+
+from google.adk.events import Event
+from google.adk.memory import InMemoryMemoryService
+from google.adk.sessions import Session
+from google.genai import types
+
+from agents_shared.memory_cache import CachedMemoryService, normalize_query
+
+
+def _session(session_id: str, user_id: str, *texts: str) -> Session:
+    return Session(
+        id=session_id, app_name="app", user_id=user_id,
+        events=[Event(author="user", content=types.UserContent(parts=[types.Part(text=t)])) for t in texts],
+    )
+
+
+def _texts(response) -> list[str]:
+    return sorted(memory.content.parts[0].text for memory in response.memories)
+
+
+def test_repeated_searches_hit_until_the_user_memory_changes():
+    memory = CachedMemoryService(InMemoryMemoryService())
+
+    async def scenario():
+        await memory.add_session_to_memory(_session("s1", "alice", "My cat is called Pixel."))
+        await memory.add_session_to_memory(_session("s1", "bob", "My cat is called Tofu."))
+        first = await memory.search_memory(app_name="app", user_id="alice", query="cat")
+        again = await memory.search_memory(app_name="app", user_id="alice", query="  CAT? ")
+        # Changing the result list must not change what is cached
+        again.memories.clear()
+        bob = await memory.search_memory(app_name="app", user_id="bob", query="cat")
+        assert memory.stats.hits == 1
+
+        await memory.add_session_to_memory(_session("s2", "alice", "My other cat is called Miso."))
+        fresh = await memory.search_memory(app_name="app", user_id="alice", query="cat")
+        bob_again = await memory.search_memory(app_name="app", user_id="bob", query="cat")
+        return first, bob, fresh, bob_again
+
+    first, bob, fresh, bob_again = asyncio.run(scenario())
+    assert _texts(first) == ["My cat is called Pixel."]
+    assert _texts(bob) == _texts(bob_again) == ["My cat is called Tofu."]
+    # Alice sees her new memory at once, Bob keeps his cached result
+    assert _texts(fresh) == ["My cat is called Pixel.", "My other cat is called Miso."]
+    assert (memory.stats.hits, memory.stats.misses, memory.stats.stale) == (2, 3, 1)
+    assert normalize_query("  Where\tis   my CAT?! ") == "where is my cat"
+
+
+def test_least_recently_used_results_are_evicted():
+    memory = CachedMemoryService(InMemoryMemoryService(), max_entries=2)
+
+    async def scenario():
+        for query in ["cat", "dog", "cat", "fish", "cat", "dog"]:
+            await memory.search_memory(app_name="app", user_id="alice", query=query)
+
+    asyncio.run(scenario())
+    # "dog" was evicted by "fish" and had to be searched again
+    assert (memory.stats.hits, memory.stats.misses, memory.stats.evictions) == (2, 4, 2)
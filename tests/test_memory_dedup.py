@@ -0,0 +1,81 @@
+import asyncio
+
+from google.adk.agents import LlmAgent
+from google.adk.apps import App
+from google.adk.events import Event
+from google.adk.memory import InMemoryMemoryService
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService, Session
+from google.genai import types
+
+from agents_shared import DedupMemoryService, IncrementalMemoryPreload
+from agents_shared.memory_preload import MEMORY_PREAMBLE
+from agents_shared.stand_in_model import StandInModel
+
+
+def _user_event(text: str) -> Event:
+    return Event(author="user", content=types.Content(role="user", parts=[types.Part(text=text)]))
+
+
+def test_near_duplicates_are_dropped_once():
+    memory = DedupMemoryService(InMemoryMemoryService(), threshold=0.8)
+    session = Session(
+        id="s1", app_name="app", user_id="user",
+        events=[
+            _user_event("Remember that my favorite color is blue-green and I like the sea."),
+            _user_event("Remember that my favorite color is blue-green and I like the sea!"),
+            _user_event("I am planning a trip to Lisbon with my sister."),
+        ],
+    )
+    kept = memory.filter_events(session)
+    assert [event.id for event in kept] == [session.events[0].id, session.events[2].id]
+
+    # Saving the same session again keeps the same events
+    assert [event.id for event in memory.filter_events(session)] == [event.id for event in kept]
+    assert memory.stats.events_seen == 3
+    assert memory.stats.events_dropped == 1
+
+
+def test_preloaded_memories_do_not_make_messages_duplicates():
+    async def scenario():
+        memory = DedupMemoryService(InMemoryMemoryService(), threshold=0.8)
+        await memory.add_session_to_memory(Session(
+            id="past", app_name="app", user_id="user",
+            events=[_user_event(text) for text in [
+                "My favorite color is blue-green.",
+                "My birthday is on March 15th.",
+                "My nephew turned one and I gifted him a new toy.",
+                "I am planning a trip to Lisbon with my sister.",
+                "My sister lives in Porto and works as a marine biologist.",
+                "My cat is called Pixel and sleeps on my keyboard all day.",
+                "My first car was a red hatchback that broke down every winter.",
+            ]],
+        ))
+        agent = LlmAgent(name="MemoryDemoAgent", model=StandInModel())
+        session_service = InMemorySessionService()
+        runner = Runner(
+            app=App(name="app", root_agent=agent, plugins=[IncrementalMemoryPreload(max_tokens=400)]),
+            session_service=session_service,
+            memory_service=memory,
+        )
+        # Questions that rank the memories alike, so both get the same block
+        questions = ["What do you know about my life", "Summarize what you know about my week"]
+        sessions = []
+        for question in questions:
+            session = await session_service.create_session(app_name="app", user_id="user")
+            message = types.UserContent(parts=[types.Part(text=question)])
+            async for _ in runner.run_async(user_id="user", session_id=session.id, new_message=message):
+                pass
+            session = await session_service.get_session(app_name="app", user_id="user", session_id=session.id)
+            user_parts = session.events[0].content.parts
+            assert user_parts[-1].text.startswith(MEMORY_PREAMBLE)
+            sessions.append(session)
+        assert sessions[0].events[0].content.parts[-1].text == sessions[1].events[0].content.parts[-1].text
+        for session in sessions:
+            await memory.add_session_to_memory(session)
+        return memory
+
+    memory = asyncio.run(scenario())
+    # Both questions (and both replies) are new to memory
+    assert memory.stats.events_dropped == 0
+    assert memory.stats.events_seen == 7 + 4
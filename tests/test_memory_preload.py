@@ -0,0 +1,70 @@
+import asyncio
+
+from google.adk.agents import LlmAgent
+from google.adk.apps import App
+from google.adk.events import Event
+from google.adk.memory import InMemoryMemoryService
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService, Session
+from google.genai import types
+
+from agents_shared import IncrementalMemoryPreload
+from agents_shared.memory_preload import MEMORY_EPILOGUE, MEMORY_PREAMBLE, is_memory_block
+from agents_shared.stand_in_model import StandInModel
+
+PAST = [
+    "My sister lives in Porto and works as a marine biologist.",
+    "I am planning a trip to Lisbon with my sister.",
+    "My sister has a dog called Anchor that loves the beach.",
+    "My cat is called Pixel and sleeps on my keyboard all day.",
+]
+
+
+def _block_lines(event: Event) -> list[str]:
+    """Memory lines added to a user message, without their Time: lines."""
+    lines = []
+    for part in event.content.parts:
+        if is_memory_block(part):
+            body = part.text[len(MEMORY_PREAMBLE) : -len(MEMORY_EPILOGUE)]
+            lines += [line for line in body.splitlines() if line and not line.startswith("Time:")]
+    return lines
+
+
+def test_each_memory_is_given_once_per_session():
+    plugin = IncrementalMemoryPreload(max_tokens=60)
+
+    async def scenario():
+        memory = InMemoryMemoryService()
+        await memory.add_session_to_memory(Session(
+            id="past", app_name="app", user_id="user",
+            events=[Event(author="user", content=types.UserContent(parts=[types.Part(text=t)])) for t in PAST],
+        ))
+        session_service = InMemorySessionService()
+        runner = Runner(
+            app=App(name="app", root_agent=LlmAgent(name="Assistant", model=StandInModel()), plugins=[plugin]),
+            session_service=session_service,
+            memory_service=memory,
+        )
+        session = await session_service.create_session(app_name="app", user_id="user")
+        for question in ["Where does my sister live", "Tell me more about my sister", "What does my sister do"]:
+            message = types.UserContent(parts=[types.Part(text=question)])
+            async for _ in runner.run_async(user_id="user", session_id=session.id, new_message=message):
+                pass
+            # Auto-save, as in d3_memory_2: the session's own turns become memories too
+            stored = await session_service.get_session(app_name="app", user_id="user", session_id=session.id)
+            await memory.add_session_to_memory(stored)
+        return stored
+
+    session = asyncio.run(scenario())
+    user_events = [event for event in session.events if event.author == "user"]
+    assert user_events[0].content.parts[0].text == "Where does my sister live"
+    blocks = [_block_lines(event) for event in user_events]
+    delivered = [line for block in blocks for line in block]
+
+    # The budget does not fit every memory at once: the rest follow on later
+    # turns, none twice, and the session's own saved turns never come back
+    assert len(blocks[0]) < len(PAST)
+    assert len(delivered) == len(set(delivered))
+    assert set(delivered) <= {f"user: {text}" for text in PAST}
+    assert {f"user: {text}" for text in PAST if "sister" in text} <= set(delivered)
+    assert plugin.stats.over_budget >= 1 and plugin.stats.already_seen >= 3
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+from google.adk.models.google_llm import Gemini
+from google.adk.models.registry import LLMRegistry
+from google.genai import types
+
+import agents_shared  # noqa: F401  (importing must not change the model registry)
+from agents_shared.model_clients import (
+    ModelClientRegistry,
+    PooledGemini,
+    _drive,
+    _start_fake_endpoint,
+    model_clients,
+    register_pooled_gemini,
+)
+
+
+@pytest.fixture
+def fake_gemini(monkeypatch):
+    base_url, counts = _start_fake_endpoint()
+    monkeypatch.setenv("GOOGLE_GEMINI_BASE_URL", base_url)
+    monkeypatch.setenv("GOOGLE_API_KEY", "fake-key")
+    monkeypatch.delenv("GOOGLE_GENAI_USE_VERTEXAI", raising=False)
+    return counts
+
+
+def test_import_leaves_the_model_registry_alone():
+    assert LLMRegistry.resolve("gemini-2.5-flash-lite") is Gemini
+    try:
+        register_pooled_gemini()
+        assert LLMRegistry.resolve("gemini-2.5-flash-lite") is PooledGemini
+    finally:
+        LLMRegistry.register(Gemini)
+        LLMRegistry.resolve.cache_clear()
+    assert LLMRegistry.resolve("gemini-2.5-flash-lite") is Gemini
+
+
+def test_works_outside_an_event_loop(fake_gemini):
+    registry = ModelClientRegistry()
+    options = types.HttpOptions(headers={"x-test": "1"})
+    assert registry.client(options) is registry.client(options)
+    stats = registry.stats()
+    assert stats["clients"] == 1 and stats["requests"] == 0 and stats["connections_opened"] == 0
+
+    model = PooledGemini(model="gemini-2.5-flash-lite")
+    assert model.api_client is model.api_client
+
+
+def test_agents_share_one_pool_per_loop(fake_gemini):
+    retry = types.HttpRetryOptions(attempts=1)
+    models = [PooledGemini(model="gemini-2.5-flash-lite", retry_options=retry) for _ in range(6)]
+
+    async def run() -> dict:
+        await _drive(models, calls=24, concurrency=3)
+        assert len({id(model.api_client) for model in models}) == 1
+        return model_clients.stats()
+
+    before = model_clients.stats()["requests"]
+    stats = asyncio.run(run())
+    assert fake_gemini["requests"] == 24
+    assert stats["requests"] == 24
+    assert stats["peak_in_flight"] <= 3
+    # Fewer connections than agents: they reuse the pool's keep-alive connections
+    assert fake_gemini["connections"] <= 3
+
+    # A second loop gets a pool of its own; totals outside a loop cover both
+    asyncio.run(run())
+    assert model_clients.stats()["requests"] == before + 48
+
+
+def test_aclose_closes_the_pool_of_the_loop(fake_gemini):
+    registry = ModelClientRegistry()
+    options = types.HttpOptions(headers={"x-test": "1"})
+
+    async def run():
+        client = registry.client(options)
+        await client.aio.models.generate_content(model="gemini-2.5-flash-lite", contents="Hi")
+        http_client = registry._pool()["http_client"]
+        await registry.aclose()
+        return http_client, registry.client(options) is client
+
+    http_client, reused = asyncio.run(run())
+    assert http_client.is_closed and not reused
+    assert registry.stats()["requests"] == 1
@@ -0,0 +1,68 @@
+import asyncio
+
+from google.adk.agents import LlmAgent, SequentialAgent
+from google.adk.models.llm_request import LlmRequest
+from google.genai import types
+
+from agents_shared.model_router import ModelTier, RouteRule, RouterModel, router_report, use_model_router
+from agents_shared.stand_in_model import StandInModel
+
+
+def _request(text: str) -> LlmRequest:
+    return LlmRequest(contents=[types.Content(role="user", parts=[types.Part(text=text)])])
+
+
+def _router(**lite_model) -> RouterModel:
+    return RouterModel(
+        tiers=[
+            ModelTier("lite", StandInModel(model="gemini-2.5-flash-lite", **lite_model), input_price=1.0, fallback="flash"),
+            ModelTier("flash", StandInModel(model="gemini-2.5-flash"), input_price=10.0),
+        ],
+        rules=[
+            RouteRule("flash", agents=("Writer",)),
+            RouteRule("flash", min_prompt_tokens=100),
+        ],
+        cooldown=60,
+    )
+
+
+async def _ask(router: RouterModel, text: str) -> list:
+    return [response async for response in router.generate_content_async(_request(text))]
+
+
+def test_rules_pick_the_tier_per_agent_and_prompt_size():
+    router = _router()
+    assert router.model == "gemini-2.5-flash-lite"
+    assert router.for_agent("Critic").choose(_request("APPROVED?"))[0] == "lite"
+    assert router.for_agent("Writer").choose(_request("APPROVED?"))[0] == "flash"
+    assert router.for_agent("Critic").choose(_request("word " * 100))[0] == "flash"
+    assert router.choose(_request("hi")) == ("lite", ["lite", "flash"])
+
+    pipeline = SequentialAgent(name="Pipeline", sub_agents=[
+        LlmAgent(name="Writer", model="gemini-2.5-flash-lite"),
+        LlmAgent(name="Critic", model="gemini-2.5-flash-lite"),
+    ])
+    assert use_model_router(pipeline, router) == 2
+    assert pipeline.sub_agents[0].model.agent_name == "Writer"
+    assert pipeline.sub_agents[1].model.stats is router.stats
+
+
+def test_throttled_tier_falls_back_and_cools_down():
+    router = _router(throttle_rate=1.0).for_agent("Critic")
+
+    async def scenario():
+        first = await _ask(router, "first question")
+        second = await _ask(router, "second question")
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first[-1].content.parts[0].text.startswith("Reply to: first question")
+    assert second[-1].content.parts[0].text.startswith("Reply to: second question")
+
+    report = router_report(router)
+    lite, flash = report["tiers"]["lite"], report["tiers"]["flash"]
+    # The first call was refused by lite, the second skipped it while it cooled down
+    assert (lite["calls"], lite["throttled"], lite["skipped"], lite["answered"]) == (1, 1, 1, 0)
+    assert (flash["calls"], flash["answered"]) == (2, 2)
+    assert flash["cost_usd"] == flash["prompt_tokens"] * 10.0 / 1e6 > 0
+    assert report["decisions"] == {("Critic", "lite", "flash"): 2}
@@ -0,0 +1,55 @@
+import asyncio
+
+from google.adk.events import Event, EventActions
+from google.genai import types
+
+from agents_shared import (
+    CompressedDatabaseSessionService,
+    DeltaEncodedDatabaseSessionService,
+    SnapshotDatabaseSessionService,
+    WindowedDatabaseSessionService,
+)
+
+
+# The composition d3_persistent uses
+class PersistentSessionService(
+    SnapshotDatabaseSessionService,
+    DeltaEncodedDatabaseSessionService,
+    WindowedDatabaseSessionService,
+    CompressedDatabaseSessionService,
+):
+    pass
+
+
+def _story_event(story: str) -> Event:
+    return Event(
+        author="writer",
+        invocation_id="inv",
+        content=types.Content(role="model", parts=[types.Part(text=story)]),
+        actions=EventActions(state_delta={"story": story}),
+    )
+
+
+def test_composed_service_appends_long_state_values(tmp_path):
+    db_url = f"sqlite:///{tmp_path / 'sessions.db'}"
+
+    async def scenario():
+        service = PersistentSessionService(db_url=db_url)
+        session = await service.create_session(app_name="app", user_id="user")
+        stories = ["word " * 100, "word " * 100 + "and one more line", "word " * 90 + "ending"]
+        for story in stories:
+            session = await service.get_session(app_name="app", user_id="user", session_id=session.id)
+            await service.append_event(session, _story_event(story))
+
+        # Each mixin keeps its own counters
+        assert service.delta_stats["raw_bytes"] > 0
+        assert service.delta_stats["patches"] >= 1
+        assert "snapshot_hits" in service.snapshot_stats
+        assert service.compression_stats["events"] == len(stories)
+
+        reopened = PersistentSessionService(db_url=db_url)
+        loaded = await reopened.get_session(app_name="app", user_id="user", session_id=session.id)
+        assert loaded.state["story"] == stories[-1]
+        assert [event.content.parts[0].text for event in loaded.events] == stories
+
+    asyncio.run(scenario())
@@ -0,0 +1,76 @@
+import os
+import sys
+
+import pytest
+
+from agents_shared.pooled_code_executor import PooledCodeExecutor
+
+pytestmark = pytest.mark.skipif(sys.platform != "linux", reason="The sandbox needs Linux")
+
+
+@pytest.fixture(scope="module")
+def executor():
+    os.environ["FAKE_SECRET"] = "s3cret"
+    executor = PooledCodeExecutor(workers=1)
+    yield executor
+    executor.close()
+    del os.environ["FAKE_SECRET"]
+
+
+def test_runs_snippets(executor):
+    result = executor.run_code("import math\nprint(math.sqrt(16) + 2)")
+    assert result.stdout.strip() == "6.0"
+    assert result.stderr == ""
+
+
+def test_environment_is_not_inherited(executor):
+    result = executor.run_code("import random; print(dict(random._os.environ))")
+    assert "s3cret" not in result.stdout
+    assert "GOOGLE_API_KEY" not in result.stdout
+
+
+def test_filesystem_is_out_of_reach(executor):
+    for code in ("import random; print(random._os.listdir('/root'))",
+                 "import random; print(random._os.listdir('/'))",
+                 "import random; random._os.unlink('/etc/passwd')"):
+        result = executor.run_code(code)
+        assert result.stdout == ""
+        assert "Error" in result.stderr
+
+
+def test_no_processes_or_sockets(executor):
+    assert "Operation not permitted" in executor.run_code("import random; random._os.fork()").stderr
+    # Raw syscalls through ctypes, which the worker itself has loaded, still hit the seccomp filter
+    result = executor.run_code(
+        "import random\n"
+        "libc = random._os.sys.modules['ctypes'].CDLL(None)\n"
+        "print(libc.socket(2, 1, 0), libc.unshare(0x40000000))"
+    )
+    assert result.stdout.split() == ["-1", "-1"]
+
+
+def test_drops_root(executor):
+    if os.getuid() == 0:
+        assert executor.run_code("import random; print(random._os.getuid())").stdout.strip() == "65534"
+
+
+def test_import_allowlist(executor):
+    assert "not allowed" in executor.run_code("import socket").stderr
+
+
+def test_a_worker_that_cannot_be_replaced_is_retried_later(monkeypatch):
+    executor = PooledCodeExecutor(workers=1, timeout=0.5)
+    executor.start()
+    spawn = PooledCodeExecutor._spawn
+
+    def failing_spawn(self):
+        raise RuntimeError("Code executor worker failed to start its sandbox: test")
+
+    monkeypatch.setattr(PooledCodeExecutor, "_spawn", failing_spawn)
+    assert "TimeoutError" in executor.run_code("while True: pass").stderr
+    # The pool slot is kept: later snippets get an error instead of waiting forever
+    assert "could not be restarted" in executor.run_code("print(1)").stderr
+
+    monkeypatch.setattr(PooledCodeExecutor, "_spawn", spawn)
+    assert executor.run_code("print(1)").stdout.strip() == "1"
+    executor.close()
@@ -0,0 +1,96 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+from google.adk.events import Event, EventActions
+from google.adk.sessions import DatabaseSessionService
+from google.genai import types
+
+from agents_shared.compressed_sessions import CompressedDatabaseSessionService
+from agents_shared.session_export import ExportWatermark, export_database
+
+dataset = pytest.importorskip("pyarrow.dataset")
+
+
+def _event(text: str, **state) -> Event:
+    return Event(
+        author="writer",
+        invocation_id="inv",
+        content=types.Content(role="model", parts=[types.Part(text=text)]),
+        actions=EventActions(state_delta=state),
+    )
+
+
+def _age_sessions(db_path, seconds: int):
+    """Move the latest session updates back in time, as if the export ran later."""
+    with sqlite3.connect(db_path) as connection:
+        connection.execute(
+            f"UPDATE sessions SET update_time = datetime(update_time, '-{seconds} seconds')"
+            " WHERE update_time >= datetime('now', '-10 seconds')"
+        )
+
+
+def _read(out_dir, table: str):
+    return dataset.dataset(str(out_dir / table), format="parquet", partitioning="hive").to_table()
+
+
+def test_exports_a_real_database_and_reads_it_back(tmp_path):
+    db_path = tmp_path / "sessions.db"
+    out_dir = tmp_path / "analytics"
+
+    async def write(service, app_name: str, texts: list[str]):
+        session = await service.create_session(app_name=app_name, user_id="user")
+        for i, text in enumerate(texts):
+            await service.append_event(session, _event(text, turn=i))
+        return session
+
+    # Compressed content must come out decoded
+    service = CompressedDatabaseSessionService(db_url=f"sqlite:///{db_path}", threshold=64)
+    asyncio.run(write(service, "stories", ["word " * 100, "short"]))
+    asyncio.run(write(service, "support app", ["hello", "how can I help?", "bye"]))
+    _age_sessions(db_path, 120)
+
+    stats = export_database(str(db_path), str(out_dir), batch_size=2, settle_seconds=0)
+    assert (stats.events, stats.sessions) == (5, 2)
+    assert stats.batches == 3 + 1
+
+    events = _read(out_dir, "events").to_pylist()
+    assert sorted(row["app_name"] for row in events) == ["stories"] * 2 + ["support app"] * 3
+    by_text = {row["text_chars"] for row in events if row["app_name"] == "stories"}
+    assert by_text == {500, 5}
+    assert all(row["state_delta_keys"] == ["turn"] for row in events)
+    assert all(row["date"] for row in events)
+    sessions = _read(out_dir, "sessions").to_pylist()
+    assert sorted(row["app_name"] for row in sessions) == ["stories", "support app"]
+    assert all(row["state_keys"] == ["turn"] for row in sessions)
+
+    # A second run only appends what is new
+    plain = DatabaseSessionService(db_url=f"sqlite:///{db_path}")
+    asyncio.run(write(plain, "stories", ["another story"]))
+    _age_sessions(db_path, 60)
+    stats = export_database(str(db_path), str(out_dir), settle_seconds=0)
+    assert (stats.events, stats.sessions) == (1, 1)
+    assert _read(out_dir, "events").num_rows == 6
+    watermark = ExportWatermark.load(str(out_dir))
+    assert (watermark.runs, watermark.events_exported, watermark.sessions_exported) == (2, 6, 3)
+
+
+def test_sessions_wait_until_their_second_is_over(tmp_path):
+    db_path = tmp_path / "sessions.db"
+    out_dir = tmp_path / "analytics"
+    service = DatabaseSessionService(db_url=f"sqlite:///{db_path}")
+    # Start early in a second, so the export below runs within the same one
+    time.sleep(1 - time.time() % 1)
+    session = asyncio.run(service.create_session(app_name="app", user_id="user"))
+
+    stats = export_database(str(db_path), str(out_dir), settle_seconds=0)
+    # update_time has whole seconds: another change in this second would
+    # keep it, so exporting the session now could miss that change
+    assert stats.sessions == 0
+
+    asyncio.run(service.append_event(session, _event("late change", step=2)))
+    time.sleep(2.1)
+    stats = export_database(str(db_path), str(out_dir), settle_seconds=0)
+    assert (stats.events, stats.sessions) == (1, 1)
+    assert _read(out_dir, "sessions").to_pylist()[0]["state_keys"] == ["step"]
@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+from google.adk.events import Event, EventActions
+from google.adk.events.event_actions import EventCompaction
+from google.adk.sessions.base_session_service import GetSessionConfig
+from google.genai import types
+
+from agents_shared import SnapshotDatabaseSessionService, WindowedDatabaseSessionService
+
+
+class WindowedSnapshotService(SnapshotDatabaseSessionService, WindowedDatabaseSessionService):
+    pass
+
+
+def _event(text: str, **actions) -> Event:
+    return Event(
+        author="writer",
+        invocation_id="inv",
+        content=types.Content(role="model", parts=[types.Part(text=text)]),
+        actions=EventActions(**actions),
+    )
+
+
+async def _write(service, texts: list[str], compact_from: int = None) -> str:
+    """Append `texts`; with compact_from, compact the events from that one on."""
+    session = await service.create_session(app_name="app", user_id="user")
+    timestamps = []
+    for text in texts:
+        event = await service.append_event(session, _event(text))
+        timestamps.append(event.timestamp)
+        time.sleep(0.001)
+    if compact_from is not None:
+        compaction = EventCompaction(
+            start_timestamp=timestamps[compact_from],
+            end_timestamp=timestamps[-1],
+            compacted_content=types.Content(role="model", parts=[types.Part(text="summary")]),
+        )
+        await service.append_event(session, _event("summary", compaction=compaction))
+        await service.append_event(session, _event("after"))
+    return session.id
+
+
+def _texts(session) -> list[str]:
+    return [event.content.parts[0].text for event in session.events]
+
+
+def test_snapshot_hits_return_the_same_events_as_the_database(tmp_path):
+    db_url = f"sqlite:///{tmp_path / 'sessions.db'}"
+    snapshot_path = str(tmp_path / "sessions.snapshot")
+    texts = [f"turn {i}" for i in range(6)]
+    configs = [None, GetSessionConfig(), GetSessionConfig(num_recent_events=3)]
+
+    async def scenario():
+        writer = WindowedSnapshotService(db_url, window_events=2)
+        plain_id = await _write(writer, texts)
+        compacted_id = await _write(writer, texts, compact_from=4)
+        await writer.save_snapshot(snapshot_path, app_name="app")
+
+        windowed = WindowedDatabaseSessionService(db_url, window_events=2)
+        warm = WindowedSnapshotService(db_url, window_events=2)
+        assert warm.load_snapshot(snapshot_path) == 2
+        for session_id in (plain_id, compacted_id):
+            for config in configs:
+                # Twice: once from the snapshot, once from the warm cache
+                for _ in range(2):
+                    hit = await warm.get_session(
+                        app_name="app", user_id="user", session_id=session_id, config=config
+                    )
+                    expected = await windowed.get_session(
+                        app_name="app", user_id="user", session_id=session_id, config=config
+                    )
+                    assert [e.id for e in hit.events] == [e.id for e in expected.events]
+        assert warm.snapshot_stats["db_loads"] == 0
+        assert warm.snapshot_stats["snapshot_hits"] == 2
+
+        plain = await warm.get_session(app_name="app", user_id="user", session_id=plain_id)
+        assert _texts(plain) == ["turn 4", "turn 5"]
+        compacted = await warm.get_session(app_name="app", user_id="user", session_id=compacted_id)
+        assert _texts(compacted) == ["turn 4", "turn 5", "summary", "after"]
+
+    asyncio.run(scenario())
+
+
+def test_warm_cache_is_capped_by_events(tmp_path):
+    db_url = f"sqlite:///{tmp_path / 'sessions.db'}"
+    snapshot_path = str(tmp_path / "sessions.snapshot")
+
+    async def scenario():
+        writer = SnapshotDatabaseSessionService(db_url)
+        session_ids = [await _write(writer, ["a", "b", "c"]) for _ in range(3)]
+        await writer.save_snapshot(snapshot_path, app_name="app")
+
+        warm = SnapshotDatabaseSessionService(db_url, max_warm_events=7)
+        warm.load_snapshot(snapshot_path)
+        for session_id in session_ids:
+            await warm.get_session(app_name="app", user_id="user", session_id=session_id)
+        # Three sessions of three events do not fit in seven
+        assert len(warm._warm) == 2 and warm._warm_events == 6
+
+        session = await warm.get_session(app_name="app", user_id="user", session_id=session_ids[2])
+        await warm.append_event(session, _event("d"))
+        await warm.append_event(session, _event("e"))
+        assert list(warm._warm) == [("app", "user", session_ids[2])]
+        assert warm._warm_events == 5
+
+        reloaded = await warm.get_session(app_name="app", user_id="user", session_id=session_ids[2])
+        assert _texts(reloaded) == ["a", "b", "c", "d", "e"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,73 @@
+import asyncio
+
+from google.adk.events import Event, EventActions
+from google.genai import types
+
+from agents_shared.sharded_sessions import ShardedSessionService, shard_index, shard_urls
+
+
+def _event(i: int, **state) -> Event:
+    return Event(
+        author="writer",
+        invocation_id=f"inv-{i}",
+        content=types.Content(role="model", parts=[types.Part(text=f"turn {i}")]),
+        actions=EventActions(state_delta=state),
+    )
+
+
+def test_users_live_on_their_shard_and_app_state_is_shared(tmp_path):
+    service = ShardedSessionService(shard_urls(str(tmp_path / "sessions"), 4))
+    users = [f"user-{i}" for i in range(12)]
+
+    async def scenario():
+        sessions = {}
+        for user_id in users:
+            session = await service.create_session(app_name="app", user_id=user_id)
+            await service.append_event(session, _event(0, **{"user:name": user_id}))
+            sessions[user_id] = session
+        # An app-wide value written through one user reaches every shard
+        await service.append_event(sessions[users[0]], _event(1, **{"app:motd": "hello"}))
+        loaded = {
+            user_id: await service.get_session(app_name="app", user_id=user_id, session_id=session.id)
+            for user_id, session in sessions.items()
+        }
+        listed = await service.list_sessions(app_name="app")
+        return loaded, listed
+
+    loaded, listed = asyncio.run(scenario())
+    assert len({shard_index("app", user_id, 4) for user_id in users}) > 1
+    for user_id, session in loaded.items():
+        assert session.state["user:name"] == user_id
+        assert session.state["app:motd"] == "hello"
+    assert sorted(session.user_id for session in listed.sessions) == sorted(users)
+    service.close()
+
+
+def test_reshard_keeps_sessions_while_users_keep_writing(tmp_path):
+    service = ShardedSessionService(shard_urls(str(tmp_path / "sessions"), 2))
+    users = [f"user-{i}" for i in range(8)]
+
+    async def scenario():
+        sessions = [await service.create_session(app_name="app", user_id=user_id) for user_id in users]
+
+        async def keep_writing(session):
+            for i in range(5):
+                await service.append_event(session, _event(i, turn=i))
+
+        moved, *_ = await asyncio.gather(
+            service.reshard(shard_urls(str(tmp_path / "sessions"), 3)),
+            *(keep_writing(session) for session in sessions),
+        )
+        loaded = [
+            await service.get_session(app_name="app", user_id=session.user_id, session_id=session.id)
+            for session in sessions
+        ]
+        return moved, loaded
+
+    moved, loaded = asyncio.run(scenario())
+    assert moved["users"] == len(users)
+    assert len(service.shards) == 3
+    for session in loaded:
+        assert [event.invocation_id for event in session.events] == [f"inv-{i}" for i in range(5)]
+        assert session.state["turn"] == 4
+    service.close()
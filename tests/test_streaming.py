@@ -0,0 +1,50 @@
+import asyncio
+
+from google.adk.agents import LlmAgent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from agents_shared import run_session
+from agents_shared.stand_in_model import StandInModel
+from agents_shared.streaming import StreamMetrics, stream_text
+
+
+def _runner() -> tuple[Runner, InMemorySessionService]:
+    session_service = InMemorySessionService()
+    model = StandInModel(latency=0.05, response_words=12, chunk_words=4)
+    agent = LlmAgent(name="Assistant", model=model)
+    return Runner(app_name="app", agent=agent, session_service=session_service), session_service
+
+
+def test_each_delta_is_yielded_once_with_its_timing():
+    runner, session_service = _runner()
+
+    async def scenario():
+        session = await session_service.create_session(app_name="app", user_id="user")
+        metrics = StreamMetrics(query="Hello")
+        message = types.Content(role="user", parts=[types.Part(text="Hello")])
+        deltas = [delta async for delta in stream_text(runner, "user", session.id, message, metrics=metrics)]
+        stored = await session_service.get_session(app_name="app", user_id="user", session_id=session.id)
+        return deltas, metrics, stored
+
+    deltas, metrics, stored = asyncio.run(scenario())
+    # Three chunks of four words, and not the final text again
+    assert [author for author, _ in deltas] == ["Assistant"] * 3
+    final_text = stored.events[-1].content.parts[0].text
+    assert "".join(delta for _, delta in deltas).split() == final_text.split()
+    assert not any(event.partial for event in stored.events)
+
+    summary = metrics.summary()
+    assert summary["deltas"] == 3 and len(metrics.inter_token) == 2
+    assert 0.05 <= metrics.ttft < summary["total_ms"] / 1000
+
+
+def test_run_session_streams_every_query(capsys):
+    runner, session_service = _runner()
+    metrics = asyncio.run(
+        run_session(runner, session_service, user_queries=["Hi", "Again"], session_name="s1", stream=True)
+    )
+    assert [m.query for m in metrics] == ["Hi", "Again"]
+    assert all(m.summary()["deltas"] == 3 for m in metrics)
+    assert capsys.readouterr().out.count("Reply to: Again") == 1
@@ -0,0 +1,71 @@
+import asyncio
+import os
+import threading
+import tracemalloc
+from types import SimpleNamespace
+
+import pytest
+from google.adk.agents import LlmAgent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import errors
+
+from agents_shared import run_session
+from agents_shared.stand_in_model import StandInModel
+from agents_shared.turn_profiler import AGENTS_DIR, TurnProfiler
+
+
+def _frames(*paths):
+    return [SimpleNamespace(filename=path, lineno=1) for path in paths]
+
+
+def test_agent_folders_are_told_apart_from_helpers():
+    profiler = TurnProfiler()
+    tool = os.path.join(AGENTS_DIR, "d3_sessions", "agent.py")
+    helper = os.path.join(AGENTS_DIR, "delta_sessions.py")
+    adk = os.path.join("site-packages", "google", "adk", "sessions", "database_session_service.py")
+
+    assert profiler._attribute(_frames(tool, adk))[0] == "ADK sessions"
+    assert profiler._attribute(_frames(adk, tool))[0] == "agent tools"
+    # delta_sessions.py starts with "d" but is not an agent folder
+    assert profiler._attribute(_frames(helper))[0] == "agents_shared"
+    assert profiler._attribute(_frames(os.path.join(AGENTS_DIR, "d1_loop_agent", "agent.py")))[0] == "agent tools"
+
+
+def _runner(**model_kwargs) -> tuple[Runner, InMemorySessionService]:
+    session_service = InMemorySessionService()
+    agent = LlmAgent(name="Assistant", model=StandInModel(**model_kwargs))
+    return Runner(app_name="app", agent=agent, session_service=session_service), session_service
+
+
+def _sampler_threads() -> list:
+    return [thread for thread in threading.enumerate() if thread.name == "turn-profiler"]
+
+
+def test_profiled_session_reports_every_turn(tmp_path):
+    runner, session_service = _runner()
+    profiler = TurnProfiler(cpu_profile_dir=str(tmp_path))
+    asyncio.run(run_session(runner, session_service, user_queries=["Hi", "Again"], session_name="s1", profile=profiler))
+
+    assert [turn["query"] for turn in profiler.turns] == ["Hi", "Again"]
+    assert all(turn["events"] == {"text": 1} for turn in profiler.turns)
+    assert sorted(os.listdir(tmp_path)) == ["turn_001.folded", "turn_002.folded"]
+    assert not tracemalloc.is_tracing()
+    assert not _sampler_threads()
+
+
+def test_profiler_stops_when_a_turn_raises(tmp_path):
+    runner, session_service = _runner(throttle_rate=1.0)
+    profiler = TurnProfiler(cpu_profile_dir=str(tmp_path))
+    with pytest.raises(errors.ClientError):
+        asyncio.run(run_session(runner, session_service, user_queries=["Hi"], session_name="s1", profile=profiler))
+
+    assert profiler.turns == []
+    assert not tracemalloc.is_tracing()
+    assert not _sampler_threads()
+
+
+def test_profiler_stops_without_queries():
+    runner, session_service = _runner()
+    asyncio.run(run_session(runner, session_service, user_queries=None, session_name="s1", profile=True))
+    assert not tracemalloc.is_tracing()
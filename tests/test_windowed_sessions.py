@@ -0,0 +1,80 @@
+import asyncio
+import sqlite3
+import time
+
+from google.adk.events import Event, EventActions
+from google.adk.events.event_actions import EventCompaction
+from google.adk.sessions.base_session_service import GetSessionConfig
+from google.genai import types
+
+from agents_shared import WindowedDatabaseSessionService
+
+
+def _event(text: str, **actions) -> Event:
+    return Event(
+        author="writer",
+        invocation_id="inv",
+        content=types.Content(role="model", parts=[types.Part(text=text)]),
+        actions=EventActions(**actions),
+    )
+
+
+def _compaction(name: str, start: float, end: float) -> Event:
+    summary = types.Content(role="model", parts=[types.Part(text=name)])
+    return _event(name, compaction=EventCompaction(start_timestamp=start, end_timestamp=end, compacted_content=summary))
+
+
+def _texts(events) -> list[str]:
+    return [event.content.parts[0].text for event in events]
+
+
+async def _append(service, session, text: str) -> float:
+    event = await service.append_event(session, _event(text))
+    time.sleep(0.001)
+    return event.timestamp
+
+
+def test_loads_the_compaction_window_and_pages_older_events(tmp_path):
+    db_path = tmp_path / "sessions.db"
+
+    async def scenario():
+        service = WindowedDatabaseSessionService(f"sqlite:///{db_path}")
+        session = await service.create_session(app_name="app", user_id="user")
+        times = [await _append(service, session, f"t{i}") for i in range(8)]
+        await service.append_event(session, _compaction("c1", times[0], times[7]))
+        times += [await _append(service, session, f"t{i}") for i in (8, 9)]
+        await service.append_event(session, _compaction("c2", times[8], times[9]))
+        await _append(service, session, "t10")
+
+        loaded = await service.get_session(app_name="app", user_id="user", session_id=session.id)
+        # The earlier summary still covers t0..t7
+        assert _texts(loaded.events) == ["c1", "t8", "t9", "c2", "t10"]
+        older = [event async for event in service.older_events(loaded, page_size=3)]
+        assert _texts(older) == [f"t{i}" for i in range(7, -1, -1)]
+
+        full = await service.get_session(app_name="app", user_id="user", session_id=session.id, config=GetSessionConfig())
+        assert len(full.events) == 13
+
+        # A session stored before windowing is loaded in full once and indexed
+        with sqlite3.connect(db_path) as connection:
+            connection.execute("DELETE FROM session_windows")
+        reopened = WindowedDatabaseSessionService(f"sqlite:///{db_path}")
+        legacy = await reopened.get_session(app_name="app", user_id="user", session_id=session.id)
+        assert len(legacy.events) == 13
+        indexed = await reopened.get_session(app_name="app", user_id="user", session_id=session.id)
+        assert _texts(indexed.events) == _texts(loaded.events)
+
+    asyncio.run(scenario())
+
+
+def test_sessions_without_compaction_keep_their_last_events(tmp_path):
+    async def scenario():
+        service = WindowedDatabaseSessionService(f"sqlite:///{tmp_path / 'sessions.db'}", window_events=3)
+        session = await service.create_session(app_name="app", user_id="user")
+        for i in range(5):
+            await _append(service, session, f"t{i}")
+        loaded = await service.get_session(app_name="app", user_id="user", session_id=session.id)
+        assert _texts(loaded.events) == ["t2", "t3", "t4"]
+        assert _texts([event async for event in service.older_events(loaded)]) == ["t1", "t0"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from agents_shared.worker_pool import HashRing, SessionWorkerPool
+
+
+def test_resizing_the_ring_moves_few_sessions():
+    keys = [f"user-{i}\x00session" for i in range(2000)]
+    before = HashRing(4)
+    after = HashRing(5)
+    moved = [key for key in keys if before.node_for(key) != after.node_for(key)]
+    # Only the keys the new worker takes over change hands
+    assert all(after.node_for(key) == 4 for key in moved)
+    assert 0.1 < len(moved) / len(keys) < 0.3
+
+
+def test_turns_of_a_session_stay_on_one_worker():
+    async def scenario():
+        async with SessionWorkerPool("d3_sessions", workers=2, stand_in=True) as pool:
+            replies = [await pool.run_turn("user", f"s{i % 4}", f"Turn {i}") for i in range(12)]
+            stats = pool.stats()
+        return pool, replies, stats
+
+    pool, replies, stats = asyncio.run(scenario())
+    for i, reply in enumerate(replies):
+        assert reply["worker"] == pool.worker_for("user", f"s{i % 4}")
+        assert reply["text"]
+    assert sum(row["turns"] for row in stats) == 12
+    assert sum(row["sessions"] for row in stats) == 4
+
+
+def test_journaled_folder_needs_a_single_worker(tmp_path, monkeypatch):
+    monkeypatch.setenv("SHIPPING_SESSIONS_JOURNAL", str(tmp_path / "shipping.journal"))
+
+    async def scenario():
+        with pytest.raises(ValueError, match="workers=1"):
+            await SessionWorkerPool("d2_lro_hitl", workers=2, stand_in=True).start()
+        async with SessionWorkerPool("d2_lro_hitl", workers=1, stand_in=True) as pool:
+            return await pool.run_turn("user", "order-1", "Ship 2 containers to Rotterdam")
+
+    reply = asyncio.run(scenario())
+    assert reply["worker"] == 0 and reply["events"] >= 1
+    assert (tmp_path / "shipping.journal").exists()
+
+
+def test_a_killed_worker_is_restarted():
+    async def scenario():
+        async with SessionWorkerPool("d3_sessions", workers=1, stand_in=True) as pool:
+            await pool.run_turn("user", "s1", "Hello")
+            worker = pool._workers[0]
+            killed = worker.process
+            killed.kill()
+            await killed.wait()
+            # Sent to the dead process or to its replacement, never a raw pipe error
+            try:
+                await pool.run_turn("user", "s1", "Are you there?")
+            except RuntimeError:
+                pass
+            for _ in range(300):
+                if worker.process is not killed and worker.ready.is_set():
+                    break
+                await asyncio.sleep(0.1)
+            reply = await pool.run_turn("user", "s2", "Hello again")
+            return reply, pool.stats()[0], killed.pid, worker.pending
+
+    reply, stats, killed_pid, pending = asyncio.run(scenario())
+    assert reply["text"] and stats["restarts"] == 1
+    assert stats["pid"] != killed_pid
+    assert pending == {}